@@ -2,6 +2,8 @@
 Configuration settings for the MyFlix backend API.
 """
 
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,6 +14,22 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_SECRET_KEY: str
     ACCESS_TOKEN_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_HOURS: int
+    # Lifetime of access tokens in minutes, overriding ACCESS_TOKEN_EXPIRE_HOURS
+    # when set (e.g. 15, as clients renew short-lived tokens with their refresh
+    # token)
+    ACCESS_TOKEN_EXPIRE_MINUTES: Optional[int] = None
+    # Lifetime of refresh tokens in days
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Size in bits of the Bloom filter checked before the revoked token
+    # denylist, rounded up to a power of two (0 disables the filter)
+    REVOKED_TOKENS_BLOOM_BITS: int = 0
+    # Seconds between removals of expired tokens from the denylist
+    REVOKED_TOKENS_PRUNE_SECONDS: float = 300.0
+    # Redis URL to share the denylist between workers (in-process when empty)
+    REVOKED_TOKENS_REDIS_URL: str = ""
+    # Comma-separated emails of the users allowed to use admin endpoints (none
+    # when empty, so admin endpoints are off until configured)
+    ADMIN_EMAILS: str = ""
 
     # CORS - will be parsed from comma-separated string in .env
     ALLOWED_ORIGINS: str
@@ -25,11 +43,266 @@ class Settings(BaseSettings):
     IMAGE_GEN_MODEL: str
     MIN_PASSWORD_LENGTH: int = 6
 
+    # Image generation models
+    # Comma-separated models a request can select (IMAGE_GEN_MODEL is always
+    # allowed and is used when a request selects neither a model nor a tier)
+    IMAGE_GEN_MODELS: str = "black-forest-labs/flux-schnell,black-forest-labs/flux-dev"
+    # Comma-separated models serving each tier
+    IMAGE_GEN_FAST_MODELS: str = "black-forest-labs/flux-schnell"
+    IMAGE_GEN_QUALITY_MODELS: str = "black-forest-labs/flux-dev"
+    # Route tier requests to the model of the tier with the lowest observed p50
+    # latency (otherwise the first model of the tier is used)
+    IMAGE_GEN_LATENCY_ROUTING: bool = True
+    # Number of recent call latencies per model used for routing
+    IMAGE_GEN_LATENCY_WINDOW: int = 100
+    # Latency recorded for a failed call (at least), in milliseconds, so that a
+    # failing model loses the traffic of its tier
+    IMAGE_GEN_FAILURE_PENALTY_MS: float = 60000.0
+    # Maximum concurrent Replicate calls per model, with comma-separated
+    # `model=limit` overrides
+    IMAGE_GEN_MODEL_CONCURRENCY: int = 8
+    IMAGE_GEN_MODEL_CONCURRENCY_OVERRIDES: str = "black-forest-labs/flux-dev=2"
+    # Comma-separated models whose predictions are polled while they run, to
+    # stream their step progress and intermediate outputs as `preview` events
+    IMAGE_GEN_PREVIEW_MODELS: str = "black-forest-labs/flux-dev"
+    # Interval between polls of a previewed prediction in milliseconds
+    IMAGE_GEN_PREVIEW_POLL_MS: int = 500
+    # Minimum interval between two previews of the same image in milliseconds
+    IMAGE_GEN_PREVIEW_MIN_INTERVAL_MS: int = 1000
+
+    # Batching of job stream events, so that events produced together (e.g.
+    # images finishing at the same time) are written as one chunk per subscriber
+    # Whether events of a job stream are batched
+    SSE_BATCHING_ENABLED: bool = True
+    # Events produced within this many milliseconds are batched (0 batches the
+    # events of one event loop iteration)
+    SSE_BATCH_WINDOW_MS: float = 0.0
+
+    # Generation scheduling
+    # Upper bound on images admitted but not yet finished across all jobs
+    MAX_QUEUED_IMAGES: int = 50000
+    # Maximum number of items accepted in a single batch request
+    MAX_BATCH_ITEMS: int = 10000
+    # Number of jobs from a single batch that are processed concurrently
+    BATCH_MAX_ACTIVE_JOBS: int = 4
+    # Finished jobs and batches are forgotten after this many seconds (their
+    # images expire on Replicate after an hour)
+    JOB_RETENTION_SECONDS: float = 3600.0
+
+    # Upstream warm-up, before /health reports the service as ready
+    # Whether to open pooled Replicate connections on startup
+    UPSTREAM_WARMUP_ENABLED: bool = True
+    # Number of Replicate connections opened on startup and kept alive
+    UPSTREAM_WARMUP_CONNECTIONS: int = 4
+    # Whether to also run a prediction of every allowed model on startup, so
+    # that the first jobs do not wait for cold models to boot
+    UPSTREAM_WARMUP_PREDICTIONS: bool = False
+    # Prompt of the warm-up predictions
+    UPSTREAM_WARMUP_PROMPT: str = "A white square"
+    # Time after which the service reports ready even if warm-up is not done
+    UPSTREAM_WARMUP_TIMEOUT_SECONDS: float = 120.0
+    # Delay before retrying a failed warm-up, doubled after every failed
+    # attempt up to UPSTREAM_WARMUP_RETRY_MAX_SECONDS
+    UPSTREAM_WARMUP_RETRY_SECONDS: float = 1.0
+    UPSTREAM_WARMUP_RETRY_MAX_SECONDS: float = 30.0
+    # Interval of the cheap requests keeping connections open while no
+    # prediction is made, in seconds (0 disables them)
+    UPSTREAM_KEEPALIVE_INTERVAL_SECONDS: float = 20.0
+    # Idle pooled Replicate connections are closed after this many seconds
+    UPSTREAM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+
+    # Semantic prompt cache, serving jobs from the images of similar prompts
+    # Whether jobs can be served from the images of a similar cached prompt
+    PROMPT_CACHE_ENABLED: bool = False
+    # Number of prompts kept in the cache, least recently used evicted first
+    PROMPT_CACHE_MAX_PROMPTS: int = 50000
+    # Dimensions of the hashed n-gram prompt embeddings (a power of two)
+    PROMPT_CACHE_DIM: int = 256
+    # Cosine similarity from which a cached prompt is served
+    PROMPT_CACHE_THRESHOLD: float = 0.8
+    # Age after which cached images are not served (Replicate deletes
+    # prediction outputs after an hour)
+    PROMPT_CACHE_TTL_SECONDS: int = 3000
+
+    # Speculative prefill of the prompt cache with popular prompts, using idle
+    # upstream capacity (requires the prompt cache)
+    # Whether popular prompts are generated ahead of requests
+    PREFILL_ENABLED: bool = False
+    # Number of distinct prompts whose frequency is tracked
+    PREFILL_SKETCH_SIZE: int = 1024
+    # Number of most frequent prompts kept prefilled
+    PREFILL_TOP_PROMPTS: int = 20
+    # Requests of a prompt (since counts were last halved) before it is prefilled
+    PREFILL_MIN_REQUESTS: int = 5
+    # Interval after which prompt request counts are halved, in seconds
+    PREFILL_DECAY_SECONDS: int = 3600
+    # Cached images of a popular prompt are regenerated when they expire
+    # within this many seconds
+    PREFILL_REFRESH_SECONDS: int = 600
+    # Share of a model's concurrency limit in use below which it is idle enough
+    # to prefill (prefill predictions are cancelled when real calls need it)
+    PREFILL_MAX_UTILIZATION: float = 0.5
+    # Maximum number of prefill predictions running at the same time
+    PREFILL_MAX_CONCURRENCY: int = 2
+    # Maximum number of prefill predictions started per hour
+    PREFILL_MAX_PREDICTIONS_PER_HOUR: int = 120
+    # Interval between checks for idle capacity and prompts to prefill
+    PREFILL_INTERVAL_SECONDS: float = 1.0
+
+    # Perceptual-hash deduplication of generated images (requires Pillow)
+    # Whether generated images are hashed to flag near duplicates of earlier ones
+    DEDUP_ENABLED: bool = False
+    # Number of threads hashing downloaded images
+    DEDUP_WORKERS: int = 2
+    # Largest Hamming distance between the 64-bit hashes of near duplicates
+    DEDUP_MAX_DISTANCE: int = 6
+    # Number of image hashes kept, oldest dropped first
+    DEDUP_MAX_IMAGES: int = 200000
+    # Age after which an image is not the original of duplicates anymore
+    # (Replicate deletes prediction outputs after an hour)
+    DEDUP_TTL_SECONDS: int = 3000
+    # Timeout of every image download in seconds
+    DEDUP_FETCH_TIMEOUT_SECONDS: float = 30.0
+
+    # Job archives (ZIP downloads of a job's images)
+    # Number of images downloaded concurrently while building an archive
+    ARCHIVE_FETCH_CONCURRENCY: int = 8
+    # Images larger than this are left out of archives, in megabytes
+    ARCHIVE_MAX_IMAGE_MB: int = 20
+    # Timeout of every image download in seconds
+    ARCHIVE_FETCH_TIMEOUT_SECONDS: float = 30.0
+
+    # Rate limiting, as token buckets refilled at a sustained rate per second
+    # and holding up to a burst of requests
+    GENERATE_RATE_LIMIT_PER_SECOND: float = 0.5
+    GENERATE_RATE_LIMIT_BURST: int = 10
+    # Batch items are limited in a bucket of their own, holding a batch of
+    # MAX_BATCH_ITEMS items, so that a backfill is not limited to a few items
+    BATCH_GENERATE_RATE_LIMIT_PER_SECOND: float = 5.0
+    BATCH_GENERATE_RATE_LIMIT_BURST: int = 10000
+    LOGIN_RATE_LIMIT_PER_SECOND: float = 0.2
+    LOGIN_RATE_LIMIT_BURST: int = 5
+    # Redis URL to share buckets between workers (in-process buckets when empty)
+    RATE_LIMIT_REDIS_URL: str = ""
+
+    # Show catalog
+    # JSON file with a list of shows; a dummy catalog is generated when empty
+    CATALOG_PATH: str = ""
+    # Number of shows in the generated dummy catalog
+    CATALOG_SIZE: int = 55
+    # Shows per row in the home payload, and per page when paginating a row
+    CATALOG_FIRST_PAGE_SIZE: int = 10
+    CATALOG_PAGE_SIZE: int = 20
+    # Number of serialized row pages and shows kept in memory
+    CATALOG_PAYLOAD_CACHE_SIZE: int = 4096
+    # Cache-Control header sent with catalog responses
+    CATALOG_CACHE_CONTROL: str = "public, max-age=60, stale-while-revalidate=300"
+    # Binary snapshot of the catalog, memory-mapped read-only so that workers
+    # share it (written from CATALOG_PATH or the dummy catalog when missing)
+    CATALOG_SNAPSHOT_PATH: str = ""
+    # Seconds between checks for a new snapshot renamed over the path, which is
+    # then served without a restart (0 disables hot reloads)
+    CATALOG_SNAPSHOT_RELOAD_SECONDS: float = 5.0
+    # Number of worker processes serving the app, set by server.py: shows are
+    # only added to an in-memory catalog (not a snapshot) with a single worker
+    SERVER_WORKERS: int = 1
+
+    # Catalog search
+    # Maximum number of vocabulary terms a prefix or infix token expands to
+    SEARCH_MAX_EXPANSIONS: int = 64
+    # Shows added after the index build are merged into it past this number
+    SEARCH_DELTA_MAX_DOCS: int = 1000
+
+    # Personalized recommendations
+    # Number of shows in the "Top Picks for You" row
+    RECOMMENDATIONS_SIZE: int = 30
+    # Number of users whose serialized top picks are kept in memory
+    RECOMMENDATIONS_CACHE_SIZE: int = 10000
+    # Number of recent generation prompts used to build a user's profile
+    RECOMMENDATIONS_MAX_PROMPTS: int = 50
+    # Cache-Control header sent with personalized catalog responses
+    RECOMMENDATIONS_CACHE_CONTROL: str = "private, no-cache"
+
+    # Event loop monitoring
+    # Whether to measure event loop lag and capture the stack of blocking calls
+    LOOP_MONITOR_ENABLED: bool = True
+    # Interval between event loop heartbeats in milliseconds
+    LOOP_MONITOR_INTERVAL_MS: int = 100
+    # Lag in milliseconds from which the event loop is considered blocked
+    LOOP_MONITOR_THRESHOLD_MS: int = 100
+    # Number of recent lag samples used for percentiles (one minute by default)
+    LOOP_MONITOR_WINDOW: int = 600
+    # Number of recent stalls kept with the stack of the blocking call
+    LOOP_MONITOR_MAX_STALLS: int = 20
+
+    # Lifecycle tracing of generation jobs
+    # Whether to record lifecycle spans of generation jobs
+    TRACING_ENABLED: bool = True
+    # Fraction of generation jobs traced, between 0 and 1
+    TRACING_SAMPLE_RATE: float = 1.0
+    # Number of recent job traces kept in memory for the breakdown endpoint
+    TRACING_MAX_JOBS: int = 1000
+
+    # On-demand profiling (admin endpoints)
+    # Maximum duration of a CPU profile in seconds
+    PROFILER_MAX_SECONDS: int = 60
+    # Maximum duration of an allocation trace in seconds
+    TRACEMALLOC_MAX_SECONDS: int = 300
+
     @property
     def allowed_origins_list(self) -> list[str]:
         """Convert comma-separated ALLOWED_ORIGINS to list."""
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def admin_emails_list(self) -> list[str]:
+        """Convert comma-separated ADMIN_EMAILS to list."""
+        return [
+            email.strip() for email in self.ADMIN_EMAILS.split(",") if email.strip()
+        ]
+
+    @property
+    def image_gen_models_list(self) -> list[str]:
+        """Convert comma-separated IMAGE_GEN_MODELS to list, with the default."""
+        models = [self.IMAGE_GEN_MODEL]
+        for model in self.IMAGE_GEN_MODELS.split(","):
+            if model.strip() and model.strip() not in models:
+                models.append(model.strip())
+        return models
+
+    @property
+    def image_gen_tiers(self) -> dict[str, list[str]]:
+        """Convert the comma-separated models of each tier to lists."""
+        return {
+            tier: [model.strip() for model in models.split(",") if model.strip()]
+            for tier, models in (
+                ("fast", self.IMAGE_GEN_FAST_MODELS),
+                ("quality", self.IMAGE_GEN_QUALITY_MODELS),
+            )
+        }
+
+    @property
+    def image_gen_preview_models_list(self) -> list[str]:
+        """Convert comma-separated IMAGE_GEN_PREVIEW_MODELS to list."""
+        return [
+            model.strip()
+            for model in self.IMAGE_GEN_PREVIEW_MODELS.split(",")
+            if model.strip()
+        ]
+
+    @property
+    def image_gen_model_concurrency(self) -> dict[str, int]:
+        """Get the maximum concurrent Replicate calls of every allowed model."""
+        overrides = dict(
+            entry.strip().rsplit("=", 1)
+            for entry in self.IMAGE_GEN_MODEL_CONCURRENCY_OVERRIDES.split(",")
+            if entry.strip()
+        )
+        return {
+            model: int(overrides.get(model, self.IMAGE_GEN_MODEL_CONCURRENCY))
+            for model in self.image_gen_models_list
+        }
+
     model_config = SettingsConfigDict(
         env_file=(".env", ".env.local"),
         case_sensitive=True,
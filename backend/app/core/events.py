@@ -0,0 +1,129 @@
+"""
+Server-sent event encoding for the MyFlix backend.
+
+Events are serialized once into pre-framed SSE bytes so that broadcasting
+to many subscribers only hands out the same immutable frame. The fastest
+available JSON encoder is picked at import time (orjson, then msgspec),
+falling back to the standard library.
+
+Subscribers read frames from an `EventQueue`, where a newer preview of an
+image replaces one still waiting to be read, so slow subscribers only get
+the latest preview instead of falling further behind. Frames broadcast
+together can be put as one chunk of concatenated frames, which is still a
+valid SSE stream.
+"""
+
+import asyncio
+import json
+from typing import Any, Callable, Hashable
+
+try:
+    import orjson
+
+    dumps: Callable[[Any], bytes] = orjson.dumps
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        dumps = msgspec.json.Encoder().encode
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+        def _dumps_stdlib(data: Any) -> bytes:
+            return _encoder.encode(data).encode()
+
+        dumps = _dumps_stdlib
+        JSON_BACKEND = "json"
+
+# Frame sent when a stream has been idle for a while
+KEEPALIVE_FRAME = b"event: keepalive\ndata: {}\n\n"
+
+# Frame prefixes are built once per event type and reused for every event
+_FRAME_PREFIXES: dict[str, bytes] = {}
+
+
+def frame_prefix(event_type: str) -> bytes:
+    """
+    Get the pre-encoded `event:`/`data:` prefix for an event type.
+
+    Args:
+        event_type: SSE event name
+
+    Returns:
+        The bytes that precede the JSON payload in a frame of this type
+    """
+    prefix = _FRAME_PREFIXES.get(event_type)
+    if prefix is None:
+        prefix = _FRAME_PREFIXES[event_type] = f"event: {event_type}\ndata: ".encode()
+    return prefix
+
+
+def encode_event(event_type: str, data: Any) -> bytes:
+    """
+    Encode an event into a complete SSE frame.
+
+    Args:
+        event_type: SSE event name
+        data: JSON-serializable event payload
+
+    Returns:
+        The framed event, ready to be written to any subscriber
+    """
+    return frame_prefix(event_type) + dumps(data) + b"\n\n"
+
+
+_TERMINAL_PREFIXES = (frame_prefix("done"), frame_prefix("error"))
+
+
+def is_terminal_frame(frame: bytes) -> bool:
+    """Whether a frame ends a stream (a `done` or `error` event)."""
+    return frame.startswith(_TERMINAL_PREFIXES)
+
+
+class _PendingPreview:
+    """Queue entry of a preview frame, replaced in place by newer previews."""
+
+    __slots__ = ("key", "frame")
+
+    def __init__(self, key: Hashable, frame: bytes):
+        self.key = key
+        self.frame = frame
+
+
+class EventQueue(asyncio.Queue):
+    """
+    Queue of frames for a subscriber, coalescing superseded previews.
+
+    A preview put while an earlier preview with the same key is still queued
+    takes its place (and its position) instead of being appended, so at most
+    one preview per key is ever waiting.
+    """
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        # Previews waiting to be read, by key
+        self._previews: dict[Hashable, _PendingPreview] = {}
+
+    def _get(self) -> bytes:
+        item = super()._get()
+        if type(item) is _PendingPreview:
+            del self._previews[item.key]
+            return item.frame
+        return item
+
+    def put_preview(self, key: Hashable, frame: bytes) -> None:
+        """
+        Queue a preview frame, superseding a queued preview with the same key.
+
+        Args:
+            key: What the preview is of, e.g. an image index
+            frame: Encoded preview event
+        """
+        pending = self._previews.get(key)
+        if pending is not None:
+            pending.frame = frame
+            return
+        pending = self._previews[key] = _PendingPreview(key, frame)
+        self.put_nowait(pending)
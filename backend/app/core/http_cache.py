@@ -0,0 +1,170 @@
+"""
+HTTP caching utilities for pre-serialized responses.
+
+A `CachedPayload` holds a response body serialized once, along with its
+strong ETag and pre-compressed gzip/brotli variants, so repeated requests
+only pick a representation instead of re-serializing and re-compressing.
+"""
+
+import gzip
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Codings of the representations, preferred in this order at equal quality
+PREFERRED_CODINGS = ("br", "gzip", "identity")
+
+
+@lru_cache(maxsize=256)
+def parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    """
+    Parse an `Accept-Encoding` header into the quality of every coding.
+
+    Clients send few distinct headers, so parsed headers are cached.
+
+    Args:
+        accept_encoding: Value of the header, e.g. `gzip, br;q=0.8, *;q=0`
+
+    Returns:
+        dict[str, float]: Quality (0 to 1) of every listed coding, lowercase
+        and with `x-gzip` as `gzip`; invalid qualities count as 0
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+                if not 0.0 <= quality <= 1.0:
+                    quality = 0.0
+        qualities.setdefault("gzip" if coding == "x-gzip" else coding, quality)
+    return qualities
+
+
+def coding_quality(qualities: dict[str, float], coding: str) -> float:
+    """
+    Get how acceptable a coding is to a client.
+
+    Args:
+        qualities: Parsed `Accept-Encoding` header
+        coding: Content coding, or `identity`
+
+    Returns:
+        float: Quality of the coding: the listed one, or else the quality of
+        `*`, or else 0
+    """
+    quality = qualities.get(coding)
+    return qualities.get("*", 0.0) if quality is None else quality
+
+
+class CachedPayload:
+    """A pre-serialized response body with its ETag and compressed variants."""
+
+    __slots__ = ("body", "etag", "gzip_body", "brotli_body")
+
+    body: bytes
+    etag: str
+    gzip_body: bytes
+    brotli_body: Optional[bytes]
+
+    def __init__(
+        self,
+        body: bytes,
+        brotli_quality: int = 5,
+        brotli_body: Optional[bytes] = None,
+    ):
+        """
+        Compute the ETag and compressed variants of a body.
+
+        Args:
+            body: Serialized (uncompressed) response body
+            brotli_quality: Brotli quality (0-11). Higher values give smaller
+                bodies but take much longer, so they only pay off for payloads
+                that are built once and served many times.
+            brotli_body: Brotli variant compressed beforehand, if any
+        """
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        if brotli_body is None and brotli is not None:
+            brotli_body = brotli.compress(body, quality=brotli_quality)
+        self.brotli_body = brotli_body
+
+    def select(self, accept_encoding: str) -> tuple[bytes, Optional[str], str]:
+        """
+        Pick the best representation for an `Accept-Encoding` header.
+
+        The representation of highest quality wins, the smaller one at equal
+        quality. The body is sent uncompressed when the client prefers it or
+        accepts none of the compressed ones.
+
+        Args:
+            accept_encoding: Value of the request's `Accept-Encoding` header
+
+        Returns:
+            The body, its content encoding (None for identity) and its strong
+            ETag. Each representation has its own ETag since the bytes differ.
+        """
+        qualities = parse_accept_encoding(accept_encoding)
+        best, best_quality = "identity", 0.0
+        for coding in PREFERRED_CODINGS:
+            if coding == "br" and self.brotli_body is None:
+                continue
+            quality = coding_quality(qualities, coding)
+            if quality > best_quality:
+                best, best_quality = coding, quality
+
+        if best == "br":
+            return self.brotli_body, "br", f'"{self.etag}-br"'
+        if best == "gzip":
+            return self.gzip_body, "gzip", f'"{self.etag}-gz"'
+        return self.body, None, f'"{self.etag}"'
+
+
+def cached_response(
+    request: Request, payload: CachedPayload, cache_control: str
+) -> Response:
+    """
+    Build a response for a cached payload, honouring `If-None-Match`.
+
+    Args:
+        request: Incoming request
+        payload: Pre-serialized payload to send
+        cache_control: Value of the `Cache-Control` header
+
+    Returns:
+        A 304 response when the client already has the representation,
+        otherwise a 200 response with the selected representation
+    """
+    body, encoding, etag = payload.select(request.headers.get("accept-encoding", ""))
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match == "*" or etag in if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
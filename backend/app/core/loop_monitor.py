@@ -0,0 +1,248 @@
+"""
+Event loop lag monitoring and blocking call detection.
+
+A heartbeat task sleeps for a fixed interval and measures how late it wakes
+up: that delay is the time the event loop spent running something else
+without yielding, e.g. a blocking call inside a coroutine. Recent lags are
+kept in a window to export percentiles.
+
+A watchdog thread checks the last heartbeat. When the loop has not beaten
+for longer than the threshold it is blocked right now, so the watchdog
+captures the stack of the loop thread, which points at the blocking call and
+the coroutine that made it.
+
+Every heartbeat also checks the executors registered with `watch_executor`
+and flags those with calls waiting for a free thread.
+
+The heartbeat and the watchdog wake up a few times per interval, which costs
+microseconds, so the monitor can stay enabled in production.
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures event loop lag and captures the stack of blocking calls."""
+
+    interval: float
+    threshold: float
+    _lags: deque[float]
+    _stalls: deque[dict]
+    _total_stalls: int
+    _executors: dict[str, ThreadPoolExecutor]
+    _saturated: set[str]
+    _task: Optional[asyncio.Task]
+    _watchdog: Optional[threading.Thread]
+    _stopped: threading.Event
+
+    def __init__(
+        self,
+        interval_ms: float = settings.LOOP_MONITOR_INTERVAL_MS,
+        threshold_ms: float = settings.LOOP_MONITOR_THRESHOLD_MS,
+        window: int = settings.LOOP_MONITOR_WINDOW,
+        max_stalls: int = settings.LOOP_MONITOR_MAX_STALLS,
+    ):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval_ms: Interval between heartbeats, in milliseconds
+            threshold_ms: Lag from which the loop is considered blocked
+            window: Number of recent lags kept for percentiles
+            max_stalls: Number of recent stalls kept with their stack
+        """
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._lags = deque(maxlen=window)
+        self._stalls = deque(maxlen=max_stalls)
+        self._total_stalls = 0
+        self._executors = {}
+        # Names of the executors currently saturated, to log transitions only
+        self._saturated = set()
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+        # Written by the heartbeat, read by the watchdog thread
+        self._loop_thread_id = 0
+        self._last_beat = 0.0
+        # Last stack captured by the watchdog, with the beat the stall followed
+        self._stall_stack: Optional[tuple[float, str]] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the monitor is running."""
+        return self._task is not None
+
+    def watch_executor(self, name: str, executor: ThreadPoolExecutor) -> None:
+        """
+        Flag an executor when calls wait for one of its threads.
+
+        Args:
+            name: Name of the executor, used in logs and stats
+            executor: Executor to watch
+        """
+        self._executors[name] = executor
+
+    def start(self) -> None:
+        """Start the heartbeat on the running event loop and the watchdog."""
+        if self.running:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+        logger.info(
+            f"Started event loop monitor (interval {self.interval * 1e3:.0f}ms, "
+            f"threshold {self.threshold * 1e3:.0f}ms)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the heartbeat and the watchdog."""
+        if not self.running:
+            return
+
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._watchdog.join()
+        self._task = None
+        self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        """Measure how late every heartbeat wakes up."""
+        interval = self.interval
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            previous_beat, self._last_beat = self._last_beat, now
+
+            lag = max(now - expected, 0.0)
+            self._lags.append(lag)
+            if lag >= self.threshold:
+                self._record_stall(lag, previous_beat)
+
+            if self._executors:
+                self._check_executors()
+
+    def _record_stall(self, lag: float, previous_beat: float) -> None:
+        """Record a stall that just ended, with the stack captured during it."""
+        captured = self._stall_stack
+        stack = captured[1] if captured and captured[0] == previous_beat else None
+        self._total_stalls += 1
+        self._stalls.append(
+            {
+                "at": datetime.now(timezone.utc),
+                "lag_ms": round(lag * 1e3, 1),
+                "stack": stack,
+            }
+        )
+        if stack is None:
+            # Too short for the watchdog to catch it in the act
+            logger.warning(f"Event loop was blocked for {lag * 1e3:.0f}ms")
+
+    def _watch(self) -> None:
+        """Capture the stack of the loop thread while it is blocked."""
+        last_captured = None
+        while not self._stopped.wait(self.interval / 2):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - self.interval
+            if blocked < self.threshold or last_captured == last_beat:
+                continue
+
+            # One capture per stall, as early as possible
+            last_captured = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self._stall_stack = (last_beat, stack)
+            logger.warning(
+                f"Event loop blocked for {blocked * 1e3:.0f}ms so far, in:\n{stack}"
+            )
+
+    def _check_executors(self) -> None:
+        """Log executors that became saturated or recovered since the last beat."""
+        for name, executor in self._executors.items():
+            queued = executor_queue_size(executor)
+            if queued and name not in self._saturated:
+                self._saturated.add(name)
+                logger.warning(
+                    f"Executor {name} is saturated: {queued} calls waiting "
+                    f"for one of its {executor._max_workers} threads"
+                )
+            elif not queued and name in self._saturated:
+                self._saturated.discard(name)
+                logger.info(f"Executor {name} is no longer saturated")
+
+    def stats(self) -> dict:
+        """
+        Get the lag percentiles, recent stalls and executor state.
+
+        Returns:
+            dict: Data for a `LoopStats` model
+        """
+        lags = sorted(self._lags)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not lags:
+                return None
+            return round(lags[min(int(len(lags) * fraction), len(lags) - 1)] * 1e3, 2)
+
+        return {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1e3,
+            "threshold_ms": self.threshold * 1e3,
+            "samples": len(lags),
+            "mean_ms": round(statistics.fmean(lags) * 1e3, 2) if lags else None,
+            "p50_ms": percentile(0.50),
+            "p90_ms": percentile(0.90),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(lags[-1] * 1e3, 2) if lags else None,
+            "stalls": self._total_stalls,
+            "recent_stalls": list(reversed(self._stalls)),
+            "executors": [
+                {
+                    "name": name,
+                    "max_workers": executor._max_workers,
+                    "threads": len(executor._threads),
+                    "queued": executor_queue_size(executor),
+                    "saturated": name in self._saturated,
+                }
+                for name, executor in self._executors.items()
+            ],
+        }
+
+
+def executor_queue_size(executor: ThreadPoolExecutor) -> int:
+    """Get the number of calls waiting for a thread of an executor."""
+    # Calls wait in the queue until a thread is free to pick them up
+    return executor._work_queue.qsize()
+
+
+# Global event loop monitor instance
+loop_monitor = LoopMonitor()
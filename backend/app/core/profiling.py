@@ -0,0 +1,255 @@
+"""
+On-demand CPU sampling profiler and memory allocation tracing.
+
+The profiler runs a thread that periodically samples the stack of every other
+thread with `sys._current_frames()` and counts identical stacks. Nothing runs
+and nothing is traced while no profile is being captured, so there is no
+overhead when idle. Profiles are exported in the collapsed stack format
+(flame graph tools) or the speedscope format (https://www.speedscope.app).
+
+Allocations are traced with `tracemalloc` only for the duration of a capture,
+since tracing slows down every allocation, and reported as the top
+differences between a snapshot taken at the start and one at the end.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+# Name of the sampling thread, which is left out of profiles
+PROFILER_THREAD_NAME = "cpu-profiler"
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a capture is requested while another one is in progress."""
+
+
+def _short_path(path: str) -> str:
+    """Shorten a source path to the part after site-packages or the cwd."""
+    _, sep, rest = path.rpartition("site-packages" + os.sep)
+    if sep:
+        return rest
+    cwd = os.getcwd() + os.sep
+    return path[len(cwd) :] if path.startswith(cwd) else path
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval."""
+
+    interval: float
+    samples: dict[str, Counter]
+    duration: float
+    _frame_names: dict[tuple, str]
+    _stopped: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, interval_ms: float):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval_ms: Interval between samples, in milliseconds
+        """
+        self.interval = interval_ms / 1000
+        # Number of samples of every stack, root first, per thread name
+        self.samples = {}
+        self._frame_names = {}
+        self._stopped = threading.Event()
+        self._thread = None
+        self._started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(
+            target=self._run, name=PROFILER_THREAD_NAME, daemon=True
+        )
+        self._started_at = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread."""
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.monotonic() - self._started_at
+
+    def _frame_name(self, frame: FrameType) -> str:
+        """Get the display name of a frame, e.g. `Class.method (file.py:12)`."""
+        code = frame.f_code
+        key = (code.co_filename, code.co_firstlineno, code.co_qualname)
+        name = self._frame_names.get(key)
+        if name is None:
+            name = self._frame_names[key] = (
+                f"{code.co_qualname} ({_short_path(code.co_filename)}"
+                f":{code.co_firstlineno})"
+            )
+        return name
+
+    def _run(self) -> None:
+        """Sample every thread until stopped."""
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                stack.reverse()
+
+                thread_name = names.get(thread_id, str(thread_id))
+                counts = self.samples.get(thread_name)
+                if counts is None:
+                    counts = self.samples[thread_name] = Counter()
+                counts[tuple(stack)] += 1
+
+    def collapsed(self) -> str:
+        """
+        Export the profile in the collapsed stack format.
+
+        Returns:
+            str: One `thread;root;...;leaf count` line per distinct stack
+        """
+        return "".join(
+            f"{';'.join((thread_name, *stack))} {count}\n"
+            for thread_name, counts in self.samples.items()
+            for stack, count in counts.most_common()
+        )
+
+    def speedscope(self, name: str = "profile") -> dict:
+        """
+        Export the profile in the speedscope file format.
+
+        Args:
+            name: Name of the profile
+
+        Returns:
+            dict: A speedscope file with one sampled profile per thread,
+            weighted in seconds
+        """
+        frame_indices: dict[str, int] = {}
+        profiles = []
+        for thread_name, counts in self.samples.items():
+            samples, weights = [], []
+            for stack, count in counts.items():
+                samples.append(
+                    [
+                        frame_indices.setdefault(frame, len(frame_indices))
+                        for frame in stack
+                    ]
+                )
+                weights.append(round(count * self.interval, 6))
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(weights), 6),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            )
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "myflix-backend",
+            "shared": {"frames": [{"name": frame} for frame in frame_indices]},
+            "profiles": profiles,
+        }
+
+
+# Only one capture of each kind runs at a time in a worker
+_profile_lock = asyncio.Lock()
+_allocations_lock = asyncio.Lock()
+
+
+async def capture_profile(seconds: float, interval_ms: float) -> SamplingProfiler:
+    """
+    Profile the worker for a while, without blocking the event loop.
+
+    Args:
+        seconds: Duration of the profile
+        interval_ms: Interval between samples, in milliseconds
+
+    Returns:
+        SamplingProfiler: The stopped profiler, with its samples
+
+    Raises:
+        ProfilerBusyError: If a profile is already being captured
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError("A profile is already being captured")
+
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval_ms)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        return profiler
+
+
+async def capture_allocations(seconds: float, frames: int, top: int) -> dict:
+    """
+    Trace memory allocations for a while and diff the start and end snapshots.
+
+    Args:
+        seconds: Duration of the trace
+        frames: Number of frames kept per allocation traceback
+        top: Number of differences to return, largest first
+
+    Returns:
+        dict: Data for an `AllocationsResponse` model
+
+    Raises:
+        ProfilerBusyError: If allocations are already being traced
+    """
+    if _allocations_lock.locked() or tracemalloc.is_tracing():
+        raise ProfilerBusyError("Allocations are already being traced")
+
+    async with _allocations_lock:
+        tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    # Allocations of tracemalloc itself are not interesting
+    exclude = tracemalloc.Filter(False, tracemalloc.__file__)
+    key_type = "traceback" if frames > 1 else "lineno"
+    diff = after.filter_traces([exclude]).compare_to(
+        before.filter_traces([exclude]), key_type
+    )
+
+    return {
+        "seconds": seconds,
+        "traced_kb": round(traced / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "top": [
+            {
+                "traceback": [
+                    f"{_short_path(frame.filename)}:{frame.lineno}"
+                    for frame in stat.traceback
+                ],
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in diff[:top]
+        ],
+    }
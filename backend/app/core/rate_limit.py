@@ -0,0 +1,295 @@
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+Each key (a user or a client IP) owns a bucket holding up to `burst` tokens
+that refills at `rate` tokens per second; a request takes a token or is
+rejected with 429 and a `Retry-After` header. Buckets live in process memory
+by default, where every operation is O(1) and needs no lock since it never
+awaits. Set `RATE_LIMIT_REDIS_URL` to share buckets between workers.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Union
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.security import get_current_user
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Buckets are evicted from the least recently used end, a few per request
+EVICTIONS_PER_ACQUIRE = 2
+
+# Refills and takes tokens atomically on the Redis server, using its clock so
+# workers on different hosts agree. Returns the seconds to wait (0 if allowed).
+REDIS_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated_at", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class TokenBucketLimiter:
+    """In-process token buckets, one per key."""
+
+    name: str
+    rate: float
+    burst: float
+    _buckets: "OrderedDict[str, list[float]]"
+    _idle_seconds: float
+    _clock: Callable[[], float]
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Name of the limited operation, used in logs
+            rate: Tokens added to a bucket per second
+            burst: Maximum number of tokens in a bucket
+            clock: Monotonic clock, in seconds
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        # Buckets in least recently used order, as [tokens, updated_at]
+        self._buckets = OrderedDict()
+        # Time for an empty bucket to be full again
+        self._idle_seconds = burst / rate
+        self._clock = clock
+
+    def __len__(self) -> int:
+        """Get the number of buckets in memory."""
+        return len(self._buckets)
+
+    async def acquire(self, key: str, cost: float = 1.0) -> float:
+        """
+        Take tokens from the bucket of a key.
+
+        Nothing in here awaits, so concurrent requests never interleave.
+
+        Args:
+            key: Key of the bucket
+            cost: Number of tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait
+            until enough tokens are available
+        """
+        now = self._clock()
+        buckets = self._buckets
+
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            buckets.move_to_end(key)
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            wait = 0.0
+        else:
+            wait = (cost - bucket[0]) / self.rate
+
+        # Buckets idle long enough to be full again are the same as new ones,
+        # so dropping them is lossless
+        for _ in range(EVICTIONS_PER_ACQUIRE):
+            oldest = next(iter(buckets.values()))
+            if now - oldest[1] < self._idle_seconds:
+                break
+            buckets.popitem(last=False)
+
+        return wait
+
+
+class RedisTokenBucketLimiter:
+    """Token buckets in Redis, shared by every worker."""
+
+    name: str
+    rate: float
+    burst: float
+
+    def __init__(self, name: str, rate: float, burst: float, url: str):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Name of the limited operation, used in bucket keys and logs
+            rate: Tokens added to a bucket per second
+            burst: Maximum number of tokens in a bucket
+            url: Redis URL
+
+        Raises:
+            RuntimeError: If the `redis` package is not installed
+        """
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL requires the redis package")
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        client = redis.from_url(url)
+        self._script = client.register_script(REDIS_TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, cost: float = 1.0) -> float:
+        """
+        Take tokens from the bucket of a key.
+
+        Buckets expire once they would be full again.
+
+        Args:
+            key: Key of the bucket
+            cost: Number of tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait
+            until enough tokens are available
+        """
+        wait = await self._script(
+            keys=[f"rate_limit:{self.name}:{key}"],
+            args=[self.rate, self.burst, cost],
+        )
+        return float(wait)
+
+
+RateLimiter = Union[TokenBucketLimiter, RedisTokenBucketLimiter]
+
+
+def create_limiter(name: str, rate: float, burst: float) -> RateLimiter:
+    """Create a limiter backed by Redis when configured, in process otherwise."""
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisTokenBucketLimiter(name, rate, burst, settings.RATE_LIMIT_REDIS_URL)
+    return TokenBucketLimiter(name, rate, burst)
+
+
+generation_limiter = create_limiter(
+    "generate",
+    settings.GENERATE_RATE_LIMIT_PER_SECOND,
+    settings.GENERATE_RATE_LIMIT_BURST,
+)
+batch_generation_limiter = create_limiter(
+    "generate_batch",
+    settings.BATCH_GENERATE_RATE_LIMIT_PER_SECOND,
+    settings.BATCH_GENERATE_RATE_LIMIT_BURST,
+)
+login_limiter = create_limiter(
+    "login",
+    settings.LOGIN_RATE_LIMIT_PER_SECOND,
+    settings.LOGIN_RATE_LIMIT_BURST,
+)
+
+
+async def enforce_rate_limit(limiter: RateLimiter, key: str, cost: float = 1.0) -> None:
+    """
+    Take tokens for a key, rejecting the request when there are not enough.
+
+    Args:
+        limiter: Limiter of the operation
+        key: Key of the bucket
+        cost: Number of tokens the request takes
+
+    Raises:
+        HTTPException: 429 with a `Retry-After` header if the limit is exceeded,
+            or without one if the cost is more than a bucket can ever hold
+    """
+    if cost > limiter.burst:
+        logger.warning(f"Rejected {limiter.name} for {key} costing {cost:g} tokens")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=(
+                f"Request counts as {cost:g} requests, more than the limit of "
+                f"{limiter.burst:g} at once"
+            ),
+        )
+
+    wait = await limiter.acquire(key, cost)
+    if wait > 0:
+        retry_after = math.ceil(wait)
+        logger.warning(f"Rate limited {limiter.name} for {key}, retry in {wait:.1f}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many requests, retry in {retry_after} seconds",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def limit_generation(current_user: dict = Depends(get_current_user)) -> None:
+    """
+    FastAPI dependency limiting generation requests per user.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Raises:
+        HTTPException: 429 if the user exceeded the generation rate limit
+    """
+    await enforce_rate_limit(generation_limiter, f"user:{current_user.get('sub')}")
+
+
+async def limit_generation_batch(current_user: dict, num_items: int) -> None:
+    """
+    Limit batch generation requests per user.
+
+    Every item of a batch takes a token from the batch bucket of the user.
+    Called by the route rather than used as a dependency, so that the number
+    of items is taken from the request body it already validated.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+        num_items: Number of items of the batch
+
+    Raises:
+        HTTPException: 429 if the user exceeded the batch generation rate limit
+    """
+    await enforce_rate_limit(
+        batch_generation_limiter, f"user:{current_user.get('sub')}", num_items
+    )
+
+
+async def limit_login(request: Request) -> None:
+    """
+    FastAPI dependency limiting login attempts per client IP.
+
+    Args:
+        request: Incoming request
+
+    Raises:
+        HTTPException: 429 if the client exceeded the login rate limit
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    await enforce_rate_limit(login_limiter, f"ip:{client_ip}")
@@ -0,0 +1,228 @@
+"""
+Denylist of revoked JWTs, checked on every authenticated request.
+
+Tokens carry a random `jti` claim. Revoking a token stores its `jti` with the
+token's expiry in a dict, so checking a token is a single hash lookup (and
+nothing at all while no token is revoked). Entries are pruned once their
+token expires, since expired tokens are rejected anyway.
+
+An optional Bloom filter sits in front of the dict: two bits derived from the
+hash of the `jti`, which Python caches on the string and the dict lookup
+reuses. With many revoked tokens, the bit array stays in CPU caches where the
+dict does not.
+
+The denylist lives in the memory of each worker by default, so a token revoked
+in one worker is still accepted by the others. Set `REVOKED_TOKENS_REDIS_URL`
+to share it between workers: revoked IDs are then Redis keys expiring with
+their tokens, and every check is a round trip to Redis.
+"""
+
+import logging
+import math
+import time
+from typing import Callable, Optional, Union
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedTokens:
+    """In-memory denylist of revoked token IDs, pruned as the tokens expire."""
+
+    prune_interval: float
+    _expiries: dict[str, float]
+    _bloom: Optional[bytearray]
+    _bloom_mask: int
+    _next_prune: float
+    _clock: Callable[[], float]
+
+    def __init__(
+        self,
+        bloom_bits: int = settings.REVOKED_TOKENS_BLOOM_BITS,
+        prune_interval: float = settings.REVOKED_TOKENS_PRUNE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Initialize an empty denylist.
+
+        Args:
+            bloom_bits: Size of the Bloom filter in bits, rounded up to a power
+                of two (0 disables the filter)
+            prune_interval: Seconds between removals of expired tokens
+            clock: Wall clock in seconds, the clock of the `exp` claims
+        """
+        self.prune_interval = prune_interval
+        self._clock = clock
+        # Expiry timestamp of every revoked token ID
+        self._expiries = {}
+        self._bloom = None
+        self._bloom_mask = 0
+        if bloom_bits > 0:
+            size = max(8, 1 << (bloom_bits - 1).bit_length())
+            self._bloom = bytearray(size // 8)
+            self._bloom_mask = size - 1
+        self._next_prune = clock() + prune_interval
+
+    def __len__(self) -> int:
+        """Get the number of revoked tokens."""
+        return len(self._expiries)
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        Check whether a token was revoked.
+
+        Nothing in here awaits, so the check costs no event loop round trip.
+
+        Args:
+            jti: ID of the token (None for tokens issued without one)
+
+        Returns:
+            bool: True if the token was revoked
+        """
+        if not self._expiries:
+            return False
+        bloom = self._bloom
+        if bloom is not None:
+            h = hash(jti)
+            first = h & self._bloom_mask
+            second = (h >> 32) & self._bloom_mask
+            if not (
+                bloom[first >> 3] >> (first & 7) & 1
+                and bloom[second >> 3] >> (second & 7) & 1
+            ):
+                return False
+        return jti in self._expiries
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """
+        Revoke a token until it expires.
+
+        Nothing in here awaits, so checking and revoking is atomic.
+
+        Args:
+            jti: ID of the token
+            expires_at: Expiry of the token (its `exp` claim)
+
+        Returns:
+            bool: True if this call revoked the token, False if it was already
+            revoked or has expired
+        """
+        now = self._clock()
+        revoked = expires_at > now and jti not in self._expiries
+        if revoked:
+            self._expiries[jti] = expires_at
+            if self._bloom is not None:
+                self._add_to_bloom(jti)
+        if now >= self._next_prune:
+            self.prune(now)
+        return revoked
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Remove the expired tokens, and rebuild the Bloom filter without them.
+
+        Args:
+            now: Current time (the clock's time when None)
+
+        Returns:
+            int: Number of tokens removed
+        """
+        now = self._clock() if now is None else now
+        self._next_prune = now + self.prune_interval
+        expired = [jti for jti, expiry in self._expiries.items() if expiry <= now]
+        for jti in expired:
+            del self._expiries[jti]
+
+        if expired and self._bloom is not None:
+            self._bloom = bytearray(len(self._bloom))
+            for jti in self._expiries:
+                self._add_to_bloom(jti)
+        if expired:
+            logger.debug(f"Pruned {len(expired)} expired revoked tokens")
+        return len(expired)
+
+    def _add_to_bloom(self, jti: str) -> None:
+        """Set the Bloom filter bits of a token ID."""
+        h = hash(jti)
+        for bit in (h & self._bloom_mask, (h >> 32) & self._bloom_mask):
+            self._bloom[bit >> 3] |= 1 << (bit & 7)
+
+
+class RedisRevokedTokens:
+    """Denylist of revoked token IDs in Redis, shared by every worker."""
+
+    _client: "redis.Redis"
+    _clock: Callable[[], float]
+
+    def __init__(self, url: str, clock: Callable[[], float] = time.time):
+        """
+        Initialize the denylist.
+
+        Args:
+            url: Redis URL
+            clock: Wall clock in seconds, the clock of the `exp` claims
+
+        Raises:
+            RuntimeError: If the `redis` package is not installed
+        """
+        if redis is None:
+            raise RuntimeError("REVOKED_TOKENS_REDIS_URL requires the redis package")
+
+        self._client = redis.from_url(url)
+        self._clock = clock
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        Check whether a token was revoked.
+
+        Args:
+            jti: ID of the token (None for tokens issued without one)
+
+        Returns:
+            bool: True if the token was revoked
+        """
+        if jti is None:
+            return False
+        return bool(await self._client.exists(f"revoked_token:{jti}"))
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """
+        Revoke a token until it expires, when Redis drops its key.
+
+        The key is only set if it does not exist, so that of concurrent
+        revocations in any worker, a single one succeeds.
+
+        Args:
+            jti: ID of the token
+            expires_at: Expiry of the token (its `exp` claim)
+
+        Returns:
+            bool: True if this call revoked the token, False if it was already
+            revoked or has expired
+        """
+        ttl_ms = math.ceil((expires_at - self._clock()) * 1000)
+        if ttl_ms <= 0:
+            return False
+        return bool(
+            await self._client.set(f"revoked_token:{jti}", 1, px=ttl_ms, nx=True)
+        )
+
+
+RevocationList = Union[RevokedTokens, RedisRevokedTokens]
+
+
+def create_revoked_tokens() -> RevocationList:
+    """Create a denylist backed by Redis when configured, in process otherwise."""
+    if settings.REVOKED_TOKENS_REDIS_URL:
+        return RedisRevokedTokens(settings.REVOKED_TOKENS_REDIS_URL)
+    return RevokedTokens()
+
+
+# Global denylist instance
+revoked_tokens = create_revoked_tokens()
@@ -6,6 +6,7 @@ for the MyFlix backend API.
 """
 
 import logging
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -15,6 +16,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.revocation import revoked_tokens
 
 # Password hashing context
 crypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,6 +26,10 @@ security = HTTPBearer()
 
 logger = logging.getLogger(__name__)
 
+# Values of the `type` claim (tokens issued without one are access tokens)
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -52,6 +58,34 @@ def get_password_hash(password: str) -> str:
     return crypt_context.hash(password)
 
 
+def access_token_lifetime() -> timedelta:
+    """Get the lifetime of access tokens."""
+    if settings.ACCESS_TOKEN_EXPIRE_MINUTES is not None:
+        return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return timedelta(hours=settings.ACCESS_TOKEN_EXPIRE_HOURS)
+
+
+def _create_token(
+    user_id: str, email: str, token_type: str, lifetime: timedelta
+) -> str:
+    """Create a JWT of a type for a user, with a random ID (`jti`)."""
+    now = datetime.now(timezone.utc)
+    token_data = {
+        "sub": email,
+        "iat": now,
+        "exp": now + lifetime,
+        "user_id": user_id,
+        "type": token_type,
+        "jti": secrets.token_hex(16),
+    }
+
+    return jwt.encode(
+        token_data,
+        key=settings.ACCESS_TOKEN_SECRET_KEY,
+        algorithm=settings.ACCESS_TOKEN_ALGORITHM,
+    )
+
+
 def create_access_token(user_id: str, email: str) -> str:
     """
     Create an access token for a user in a format of JWT.
@@ -63,50 +97,87 @@ def create_access_token(user_id: str, email: str) -> str:
     Returns:
         The JWT access token
     """
-    expire = datetime.now(timezone.utc) + timedelta(
-        hours=settings.ACCESS_TOKEN_EXPIRE_HOURS,
-    )
+    return _create_token(user_id, email, ACCESS_TOKEN_TYPE, access_token_lifetime())
 
-    token_data = {
-        "sub": email,
-        "iat": datetime.now(timezone.utc),
-        "exp": expire,
-        "user_id": user_id,
-    }
 
-    return jwt.encode(
-        token_data,
-        key=settings.ACCESS_TOKEN_SECRET_KEY,
-        algorithm=settings.ACCESS_TOKEN_ALGORITHM,
-    )
+def create_refresh_token(user_id: str, email: str) -> str:
+    """
+    Create a refresh token for a user, exchanged for new access tokens.
+
+    Args:
+        user_id: The user's unique identifier
+        email: The user's email address
 
+    Returns:
+        The JWT refresh token
+    """
+    lifetime = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    return _create_token(user_id, email, REFRESH_TOKEN_TYPE, lifetime)
 
-def verify_access_token(token: str) -> Optional[dict]:
+
+async def verify_token(
+    token: str, token_type: str = ACCESS_TOKEN_TYPE
+) -> Optional[dict]:
     """
-    Verify and decode a JWT access token.
+    Verify and decode a JWT of a type, rejecting expired and revoked tokens.
 
     Args:
         token: The JWT token to verify
+        token_type: Expected `type` claim
 
     Returns:
         Token payload if valid, None otherwise
     """
     try:
-        logger.info(f"Verifying access token: {token}")
         payload = jwt.decode(
             token,
             key=settings.ACCESS_TOKEN_SECRET_KEY,
             algorithms=[settings.ACCESS_TOKEN_ALGORITHM],
-            # TODO: Verify token expiration
-            options={"verify_exp": False},
         )
-        return payload
-    except JWTError:
-        logger.error(f"Error verifying access token: {token}")
+    except JWTError as e:
+        logger.error(f"Error verifying {token_type} token: {e}")
         return None
 
+    if payload.get("type", ACCESS_TOKEN_TYPE) != token_type:
+        logger.error(f"Expected {token_type} token, got {payload.get('type')} token")
+        return None
+    if await revoked_tokens.is_revoked(payload.get("jti")):
+        logger.warning(f"Revoked {token_type} token used by {payload.get('sub')}")
+        return None
+    return payload
+
+
+async def verify_access_token(token: str) -> Optional[dict]:
+    """
+    Verify and decode a JWT access token.
+
+    Args:
+        token: The JWT token to verify
+
+    Returns:
+        Token payload if valid, None otherwise
+    """
+    logger.info(f"Verifying access token: {token}")
+    return await verify_token(token, ACCESS_TOKEN_TYPE)
 
-def get_current_user(
+
+async def revoke_token(payload: dict) -> bool:
+    """
+    Revoke a verified token until it expires.
+
+    Args:
+        payload: Payload of the token
+
+    Returns:
+        bool: True if this call revoked the token, False if it was already
+        revoked, has expired or has no ID
+    """
+    if payload.get("jti") is None:
+        return False
+    return await revoked_tokens.revoke(payload["jti"], payload["exp"])
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> dict:
     """
@@ -119,11 +190,11 @@ def get_current_user(
         User payload from the JWT token
 
     Raises:
-        HTTPException: If token is invalid or missing
+        HTTPException: If token is invalid, expired, revoked or missing
     """
     logger.info(f"Getting current user from credentials: {credentials}")
     token = credentials.credentials
-    payload = verify_access_token(token)
+    payload = await verify_access_token(token)
 
     if payload is None:
         logger.error(f"Invalid authentication credentials: {token}")
@@ -133,3 +204,26 @@ def get_current_user(
         )
 
     return payload
+
+
+def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    FastAPI dependency to get the current user, who must be an admin.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        User payload from the JWT token
+
+    Raises:
+        HTTPException: 403 if the user is not listed in ADMIN_EMAILS
+    """
+    if current_user.get("sub") not in settings.admin_emails_list:
+        logger.warning(f"Denied admin access to {current_user.get('sub')}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+
+    return current_user
@@ -0,0 +1,255 @@
+"""
+Binary snapshots of NumPy arrays, memory-mapped read-only.
+
+A snapshot file is a JSON header followed by the raw bytes of named arrays:
+
+    MAGIC (8 bytes) | header length (uint64) | header | arrays, 64-byte aligned
+
+The header holds free-form metadata and the dtype, shape and offset of every
+array. Opening a snapshot maps the file read-only and wraps every array
+around the mapping without copying, so pages are only read when used and are
+shared by every process mapping the same file through the page cache.
+
+Snapshots are never modified in place: a new one is written to a temporary
+file in the same directory and renamed over the old one, which is atomic.
+Processes that mapped the old file keep reading it until they open the new
+one, and its space is freed once the last of them unmaps it.
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+MAGIC = b"MFXSNAP1"
+ALIGNMENT = 64
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a file is not a valid snapshot."""
+
+
+class FileIdentity(NamedTuple):
+    """What changes when a file is replaced."""
+
+    inode: int
+    mtime_ns: int
+    size: int
+
+
+def file_identity(path: str) -> Optional[FileIdentity]:
+    """Get the identity of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return FileIdentity(st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _aligned(offset: int) -> int:
+    """Round an offset up to the alignment of arrays."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path: str, arrays: dict[str, np.ndarray], metadata: dict) -> int:
+    """
+    Write arrays to a snapshot file, atomically replacing any previous one.
+
+    Args:
+        path: Path of the snapshot
+        arrays: Arrays by name, of fixed-width dtypes
+        metadata: JSON-serializable metadata
+
+    Returns:
+        int: Size of the snapshot in bytes
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise TypeError(f"Array {name} has a {array.dtype} dtype")
+        offset = _aligned(offset)
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+    header = json.dumps({"metadata": metadata, "arrays": layout}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, array in arrays.items():
+                f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+                f.write(np.ascontiguousarray(array).data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return data_start + offset
+
+
+class Snapshot:
+    """Arrays of a snapshot file, mapped read-only."""
+
+    path: str
+    identity: FileIdentity
+    metadata: dict
+    _mmap: mmap.mmap
+    _arrays: dict[str, np.ndarray]
+
+    def __init__(self, path: str):
+        """
+        Map a snapshot file.
+
+        Args:
+            path: Path of the snapshot
+
+        Raises:
+            SnapshotFormatError: If the file is not a valid snapshot
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = FileIdentity(st.st_ino, st.st_mtime_ns, st.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise SnapshotFormatError(f"{path} is not a snapshot")
+        header_start = len(MAGIC) + 8
+        header_size = int.from_bytes(self._mmap[len(MAGIC) : header_start], "little")
+        try:
+            header = json.loads(self._mmap[header_start : header_start + header_size])
+        except ValueError as e:
+            raise SnapshotFormatError(f"{path} has an invalid header") from e
+        data_start = _aligned(header_start + header_size)
+
+        self.metadata = header["metadata"]
+        self._arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape))
+            offset = data_start + spec["offset"]
+            if offset + count * dtype.itemsize > len(self._mmap):
+                raise SnapshotFormatError(f"{path} is truncated")
+            array = np.frombuffer(self._mmap, dtype, count, offset if count else 0)
+            self._arrays[name] = array.reshape(shape)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Get an array by name."""
+        return self._arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        """Check whether the snapshot has an array."""
+        return name in self._arrays
+
+    def prefixed(self, prefix: str) -> dict[str, np.ndarray]:
+        """Get the arrays whose name starts with a prefix, without it."""
+        return {
+            name[len(prefix) :]: array
+            for name, array in self._arrays.items()
+            if name.startswith(prefix)
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Get the size of the snapshot file."""
+        return len(self._mmap)
+
+
+class BlobTable:
+    """Variable-length byte strings packed in one buffer, indexed by offsets."""
+
+    __slots__ = ("_offsets", "_data")
+
+    _offsets: memoryview
+    _data: memoryview
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        """
+        Wrap packed byte strings.
+
+        Args:
+            offsets: Start of every string in the data, then the end of the
+                last one, as int64
+            data: Concatenated strings, as uint8
+        """
+        # Memoryviews index faster than NumPy arrays, one value at a time
+        self._offsets = memoryview(np.ascontiguousarray(offsets, dtype=np.int64))
+        self._data = memoryview(data)
+
+    @staticmethod
+    def pack(values: Iterable[bytes]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pack byte strings.
+
+        Args:
+            values: Byte strings
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Offsets and data of a `BlobTable`
+        """
+        data = bytearray()
+        offsets = [0]
+        for value in values:
+            data += value
+            offsets.append(len(data))
+        return np.array(offsets, dtype=np.int64), np.frombuffer(data, np.uint8)
+
+    def __len__(self) -> int:
+        """Get the number of strings."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        """Get a string by index."""
+        if i < 0:
+            i += len(self)
+        return self._data[self._offsets[i] : self._offsets[i + 1]].tobytes()
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over the strings."""
+        for i in range(len(self)):
+            yield self[i]
+
+
+class StringTable(BlobTable):
+    """UTF-8 strings packed in one buffer, indexed by offsets."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def pack(values: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pack strings.
+
+        Args:
+            values: Strings
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Offsets and data of a `StringTable`
+        """
+        return BlobTable.pack(value.encode() for value in values)
+
+    def __getitem__(self, i: int) -> str:
+        """Get a string by index."""
+        if i < 0:
+            i += len(self)
+        return str(self._data[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the strings."""
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,189 @@
+"""
+Lightweight lifecycle tracing of generation jobs.
+
+Every sampled job gets a `JobTrace` that records spans as plain tuples of a
+name, start and end `perf_counter_ns` timestamps and attributes, so recording
+a span costs an append. Traces of recent jobs are kept in memory for the
+per-job breakdown endpoint.
+
+When the OpenTelemetry API is installed, finished traces are also exported
+as OpenTelemetry spans (a `generation.job` root span with one child per
+recorded span) through the globally configured tracer provider; without an
+SDK configured, the API drops them at no cost.
+"""
+
+import random
+import statistics
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+class JobTrace:
+    """Spans recorded for a single job."""
+
+    __slots__ = ("job_id", "epoch_offset_ns", "spans")
+
+    job_id: str
+    epoch_offset_ns: int
+    spans: list[tuple[str, int, int, Optional[dict]]]
+
+    def __init__(self, job_id: str):
+        """
+        Initialize an empty trace.
+
+        Args:
+            job_id: Job the trace belongs to
+        """
+        self.job_id = job_id
+        # Converts perf_counter_ns timestamps to epoch nanoseconds for export
+        self.epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.spans = []
+
+    def add(
+        self, name: str, start_ns: int, end_ns: int, attributes: Optional[dict] = None
+    ) -> None:
+        """
+        Record a span.
+
+        Args:
+            name: Span name, e.g. `image.run`
+            start_ns: Start, as a `time.perf_counter_ns()` timestamp
+            end_ns: End, as a `time.perf_counter_ns()` timestamp
+            attributes: Span attributes, with primitive values
+        """
+        self.spans.append((name, start_ns, end_ns, attributes))
+
+    def breakdown(self) -> dict:
+        """
+        Summarize the trace.
+
+        Returns:
+            dict: Data for a `JobTraceResponse` model, with span times in
+            milliseconds relative to the start of the first span
+        """
+        if not self.spans:
+            return {
+                "job_id": self.job_id,
+                "duration_ms": 0.0,
+                "spans": [],
+                "summary": [],
+            }
+
+        origin = min(span[1] for span in self.spans)
+        end = max(span[2] for span in self.spans)
+
+        durations: dict[str, list[float]] = {}
+        for name, start_ns, end_ns, _ in self.spans:
+            durations.setdefault(name, []).append((end_ns - start_ns) / 1e6)
+
+        return {
+            "job_id": self.job_id,
+            "duration_ms": round((end - origin) / 1e6, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start_ns - origin) / 1e6, 3),
+                    "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+                    "attributes": attributes or {},
+                }
+                for name, start_ns, end_ns, attributes in sorted(
+                    self.spans, key=lambda span: span[1]
+                )
+            ],
+            "summary": [
+                {
+                    "name": name,
+                    "count": len(values),
+                    "total_ms": round(sum(values), 3),
+                    "p50_ms": round(statistics.median(values), 3),
+                    "max_ms": round(max(values), 3),
+                }
+                for name, values in durations.items()
+            ],
+        }
+
+
+class Tracer:
+    """Samples jobs for tracing and keeps the traces of recent jobs."""
+
+    sample_rate: float
+    max_traces: int
+    _traces: "OrderedDict[str, JobTrace]"
+
+    def __init__(
+        self,
+        sample_rate: float = settings.TRACING_SAMPLE_RATE,
+        max_traces: int = settings.TRACING_MAX_JOBS,
+    ):
+        """
+        Initialize the tracer.
+
+        Args:
+            sample_rate: Fraction of jobs traced, between 0 and 1
+            max_traces: Number of recent traces kept in memory
+        """
+        self.sample_rate = sample_rate if settings.TRACING_ENABLED else 0.0
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+
+    def start_trace(self, job_id: str) -> Optional[JobTrace]:
+        """
+        Start the trace of a job, if it is sampled.
+
+        Args:
+            job_id: Job to trace
+
+        Returns:
+            Optional[JobTrace]: The trace, or None if the job is not sampled
+        """
+        if self.sample_rate <= 0.0 or random.random() >= self.sample_rate:
+            return None
+
+        trace = self._traces[job_id] = JobTrace(job_id)
+        if len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+        return trace
+
+    def get_trace(self, job_id: str) -> Optional[JobTrace]:
+        """Get the trace of a recent job, if it was sampled."""
+        return self._traces.get(job_id)
+
+    def finish_trace(self, trace: JobTrace) -> None:
+        """
+        Export a finished trace as OpenTelemetry spans, when available.
+
+        Args:
+            trace: Finished trace
+        """
+        if otel_trace is None or not trace.spans:
+            return
+
+        offset = trace.epoch_offset_ns
+        tracer = otel_trace.get_tracer("myflix.generation")
+        root = tracer.start_span(
+            "generation.job",
+            start_time=min(span[1] for span in trace.spans) + offset,
+            attributes={"job.id": trace.job_id},
+        )
+        context = otel_trace.set_span_in_context(root)
+        for name, start_ns, end_ns, attributes in trace.spans:
+            span = tracer.start_span(
+                name,
+                context=context,
+                start_time=start_ns + offset,
+                attributes=attributes,
+            )
+            span.end(end_time=end_ns + offset)
+        root.end(end_time=max(span[2] for span in trace.spans) + offset)
+
+
+# Global tracer instance
+tracer = Tracer()
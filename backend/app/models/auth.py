@@ -3,6 +3,8 @@ Authentication models for the MyFlix backend API.
 Defines Pydantic models for authentication requests and responses.
 """
 
+from typing import Optional
+
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 from app.core.config import settings
@@ -40,13 +42,41 @@ class LoginResponse(BaseModel):
     """Login response model."""
 
     token: str = Field(default="", description="JWT access token")
+    refresh_token: str = Field(
+        default="", description="JWT refresh token, exchanged for new access tokens"
+    )
+    expires_in: int = Field(
+        default=0, description="Seconds until the access token expires"
+    )
     user: UserResponse = Field(default=None, description="User information")
 
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
                 "token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                "refresh_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                "expires_in": 900,
                 "user": {"id": "user_01", "email": "demo@myflix.com"},
             }
         }
     )
+
+
+class RefreshRequest(BaseModel):
+    """Refresh request model."""
+
+    refresh_token: str = Field(description="JWT refresh token")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {"refresh_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."}
+        }
+    )
+
+
+class LogoutRequest(BaseModel):
+    """Logout request model."""
+
+    refresh_token: Optional[str] = Field(
+        default=None, description="JWT refresh token to revoke as well"
+    )
@@ -0,0 +1,75 @@
+"""
+Show catalog models for the MyFlix backend API.
+Pydantic models for shows, show rows and catalog responses.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class Show(BaseModel):
+    """A show in the catalog."""
+
+    id: str = Field(
+        default="", description="Show's unique identifier", example="show-1"
+    )
+    title: str = Field(default="", description="Show title", example="Show Title 1")
+    description: str = Field(default="", description="Short show description")
+    image_url: str = Field(
+        default="",
+        description="URL of the show's artwork",
+        example="https://picsum.photos/1920/1080?random=101",
+    )
+    rating: float = Field(default=0.0, ge=0, le=5, description="Rating from 0 to 5")
+    year: int = Field(default=0, description="Release year", example=2024)
+    genre: list[str] = Field(
+        default_factory=list, description="Genres", example=["Action", "Drama"]
+    )
+    duration: str = Field(default="", description="Duration", example="120 min")
+    is_featured: bool = Field(
+        default=False, description="Whether the show is featured in the hero"
+    )
+
+
+class ShowRowPage(BaseModel):
+    """A page of shows of a single row."""
+
+    id: str = Field(default="", description="Row identifier", example="row-0")
+    title: str = Field(default="", description="Row title", example="Trending Now")
+    shows: list[Show] = Field(default_factory=list, description="Shows in this page")
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor for the next page of this row, if there is one",
+        example="MjA",
+    )
+
+
+class CatalogResponse(BaseModel):
+    """Home page catalog with the first page of every row."""
+
+    featured: Optional[Show] = Field(
+        default=None, description="Show to display in the hero section"
+    )
+    rows: list[ShowRowPage] = Field(
+        default_factory=list, description="First page of every show row"
+    )
+
+
+class SearchResponse(BaseModel):
+    """Ranked catalog search results."""
+
+    query: str = Field(default="", description="Query that was searched")
+    total: int = Field(default=0, description="Total number of matching shows")
+    shows: list[Show] = Field(
+        default_factory=list, description="Matching shows in this page, best first"
+    )
+
+
+class AddShowsResponse(BaseModel):
+    """Result of adding shows to the catalog."""
+
+    added: int = Field(default=0, description="Number of shows added", example=2)
+    total: int = Field(
+        default=0, description="Number of shows in the catalog", example=1002
+    )
@@ -7,7 +7,9 @@ from datetime import datetime, timezone
 from enum import Enum
 from typing import Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.core.config import settings
 
 
 class GenerationStatus(str, Enum):
@@ -36,6 +38,76 @@ class GenerationRequest(BaseModel):
         description="Number of images to generate",
         example=5,
     )
+    model: Optional[str] = Field(
+        default=None,
+        description="Model to generate with, from the allowed models",
+        example="black-forest-labs/flux-schnell",
+    )
+    tier: Optional[Literal["fast", "quality"]] = Field(
+        default=None,
+        description=(
+            "Model tier to generate with, instead of a model. Requests are "
+            "routed to the model of the tier with the lowest observed latency."
+        ),
+        example="fast",
+    )
+    priority: int = Field(
+        default=5,
+        ge=0,
+        le=9,
+        description=(
+            "Priority of the job's upstream calls, higher first. Interactive "
+            "requests should use a higher priority than background backfills."
+        ),
+        example=5,
+    )
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description=(
+            "Time budget from job creation in milliseconds. Images that can no "
+            "longer finish in time are failed instead of generated."
+        ),
+        example=30000,
+    )
+    use_cache: bool = Field(
+        default=True,
+        description=(
+            "Serve the job from the images of a similar prompt generated "
+            "recently, when the prompt cache is enabled"
+        ),
+        example=True,
+    )
+
+    @field_validator("model")
+    @classmethod
+    def validate_model(cls, model: Optional[str]) -> Optional[str]:
+        """Only accept models from the allow-list."""
+        if model is not None and model not in settings.image_gen_models_list:
+            raise ValueError(f"Model {model} is not allowed")
+        return model
+
+    @model_validator(mode="after")
+    def validate_model_or_tier(self) -> "GenerationRequest":
+        """Only accept a model or a tier, not both."""
+        if self.model is not None and self.tier is not None:
+            raise ValueError("Select either a model or a tier, not both")
+        return self
+
+
+class BatchGenerationRequest(BaseModel):
+    """Request model for creating many generation jobs in a single call."""
+
+    items: list[GenerationRequest] = Field(
+        default_factory=list,
+        min_length=1,
+        max_length=settings.MAX_BATCH_ITEMS,
+        description="Generation requests to run as a single batch",
+        example=[
+            {"prompt": "A beautiful sunset over mountains", "num_images": 2},
+            {"prompt": "A neon city at night", "num_images": 1},
+        ],
+    )
 
 
 class GenerationJobResponse(BaseModel):
@@ -48,6 +120,21 @@ class GenerationJobResponse(BaseModel):
     )
 
 
+class BatchGenerationJobResponse(BaseModel):
+    """Response model for batch creation."""
+
+    batch_id: str = Field(
+        default="",
+        description="Unique identifier for the generation batch",
+        example="batch_abc123",
+    )
+    job_ids: list[str] = Field(
+        default_factory=list,
+        description="Job IDs for each batch item, in request order",
+        example=["job_abc123", "job_def456"],
+    )
+
+
 class GenerationResult(BaseModel):
     """Individual image generation result."""
 
@@ -69,6 +156,12 @@ class GenerationResult(BaseModel):
         description="Error message (if failed)",
         example="Generation failed due to an unknown error",
     )
+    duplicate_of: Optional[str] = Field(
+        default=None,
+        description="URL of an earlier near-identical image, which can be stored "
+        "in place of this one (if the image is a near duplicate)",
+        example="https://replicate.delivery/xezq/guid/out-1.webp",
+    )
     started_at: Optional[datetime] = Field(
         default=None, description="When this generation started"
     )
@@ -84,6 +177,11 @@ class GenerationJob(BaseModel):
         default="", description="Unique identifier for the generation job"
     )
     prompt: str = Field(default="", description="Original prompt used for generation")
+    model: str = Field(default="", description="Model the images are generated with")
+    priority: int = Field(default=5, description="Priority of the job")
+    deadline_ms: Optional[int] = Field(
+        default=None, description="Time budget from job creation in milliseconds"
+    )
     num_images: int = Field(default=0, description="Total number of images requested")
     status: GenerationStatus = Field(
         default=GenerationStatus.PENDING, description="Overall status of the job"
@@ -106,6 +204,37 @@ class GenerationJob(BaseModel):
     total_ms: Optional[int] = Field(
         default=None, description="Total processing time in milliseconds"
     )
+    deadline_misses: int = Field(
+        default=0, description="Number of images failed for missing the deadline"
+    )
+
+
+class GenerationBatch(BaseModel):
+    """Group of generation jobs submitted together."""
+
+    batch_id: str = Field(
+        default="", description="Unique identifier for the generation batch"
+    )
+    job_ids: list[str] = Field(
+        default_factory=list, description="Job IDs belonging to this batch"
+    )
+    total_images: int = Field(
+        default=0, description="Total number of images across all jobs"
+    )
+    status: GenerationStatus = Field(
+        default=GenerationStatus.PENDING, description="Overall status of the batch"
+    )
+    completed_jobs: int = Field(default=0, description="Number of finished jobs")
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="When the batch was created",
+    )
+    completed_at: Optional[datetime] = Field(
+        default=None, description="When the batch completed"
+    )
+    total_ms: Optional[int] = Field(
+        default=None, description="Total processing time in milliseconds"
+    )
 
 
 class ProgressEventData(BaseModel):
@@ -117,6 +246,62 @@ class ProgressEventData(BaseModel):
     )
     url: Optional[str] = Field(default=None, description="Image URL if ready")
     error: Optional[str] = Field(default=None, description="Error message if failed")
+    cache: Optional[Literal["exact", "near"]] = Field(
+        default=None,
+        description=(
+            "Set when the image was served from the prompt cache: `exact` for "
+            "the same prompt (ignoring case, punctuation and filler words), "
+            "`near` for a similar but different prompt"
+        ),
+        example="near",
+    )
+    cached_prompt: Optional[str] = Field(
+        default=None,
+        description="Prompt the cached image was generated for",
+        example="A sunset over mountains",
+    )
+    similarity: Optional[float] = Field(
+        default=None,
+        description="Cosine similarity between the prompt and the cached prompt",
+        example=0.84,
+    )
+    duplicate_of: Optional[str] = Field(
+        default=None,
+        description=(
+            "URL of an earlier near-identical image, when the image was "
+            "flagged as a near duplicate before the event was sent"
+        ),
+        example="https://replicate.delivery/xezq/guid/out-1.webp",
+    )
+
+
+class DuplicateEventData(BaseModel):
+    """Data for duplicate events."""
+
+    index: int = Field(default=0, description="Image index")
+    duplicate_of: str = Field(
+        default="",
+        description="URL of the earlier near-identical image",
+        example="https://replicate.delivery/xezq/guid/out-1.webp",
+    )
+
+
+class PreviewEventData(BaseModel):
+    """Data for preview events, sent while an image is running."""
+
+    index: int = Field(default=0, description="Image index")
+    step: Optional[int] = Field(
+        default=None, description="Current denoising step, if reported", example=12
+    )
+    total_steps: Optional[int] = Field(
+        default=None, description="Total number of denoising steps", example=28
+    )
+    progress: Optional[float] = Field(
+        default=None, description="Completed fraction of the image", example=0.43
+    )
+    url: Optional[str] = Field(
+        default=None, description="Low-resolution intermediate image, if any"
+    )
 
 
 class DoneEventData(BaseModel):
@@ -126,10 +311,96 @@ class DoneEventData(BaseModel):
     total: int = Field(default=0, description="Total number of images")
     ttfi_ms: Optional[int] = Field(default=None, description="Time to first image (ms)")
     total_ms: Optional[int] = Field(default=None, description="Total time (ms)")
+    deadline_misses: int = Field(
+        default=0, description="Number of images failed for missing the deadline"
+    )
 
 
 class ErrorEventData(BaseModel):
     """Data for error events."""
 
     error: str = Field(default="", description="Error message")
-    job_id: str = Field(default="", description="Job ID that failed")
+    job_id: str = Field(
+        default="", description="Job ID that failed (batch ID for a batch)"
+    )
+
+
+class BatchDoneEventData(BaseModel):
+    """Data for batch completion events."""
+
+    status: Literal["done"] = Field(default="done", description="Batch status")
+    batch_id: str = Field(default="", description="Batch ID that completed")
+    total_jobs: int = Field(default=0, description="Total number of jobs")
+    total_images: int = Field(default=0, description="Total number of images")
+    succeeded: int = Field(default=0, description="Number of successful images")
+    failed: int = Field(default=0, description="Number of failed images")
+    deadline_misses: int = Field(
+        default=0, description="Number of images failed for missing their deadline"
+    )
+    total_ms: Optional[int] = Field(default=None, description="Total time (ms)")
+
+
+class ModelStats(BaseModel):
+    """Current state of an image generation model."""
+
+    model: str = Field(
+        default="",
+        description="Model identifier",
+        example="black-forest-labs/flux-schnell",
+    )
+    tier: Optional[str] = Field(
+        default=None, description="Tier served by the model", example="fast"
+    )
+    max_concurrency: int = Field(
+        default=0, description="Maximum number of concurrent calls to the model"
+    )
+    previews: bool = Field(
+        default=False,
+        description="Whether `preview` events are streamed for the model's images",
+    )
+    in_flight: int = Field(default=0, description="Number of calls in progress")
+    queued: int = Field(default=0, description="Number of calls waiting for a slot")
+    p50_ms: Optional[int] = Field(
+        default=None, description="Median latency of recent calls (ms)"
+    )
+    samples: int = Field(default=0, description="Number of recent calls observed")
+
+
+class TraceSpan(BaseModel):
+    """A span of a generation job's lifecycle."""
+
+    name: str = Field(default="", description="Span name", example="image.run")
+    start_ms: float = Field(
+        default=0.0, description="Start, relative to the start of the job (ms)"
+    )
+    duration_ms: float = Field(default=0.0, description="Duration (ms)", example=1850.2)
+    attributes: dict = Field(
+        default_factory=dict,
+        description="Span attributes",
+        example={"index": 0, "model": "black-forest-labs/flux-schnell"},
+    )
+
+
+class SpanSummary(BaseModel):
+    """Aggregated durations of the spans of a job with the same name."""
+
+    name: str = Field(default="", description="Span name", example="image.queue_wait")
+    count: int = Field(default=0, description="Number of spans")
+    total_ms: float = Field(default=0.0, description="Sum of the durations (ms)")
+    p50_ms: float = Field(default=0.0, description="Median duration (ms)")
+    max_ms: float = Field(default=0.0, description="Maximum duration (ms)")
+
+
+class JobTraceResponse(BaseModel):
+    """Breakdown of where the time of a generation job went."""
+
+    job_id: str = Field(default="", description="Job ID", example="job_1234567890ab")
+    duration_ms: float = Field(
+        default=0.0, description="Time from the first span start to the last span end"
+    )
+    spans: list[TraceSpan] = Field(
+        default_factory=list, description="Spans in start order"
+    )
+    summary: list[SpanSummary] = Field(
+        default_factory=list, description="Durations aggregated per span name"
+    )
@@ -0,0 +1,200 @@
+"""
+Monitoring models for the MyFlix backend API.
+Pydantic models for event loop lag, executor statistics and profiling.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class LoopStall(BaseModel):
+    """A period the event loop was blocked for longer than the threshold."""
+
+    at: datetime = Field(description="When the event loop recovered")
+    lag_ms: float = Field(
+        default=0.0, description="How late the heartbeat woke up (ms)", example=250.3
+    )
+    stack: Optional[str] = Field(
+        default=None,
+        description=(
+            "Stack of the event loop thread while it was blocked, "
+            "if the watchdog caught the stall in progress"
+        ),
+    )
+
+
+class ExecutorStats(BaseModel):
+    """Current state of a watched thread pool executor."""
+
+    name: str = Field(default="", description="Executor name", example="generation")
+    max_workers: int = Field(default=0, description="Maximum number of threads")
+    threads: int = Field(default=0, description="Number of threads started")
+    queued: int = Field(default=0, description="Number of calls waiting for a thread")
+    saturated: bool = Field(
+        default=False, description="Whether calls were waiting at the last heartbeat"
+    )
+
+
+class LoopStats(BaseModel):
+    """Event loop lag percentiles, recent stalls and executor state."""
+
+    enabled: bool = Field(default=False, description="Whether the monitor is running")
+    interval_ms: float = Field(
+        default=0.0, description="Interval between heartbeats (ms)"
+    )
+    threshold_ms: float = Field(
+        default=0.0, description="Lag from which the event loop is blocked (ms)"
+    )
+    samples: int = Field(default=0, description="Number of recent lag samples")
+    mean_ms: Optional[float] = Field(default=None, description="Mean lag (ms)")
+    p50_ms: Optional[float] = Field(default=None, description="Median lag (ms)")
+    p90_ms: Optional[float] = Field(
+        default=None, description="90th percentile lag (ms)"
+    )
+    p99_ms: Optional[float] = Field(
+        default=None, description="99th percentile lag (ms)"
+    )
+    max_ms: Optional[float] = Field(default=None, description="Maximum recent lag (ms)")
+    stalls: int = Field(default=0, description="Number of stalls since startup")
+    recent_stalls: list[LoopStall] = Field(
+        default_factory=list, description="Most recent stalls, latest first"
+    )
+    executors: list[ExecutorStats] = Field(
+        default_factory=list, description="Watched executors"
+    )
+
+
+class AllocationDiff(BaseModel):
+    """Difference in allocated memory at a source location."""
+
+    traceback: list[str] = Field(
+        default_factory=list,
+        description="Source locations of the allocation, most recent call last",
+        example=["app/services/job_state.py:42"],
+    )
+    size_diff_kb: float = Field(
+        default=0.0, description="Change of allocated memory (KiB)", example=512.0
+    )
+    size_kb: float = Field(default=0.0, description="Allocated memory at the end (KiB)")
+    count_diff: int = Field(default=0, description="Change of the number of blocks")
+    count: int = Field(default=0, description="Number of blocks at the end")
+
+
+class AllocationsResponse(BaseModel):
+    """Top differences between allocation snapshots taken at the start and end."""
+
+    seconds: float = Field(default=0.0, description="Duration of the trace")
+    traced_kb: float = Field(
+        default=0.0, description="Memory allocated since tracing started (KiB)"
+    )
+    peak_kb: float = Field(
+        default=0.0, description="Peak memory allocated while tracing (KiB)"
+    )
+    top: list[AllocationDiff] = Field(
+        default_factory=list, description="Largest differences first"
+    )
+
+
+class PromptCacheStats(BaseModel):
+    """Size and hit counts of the semantic prompt cache."""
+
+    enabled: bool = Field(default=False, description="Whether the cache is enabled")
+    prompts: int = Field(default=0, description="Number of cached prompts")
+    hits: int = Field(
+        default=0, description="Lookups served for the same normalized prompt"
+    )
+    near_hits: int = Field(default=0, description="Lookups served for a similar prompt")
+    misses: int = Field(default=0, description="Lookups not served from the cache")
+
+
+class UpstreamWarmupStats(BaseModel):
+    """State of the upstream warm-up and keep-alive calls."""
+
+    ready: bool = Field(default=True, description="Whether the warm-up is done")
+    error: Optional[str] = Field(
+        default=None,
+        description="Error of the last failed warm-up attempt (null once an "
+        "attempt succeeded)",
+        example="No upstream connection could be opened",
+    )
+    attempts: int = Field(default=0, description="Warm-up attempts made")
+    warmup_ms: Optional[float] = Field(
+        default=None, description="Duration of the warm-up", example=850.0
+    )
+    connections: int = Field(
+        default=0, description="Upstream connections opened by the warm-up"
+    )
+    models: dict[str, Optional[float]] = Field(
+        default_factory=dict,
+        description="Latency of the warm-up prediction of every model, in "
+        "milliseconds (null if it failed)",
+        example={"black-forest-labs/flux-schnell": 4200.0},
+    )
+    keepalives: int = Field(
+        default=0, description="Keep-alive calls made while the upstream was idle"
+    )
+
+
+class PopularPrompt(BaseModel):
+    """A frequently requested prompt tracked for prefill."""
+
+    prompt: str = Field(..., description="Latest request of the prompt")
+    model: str = Field(..., description="Model the prompt is generated with")
+    requests: int = Field(
+        ..., description="Guaranteed number of requests, halved periodically"
+    )
+
+
+class PrefillStats(BaseModel):
+    """Counters of the speculative prefill of popular prompts."""
+
+    enabled: bool = Field(default=False, description="Whether prefill is enabled")
+    predictions: int = Field(default=0, description="Prefill predictions started")
+    cancelled: int = Field(
+        default=0, description="Prefill predictions cancelled for real jobs"
+    )
+    failed: int = Field(default=0, description="Prefill predictions that failed")
+    images: int = Field(default=0, description="Images prefilled into the cache")
+    hits: int = Field(default=0, description="Jobs served from prefilled images")
+    saved_jobs: int = Field(
+        default=0, description="Jobs served from prefilled images with a known saving"
+    )
+    running: int = Field(default=0, description="Prefill predictions running")
+    budget_left: int = Field(
+        default=0, description="Prefill predictions that can start this hour"
+    )
+    ttfi_saved_ms: int = Field(
+        default=0,
+        description="TTFI saved by prefilled hits, against the p50 latency of "
+        "their model",
+        example=184000,
+    )
+    mean_ttfi_saved_ms: Optional[int] = Field(
+        default=None, description="Mean TTFI saved per prefilled hit", example=3900
+    )
+    tracked_prompts: int = Field(
+        default=0, description="Distinct prompts tracked by the frequency sketch"
+    )
+    top_prompts: list[PopularPrompt] = Field(
+        default_factory=list, description="Most requested prompts"
+    )
+
+
+class DedupStats(BaseModel):
+    """Counters of the perceptual-hash deduplication of generated images."""
+
+    enabled: bool = Field(default=False, description="Whether dedup is enabled")
+    hashed: int = Field(default=0, description="Images downloaded and hashed")
+    duplicates: int = Field(
+        default=0, description="Images flagged as near duplicates of earlier ones"
+    )
+    failed: int = Field(
+        default=0, description="Images that could not be downloaded or decoded"
+    )
+    pending: int = Field(default=0, description="Images waiting to be hashed")
+    indexed: int = Field(default=0, description="Hashes of recent images indexed")
+    index_mb: float = Field(
+        default=0.0, description="Memory of the hash index in megabytes", example=4.8
+    )
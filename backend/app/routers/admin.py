@@ -0,0 +1,199 @@
+"""
+FastAPI router for admin diagnostics endpoints.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+from app.core.config import settings
+from app.core.profiling import (
+    ProfilerBusyError,
+    capture_allocations,
+    capture_profile,
+)
+from app.core.security import get_admin_user
+from app.models.catalog import AddShowsResponse, Show
+from app.models.monitoring import AllocationsResponse
+from app.services.catalog_service import catalog_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_admin_user)],
+    responses={
+        403: {"description": "The user is not an admin"},
+        409: {"description": "A capture of the same kind is already in progress"},
+    },
+)
+
+
+@router.post(
+    "/profile",
+    summary="Capture a CPU profile",
+    description="""
+    Sample the stacks of every thread of the worker handling the request for
+    `seconds`, then return the profile in the speedscope format (open it at
+    https://www.speedscope.app) or in the collapsed stack format (for flame
+    graph tools). The worker keeps serving requests while it is profiled.
+
+    Only one profile is captured at a time per worker, for at most
+    `PROFILER_MAX_SECONDS` seconds. Nothing is sampled in between.
+
+    Requires authentication as an admin (`ADMIN_EMAILS`).
+    """,
+)
+async def profile(
+    seconds: float = Query(
+        default=10.0,
+        gt=0,
+        le=settings.PROFILER_MAX_SECONDS,
+        description="Duration of the profile",
+    ),
+    interval_ms: float = Query(
+        default=5.0, ge=1, le=100, description="Interval between samples (ms)"
+    ),
+    format: Literal["speedscope", "collapsed"] = Query(
+        default="speedscope", description="Output format"
+    ),
+) -> Response:
+    """
+    Capture a CPU profile of the worker.
+
+    Args:
+        seconds: Duration of the profile
+        interval_ms: Interval between samples, in milliseconds
+        format: Output format
+
+    Returns:
+        Response: Speedscope JSON or collapsed stacks
+
+    Raises:
+        HTTPException: 409 if a profile is already being captured
+    """
+    logger.info(f"Capturing a {seconds}s CPU profile every {interval_ms}ms")
+    try:
+        profiler = await capture_profile(seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    name = f"profile-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}"
+    if format == "collapsed":
+        return PlainTextResponse(
+            profiler.collapsed(),
+            headers={"Content-Disposition": f'attachment; filename="{name}.txt"'},
+        )
+    return JSONResponse(
+        profiler.speedscope(name),
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.speedscope.json"'
+        },
+    )
+
+
+@router.post(
+    "/allocations",
+    response_model=AllocationsResponse,
+    summary="Trace memory allocations",
+    description="""
+    Trace memory allocations of the worker handling the request with
+    `tracemalloc` for `seconds`, then return the source locations whose
+    allocated memory changed the most between the start and the end, e.g. to
+    find what keeps growing under load.
+
+    Allocations are only traced during the capture, since tracing slows down
+    every allocation. Only one trace runs at a time per worker, for at most
+    `TRACEMALLOC_MAX_SECONDS` seconds.
+
+    Requires authentication as an admin (`ADMIN_EMAILS`).
+    """,
+)
+async def allocations(
+    seconds: float = Query(
+        default=10.0,
+        gt=0,
+        le=settings.TRACEMALLOC_MAX_SECONDS,
+        description="Duration of the trace",
+    ),
+    top: int = Query(
+        default=20, ge=1, le=100, description="Number of locations to return"
+    ),
+    frames: int = Query(
+        default=1,
+        ge=1,
+        le=25,
+        description="Number of frames per location (more frames cost more memory)",
+    ),
+) -> AllocationsResponse:
+    """
+    Trace memory allocations of the worker.
+
+    Args:
+        seconds: Duration of the trace
+        top: Number of locations to return
+        frames: Number of frames per location
+
+    Returns:
+        AllocationsResponse: Top allocation differences, largest first
+
+    Raises:
+        HTTPException: 409 if allocations are already being traced
+    """
+    logger.info(f"Tracing memory allocations for {seconds}s")
+    try:
+        result = await capture_allocations(seconds, frames, top)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return AllocationsResponse(**result)
+
+
+@router.post(
+    "/catalog/shows",
+    response_model=AddShowsResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        409: {"description": "Duplicate show IDs, or in-memory catalog of workers"}
+    },
+    summary="Add shows to the catalog",
+    description="""
+    Add shows to the catalog. With a catalog snapshot
+    (`CATALOG_SNAPSHOT_PATH`), a new snapshot is written with the shows, and
+    every worker serves it once it reloads the snapshot
+    (`CATALOG_SNAPSHOT_RELOAD_SECONDS`).
+
+    An in-memory catalog belongs to the worker handling the request, so
+    shows are only added to it when the server runs a single worker (`409`
+    otherwise). They are merged into the sorted rows and the search index
+    without rebuilding them, and served once the home payload is rebuilt
+    (in a worker thread).
+
+    Requires authentication as an admin (`ADMIN_EMAILS`).
+    """,
+)
+async def add_shows(shows: list[Show]) -> AddShowsResponse:
+    """
+    Add shows to the catalog.
+
+    Args:
+        shows: Shows to add
+
+    Returns:
+        AddShowsResponse: Number of shows added and in the catalog
+
+    Raises:
+        HTTPException: 409 if a show ID is taken, or the catalog is in memory
+            and served by several workers
+    """
+    try:
+        await catalog_service.add_shows(shows)
+    except (RuntimeError, ValueError) as e:
+        logger.warning(f"Rejected catalog addition: {e}")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return AddShowsResponse(added=len(shows), total=len(catalog_service.shows))
@@ -2,10 +2,14 @@
 Authentication router for the MyFlix backend API.
 """
 
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
 
 from app.core.config import settings
-from app.models.auth import LoginRequest, LoginResponse
+from app.core.rate_limit import limit_login
+from app.core.security import get_current_user
+from app.models.auth import LoginRequest, LoginResponse, LogoutRequest, RefreshRequest
 from app.services.auth_service import auth_service
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
@@ -15,6 +19,7 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
     "/login",
     response_model=LoginResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(limit_login)],
     responses={
         200: {
             "description": "Login successful",
@@ -29,6 +34,9 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
         422: {
             "description": "Validation error",
         },
+        429: {
+            "description": "Too many login attempts",
+        },
     },
     summary="User Login",
     description="""
@@ -38,18 +46,21 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
     - Method: POST
     - Path: /api/auth/login
     - Request: { email: string, password: string }
-    - Response 200: { token: string, user: { id, email } }
+    - Response 200: { token: string, refresh_token: string, expires_in: number,
+      user: { id, email } }
 
     Authentication Logic:
     - For demo purposes, accepts pre-canned email/password
     combinations (min 6 chars for password)
-    - Returns JWT token valid for 24 hours
-    - Token includes user ID and email in payload
+    - Returns a JWT access token valid for `expires_in` seconds, and a refresh
+    token to renew it through /api/auth/refresh
+    - Tokens include user ID and email in payload
 
     Error Handling:
     - 400: Invalid request format
     - 401: Invalid credentials (wrong email/password)
     - 422: Validation errors (invalid email format, password too short)
+    - 429: Too many login attempts from the client IP (see `Retry-After`)
     """,
 )
 async def login(login_request: LoginRequest):
@@ -100,3 +111,88 @@ async def login(login_request: LoginRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error during authentication",
         ) from e
+
+
+@router.post(
+    "/refresh",
+    response_model=LoginResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Tokens renewed",
+            "model": LoginResponse,
+        },
+        401: {
+            "description": "Invalid, expired or revoked refresh token",
+        },
+    },
+    summary="Refresh Tokens",
+    description="""
+    Exchange a refresh token for a new access token and refresh token, without
+    verifying the password again.
+
+    API Contract:
+    - Method: POST
+    - Path: /api/auth/refresh
+    - Request: { refresh_token: string }
+    - Response 200: same as /api/auth/login
+
+    The refresh token is revoked: each refresh token can be used once.
+    """,
+)
+async def refresh(refresh_request: RefreshRequest):
+    """
+    Token refresh endpoint.
+
+    Args:
+        `refresh_request`: Refresh token of a previous login or refresh
+
+    Returns:
+        `LoginResponse` with new tokens and user information
+
+    Raises:
+        `HTTPException`: If the refresh token is invalid
+    """
+    login_response = await auth_service.refresh(refresh_request.refresh_token)
+    if not login_response:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+    return login_response
+
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="User Logout",
+    description="""
+    Revoke the access token of the request, and the refresh token when given.
+
+    API Contract:
+    - Method: POST
+    - Path: /api/auth/logout
+    - Request: optional { refresh_token: string }
+    - Response 204: empty
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def logout(
+    logout_request: Optional[LogoutRequest] = Body(default=None),
+    current_user: dict = Depends(get_current_user),
+) -> Response:
+    """
+    User logout endpoint.
+
+    Args:
+        `logout_request`: Refresh token to revoke as well
+        `current_user`: Authenticated user information from JWT token
+
+    Returns:
+        `Response`: Empty response
+    """
+    refresh_token = logout_request.refresh_token if logout_request else None
+    await auth_service.logout(current_user, refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,297 @@
+"""
+FastAPI router for show catalog endpoints.
+"""
+
+import logging
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+
+from app.core.config import settings
+from app.core.http_cache import cached_response
+from app.core.security import get_current_user
+from app.models.catalog import CatalogResponse, SearchResponse, Show, ShowRowPage
+from app.services.catalog_service import (
+    InvalidCursorError,
+    catalog_service,
+    decode_cursor,
+)
+from app.services.recommendation_service import recommendation_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/catalog", tags=["catalog"])
+
+CACHING_RESPONSES = {
+    304: {"description": "Not modified (the `If-None-Match` ETag matched)"},
+}
+
+
+@router.get(
+    "/",
+    response_model=CatalogResponse,
+    responses=CACHING_RESPONSES,
+    summary="Get the home page catalog",
+    description="""
+    Get the featured show and the first page of every show row, which is
+    everything the home page needs for its first paint. Use the `next_cursor`
+    of a row with `/api/catalog/rows/{row_id}` to load more shows.
+
+    Responses are pre-serialized and served with a strong `ETag`,
+    `Cache-Control` and gzip/brotli compression based on `Accept-Encoding`.
+    """,
+)
+async def get_catalog(request: Request) -> Response:
+    """
+    Get the home page catalog.
+
+    Args:
+        request: Incoming request, used for content negotiation and ETags
+
+    Returns:
+        Response: Pre-serialized `CatalogResponse`
+    """
+    return cached_response(
+        request, catalog_service.get_home(), settings.CATALOG_CACHE_CONTROL
+    )
+
+
+@router.get(
+    "/top-picks",
+    response_model=ShowRowPage,
+    responses=CACHING_RESPONSES,
+    summary="Get the user's top picks",
+    description="""
+    Get the "Top Picks for You" row of the authenticated user, ranked from
+    the genres of the shows in their My List and of their generation prompts,
+    along with show rating and recency. Shows already in the My List are not
+    recommended.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_top_picks(
+    request: Request, current_user: dict = Depends(get_current_user)
+) -> Response:
+    """
+    Get the top picks of the authenticated user.
+
+    Args:
+        request: Incoming request, used for content negotiation and ETags
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        Response: Pre-serialized `ShowRowPage`
+    """
+    payload = recommendation_service.get_top_picks(current_user["user_id"])
+    return cached_response(request, payload, settings.RECOMMENDATIONS_CACHE_CONTROL)
+
+
+@router.get(
+    "/my-list",
+    response_model=list[Show],
+    summary="Get the user's My List",
+    description="""
+    Get the shows in the authenticated user's My List, in the order they
+    were added.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_my_list(current_user: dict = Depends(get_current_user)) -> Response:
+    """
+    Get the My List of the authenticated user.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        Response: Serialized list of `Show`
+    """
+    positions = recommendation_service.get_my_list(current_user["user_id"])
+    return Response(
+        content=catalog_service.render_shows(positions),
+        media_type="application/json",
+        headers={"Cache-Control": settings.RECOMMENDATIONS_CACHE_CONTROL},
+    )
+
+
+@router.put(
+    "/my-list/{show_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={404: {"description": "Show not found"}},
+    summary="Add a show to the user's My List",
+)
+async def add_to_my_list(
+    show_id: str, current_user: dict = Depends(get_current_user)
+) -> Response:
+    """
+    Add a show to the My List of the authenticated user.
+
+    Args:
+        show_id: Show identifier
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        Response: Empty response
+
+    Raises:
+        HTTPException: If the show is not found
+    """
+    if catalog_service.get_show_position(show_id) is None:
+        msg = f"Show {show_id} not found"
+        logger.info(msg)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=msg)
+
+    recommendation_service.add_to_my_list(current_user["user_id"], show_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete(
+    "/my-list/{show_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Remove a show from the user's My List",
+)
+async def remove_from_my_list(
+    show_id: str, current_user: dict = Depends(get_current_user)
+) -> Response:
+    """
+    Remove a show from the My List of the authenticated user.
+
+    Args:
+        show_id: Show identifier
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        Response: Empty response
+    """
+    recommendation_service.remove_from_my_list(current_user["user_id"], show_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/search",
+    response_model=SearchResponse,
+    summary="Search shows",
+    description="""
+    Search shows by title, description and genre. Every word of the query
+    must match, and the last word also matches as a prefix so the endpoint
+    can back a typeahead. Words without a match fall back to matching inside
+    longer words.
+
+    Shows matching the query in their title rank first, then shows are
+    ordered by rating. Results can be filtered by genre and release year.
+    """,
+)
+async def search_shows(
+    q: str = Query(default="", max_length=200, description="Search query"),
+    genre: Optional[str] = Query(default=None, description="Genre filter"),
+    year_from: Optional[int] = Query(default=None, description="Minimum year"),
+    year_to: Optional[int] = Query(default=None, description="Maximum year"),
+    limit: int = Query(default=10, ge=1, le=50, description="Page size"),
+    offset: int = Query(default=0, ge=0, le=1000, description="Results to skip"),
+) -> Response:
+    """
+    Search shows.
+
+    Args:
+        q: Search query
+        genre: Only include shows of this genre
+        year_from: Only include shows released this year or later
+        year_to: Only include shows released this year or earlier
+        limit: Maximum number of results
+        offset: Number of results to skip
+
+    Returns:
+        Response: Serialized `SearchResponse`
+    """
+    body = catalog_service.search(q, genre, year_from, year_to, limit, offset)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Cache-Control": settings.CATALOG_CACHE_CONTROL},
+    )
+
+
+@router.get(
+    "/rows/{row_id}",
+    response_model=ShowRowPage,
+    responses={
+        **CACHING_RESPONSES,
+        400: {"description": "Invalid cursor"},
+        404: {"description": "Row not found"},
+    },
+    summary="Get a page of a show row",
+    description="""
+    Get a page of shows of a row. Without a cursor the first page is
+    returned; pass the `next_cursor` of the previous page to get the next one.
+    """,
+)
+async def get_row_page(
+    row_id: str, request: Request, cursor: Optional[str] = None
+) -> Response:
+    """
+    Get a page of a show row.
+
+    Args:
+        row_id: Row identifier
+        request: Incoming request, used for content negotiation and ETags
+        cursor: Opaque cursor from a previous page
+
+    Returns:
+        Response: Pre-serialized `ShowRowPage`
+
+    Raises:
+        HTTPException: If the cursor is invalid or the row is not found
+    """
+    try:
+        offset = decode_cursor(cursor) if cursor else 0
+        payload = catalog_service.get_row_page(row_id, offset)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if payload is None:
+        msg = f"Row {row_id} not found"
+        logger.info(msg)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=msg)
+
+    return cached_response(request, payload, settings.CATALOG_CACHE_CONTROL)
+
+
+@router.get(
+    "/shows/{show_id}",
+    response_model=Show,
+    responses={**CACHING_RESPONSES, 404: {"description": "Show not found"}},
+    summary="Get a show",
+)
+async def get_show(show_id: str, request: Request) -> Response:
+    """
+    Get a single show.
+
+    Args:
+        show_id: Show identifier
+        request: Incoming request, used for content negotiation and ETags
+
+    Returns:
+        Response: Pre-serialized `Show`
+
+    Raises:
+        HTTPException: If the show is not found
+    """
+    payload = catalog_service.get_show(show_id)
+    if payload is None:
+        msg = f"Show {show_id} not found"
+        logger.info(msg)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=msg)
+
+    return cached_response(request, payload, settings.CATALOG_CACHE_CONTROL)
@@ -7,12 +7,26 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 
+from app.core.config import settings
+from app.core.rate_limit import limit_generation, limit_generation_batch
 from app.core.security import get_current_user
 from app.models.generation import (
+    BatchGenerationJobResponse,
+    BatchGenerationRequest,
+    GenerationJob,
     GenerationJobResponse,
     GenerationRequest,
+    JobTraceResponse,
+    ModelStats,
 )
-from app.services.generation_service import generation_service
+from app.services.archive_service import archive_service
+from app.services.generation_service import (
+    GenerationCapacityError,
+    generation_service,
+)
+from app.services.job_state import COMPLETED, FAILED
+from app.services.model_pool import UnknownModelError
+from app.services.recommendation_service import recommendation_service
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +35,8 @@ router = APIRouter(prefix="/api/generate", tags=["generation"])
 
 @router.post(
     "/",
+    dependencies=[Depends(limit_generation)],
+    responses={429: {"description": "Rate limit exceeded"}},
     response_model=GenerationJobResponse,
     status_code=status.HTTP_202_ACCEPTED,
     summary="Create an image generation job",
@@ -29,6 +45,11 @@ router = APIRouter(prefix="/api/generate", tags=["generation"])
     using Replicate API. Returns immediately with a job ID that can be
     used to stream progress updates.
 
+    Images are generated with the requested `model` (from the allowed models,
+    see `/api/generate/models`) or with the model of the requested `tier`
+    ("fast" or "quality") that currently has the lowest observed latency.
+    Every model has its own concurrency limit.
+
     Requires authentication: Include a valid JWT token in the Authorization
     header as 'Bearer <token>'.
     """,
@@ -57,10 +78,25 @@ async def create_generation_job(
             f"with prompt: '{request.prompt}' and {request.num_images} images"
         )
 
-        job_id = generation_service.create_job(request)
+        job_id = await generation_service.create_job(request)
+        recommendation_service.record_generation(
+            current_user["user_id"], request.prompt
+        )
 
         return GenerationJobResponse(job_id=job_id)
 
+    except UnknownModelError as e:
+        logger.warning(f"Rejected generation job: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except GenerationCapacityError as e:
+        logger.warning(f"Rejected generation job: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(f"Failed to create generation job: {e}")
         raise HTTPException(
@@ -69,6 +105,64 @@ async def create_generation_job(
         )
 
 
+@router.get(
+    "/models",
+    response_model=list[ModelStats],
+    summary="List image generation models",
+    description="""
+    List the models a generation request can select, with the tier they
+    serve, their concurrency limit and in-flight calls, and the median
+    latency of their recent calls used to route tier requests.
+    """,
+)
+async def list_models() -> list[ModelStats]:
+    """
+    List the allowed image generation models.
+
+    Returns:
+        list[ModelStats]: Current state of every allowed model
+    """
+    return [ModelStats(**stats) for stats in generation_service.get_model_stats()]
+
+
+@router.get(
+    "/{job_id}",
+    response_model=GenerationJob,
+    summary="Get job results",
+    description="""
+    Get the current state of a generation job and the result of every
+    image, including the `duplicate_of` flags of near duplicates, which can
+    be set after the job finished (images are checked in the background).
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_job(
+    job_id: str, current_user: dict = Depends(get_current_user)
+) -> GenerationJob:
+    """
+    Get a generation job with its results.
+
+    Args:
+        job_id: Job ID
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        GenerationJob: Job with the result of every image
+
+    Raises:
+        HTTPException: If job not found
+    """
+    job = generation_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+    return job
+
+
 @router.get(
     "/{job_id}/stream",
     summary="Stream job progress",
@@ -78,6 +172,13 @@ async def create_generation_job(
 
     Events sent:
     - `progress`: Individual image completion updates
+    - `preview`: Step progress and low-resolution intermediate image of a
+      running image, for models that report them (see `previews` in
+      `/api/generate/models`). Previews of an image are rate limited, and
+      a slow client only receives the latest one.
+    - `duplicate`: An image was flagged as a near duplicate of an earlier
+      one (`index`, `duplicate_of`); images are checked in the background,
+      so flags set after the job finished are only in `/api/generate/{job_id}`
     - `done`: Job completion with timing metrics
     - `error`: Error notifications
     - `keepalive`: Periodic keep-alive messages
@@ -99,8 +200,7 @@ async def stream_job_progress(job_id: str):
         HTTPException: If job not found
     """
     # Check if job exists
-    job = generation_service.get_job(job_id)
-    if not job:
+    if not generation_service.has_job(job_id):
         msg = f"Job {job_id} not found"
         logger.info(msg)
         raise HTTPException(
@@ -120,3 +220,286 @@ async def stream_job_progress(job_id: str):
             "Access-Control-Allow-Headers": "Cache-Control",
         },
     )
+
+
+@router.get(
+    "/{job_id}/archive",
+    responses={
+        200: {"content": {"application/zip": {}}},
+        409: {"description": "Job still running"},
+    },
+    summary="Download the images of a job as a ZIP archive",
+    description="""
+    Download every generated image of a finished job in a single ZIP
+    archive, produced while it is sent: images are downloaded concurrently
+    and written to the archive as they arrive, so memory use does not depend
+    on the number of images.
+
+    Images are named after their index (`image_01.webp`, ...). Images that
+    failed to generate or to download are listed in an `errors.txt` entry.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def download_job_archive(
+    job_id: str, current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream a ZIP archive of the images of a job.
+
+    Args:
+        job_id: Job ID to archive the images of
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        StreamingResponse: ZIP archive of the job's images
+
+    Raises:
+        HTTPException: If job not found or still running
+    """
+    job = generation_service.get_job_state(job_id)
+    if job is None:
+        msg = f"Job {job_id} not found"
+        logger.info(msg)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=msg,
+        )
+    if job.status not in (COMPLETED, FAILED):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is still running",
+        )
+
+    logger.info(f"Starting archive of job {job_id}")
+
+    return StreamingResponse(
+        archive_service.stream_job_archive(job),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{job_id}.zip"',
+            "Cache-Control": "no-cache",
+        },
+    )
+
+
+@router.get(
+    "/{job_id}/trace",
+    response_model=JobTraceResponse,
+    summary="Get the lifecycle breakdown of a job",
+    description="""
+    Get the lifecycle spans of a recent job and their durations aggregated
+    per name, to see where its time went:
+    - `job.create`: model resolution, admission and registration
+    - `job.pending`: waiting to start (e.g. behind other jobs of a batch)
+    - `job.process`: from start to completion
+    - `image.queue_wait`: waiting for a slot of the model, then for an
+      executor thread
+    - `image.run`: the upstream Replicate call
+    - `image.result`: handling the result, until the image is recorded
+    - `broadcast`: encoding and fanning out an event to subscribers
+
+    Only a fraction of jobs (`TRACING_SAMPLE_RATE`) is traced, and only the
+    traces of the `TRACING_MAX_JOBS` most recent ones are kept.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_job_trace(
+    job_id: str, current_user: dict = Depends(get_current_user)
+) -> JobTraceResponse:
+    """
+    Get the lifecycle breakdown of a job.
+
+    Args:
+        job_id: Job ID to get the breakdown of
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        JobTraceResponse: Spans of the job and their aggregated durations
+
+    Raises:
+        HTTPException: If the job was not traced or is no longer kept
+    """
+    breakdown = generation_service.get_job_trace(job_id)
+    if breakdown is None:
+        msg = f"No trace found for job {job_id}"
+        logger.info(msg)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=msg,
+        )
+
+    return JobTraceResponse(**breakdown)
+
+
+@router.post(
+    "/batch",
+    responses={429: {"description": "Rate limit exceeded"}},
+    response_model=BatchGenerationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Create a batch of image generation jobs",
+    description="""
+    Create one image generation job per item in a single request. The batch
+    is admitted to the scheduler as a whole (or rejected with 503 when there
+    is not enough capacity) and its jobs are processed with a bounded number
+    of jobs active at a time.
+
+    Progress for the whole batch can be followed through
+    `/api/generate/batch/{batch_id}/stream` (SSE) or
+    `/api/generate/batch/{batch_id}/results` (NDJSON).
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def create_generation_batch(
+    request: BatchGenerationRequest,
+    current_user: dict = Depends(get_current_user),
+) -> BatchGenerationJobResponse:
+    """
+    Create a new batch of image generation jobs.
+
+    Args:
+        request: Generation parameters for each job in the batch
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        BatchGenerationJobResponse: Batch ID and per-item job IDs
+
+    Raises:
+        HTTPException: If the batch is rate limited, cannot be admitted or
+            creation fails
+    """
+    await limit_generation_batch(current_user, len(request.items))
+
+    try:
+        user_email = current_user.get("sub", "unknown")
+        logger.info(
+            f"Creating generation batch for user '{user_email}' "
+            f"with {len(request.items)} items"
+        )
+
+        batch = await generation_service.create_batch(request)
+        # Only the most recent prompts are kept in the user's history
+        for item in request.items[-settings.RECOMMENDATIONS_MAX_PROMPTS :]:
+            recommendation_service.record_generation(
+                current_user["user_id"], item.prompt
+            )
+
+        return BatchGenerationJobResponse(
+            batch_id=batch.batch_id, job_ids=batch.job_ids
+        )
+
+    except UnknownModelError as e:
+        logger.warning(f"Rejected generation batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except GenerationCapacityError as e:
+        logger.warning(f"Rejected generation batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Failed to create generation batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create generation batch: {str(e)}",
+        )
+
+
+@router.get(
+    "/batch/{batch_id}/stream",
+    summary="Stream batch progress",
+    description="""
+    Stream real-time progress updates for every job of a batch over a
+    single Server-Sent Events connection.
+
+    Events sent:
+    - `progress`: Individual image completion updates (include `job_id`)
+    - `duplicate`: An image was flagged as a near duplicate (include `job_id`)
+    - `job_done`: A job of the batch finished (include `job_id`)
+    - `job_error`: A job of the batch failed (include `job_id`)
+    - `done`: Batch completion with aggregated counts
+    - `keepalive`: Periodic keep-alive messages
+
+    The stream will automatically close when the batch completes.
+    """,
+)
+async def stream_batch_progress(batch_id: str):
+    """
+    Stream batch progress using Server-Sent Events.
+
+    Args:
+        batch_id: Batch ID to stream progress for
+
+    Returns:
+        StreamingResponse: SSE stream of batch progress
+
+    Raises:
+        HTTPException: If batch not found
+    """
+    _ensure_batch_exists(batch_id)
+
+    logger.info(f"Starting stream for batch {batch_id}")
+
+    return StreamingResponse(
+        generation_service.subscribe_to_batch_stream(batch_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Cache-Control",
+        },
+    )
+
+
+@router.get(
+    "/batch/{batch_id}/results",
+    summary="Stream batch results as NDJSON",
+    description="""
+    Stream the result of every image in a batch as newline-delimited JSON,
+    one `{job_id, index, status, url, error}` document per line. Results
+    already available are sent first, and the response ends once the batch
+    completes, which makes it suitable for saving straight to a file.
+    """,
+)
+async def stream_batch_results(batch_id: str):
+    """
+    Stream batch results as newline-delimited JSON.
+
+    Args:
+        batch_id: Batch ID to stream results for
+
+    Returns:
+        StreamingResponse: NDJSON stream of image results
+
+    Raises:
+        HTTPException: If batch not found
+    """
+    _ensure_batch_exists(batch_id)
+
+    logger.info(f"Starting results stream for batch {batch_id}")
+
+    return StreamingResponse(
+        generation_service.stream_batch_results(batch_id),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def _ensure_batch_exists(batch_id: str) -> None:
+    """Raise a 404 if the batch is unknown."""
+    if not generation_service.get_batch(batch_id):
+        msg = f"Batch {batch_id} not found"
+        logger.info(msg)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=msg,
+        )
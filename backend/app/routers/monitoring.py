@@ -0,0 +1,160 @@
+"""
+FastAPI router for runtime monitoring endpoints.
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.core.loop_monitor import loop_monitor
+from app.core.security import get_current_user
+from app.models.monitoring import (
+    DedupStats,
+    LoopStats,
+    PrefillStats,
+    PromptCacheStats,
+    UpstreamWarmupStats,
+)
+from app.services.dedup_service import dedup_service
+from app.services.generation_service import generation_service
+from app.services.warmup_service import warmup_service
+
+router = APIRouter(prefix="/api/monitoring", tags=["monitoring"])
+
+
+@router.get(
+    "/loop",
+    response_model=LoopStats,
+    summary="Get event loop lag statistics",
+    description="""
+    Get percentiles of the event loop lag over the recent window, the most
+    recent stalls (lags above `LOOP_MONITOR_THRESHOLD_MS`) with the stack of
+    the blocking call, and the state of the watched executors.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_loop_stats(current_user: dict = Depends(get_current_user)) -> LoopStats:
+    """
+    Get event loop lag statistics.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        LoopStats: Lag percentiles, recent stalls and executor state
+    """
+    return LoopStats(**loop_monitor.stats())
+
+
+@router.get(
+    "/prompt-cache",
+    response_model=PromptCacheStats,
+    summary="Get prompt cache statistics",
+    description="""
+    Get the number of prompts in the semantic prompt cache and how many job
+    lookups were served from it, for the same prompt (`hits`) or a similar
+    one (`near_hits`), to tune `PROMPT_CACHE_THRESHOLD`.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_prompt_cache_stats(
+    current_user: dict = Depends(get_current_user),
+) -> PromptCacheStats:
+    """
+    Get prompt cache statistics.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        PromptCacheStats: Size and hit counts of the prompt cache
+    """
+    return PromptCacheStats(**generation_service.get_cache_stats())
+
+
+@router.get(
+    "/prefill",
+    response_model=PrefillStats,
+    summary="Get prompt prefill statistics",
+    description="""
+    Get the prefill predictions run with idle capacity (and how many were
+    cancelled for real jobs or failed), the remaining hourly budget, the jobs
+    served from prefilled images with the TTFI they saved, and the most
+    requested prompts.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_prefill_stats(
+    current_user: dict = Depends(get_current_user),
+) -> PrefillStats:
+    """
+    Get prompt prefill statistics.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        PrefillStats: Prefill counters, budget and popular prompts
+    """
+    return PrefillStats(**generation_service.get_prefill_stats())
+
+
+@router.get(
+    "/dedup",
+    response_model=DedupStats,
+    summary="Get image deduplication statistics",
+    description="""
+    Get the number of generated images hashed, flagged as near duplicates of
+    an earlier image (within `DEDUP_MAX_DISTANCE` bits) or that could not be
+    checked, and the size of the index of recent image hashes.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_dedup_stats(
+    current_user: dict = Depends(get_current_user),
+) -> DedupStats:
+    """
+    Get image deduplication statistics.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        DedupStats: Deduplication counters and index size
+    """
+    return DedupStats(**dedup_service.stats())
+
+
+@router.get(
+    "/warmup",
+    response_model=UpstreamWarmupStats,
+    summary="Get upstream warm-up statistics",
+    description="""
+    Get whether the upstream warm-up is done, how long it took, how many
+    Replicate connections it opened, the latency of the warm-up prediction of
+    every model (when `UPSTREAM_WARMUP_PREDICTIONS` is set), and the number of
+    keep-alive calls made since.
+
+    Requires authentication: Include a valid JWT token in the Authorization
+    header as 'Bearer <token>'.
+    """,
+)
+async def get_warmup_stats(
+    current_user: dict = Depends(get_current_user),
+) -> UpstreamWarmupStats:
+    """
+    Get upstream warm-up statistics.
+
+    Args:
+        current_user: Authenticated user information from JWT token
+
+    Returns:
+        UpstreamWarmupStats: State and timings of the warm-up
+    """
+    return UpstreamWarmupStats(**warmup_service.stats())
@@ -0,0 +1,234 @@
+"""
+Service for exporting the images of a generation job as a ZIP archive.
+
+Archives are produced on the fly: images are downloaded concurrently within a
+bounded window and each one is written to the archive as soon as its download
+completes, then the bytes written are sent. Memory is therefore bounded by the
+window times the maximum image size, whatever the number of images; only a
+small central directory record per image is kept until the end. Generated
+images are already compressed, so they are stored as is instead of being
+deflated again.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+import zipfile
+from typing import AsyncGenerator, Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.services.job_state import SUCCEEDED, JobState
+
+logger = logging.getLogger(__name__)
+
+# Extensions of formats that gain nothing from being deflated
+COMPRESSED_EXTENSIONS = frozenset({".webp", ".png", ".jpg", ".jpeg", ".gif", ".avif"})
+
+# Extension of images whose URL does not have one
+DEFAULT_EXTENSION = ".webp"
+
+# Entry listing the images missing from an archive, and why
+ERRORS_ENTRY = "errors.txt"
+
+
+class ImageTooLargeError(Exception):
+    """Raised when an image is larger than the maximum archived size."""
+
+
+class _ChunkSink:
+    """Write-only file collecting what `zipfile` writes until it is taken."""
+
+    def __init__(self):
+        """Initialize an empty sink."""
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        """Collect written data."""
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        """Nothing is buffered besides the collected data."""
+
+    def take(self) -> bytes:
+        """Get and clear the data written since the last call."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ArchiveService:
+    """Streams the images of generation jobs as ZIP archives."""
+
+    fetch_concurrency: int
+    max_image_bytes: int
+    fetch_timeout: float
+    _transport: Optional[httpx.AsyncBaseTransport]
+
+    def __init__(
+        self,
+        fetch_concurrency: int = settings.ARCHIVE_FETCH_CONCURRENCY,
+        max_image_mb: int = settings.ARCHIVE_MAX_IMAGE_MB,
+        fetch_timeout: float = settings.ARCHIVE_FETCH_TIMEOUT_SECONDS,
+    ):
+        """
+        Initialize the archive service.
+
+        Args:
+            fetch_concurrency: Number of images downloaded concurrently
+            max_image_mb: Images larger than this are left out, in megabytes
+            fetch_timeout: Timeout of every image download in seconds
+        """
+        self.fetch_concurrency = fetch_concurrency
+        self.max_image_bytes = max_image_mb * 1024 * 1024
+        self.fetch_timeout = fetch_timeout
+        # Transport of the download client (the network when None)
+        self._transport = None
+
+    async def stream_job_archive(self, job: JobState) -> AsyncGenerator[bytes, None]:
+        """
+        Stream a ZIP archive of the generated images of a job.
+
+        Images are named after their index (`image_01.webp`, ...) and written
+        in the order their downloads complete. Images that failed to generate
+        or to download are listed in an `errors.txt` entry instead.
+
+        Args:
+            job: Finished job to archive
+
+        Yields:
+            bytes: Consecutive parts of the archive
+        """
+        sink = _ChunkSink()
+        archive = zipfile.ZipFile(sink, "w", allowZip64=True)
+        width = len(str(job.num_images))
+        images = self._iter_images(job)
+        download_errors: dict[int, str] = {}
+        archived = 0
+        in_flight: set[asyncio.Task] = set()
+
+        async with httpx.AsyncClient(
+            transport=self._transport,
+            timeout=self.fetch_timeout,
+            limits=httpx.Limits(max_connections=self.fetch_concurrency),
+            follow_redirects=True,
+        ) as client:
+            try:
+                while True:
+                    # Keep the window of downloads full
+                    free = self.fetch_concurrency - len(in_flight)
+                    for index, url in itertools.islice(images, free):
+                        in_flight.add(
+                            asyncio.create_task(self._download(client, index, url))
+                        )
+                    if not in_flight:
+                        break
+
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        index, url, data, error = task.result()
+                        if data is None:
+                            download_errors[index] = error
+                            logger.warning(
+                                f"Job {job.job_id}: Image {index} left out of "
+                                f"the archive - {error}"
+                            )
+                            continue
+
+                        archive.writestr(self._entry_info(job, index, url, width), data)
+                        archived += 1
+                        yield sink.take()
+            finally:
+                # The client went away: stop the downloads still running
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        errors = {**job.errors, **download_errors}
+        if errors:
+            archive.writestr(
+                ERRORS_ENTRY,
+                "".join(
+                    f"image {index + 1:0{width}d}: {errors[index]}\n"
+                    for index in sorted(errors)
+                ),
+            )
+        archive.close()
+        yield sink.take()
+
+        logger.info(
+            f"Job {job.job_id}: Archived {archived} images, {len(errors)} missing"
+        )
+
+    def _iter_images(self, job: JobState) -> Iterator[tuple[int, str]]:
+        """Iterate over the index and URL of the generated images of a job."""
+        for index in range(job.num_images):
+            if job.statuses[index] == SUCCEEDED:
+                yield index, job.urls[index]
+
+    async def _download(
+        self, client: httpx.AsyncClient, index: int, url: str
+    ) -> tuple[int, str, Optional[bytes], Optional[str]]:
+        """
+        Download an image.
+
+        Args:
+            client: HTTP client
+            index: Image index
+            url: Image URL
+
+        Returns:
+            tuple: Image index, URL, and either the image data or the error
+        """
+        try:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                size = int(response.headers.get("content-length") or 0)
+                if size > self.max_image_bytes:
+                    raise ImageTooLargeError(f"Image is too large ({size} bytes)")
+
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data += chunk
+                    if len(data) > self.max_image_bytes:
+                        raise ImageTooLargeError(
+                            f"Image is larger than {self.max_image_bytes} bytes"
+                        )
+                return index, url, bytes(data), None
+
+        except httpx.HTTPStatusError as e:
+            return index, url, None, f"Download failed ({e.response.status_code})"
+        except (httpx.HTTPError, ImageTooLargeError) as e:
+            return index, url, None, str(e) or type(e).__name__
+
+    def _entry_info(
+        self, job: JobState, index: int, url: str, width: int
+    ) -> zipfile.ZipInfo:
+        """Build the archive entry of an image, named after its index."""
+        extension = os.path.splitext(urlsplit(url).path)[1].lower()
+        if not extension:
+            extension = DEFAULT_EXTENSION
+
+        finished_at = job.image_finished_at[index] or time.time()
+        info = zipfile.ZipInfo(
+            f"image_{index + 1:0{width}d}{extension}",
+            date_time=time.gmtime(finished_at)[:6],
+        )
+        info.compress_type = (
+            zipfile.ZIP_STORED
+            if extension in COMPRESSED_EXTENSIONS
+            else zipfile.ZIP_DEFLATED
+        )
+        info.external_attr = 0o644 << 16
+        return info
+
+
+# Global service instance
+archive_service = ArchiveService()
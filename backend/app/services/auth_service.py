@@ -8,9 +8,14 @@ and token generation.
 from typing import Optional
 
 from app.core.security import (
+    REFRESH_TOKEN_TYPE,
+    access_token_lifetime,
     create_access_token,
+    create_refresh_token,
     get_password_hash,
+    revoke_token,
     verify_password,
+    verify_token,
 )
 from app.models.auth import LoginRequest, LoginResponse, UserResponse
 
@@ -73,12 +78,58 @@ class AuthService:
         if not user:
             return None
 
-        # Create access token
+        return self._issue_tokens(user)
+
+    async def refresh(self, refresh_token: str) -> Optional[LoginResponse]:
+        """
+        Exchange a refresh token for new tokens, without the password.
+
+        The refresh token is revoked before new tokens are issued, and only
+        the request that revoked it gets them, so that each one is used only
+        once even by concurrent refreshes.
+
+        Args:
+            refresh_token: The refresh token of a previous login or refresh
+
+        Returns:
+            LoginResponse if the token is valid, None otherwise
+        """
+        payload = await verify_token(refresh_token, REFRESH_TOKEN_TYPE)
+        if payload is None:
+            return None
+
+        user = self.dummy_users.get(payload["sub"])
+        if not user or user["id"] != payload.get("user_id"):
+            return None
+
+        if not await revoke_token(payload):
+            return None
+        return self._issue_tokens(user)
+
+    async def logout(self, access_payload: dict, refresh_token: Optional[str]) -> None:
+        """
+        Revoke the tokens of a session.
+
+        Args:
+            access_payload: Payload of the access token of the request
+            refresh_token: Refresh token of the session, if any
+        """
+        await revoke_token(access_payload)
+        if refresh_token:
+            refresh_payload = await verify_token(refresh_token, REFRESH_TOKEN_TYPE)
+            if refresh_payload and refresh_payload["sub"] == access_payload["sub"]:
+                await revoke_token(refresh_payload)
+
+    def _issue_tokens(self, user: dict) -> LoginResponse:
+        """Create an access and a refresh token for a user."""
         access_token = create_access_token(user_id=user["id"], email=user["email"])
+        refresh_token = create_refresh_token(user_id=user["id"], email=user["email"])
 
         # Create response
         return LoginResponse(
             token=access_token,
+            refresh_token=refresh_token,
+            expires_in=int(access_token_lifetime().total_seconds()),
             user=UserResponse(id=user["id"], email=user["email"]),
         )
 
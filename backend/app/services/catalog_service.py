@@ -0,0 +1,1028 @@
+"""
+Service for serving the show catalog.
+
+Shows are loaded once (from `CATALOG_PATH` or a generated dummy dataset) and
+every show is serialized up front. Rows are precomputed as ordered lists of
+show positions, and row pages are assembled from the pre-serialized shows
+and cached together with their ETag and compressed variants.
+
+With `CATALOG_SNAPSHOT_PATH`, all of it (and the search index, recommendation
+features and home payload) is instead read from a binary snapshot that every
+worker maps read-only, so the catalog is in memory once per host rather than
+once per worker. A snapshot holds:
+
+- Fixed-width columns, one value per show: indexes into an interned string
+  table for the string fields, and NumPy arrays for the numbers
+- The pre-serialized JSON of every show, in a blob table
+- Show IDs by 64-bit hash, sorted, for lookups by ID
+- The positions of the shows of every row, the recommendation features, the
+  main segment of the search index and the compressed home payload
+
+A new snapshot renamed over the path is picked up without a restart. Shows
+added to a snapshot catalog are written to a new snapshot, under a lock shared
+by every worker, so all workers serve them once they pick it up.
+"""
+
+import asyncio
+import base64
+import binascii
+import bisect
+import hashlib
+import json
+import logging
+import os
+import random
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Sequence
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.events import dumps
+from app.core.http_cache import CachedPayload, brotli
+from app.core.snapshot import (
+    BlobTable,
+    Snapshot,
+    StringTable,
+    file_identity,
+    write_snapshot,
+)
+from app.models.catalog import Show
+from app.services.search_index import SearchIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DUMMY_GENRES = [
+    "Action",
+    "Comedy",
+    "Drama",
+    "Horror",
+    "Sci-Fi",
+    "Thriller",
+    "Romance",
+    "Documentary",
+]
+
+
+class RowDefinition(NamedTuple):
+    """How a row selects and orders shows from the catalog."""
+
+    id: str
+    title: str
+    # Only shows with this genre are included (all shows when None)
+    genre: Optional[str]
+    # Sort key, a tuple of numbers applied in descending order (dataset order
+    # when None)
+    sort_key: Optional[Callable[[Show], tuple]]
+
+
+# Row personalized per user by the recommendation service
+TOP_PICKS_ROW_ID = "row-2"
+
+ROW_DEFINITIONS: tuple[RowDefinition, ...] = (
+    RowDefinition("row-0", "Trending Now", None, lambda s: (s.year, s.rating)),
+    RowDefinition("row-1", "Popular on MyFlix", None, lambda s: (s.rating,)),
+    RowDefinition(TOP_PICKS_ROW_ID, "Top Picks for You", None, None),
+    RowDefinition("row-3", "Recently Added", None, lambda s: (s.year,)),
+    RowDefinition("row-4", "Action & Adventure", "Action", lambda s: (s.rating,)),
+    RowDefinition("row-5", "Comedies", "Comedy", lambda s: (s.rating,)),
+    RowDefinition("row-6", "Documentaries", "Documentary", lambda s: (s.rating,)),
+    RowDefinition("row-7", "Dramas", "Drama", lambda s: (s.rating,)),
+    RowDefinition("row-8", "Horror Movies", "Horror", lambda s: (s.rating,)),
+    RowDefinition("row-9", "Sci-Fi & Fantasy", "Sci-Fi", lambda s: (s.rating,)),
+)
+
+
+# Row positions freed at a time when replaced rows are released
+RELEASE_BLOCK = 16384
+
+# Show fields stored as indexes into the interned string table of snapshots
+STRING_COLUMNS = ("id", "title", "description", "image_url", "duration")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(offset: int) -> str:
+    """Encode a row offset as an opaque cursor."""
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode an opaque cursor back into a row offset.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if offset < 0:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def generate_dummy_shows(count: int, seed: int = 42) -> list[Show]:
+    """
+    Generate a deterministic dummy catalog, mirroring the frontend mock data.
+
+    Args:
+        count: Number of shows to generate
+        seed: Seed for the random generator
+
+    Returns:
+        list[Show]: Generated shows
+    """
+    rng = random.Random(seed)
+    featured_index = rng.randrange(count) if count else -1
+
+    shows = []
+    for i in range(1, count + 1):
+        shows.append(
+            Show(
+                id=f"show-{i}",
+                title=f"Show Title {i}",
+                description=(
+                    f"This is the description for show {i}. It's an amazing show "
+                    "with great storytelling and compelling characters."
+                ),
+                image_url=f"https://picsum.photos/1920/1080?random={i + 100}",
+                rating=round(rng.uniform(3, 5), 1),
+                year=2020 + rng.randrange(5),
+                genre=sorted({rng.choice(DUMMY_GENRES), rng.choice(DUMMY_GENRES)}),
+                duration=f"{rng.randrange(60) + 90} min",
+                is_featured=i - 1 == featured_index,
+            )
+        )
+    return shows
+
+
+def serialize_show(show: Show) -> bytes:
+    """Serialize a show to JSON."""
+    # orjson output keeps a much larger allocation than its length; a copy
+    # does not, which matters for bytes kept for every show
+    return bytes(memoryview(dumps(show.model_dump())))
+
+
+def show_features(shows: Sequence[Show]) -> tuple[np.ndarray, list[str]]:
+    """
+    Encode shows as dense feature vectors for recommendations.
+
+    Args:
+        shows: Shows to encode
+
+    Returns:
+        tuple[np.ndarray, list[str]]: One row per show (multi-hot genres, then
+        the normalized year and rating), and the lowercase genre of every
+        genre column
+    """
+    genres = sorted({genre.lower() for show in shows for genre in show.genre})
+    genre_columns = {genre: i for i, genre in enumerate(genres)}
+
+    features = np.zeros((len(shows), len(genres) + 2), dtype=np.float32)
+    rows = [i for i, show in enumerate(shows) for _ in show.genre]
+    columns = [genre_columns[g.lower()] for show in shows for g in show.genre]
+    features[rows, columns] = 1.0
+
+    years = np.fromiter((show.year for show in shows), np.float32, len(shows))
+    if len(shows):
+        year_range = max(float(years.max() - years.min()), 1.0)
+        features[:, -2] = (years - years.min()) / year_range
+    features[:, -1] = np.fromiter(
+        (show.rating / 5 for show in shows), np.float32, len(shows)
+    )
+    return features, genres
+
+
+def compute_rows(shows: Sequence[Show]) -> tuple[dict[str, list[int]], Optional[int]]:
+    """
+    Compute the show positions of every row, and the featured show.
+
+    Args:
+        shows: Shows of the catalog
+
+    Returns:
+        tuple[dict[str, list[int]], Optional[int]]: Positions of the shows of
+        every row in order, and the position of the featured show
+    """
+    rows = {}
+    for row in ROW_DEFINITIONS:
+        positions = [
+            i
+            for i, show in enumerate(shows)
+            if row.genre is None or row.genre in show.genre
+        ]
+        if row.sort_key is not None:
+            sort_key = row.sort_key
+            positions.sort(key=lambda i: sort_key(shows[i]), reverse=True)
+        rows[row.id] = positions
+
+    featured = next((i for i, show in enumerate(shows) if show.is_featured), None)
+    if featured is None and shows:
+        featured = max(range(len(shows)), key=lambda i: shows[i].rating)
+    return rows, featured
+
+
+def merge_rows(
+    shows: Sequence[Show],
+    rows: dict[str, Sequence[int]],
+    featured: Optional[int],
+    start: int,
+) -> tuple[dict[str, list[int]], Optional[int]]:
+    """
+    Merge shows appended to the catalog into its rows, without sorting again.
+
+    Every new show is inserted into the sorted rows with a binary search, so
+    the rows and featured show are the same as `compute_rows` gives for all
+    the shows, in O(new shows x log shows) key computations.
+
+    Args:
+        shows: Shows of the catalog, the new ones last
+        rows: Positions of the shows of every row, before the new shows
+        featured: Position of the featured show, before the new shows
+        start: Position of the first new show
+
+    Returns:
+        tuple[dict[str, list[int]], Optional[int]]: Positions of the shows of
+        every row in order, and the position of the featured show
+    """
+    new_positions = range(start, len(shows))
+    merged = {}
+    for row in ROW_DEFINITIONS:
+        positions = rows[row.id]
+        added = [
+            i for i in new_positions if row.genre is None or row.genre in shows[i].genre
+        ]
+        if row.sort_key is None:
+            merged[row.id] = [*positions, *added]
+            continue
+
+        # Rows are in descending order of their key, so they are searched by
+        # the negated key; shows of equal keys stay in catalog order
+        def negated_key(i: int, sort_key=row.sort_key) -> tuple:
+            return tuple(-value for value in sort_key(shows[i]))
+
+        added.sort(key=negated_key)
+        result = []
+        lo = 0
+        for i in added:
+            hi = bisect.bisect_right(positions, negated_key(i), lo, key=negated_key)
+            result.extend(positions[lo:hi])
+            result.append(i)
+            lo = hi
+        result.extend(positions[lo:])
+        merged[row.id] = result
+
+    # The featured show is the first one flagged, or else the first best rated
+    if featured is None or not shows[featured].is_featured:
+        flagged = next((i for i in new_positions if shows[i].is_featured), None)
+        best = max(new_positions, key=lambda i: shows[i].rating, default=None)
+        if flagged is not None:
+            featured = flagged
+        elif best is not None and (
+            featured is None or shows[best].rating > shows[featured].rating
+        ):
+            featured = best
+    return merged, featured
+
+
+def _release_rows(rows: dict[str, list[int]]) -> None:
+    """
+    Empty replaced rows a block at a time, in a worker thread.
+
+    Freeing a list of a million positions holds the GIL for tens of
+    milliseconds; freeing blocks lets the event loop run in between.
+    """
+    for positions in rows.values():
+        while positions:
+            del positions[-RELEASE_BLOCK:]
+
+
+def render_row_page(
+    show_bytes: Sequence[bytes],
+    row_id: str,
+    positions: Iterable[int],
+    next_cursor: Optional[str] = None,
+) -> bytes:
+    """
+    Assemble the JSON for a row page from pre-serialized shows.
+
+    Args:
+        show_bytes: Serialized shows by position
+        row_id: Row identifier
+        positions: Positions of the shows of the page, in order
+        next_cursor: Cursor for the next page, if there is one
+
+    Returns:
+        bytes: Serialized `ShowRowPage`
+    """
+    row = next(r for r in ROW_DEFINITIONS if r.id == row_id)
+    shows_json = b",".join(show_bytes[i] for i in positions)
+    header = dumps({"id": row.id, "title": row.title})[:-1]
+    return (
+        header
+        + b',"shows":['
+        + shows_json
+        + b'],"next_cursor":'
+        + dumps(next_cursor)
+        + b"}"
+    )
+
+
+def render_row_slice(
+    show_bytes: Sequence[bytes],
+    row_id: str,
+    positions: Sequence[int],
+    offset: int,
+    limit: int,
+) -> bytes:
+    """Assemble the JSON for a page of a precomputed row."""
+    end = offset + limit
+    next_cursor = encode_cursor(end) if end < len(positions) else None
+    return render_row_page(show_bytes, row_id, positions[offset:end], next_cursor)
+
+
+def render_home(
+    show_bytes: Sequence[bytes],
+    rows: dict[str, Sequence[int]],
+    featured: Optional[int],
+) -> bytes:
+    """Assemble the home page JSON from the first page of every row."""
+    featured_json = show_bytes[featured] if featured is not None else b"null"
+    rows_json = b",".join(
+        render_row_slice(
+            show_bytes, row.id, rows[row.id], 0, settings.CATALOG_FIRST_PAGE_SIZE
+        )
+        for row in ROW_DEFINITIONS
+    )
+    return b'{"featured":' + featured_json + b',"rows":[' + rows_json + b"]}"
+
+
+def _id_hash(show_id: str) -> int:
+    """Hash a show ID to 64 bits, the same way in every process."""
+    digest = hashlib.blake2b(show_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def write_catalog_snapshot(shows: Sequence[Show], path: str) -> int:
+    """
+    Write a catalog snapshot, atomically replacing any previous one.
+
+    Workers serving the path pick the new snapshot up within
+    `CATALOG_SNAPSHOT_RELOAD_SECONDS`.
+
+    Args:
+        shows: Shows of the catalog
+        path: Path of the snapshot
+
+    Returns:
+        int: Size of the snapshot in bytes
+    """
+    count = len(shows)
+    arrays: dict[str, np.ndarray] = {}
+
+    # The search index is built first, the largest transient structure
+    for name, array in SearchIndex(shows).to_arrays().items():
+        arrays[f"search.{name}"] = array
+
+    # Columns, with every distinct string stored once
+    strings: dict[str, int] = {}
+    for field in STRING_COLUMNS:
+        arrays[f"columns.{field}"] = np.fromiter(
+            (strings.setdefault(getattr(show, field), len(strings)) for show in shows),
+            np.uint32,
+            count,
+        )
+    arrays["strings.offsets"], arrays["strings.data"] = StringTable.pack(strings)
+    del strings
+    arrays["columns.rating"] = np.fromiter((s.rating for s in shows), np.float64, count)
+    arrays["columns.year"] = np.fromiter((s.year for s in shows), np.int32, count)
+    arrays["columns.is_featured"] = np.fromiter(
+        (s.is_featured for s in shows), np.bool_, count
+    )
+    genres: dict[str, int] = {}
+    genre_ids = [genres.setdefault(g, len(genres)) for s in shows for g in s.genre]
+    genre_offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(s.genre) for s in shows], out=genre_offsets[1:])
+    arrays["columns.genre_offsets"] = genre_offsets
+    arrays["columns.genre_ids"] = np.array(genre_ids, dtype=np.uint16)
+    arrays["genres.offsets"], arrays["genres.data"] = StringTable.pack(genres)
+
+    json_offsets, json_data = BlobTable.pack(serialize_show(show) for show in shows)
+    arrays["json.offsets"], arrays["json.data"] = json_offsets, json_data
+
+    hashes = np.fromiter((_id_hash(show.id) for show in shows), np.uint64, count)
+    order = np.argsort(hashes, kind="stable")
+    arrays["ids.hashes"] = hashes[order]
+    arrays["ids.positions"] = order.astype(np.int64)
+
+    rows, featured = compute_rows(shows)
+    for row_id, positions in rows.items():
+        arrays[f"rows.{row_id}"] = np.array(positions, dtype=np.int64)
+
+    arrays["features"], feature_genres = show_features(shows)
+
+    # The home payload is compressed once here rather than in every worker
+    home = render_home(BlobTable(json_offsets, json_data), rows, featured)
+    arrays["home.body"] = np.frombuffer(home, np.uint8)
+    if brotli is not None:
+        arrays["home.brotli"] = np.frombuffer(
+            brotli.compress(home, quality=11), np.uint8
+        )
+
+    metadata = {
+        "shows": count,
+        "featured": featured,
+        "feature_genres": feature_genres,
+        "first_page_size": settings.CATALOG_FIRST_PAGE_SIZE,
+    }
+    size = write_snapshot(path, arrays, metadata)
+    logger.info(f"Wrote catalog snapshot of {count} shows to {path} ({size} bytes)")
+    return size
+
+
+class _SnapshotShows(Sequence[Show]):
+    """Shows of a snapshot, built from its columns when accessed."""
+
+    def __init__(self, snapshot: Snapshot):
+        """
+        Wrap the columns of a snapshot.
+
+        Args:
+            snapshot: Catalog snapshot
+        """
+        self._strings = StringTable(
+            snapshot["strings.offsets"], snapshot["strings.data"]
+        )
+        self._columns = {
+            field: memoryview(snapshot[f"columns.{field}"]) for field in STRING_COLUMNS
+        }
+        self._ratings = snapshot["columns.rating"]
+        self._years = snapshot["columns.year"]
+        self._featured = snapshot["columns.is_featured"]
+        self._genre_offsets = memoryview(snapshot["columns.genre_offsets"])
+        self._genre_ids = snapshot["columns.genre_ids"]
+        self._genres = list(
+            StringTable(snapshot["genres.offsets"], snapshot["genres.data"])
+        )
+
+    def __len__(self) -> int:
+        """Get the number of shows."""
+        return len(self._ratings)
+
+    def __getitem__(self, i: int) -> Show:
+        """Get a show by position."""
+        if not -len(self) <= i < len(self):
+            raise IndexError("show position out of range")
+        i %= len(self)
+        genre_ids = self._genre_ids[self._genre_offsets[i] : self._genre_offsets[i + 1]]
+        # Columns were validated when the snapshot was written
+        return Show.model_construct(
+            **{
+                field: self._strings[column[i]]
+                for field, column in self._columns.items()
+            },
+            rating=float(self._ratings[i]),
+            year=int(self._years[i]),
+            genre=[self._genres[g] for g in genre_ids.tolist()],
+            is_featured=bool(self._featured[i]),
+        )
+
+    def __iter__(self) -> Iterator[Show]:
+        """Iterate over the shows."""
+        for i in range(len(self)):
+            yield self[i]
+
+    def show_id(self, i: int) -> str:
+        """Get the ID of a show by position."""
+        return self._strings[self._columns["id"][i]]
+
+
+class _SnapshotPositions:
+    """Positions of the shows of a snapshot by ID, from their sorted hashes."""
+
+    def __init__(self, snapshot: Snapshot, shows: _SnapshotShows):
+        """
+        Wrap the ID index of a snapshot.
+
+        Args:
+            snapshot: Catalog snapshot
+            shows: Shows of the snapshot
+        """
+        self._hashes = snapshot["ids.hashes"]
+        self._positions = memoryview(snapshot["ids.positions"])
+        self._shows = shows
+
+    def get(self, show_id: str) -> Optional[int]:
+        """Get the position of a show by ID, or None."""
+        value = np.uint64(_id_hash(show_id))
+        i = int(np.searchsorted(self._hashes, value))
+        found = None
+        # Hashes may collide: the ID of every candidate is compared, and the
+        # last show with an ID wins like with a dict
+        while i < len(self._hashes) and self._hashes[i] == value:
+            position = self._positions[i]
+            if self._shows.show_id(position) == show_id:
+                found = position
+            i += 1
+        return found
+
+
+def _taken_ids(shows: Sequence[Show], positions) -> list[str]:
+    """Get the IDs of shows that are repeated or already have a position."""
+    counts = Counter(show.id for show in shows)
+    return [
+        show_id
+        for show_id, count in counts.items()
+        if count > 1 or positions.get(show_id) is not None
+    ]
+
+
+@contextmanager
+def _snapshot_write_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a snapshot path, shared by every process.
+
+    Only writers take the lock: readers map whichever snapshot is at the path.
+    Without `fcntl` (on Windows), nothing is locked.
+
+    Args:
+        path: Path of the snapshot
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def add_to_catalog_snapshot(shows: Sequence[Show], path: str) -> int:
+    """
+    Add shows to a catalog snapshot, writing a new one over it.
+
+    The snapshot at the path is read under the write lock, so additions made
+    at the same time by several workers are all kept.
+
+    Args:
+        shows: Shows to add
+        path: Path of the snapshot
+
+    Returns:
+        int: Number of shows in the new snapshot
+
+    Raises:
+        ValueError: If a show ID is already in the snapshot or repeated
+    """
+    with _snapshot_write_lock(path):
+        snapshot = Snapshot(path)
+        current = _SnapshotShows(snapshot)
+        taken = _taken_ids(shows, _SnapshotPositions(snapshot, current))
+        if taken:
+            raise ValueError(
+                f"Shows already in the catalog or repeated: {', '.join(taken)}"
+            )
+        write_catalog_snapshot([*current, *shows], path)
+        return len(current) + len(shows)
+
+
+class CatalogService:
+    """Service for serving show rows and shows from a loaded dataset."""
+
+    _shows: Sequence[Show]
+    _show_positions: "dict[str, int] | _SnapshotPositions"
+    _show_bytes: Sequence[bytes]
+    _rows: dict[str, Sequence[int]]
+    _featured: Optional[int]
+    _features: Optional[tuple[np.ndarray, list[str]]]
+    _home_payload: CachedPayload
+    _payload_cache: "OrderedDict[tuple[str, ...], CachedPayload]"
+    _search_index: SearchIndex
+    # Snapshot the catalog is served from, if any
+    _snapshot: Optional[Snapshot]
+    _watch_task: Optional[asyncio.Task]
+    # Incremented whenever the shows change, so dependents can rebuild
+    version: int
+
+    def __init__(self, shows: Optional[list[Show]] = None):
+        """
+        Initialize the catalog service.
+
+        Args:
+            shows: Shows to serve. Loaded from settings when not provided.
+        """
+        self.version = 0
+        self._snapshot = None
+        self._watch_task = None
+        # Serializes additions, which await the home payload
+        self._add_lock = asyncio.Lock()
+        if shows is not None:
+            self.load(shows)
+        elif settings.CATALOG_SNAPSHOT_PATH:
+            path = settings.CATALOG_SNAPSHOT_PATH
+            if not os.path.exists(path):
+                write_catalog_snapshot(self._load_dataset(), path)
+            self.load_snapshot(path)
+        else:
+            self.load(self._load_dataset())
+
+    @staticmethod
+    def _load_dataset() -> list[Show]:
+        """Load the configured dataset, or generate a dummy one."""
+        if settings.CATALOG_PATH:
+            logger.info(f"Loading show catalog from {settings.CATALOG_PATH}")
+            with open(settings.CATALOG_PATH, "rb") as f:
+                return TypeAdapter(list[Show]).validate_python(json.load(f))
+
+        return generate_dummy_shows(settings.CATALOG_SIZE)
+
+    def load(self, shows: list[Show]) -> None:
+        """
+        Replace the catalog, recomputing rows, pre-serialized payloads and
+        the search index.
+
+        Args:
+            shows: Shows to serve
+        """
+        shows = list(shows)
+        show_bytes = [serialize_show(show) for show in shows]
+        show_positions = {show.id: i for i, show in enumerate(shows)}
+        search_index = SearchIndex(shows)
+
+        # Nothing below awaits, so requests never observe a partial catalog
+        self._shows = shows
+        self._show_positions = show_positions
+        self._show_bytes = show_bytes
+        self._search_index = search_index
+        self._snapshot = None
+        self._build_rows()
+
+        logger.info(f"Loaded show catalog with {len(shows)} shows")
+
+    def load_snapshot(self, path: str) -> None:
+        """
+        Replace the catalog with the one of a snapshot file, mapped read-only.
+
+        Nothing is copied or rebuilt, so loading takes milliseconds; pages of
+        the file are read as requests need them.
+
+        Args:
+            path: Path of the snapshot
+
+        Raises:
+            SnapshotFormatError: If the file is not a valid snapshot
+        """
+        snapshot = Snapshot(path)
+        shows = _SnapshotShows(snapshot)
+        show_bytes = BlobTable(snapshot["json.offsets"], snapshot["json.data"])
+        rows = {row.id: snapshot[f"rows.{row.id}"] for row in ROW_DEFINITIONS}
+        featured = snapshot.metadata["featured"]
+        search_index = SearchIndex(shows, snapshot.prefixed("search."))
+
+        home = None
+        if snapshot.metadata["first_page_size"] == settings.CATALOG_FIRST_PAGE_SIZE:
+            home = CachedPayload(
+                snapshot["home.body"].tobytes(),
+                brotli_body=(
+                    snapshot["home.brotli"].tobytes()
+                    if "home.brotli" in snapshot
+                    else None
+                ),
+            )
+
+        # Nothing below awaits, so requests never observe a partial catalog
+        self._shows = shows
+        self._show_positions = _SnapshotPositions(snapshot, shows)
+        self._show_bytes = show_bytes
+        self._search_index = search_index
+        self._snapshot = snapshot
+        self._install_rows(rows, featured, home)
+        self._features = (snapshot["features"], snapshot.metadata["feature_genres"])
+
+        logger.info(
+            f"Loaded show catalog snapshot {path} with {len(shows)} shows "
+            f"({snapshot.nbytes} bytes mapped)"
+        )
+
+    def reload_snapshot(self) -> bool:
+        """
+        Load the snapshot file again if it was replaced since it was loaded.
+
+        Returns:
+            bool: Whether a new snapshot was loaded
+        """
+        snapshot = self._snapshot
+        if snapshot is None or file_identity(snapshot.path) in (
+            None,
+            snapshot.identity,
+        ):
+            return False
+        self.load_snapshot(snapshot.path)
+        return True
+
+    def start(self) -> None:
+        """Start watching the snapshot file for hot reloads, if one is served."""
+        if (
+            self._snapshot is None
+            or settings.CATALOG_SNAPSHOT_RELOAD_SECONDS <= 0
+            or self._watch_task is not None
+        ):
+            return
+        self._watch_task = asyncio.create_task(self._watch_snapshot())
+
+    async def stop(self) -> None:
+        """Stop watching the snapshot file."""
+        if self._watch_task is None:
+            return
+        self._watch_task.cancel()
+        try:
+            await self._watch_task
+        except asyncio.CancelledError:
+            pass
+        self._watch_task = None
+
+    async def _watch_snapshot(self) -> None:
+        """Reload the snapshot whenever a new one is renamed over its path."""
+        while True:
+            await asyncio.sleep(settings.CATALOG_SNAPSHOT_RELOAD_SECONDS)
+            try:
+                self.reload_snapshot()
+            except Exception as e:
+                # Keep serving the current snapshot
+                logger.error(f"Error reloading the catalog snapshot: {e}")
+
+    def write_snapshot(self, path: str) -> int:
+        """
+        Write the catalog to a snapshot file.
+
+        Args:
+            path: Path of the snapshot
+
+        Returns:
+            int: Size of the snapshot in bytes
+        """
+        return write_catalog_snapshot(self._shows, path)
+
+    async def add_shows(self, shows: list[Show]) -> None:
+        """
+        Add shows to the catalog.
+
+        A catalog served from a snapshot is written to a new snapshot in a
+        worker thread, and loaded at once; the other workers load it within
+        `CATALOG_SNAPSHOT_RELOAD_SECONDS`. An in-memory catalog is only the
+        worker's own, so shows are only added to it with a single worker:
+        new shows are merged into the sorted rows and the search index, the
+        home payload is compressed in a worker thread, and the new rows and
+        payloads are then served at once.
+
+        Args:
+            shows: Shows to add
+
+        Raises:
+            RuntimeError: If the catalog is in memory and served by several
+                workers
+            ValueError: If a show ID is already in the catalog or repeated
+        """
+        if self._snapshot is not None:
+            path = self._snapshot.path
+            async with self._add_lock:
+                total = await asyncio.to_thread(add_to_catalog_snapshot, shows, path)
+                self.load_snapshot(path)
+            logger.info(f"Added {len(shows)} shows to the catalog snapshot ({total})")
+            return
+
+        if settings.SERVER_WORKERS > 1:
+            raise RuntimeError(
+                "Shows can only be added to an in-memory catalog with a single "
+                "worker; serve a snapshot (CATALOG_SNAPSHOT_PATH) to add shows "
+                "with several"
+            )
+
+        async with self._add_lock:
+            taken = _taken_ids(shows, self._show_positions)
+            if taken:
+                raise ValueError(
+                    f"Shows already in the catalog or repeated: {', '.join(taken)}"
+                )
+
+            # Shows appended to the lists are not reachable from any row,
+            # show ID or search result until the rows are installed
+            start = len(self._shows)
+            self._shows.extend(shows)
+            self._show_bytes.extend(serialize_show(show) for show in shows)
+            try:
+                rows, featured, home = await asyncio.to_thread(self._merge_rows, start)
+            except BaseException:
+                # Positions must keep following those of the search index
+                del self._shows[start:]
+                del self._show_bytes[start:]
+                raise
+
+            previous_rows = self._rows
+            for show in shows:
+                self._show_positions[show.id] = self._search_index.add(show)
+            self._install_rows(rows, featured, home)
+            self._features = None
+            await asyncio.to_thread(_release_rows, previous_rows)
+
+        logger.info(f"Added {len(shows)} shows to the catalog")
+
+    def _merge_rows(
+        self, start: int
+    ) -> tuple[dict[str, list[int]], Optional[int], CachedPayload]:
+        """Merge the shows from a position into the rows, and build the home."""
+        rows, featured = merge_rows(self._shows, self._rows, self._featured, start)
+        return rows, featured, self._build_home_payload(rows, featured)
+
+    def _build_rows(self) -> None:
+        """Recompute rows, the featured show and the cached payloads."""
+        rows, featured = compute_rows(self._shows)
+        self._install_rows(rows, featured)
+        self._features = None
+
+    def _install_rows(
+        self,
+        rows: dict[str, Sequence[int]],
+        featured: Optional[int],
+        home: Optional[CachedPayload] = None,
+    ) -> None:
+        """Replace the rows and the featured show, and reset cached payloads."""
+        self._rows = rows
+        self._featured = featured
+        self._payload_cache = OrderedDict()
+        self._home_payload = home or self._build_home_payload(rows, featured)
+        self.version += 1
+
+    @property
+    def shows(self) -> Sequence[Show]:
+        """Shows of the catalog, identified by their position in the list."""
+        return self._shows
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        """Snapshot the catalog is served from, if any."""
+        return self._snapshot
+
+    def get_features(self) -> tuple[np.ndarray, list[str]]:
+        """
+        Get the recommendation features of the shows (see `show_features`).
+
+        Returns:
+            tuple[np.ndarray, list[str]]: One row per show, and the genre of
+            every genre column
+        """
+        if self._features is None:
+            self._features = show_features(self._shows)
+        return self._features
+
+    def get_show_position(self, show_id: str) -> Optional[int]:
+        """Get the position of a show in the catalog by ID."""
+        return self._show_positions.get(show_id)
+
+    def get_home(self) -> CachedPayload:
+        """Get the home page payload (featured show and first page of each row)."""
+        return self._home_payload
+
+    def get_row_page(self, row_id: str, offset: int) -> Optional[CachedPayload]:
+        """
+        Get a page of a row.
+
+        Args:
+            row_id: Row identifier
+            offset: Position of the first show of the page in the row
+
+        Returns:
+            The page payload, or None if the row does not exist
+
+        Raises:
+            InvalidCursorError: If the offset is not the start of a page
+        """
+        if row_id not in self._rows:
+            return None
+
+        # The first page is smaller to keep the home payload light
+        first_page_size = settings.CATALOG_FIRST_PAGE_SIZE
+        if offset == 0:
+            limit = first_page_size
+        elif offset >= first_page_size and not (
+            (offset - first_page_size) % settings.CATALOG_PAGE_SIZE
+        ):
+            limit = settings.CATALOG_PAGE_SIZE
+        else:
+            raise InvalidCursorError(f"Offset {offset} is not the start of a page")
+
+        return self._cached(
+            ("row", row_id, str(offset)),
+            lambda: self._row_page_bytes(row_id, offset, limit),
+        )
+
+    def get_show(self, show_id: str) -> Optional[CachedPayload]:
+        """Get a single show by ID."""
+        position = self._show_positions.get(show_id)
+        if position is None:
+            return None
+        return self._cached(("show", show_id), lambda: self._show_bytes[position])
+
+    def search(
+        self,
+        query: str,
+        genre: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> bytes:
+        """
+        Search shows by title, description and genre.
+
+        Args:
+            query: Free text query; the last word also matches as a prefix
+            genre: Only include shows of this genre
+            year_from: Only include shows released this year or later
+            year_to: Only include shows released this year or earlier
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            bytes: Serialized `SearchResponse`
+        """
+        total, positions = self._search_index.search(
+            query, genre, year_from, year_to, limit, offset
+        )
+        shows_json = b",".join(self._show_bytes[i] for i in positions)
+        return (
+            dumps({"query": query, "total": total})[:-1]
+            + b',"shows":['
+            + shows_json
+            + b"]}"
+        )
+
+    def _cached(
+        self, key: tuple[str, ...], build: Callable[[], bytes]
+    ) -> CachedPayload:
+        """Get a payload from the LRU cache, building it on a miss."""
+        payload_cache = self._payload_cache
+        payload = payload_cache.get(key)
+        if payload is not None:
+            payload_cache.move_to_end(key)
+            return payload
+
+        payload = payload_cache[key] = CachedPayload(build())
+        if len(payload_cache) > settings.CATALOG_PAYLOAD_CACHE_SIZE:
+            payload_cache.popitem(last=False)
+        return payload
+
+    def render_row_page(
+        self,
+        row_id: str,
+        positions: Iterable[int],
+        next_cursor: Optional[str] = None,
+    ) -> bytes:
+        """
+        Assemble the JSON for a row page from pre-serialized shows.
+
+        Args:
+            row_id: Row identifier
+            positions: Positions of the shows of the page, in order
+            next_cursor: Cursor for the next page, if there is one
+
+        Returns:
+            bytes: Serialized `ShowRowPage`
+        """
+        return render_row_page(self._show_bytes, row_id, positions, next_cursor)
+
+    def render_shows(self, positions: Iterable[int]) -> bytes:
+        """Assemble a JSON list of shows from pre-serialized shows."""
+        return b"[" + b",".join(self._show_bytes[i] for i in positions) + b"]"
+
+    def _row_page_bytes(self, row_id: str, offset: int, limit: int) -> bytes:
+        """Assemble the JSON for a page of a precomputed row."""
+        return render_row_slice(
+            self._show_bytes, row_id, self._rows[row_id], offset, limit
+        )
+
+    def _build_home_payload(
+        self, rows: dict[str, Sequence[int]], featured: Optional[int]
+    ) -> CachedPayload:
+        """Assemble the home page payload from the first page of every row."""
+        body = render_home(self._show_bytes, rows, featured)
+        # Built once per catalog load, so spend the time to compress it best
+        return CachedPayload(body, brotli_quality=11)
+
+
+# Global catalog service instance
+catalog_service = CatalogService()
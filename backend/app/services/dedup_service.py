@@ -0,0 +1,235 @@
+"""
+Service flagging generated images that are near duplicates of earlier ones.
+
+Every successfully generated image is downloaded in the background, hashed
+with a perceptual hash (dHash) in a worker pool, and looked up in an index of
+the hashes of recent images. An image within `DEDUP_MAX_DISTANCE` bits of an
+earlier one is flagged in its job's results with the URL of the original, so
+that only one copy needs to be stored or cached. Generation is never delayed:
+flags show up in job results once the image is hashed, and the job is told
+through a callback so that it can notify its subscribers.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.services.image_hash import HashIndex, Image, image_dhash
+from app.services.job_state import JobState
+
+logger = logging.getLogger(__name__)
+
+# Called with the job and index of an image once it is flagged as a duplicate
+DuplicateCallback = Callable[[JobState, int], Awaitable[None]]
+
+
+class DedupService:
+    """Hashes generated images and flags the near duplicates."""
+
+    enabled: bool
+    workers: int
+    max_images: int
+    ttl: float
+    fetch_timeout: float
+    _index: HashIndex
+    _urls: list[str]
+    _added_at: array
+    _executor: Optional[ThreadPoolExecutor]
+    _client: Optional[httpx.AsyncClient]
+    _transport: Optional[httpx.AsyncBaseTransport]
+
+    def __init__(
+        self,
+        workers: int = settings.DEDUP_WORKERS,
+        max_distance: int = settings.DEDUP_MAX_DISTANCE,
+        max_images: int = settings.DEDUP_MAX_IMAGES,
+        ttl_seconds: float = settings.DEDUP_TTL_SECONDS,
+        fetch_timeout: float = settings.DEDUP_FETCH_TIMEOUT_SECONDS,
+    ):
+        """
+        Initialize the deduplication service.
+
+        Args:
+            workers: Number of threads hashing images
+            max_distance: Largest Hamming distance between near duplicates
+            max_images: Number of image hashes kept, oldest dropped first
+            ttl_seconds: Age after which an image is not the original of
+                duplicates anymore
+            fetch_timeout: Timeout of every image download in seconds
+        """
+        self.enabled = settings.DEDUP_ENABLED
+        self.workers = workers
+        self.max_images = max_images
+        self.ttl = ttl_seconds
+        self.fetch_timeout = fetch_timeout
+
+        # Hash, URL and monotonic time of every indexed image, oldest first;
+        # worker threads share them under the lock
+        self._index = HashIndex(max_distance)
+        self._urls = []
+        self._added_at = array("d")
+        self._lock = threading.Lock()
+
+        self._executor = None
+        self._client = None
+        # Transport of the download client (the network when None)
+        self._transport = None
+        self._tasks: set[asyncio.Task] = set()
+        # Downloads in flight, so that images wait for a worker undownloaded
+        self._downloads = asyncio.Semaphore(2 * workers)
+
+        self.hashed = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the worker pool and the download client, if enabled."""
+        if not self.enabled or self._executor is not None:
+            return
+        if Image is None:
+            logger.warning("Image deduplication disabled: Pillow is not installed")
+            self.enabled = False
+            return
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="dedup"
+        )
+        loop_monitor.watch_executor("dedup", self._executor)
+        self._client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=self.fetch_timeout,
+            follow_redirects=True,
+        )
+
+    async def stop(self) -> None:
+        """Cancel the pending checks and stop the worker pool."""
+        if self._executor is None:
+            return
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._client.aclose()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._client = None
+
+    def submit(
+        self,
+        job: JobState,
+        index: int,
+        url: str,
+        on_duplicate: Optional[DuplicateCallback] = None,
+    ) -> None:
+        """
+        Check a generated image for near duplicates in the background.
+
+        Args:
+            job: Job the image belongs to
+            index: Image index
+            url: URL of the generated image
+            on_duplicate: Awaited once the image is flagged as a duplicate
+        """
+        if self._executor is None:
+            return
+        task = asyncio.create_task(self._check(job, index, url, on_duplicate))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _check(
+        self,
+        job: JobState,
+        index: int,
+        url: str,
+        on_duplicate: Optional[DuplicateCallback],
+    ) -> None:
+        """Download and hash an image, and flag it if it is a near duplicate."""
+        try:
+            async with self._downloads:
+                response = await self._client.get(url)
+                response.raise_for_status()
+            original = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._hash_and_index, response.content, url
+            )
+        except Exception as e:
+            self.failed += 1
+            logger.warning(
+                f"Job {job.job_id}: Image {index} not checked for duplicates - {e}"
+            )
+            return
+
+        self.hashed += 1
+        if original is not None:
+            original_url, distance = original
+            job.mark_duplicate(index, original_url)
+            self.duplicates += 1
+            logger.info(
+                f"Job {job.job_id}: Image {index} is a near duplicate of "
+                f"{original_url} ({distance} bits apart)"
+            )
+            if on_duplicate is not None:
+                await on_duplicate(job, index)
+
+    def _hash_and_index(self, data: bytes, url: str) -> Optional[tuple[str, int]]:
+        """
+        Hash an image and index it, in a worker thread.
+
+        Args:
+            data: Encoded image
+            url: URL of the image
+
+        Returns:
+            Optional[tuple[str, int]]: URL of the closest recent image within
+            the maximum distance, and its distance, or None
+        """
+        value = image_dhash(data)
+        with self._lock:
+            now = time.monotonic()
+            first_row = bisect_left(self._added_at, now - self.ttl)
+            match = self._index.nearest(value, first_row)
+            original = (self._urls[match[0]], match[1]) if match else None
+
+            # Expired rows are dropped once they are half the index, and the
+            # oldest quarter when it is full
+            size = len(self._index)
+            if size >= self.max_images:
+                self._drop_before(max(first_row, size // 4))
+            elif first_row > size // 2:
+                self._drop_before(first_row)
+
+            self._index.add(np.array([value], dtype=np.uint64))
+            self._urls.append(url)
+            self._added_at.append(now)
+        return original
+
+    def _drop_before(self, row: int) -> None:
+        """Remove the images indexed before a row."""
+        self._index.drop_before(row)
+        del self._urls[:row]
+        del self._added_at[:row]
+
+    def stats(self) -> dict:
+        """Get the counters and size of the index."""
+        return {
+            "enabled": self.enabled,
+            "hashed": self.hashed,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "pending": len(self._tasks),
+            "indexed": len(self._index),
+            "index_mb": round(self._index.nbytes / 1e6, 1),
+        }
+
+
+# Global service instance
+dedup_service = DedupService()
@@ -4,32 +4,102 @@ Service for managing image generation jobs and Replicate API integration.
 
 import asyncio
 import logging
+import math
+import threading
+import time
 import uuid
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import AsyncGenerator, Dict, List, Optional
+from typing import AsyncGenerator, Callable, Dict, List, Optional
 
+import httpx
 import replicate
+from replicate.exceptions import ModelError
 
 from app.core.config import settings
+from app.core.events import (
+    KEEPALIVE_FRAME,
+    EventQueue,
+    dumps,
+    encode_event,
+    is_terminal_frame,
+)
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import tracer
 from app.models.generation import (
+    BatchDoneEventData,
+    BatchGenerationRequest,
     DoneEventData,
+    DuplicateEventData,
     ErrorEventData,
+    GenerationBatch,
     GenerationJob,
     GenerationRequest,
-    GenerationResult,
     GenerationStatus,
-    ProgressEventData,
+    PreviewEventData,
+)
+from app.services.dedup_service import dedup_service
+from app.services.heavy_hitters import SpaceSaving
+from app.services.job_state import (
+    COMPLETED,
+    FAILED,
+    PENDING,
+    RUNNING,
+    STATUS_VALUES,
+    SUCCEEDED,
+    JobState,
 )
+from app.services.model_pool import ModelPool, ModelRouter
+from app.services.prompt_cache import CacheHit, prompt_cache
 
 logger = logging.getLogger(__name__)
 
+# Prefix of the error of images failed for missing their job's deadline
+DEADLINE_EXCEEDED_ERROR = "Deadline exceeded"
+
+# Error sent to streams still open when the service shuts down
+SHUTDOWN_ERROR = "Server is shutting down"
+
+# Statuses of a Replicate prediction that has stopped running
+PREDICTION_DONE_STATUSES = ("succeeded", "failed", "canceled")
+
+# Statuses of images that are done, whatever the outcome
+FINISHED_IMAGE_STATUSES = (SUCCEEDED, FAILED)
+FINISHED_STATUS_VALUES = tuple(STATUS_VALUES[s] for s in FINISHED_IMAGE_STATUSES)
+
+# Job-level events are re-published on the batch stream under these names
+BATCH_EVENT_TYPES = {
+    "progress": "progress",
+    "duplicate": "duplicate",
+    "done": "job_done",
+    "error": "job_error",
+}
+
+
+class GenerationCapacityError(Exception):
+    """Raised when a job or batch cannot be admitted to the scheduler."""
+
 
 class GenerationService:
     """Service for handling image generation jobs with Replicate."""
 
-    _jobs: Dict[str, GenerationJob]
-    _job_streams: Dict[str, List[asyncio.Queue]]
+    _jobs: Dict[str, JobState]
+    _job_streams: Dict[str, List[EventQueue]]
+    _pending_frames: Dict[str, List[bytes]]
+    _batches: Dict[str, GenerationBatch]
+    _batch_streams: Dict[str, List[asyncio.Queue]]
+    _job_batches: Dict[str, str]
+    _retired: deque
+    _queued_images: int
+    _draining: bool
+    _models: ModelRouter
+    _popular_prompts: SpaceSaving
+    _prefill_task: Optional[asyncio.Task]
+    _prefills: Dict[tuple[str, str], asyncio.Task]
+    _prefill_running: Dict[str, int]
+    _prefill_yield: Dict[str, threading.Event]
+    _prefill_starts: deque
     _client: replicate.Client
     _executor: ThreadPoolExecutor
 
@@ -39,13 +109,80 @@ class GenerationService:
         self._jobs = {}
         self._job_streams = {}
 
-        # Configure Replicate client
-        self._client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
-
-        # Thread pool for concurrent Replicate calls
-        self._executor = ThreadPoolExecutor(max_workers=10)
+        # Frames of job streams not yet put in the queues of their subscribers,
+        # flushed as one chunk at the end of the batching window
+        self._batch_frames = settings.SSE_BATCHING_ENABLED
+        self._batch_window = settings.SSE_BATCH_WINDOW_MS / 1000
+        self._pending_frames = {}
+
+        # Batches group jobs and own an aggregated stream of their events
+        self._batches = {}
+        self._batch_streams = {}
+        self._job_batches = {}
+
+        # Finished standalone jobs and batches, oldest first, as (time they
+        # are forgotten, "job" or "batch", ID); the jobs of a batch go with it
+        self._retired = deque()
+
+        # Images admitted to the scheduler that have not finished yet
+        self._queued_images = 0
+
+        # Set on shutdown, when no more jobs are admitted
+        self._draining = False
+
+        # Jobs can be served from the images of similar cached prompts
+        self._cache_enabled = settings.PROMPT_CACHE_ENABLED
+
+        # Popular prompts are generated into the cache ahead of requests, while
+        # their models are idle enough
+        self._prefill_enabled = settings.PREFILL_ENABLED and self._cache_enabled
+        self._popular_prompts = SpaceSaving(settings.PREFILL_SKETCH_SIZE)
+        self._prefill_task = None
+        # Prompts being prefilled, and prefill predictions running per model
+        self._prefills = {}
+        self._prefill_running = {}
+        # Set when real calls of a model need the slots of its prefills
+        self._prefill_yield = {}
+        # Start times of the prefill predictions of the last hour
+        self._prefill_starts = deque()
+        self._prefill_counts = dict.fromkeys(
+            ("predictions", "cancelled", "failed", "images", "hits", "saved_jobs"), 0
+        )
+        self._prefill_saved_ms = 0.0
+
+        # Polling of the predictions of models that stream previews
+        self._preview_poll_interval = settings.IMAGE_GEN_PREVIEW_POLL_MS / 1000
+        self._preview_min_interval = settings.IMAGE_GEN_PREVIEW_MIN_INTERVAL_MS / 1000
+
+        # Every allowed model has its own concurrency pool
+        self._models = ModelRouter()
+
+        # Configure Replicate client, keeping a pooled connection per executor
+        # thread open between calls (httpx closes them after 5 s by default)
+        self._client = replicate.Client(
+            api_token=settings.REPLICATE_API_TOKEN,
+            transport=httpx.HTTPTransport(
+                limits=httpx.Limits(
+                    max_keepalive_connections=self._models.total_concurrency,
+                    keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+                )
+            ),
+        )
+        # Time of the last Replicate call, to keep connections alive when idle
+        self._last_upstream_call = time.monotonic()
+
+        # Thread pool for concurrent Replicate calls, sized so that every
+        # model can use its whole concurrency limit at the same time
+        self._executor = ThreadPoolExecutor(max_workers=self._models.total_concurrency)
+        loop_monitor.watch_executor("generation", self._executor)
+        # Single thread for the prompt cache, whose lookups score every cached
+        # prompt: they stay off the event loop and never run concurrently
+        self._cache_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prompt-cache"
+        )
+        loop_monitor.watch_executor("prompt_cache", self._cache_executor)
 
-    def create_job(self, request: GenerationRequest) -> str:
+    async def create_job(self, request: GenerationRequest) -> str:
         """
         Create a new generation job and return job ID.
 
@@ -54,29 +191,34 @@ class GenerationService:
 
         Returns:
             str: Unique job ID
-        """
-        job_id = f"job_{uuid.uuid4().hex[:12]}"
 
-        # Initialize job in the pending state
-        results = [
-            GenerationResult(index=i, status=GenerationStatus.PENDING)
-            for i in range(request.num_images)
-        ]
+        Raises:
+            UnknownModelError: If the requested model or tier is not allowed
+            GenerationCapacityError: If the scheduler cannot admit the job
+        """
+        start_ns = time.perf_counter_ns()
+        self._evict_retired()
+        model = self._models.resolve(request.model, request.tier)
+        cache_hit = (await self._lookup_cache([request], [model]))[0]
+        # Jobs served from the cache do not take scheduler capacity
+        self._admit(request.num_images if cache_hit is None else 0)
+        job = self._register_job(request, model)
+        job.cache_hit = cache_hit
+        job_id = job.job_id
+
+        if job.trace is not None:
+            job.trace.add(
+                "job.create",
+                start_ns,
+                time.perf_counter_ns(),
+                {"model": model, "num_images": request.num_images},
+            )
 
-        job = GenerationJob(
-            job_id=job_id,
-            prompt=request.prompt,
-            num_images=request.num_images,
-            status=GenerationStatus.PENDING,
-            results=results,
-            created_at=datetime.now(timezone.utc),
+        logger.info(
+            f"Created generation job {job_id} for {request.num_images} images "
+            f"with model {model}"
         )
 
-        self._jobs[job_id] = job
-        self._job_streams[job_id] = []
-
-        logger.info(f"Created generation job {job_id} for {request.num_images} images")
-
         # Start processing asynchronously
         try:
             asyncio.create_task(self._process_job(job_id))
@@ -90,11 +232,262 @@ class GenerationService:
 
         return job_id
 
+    async def create_batch(self, request: BatchGenerationRequest) -> GenerationBatch:
+        """
+        Create a batch of generation jobs that are admitted and processed together.
+
+        Args:
+            request: Batch request with one generation request per item
+
+        Returns:
+            GenerationBatch: The created batch with one job ID per item
+
+        Raises:
+            UnknownModelError: If a requested model or tier is not allowed
+            GenerationCapacityError: If the scheduler cannot admit the batch
+        """
+        start_ns = time.perf_counter_ns()
+        self._evict_retired()
+        models = [self._models.resolve(item.model, item.tier) for item in request.items]
+        total_images = sum(item.num_images for item in request.items)
+        cache_hits = await self._lookup_cache(request.items, models)
+
+        # The whole batch is admitted (or rejected) as a single unit
+        self._admit(
+            sum(
+                item.num_images
+                for item, cache_hit in zip(request.items, cache_hits)
+                if cache_hit is None
+            )
+        )
+
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        jobs = [
+            self._register_job(item, model, batch_id)
+            for item, model in zip(request.items, models)
+        ]
+        for job, cache_hit in zip(jobs, cache_hits):
+            job.cache_hit = cache_hit
+        job_ids = [job.job_id for job in jobs]
+
+        end_ns = time.perf_counter_ns()
+        for job in jobs:
+            if job.trace is not None:
+                job.trace.add(
+                    "job.create",
+                    start_ns,
+                    end_ns,
+                    {
+                        "model": job.model,
+                        "num_images": job.num_images,
+                        "batch_id": batch_id,
+                    },
+                )
+
+        batch = GenerationBatch(
+            batch_id=batch_id,
+            job_ids=job_ids,
+            total_images=total_images,
+            status=GenerationStatus.PENDING,
+        )
+        self._batches[batch_id] = batch
+        self._batch_streams[batch_id] = []
+
+        logger.info(
+            f"Created generation batch {batch_id} with {len(job_ids)} jobs "
+            f"and {total_images} images"
+        )
+
+        try:
+            asyncio.create_task(self._process_batch(batch_id))
+        except RuntimeError:
+            logger.warning(
+                f"No event loop running, batch {batch_id} will start "
+                "when loop is available"
+            )
+
+        return batch
+
     def get_job(self, job_id: str) -> Optional[GenerationJob]:
-        """Get job by ID."""
+        """Get a snapshot of a job by ID as an API model."""
+        job = self._jobs.get(job_id)
+        return job.to_model() if job is not None else None
+
+    def get_job_state(self, job_id: str) -> Optional[JobState]:
+        """Get the live state of a job by ID, without building its API model."""
         return self._jobs.get(job_id)
 
-    async def subscribe_to_job_stream(self, job_id: str) -> AsyncGenerator[str, None]:
+    def has_job(self, job_id: str) -> bool:
+        """Check whether a job exists without building its API model."""
+        return job_id in self._jobs
+
+    def get_batch(self, batch_id: str) -> Optional[GenerationBatch]:
+        """Get batch by ID."""
+        return self._batches.get(batch_id)
+
+    def get_model_stats(self) -> list[dict]:
+        """Get the concurrency and latency of every allowed model."""
+        return self._models.stats()
+
+    def get_job_trace(self, job_id: str) -> Optional[dict]:
+        """Get the span breakdown of a recent job, if it was sampled."""
+        trace = tracer.get_trace(job_id)
+        return trace.breakdown() if trace is not None else None
+
+    def get_cache_stats(self) -> dict:
+        """Get the size and hit counts of the prompt cache."""
+        return {"enabled": self._cache_enabled, **prompt_cache.stats()}
+
+    async def _lookup_cache(
+        self, requests: list[GenerationRequest], models: list[str]
+    ) -> list[Optional[CacheHit]]:
+        """
+        Look up the prompts of requests in the prompt cache, in one batch.
+
+        The lookup runs on the prompt cache thread, as scoring every cached
+        prompt takes milliseconds with a large cache.
+
+        Args:
+            requests: Generation requests
+            models: Model resolved for every request
+
+        Returns:
+            list[Optional[CacheHit]]: The cached images every request can be
+            served from, or None
+        """
+        hits: list[Optional[CacheHit]] = [None] * len(requests)
+        if not self._cache_enabled:
+            return hits
+
+        positions = [i for i, request in enumerate(requests) if request.use_cache]
+        if positions:
+            queries = [
+                (requests[i].prompt, models[i], requests[i].num_images)
+                for i in positions
+            ]
+            found = await asyncio.get_running_loop().run_in_executor(
+                self._cache_executor, prompt_cache.lookup_batch, queries
+            )
+            for i, hit in zip(positions, found):
+                hits[i] = hit
+                if hit is not None:
+                    logger.info(
+                        f"Prompt cache {hit.kind} hit for '{requests[i].prompt}': "
+                        f"'{hit.prompt}' (similarity {hit.similarity})"
+                    )
+                    if hit.prefilled:
+                        self._prefill_counts["hits"] += 1
+
+            if self._prefill_enabled:
+                for i in positions:
+                    request = requests[i]
+                    self._popular_prompts.add(
+                        (prompt_cache.vectorizer.normalize(request.prompt), models[i]),
+                        (request.prompt, request.num_images),
+                    )
+        return hits
+
+    async def _add_to_cache(
+        self, prompt: str, model: str, urls: list[str], prefilled: bool = False
+    ) -> None:
+        """Cache the images of a prompt on the prompt cache thread."""
+        await asyncio.get_running_loop().run_in_executor(
+            self._cache_executor, prompt_cache.add, prompt, model, urls, prefilled
+        )
+
+    def _admit(self, num_images: int) -> None:
+        """
+        Reserve scheduler capacity for a number of images.
+
+        Args:
+            num_images: Number of images to reserve capacity for
+
+        Raises:
+            GenerationCapacityError: If admitting the images would exceed
+                the configured queue limit, or the service is shutting down
+        """
+        if self._draining:
+            raise GenerationCapacityError("Server is shutting down")
+        if self._queued_images + num_images > settings.MAX_QUEUED_IMAGES:
+            raise GenerationCapacityError(
+                f"Cannot admit {num_images} images: {self._queued_images} "
+                f"already queued (limit {settings.MAX_QUEUED_IMAGES})"
+            )
+        self._queued_images += num_images
+
+    def _register_job(
+        self, request: GenerationRequest, model: str, batch_id: Optional[str] = None
+    ) -> JobState:
+        """
+        Initialize a job in the pending state without starting it.
+
+        Args:
+            request: Generation request parameters
+            model: Model the images are generated with
+            batch_id: Batch the job belongs to, if any
+
+        Returns:
+            JobState: The registered job
+        """
+        job_id = f"job_{uuid.uuid4().hex[:12]}"
+        job = JobState(
+            job_id,
+            request.prompt,
+            model,
+            request.num_images,
+            priority=request.priority,
+            deadline_ms=request.deadline_ms,
+        )
+
+        job.trace = tracer.start_trace(job_id)
+
+        self._jobs[job_id] = job
+        self._job_streams[job_id] = []
+        if batch_id is not None:
+            self._job_batches[job_id] = batch_id
+
+        return job
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Stop admitting jobs, then wait for admitted jobs to finish.
+
+        Jobs still running at the timeout are left to be cancelled with the
+        event loop. Streams that are still open afterwards (e.g. subscribed
+        after their job finished) are closed with an `error` event.
+
+        Args:
+            timeout: Maximum time to wait for admitted jobs, in seconds
+        """
+        self._draining = True
+        logger.info(f"Draining generation jobs ({self._queued_images} images left)")
+
+        deadline = time.monotonic() + timeout
+        while self._queued_images and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        if self._queued_images:
+            logger.warning(
+                f"Stopped draining with {self._queued_images} images left "
+                f"after {timeout}s"
+            )
+
+        for job_id, queues in self._job_streams.items():
+            self._flush_frames(job_id)
+            if queues:
+                data = _error_event_data(SHUTDOWN_ERROR, job_id)
+                frame = encode_event("error", data)
+                for queue in queues:
+                    queue.put_nowait(frame)
+
+        for batch_id, queues in self._batch_streams.items():
+            if queues:
+                data = _error_event_data(SHUTDOWN_ERROR, batch_id)
+                frame = encode_event("error", data)
+                for queue in queues:
+                    queue.put_nowait(("error", data, frame))
+
+    async def subscribe_to_job_stream(self, job_id: str) -> AsyncGenerator[bytes, None]:
         """
         Subscribe to job progress stream.
 
@@ -102,30 +495,34 @@ class GenerationService:
             job_id: Job ID to stream
 
         Yields:
-            str: Server-sent event formatted strings
+            bytes: Server-sent event frames, several at once when batched
         """
         if job_id not in self._jobs:
-            error_msg = f'{{"error": "Job not found", "job_id": "{job_id}"}}'
-            yield f"event: error\ndata: {error_msg}\n\n"
+            yield encode_event("error", _error_event_data("Job not found", job_id))
             return
 
+        # Events not flushed yet are already in the job state sent below
+        self._flush_frames(job_id)
+
         # Create a queue for this stream
-        stream_queue = asyncio.Queue()
+        stream_queue = EventQueue()
         self._job_streams[job_id].append(stream_queue)
 
         try:
             # Send initial job state
             job = self._jobs[job_id]
-            for result in job.results:
-                if result.status != GenerationStatus.PENDING:
-                    event_data = ProgressEventData(
-                        index=result.index,
-                        status=result.status,
-                        url=result.url,
-                        error=result.error,
-                    )
-                    data_json = event_data.model_dump_json()
-                    yield f"event: progress\ndata: {data_json}\n\n"
+            # No more events are broadcast for a job that already finished
+            finished = job.status in (COMPLETED, FAILED)
+            for index in range(job.num_images):
+                if job.statuses[index] != PENDING:
+                    yield encode_event("progress", job.progress_data(index))
+
+            if finished:
+                if job.status == COMPLETED:
+                    yield encode_event("done", self._job_done_event_data(job))
+                else:
+                    yield encode_event("error", _error_event_data(job.error, job_id))
+                return
 
             # Stream updates
             while True:
@@ -134,7 +531,7 @@ class GenerationService:
                     yield event
 
                     # Check if this is a completion or error event
-                    if "event: done" in event or "event: error" in event:
+                    if is_terminal_frame(event):
                         logger.info(
                             f"Closing stream for job {job_id} after completion event"
                         )
@@ -142,13 +539,11 @@ class GenerationService:
 
                 except asyncio.TimeoutError:
                     # Send keep-alive
-                    yield "event: keepalive\ndata: {}\n\n"
+                    yield KEEPALIVE_FRAME
 
         except Exception as e:
             logger.error(f"Error in job stream {job_id}: {e}")
-            error_data = ErrorEventData(error=str(e), job_id=job_id)
-            data_json = error_data.model_dump_json()
-            yield f"event: error\ndata: {data_json}\n\n"
+            yield encode_event("error", _error_event_data(str(e), job_id))
         finally:
             # Clean up stream
             if job_id in self._job_streams:
@@ -165,160 +560,761 @@ class GenerationService:
             job_id: Job ID to process
         """
         job = self._jobs[job_id]
+        trace = job.trace
+        start_ns = time.perf_counter_ns()
+        if trace is not None and trace.spans:
+            # The job was pending since its creation span ended
+            trace.add("job.pending", trace.spans[0][2], start_ns)
 
         try:
             # Update job status
-            job.status = GenerationStatus.RUNNING
-            job.started_at = datetime.now(timezone.utc)
+            job.status = RUNNING
+            job.started_at = time.time()
 
             logger.info(f"Starting job {job_id} with {job.num_images} images")
 
-            # Create tasks for concurrent generation
+            # Create tasks for concurrent generation, or to serve cached images
+            if job.cache_hit is not None:
+                generate = self._serve_cached_image
+            else:
+                generate = self._generate_single_image_async
             tasks = []
             for i in range(job.num_images):
-                task = asyncio.create_task(
-                    self._generate_single_image_async(job_id, i, job.prompt)
-                )
+                task = asyncio.create_task(generate(job, i))
                 tasks.append(task)
 
             # Track timing
-            start_time = datetime.now(timezone.utc)
-            first_image_time = None
-            completed_count = 0
+            start_time = time.perf_counter()
 
-            # Process results as they complete
+            # Process results as they complete; results are already recorded
+            # on the job state by the time a task finishes
             for task in asyncio.as_completed(tasks):
                 try:
-                    result = await task
-                    completed_count += 1
-
-                    # Update job result
-                    job.results[result.index] = result
+                    index = await task
 
                     # Track first image time
-                    if (
-                        first_image_time is None
-                        and result.status == GenerationStatus.SUCCEEDED
-                    ):
-                        first_image_time = datetime.now(timezone.utc)
-                        time_diff = first_image_time - start_time
-                        job.ttfi_ms = int(time_diff.total_seconds() * 1000)
+                    if job.ttfi_ms is None and job.statuses[index] == SUCCEEDED:
+                        job.ttfi_ms = int((time.perf_counter() - start_time) * 1000)
 
                     # Broadcast progress
-                    await self._broadcast_progress(job_id, result)
+                    await self._broadcast_progress(job, index)
 
-                    logger.info(f"Job {job_id}: Image {result.index} {result.status}")
+                    logger.info(
+                        f"Job {job_id}: Image {index} "
+                        f"{STATUS_VALUES[job.statuses[index]]}"
+                    )
 
                 except Exception as e:
                     logger.error(f"Error processing image in job {job_id}: {e}")
 
             # Mark job as completed
-            end_time = datetime.now(timezone.utc)
-            job.status = GenerationStatus.COMPLETED
-            job.completed_at = end_time
-            job.total_ms = int((end_time - start_time).total_seconds() * 1000)
+            job.status = COMPLETED
+            job.completed_at = time.time()
+            job.total_ms = int((time.perf_counter() - start_time) * 1000)
 
             # Send completion event
             await self._broadcast_completion(job_id)
 
+            if self._cache_enabled and job.cache_hit is None:
+                urls = [url for url in job.urls if url is not None]
+                if urls:
+                    await self._add_to_cache(job.prompt, job.model, urls)
+            elif job.cache_hit is not None and job.cache_hit.prefilled:
+                self._record_prefill_saving(job)
+
             logger.info(f"Job {job_id} completed in {job.total_ms}ms")
 
         except Exception as e:
             logger.error(f"Job {job_id} failed: {e}")
-            job.status = GenerationStatus.FAILED
+            job.status = FAILED
+            job.error = str(e)
 
             # Broadcast error
-            error_data = ErrorEventData(error=str(e), job_id=job_id)
-            await self._broadcast_event(job_id, "error", error_data.model_dump())
+            await self._broadcast_event(
+                job_id, "error", _error_event_data(str(e), job_id)
+            )
+
+        finally:
+            # Release the scheduler capacity reserved at admission
+            if job.cache_hit is None:
+                self._queued_images -= job.num_images
+
+            # Jobs of a batch are retired with their batch
+            if job_id not in self._job_batches:
+                self._retire("job", job_id)
+
+            if trace is not None:
+                trace.add(
+                    "job.process",
+                    start_ns,
+                    time.perf_counter_ns(),
+                    {"status": STATUS_VALUES[job.status]},
+                )
+                tracer.finish_trace(trace)
+
+    async def _process_batch(self, batch_id: str) -> None:
+        """
+        Process all jobs of a batch with a bounded number of active jobs.
+
+        Args:
+            batch_id: Batch ID to process
+        """
+        batch = self._batches[batch_id]
+        pending_job_ids = iter(batch.job_ids)
+
+        async def worker() -> None:
+            # Workers share the iterator, so each job is picked up exactly once
+            for job_id in pending_job_ids:
+                await self._process_job(job_id)
+                batch.completed_jobs += 1
+
+        try:
+            batch.status = GenerationStatus.RUNNING
+            start_time = datetime.now(timezone.utc)
+
+            num_workers = min(settings.BATCH_MAX_ACTIVE_JOBS, len(batch.job_ids))
+            await asyncio.gather(*(worker() for _ in range(num_workers)))
+
+            end_time = datetime.now(timezone.utc)
+            batch.status = GenerationStatus.COMPLETED
+            batch.completed_at = end_time
+            batch.total_ms = int((end_time - start_time).total_seconds() * 1000)
+
+            await self._broadcast_batch_event(
+                batch_id, "done", self._batch_done_event_data(batch)
+            )
+
+            logger.info(f"Batch {batch_id} completed in {batch.total_ms}ms")
+
+        except Exception as e:
+            logger.error(f"Batch {batch_id} failed: {e}")
+            batch.status = GenerationStatus.FAILED
+
+            await self._broadcast_batch_event(
+                batch_id, "error", _error_event_data(str(e), batch_id)
+            )
+
+        finally:
+            self._retire("batch", batch_id)
+
+    def _retire(self, kind: str, key: str) -> None:
+        """
+        Schedule a finished job or batch to be forgotten.
+
+        Args:
+            kind: "job" for a job outside of any batch, or "batch"
+            key: Job or batch ID
+        """
+        expires_at = time.monotonic() + settings.JOB_RETENTION_SECONDS
+        self._retired.append((expires_at, kind, key))
+        self._evict_retired()
+
+    def _evict_retired(self) -> None:
+        """Forget the finished jobs and batches retained for long enough."""
+        retired = self._retired
+        now = time.monotonic()
+        while retired and retired[0][0] <= now:
+            _, kind, key = retired.popleft()
+            if kind == "batch":
+                batch = self._batches.pop(key, None)
+                self._batch_streams.pop(key, None)
+                job_ids = batch.job_ids if batch is not None else ()
+            else:
+                job_ids = (key,)
+            for job_id in job_ids:
+                self._jobs.pop(job_id, None)
+                self._job_streams.pop(job_id, None)
+                self._job_batches.pop(job_id, None)
+                self._pending_frames.pop(job_id, None)
+
+    async def _serve_cached_image(self, job: JobState, index: int) -> int:
+        """
+        Record an image of a job served from the prompt cache.
+
+        Args:
+            job: Job with a cache hit
+            index: Image index
+
+        Returns:
+            int: Index of the served image
+        """
+        job.mark_running(index)
+        job.mark_succeeded(index, job.cache_hit.urls[index])
+        return index
 
-    async def _generate_single_image_async(
-        self, job_id: str, index: int, prompt: str
-    ) -> GenerationResult:
+    async def _generate_single_image_async(self, job: JobState, index: int) -> int:
         """
         Generate a single image using Replicate API.
 
+        The call waits for a slot in the dispatch queue of the job's model,
+        ordered by the job's priority and deadline. Images that can no longer
+        finish before the job's deadline (based on the model's p50 latency)
+        are failed without calling the model, and calls still running at the
+        deadline are abandoned. The outcome is recorded directly on the job
+        state.
+
         Args:
-            job_id: Job ID
+            job: Job the image belongs to
             index: Image index
-            prompt: Generation prompt
-            model: Model to use
 
         Returns:
-            GenerationResult: Result of the generation
+            int: Index of the generated image
         """
-        result = GenerationResult(
-            index=index,
-            status=GenerationStatus.RUNNING,
-            started_at=datetime.now(timezone.utc),
-        )
+        job_id = job.job_id
+        prompt = job.prompt
+        model = job.model
+        pool = self._models.get(model)
+        dispatch = pool.dispatch
+        queued_ns = time.perf_counter_ns()
+
+        # Latest time the call can start and still finish before the deadline
+        timeout = None
+        if job.deadline != math.inf:
+            expected_ms = pool.p50_ms() or 0.0
+            timeout = job.deadline - expected_ms / 1000 - time.monotonic()
+            if timeout <= 0:
+                job.mark_deadline_missed(
+                    index, f"{DEADLINE_EXCEEDED_ERROR}: not enough time left to start"
+                )
+                logger.info(f"Job {job_id}: Image {index} skipped, deadline too close")
+                if job.trace is not None:
+                    self._trace_image(job, index, queued_ns)
+                return index
+
+        # Prefill predictions give their slots back as soon as real calls need
+        # more than the share of the model's capacity prefills are allowed in
+        if self._prefill_running.get(model) and not self._model_idle(pool):
+            self._prefill_yield[model].set()
+
+        acquired = await dispatch.acquire(job.priority, job.deadline, timeout)
+        if not acquired:
+            job.mark_deadline_missed(
+                index, f"{DEADLINE_EXCEEDED_ERROR}: still queued at the latest start"
+            )
+            logger.info(f"Job {job_id}: Image {index} dropped from the queue")
+            if job.trace is not None:
+                self._trace_image(job, index, queued_ns)
+            return index
+
+        job.mark_running(index)
+        loop = asyncio.get_event_loop()
+        last_preview_at = 0.0
+
+        def publish_preview(preview: dict) -> None:
+            # Previews of an image are rate limited, and dropped once it ends
+            nonlocal last_preview_at
+            now = time.monotonic()
+            if job.statuses[index] != RUNNING:
+                return
+            if now - last_preview_at < self._preview_min_interval:
+                return
+            last_preview_at = now
+            self._broadcast_preview(job, index, preview)
+
+        # Set by the executor thread, to split the queue wait from the run
+        run_started_ns = run_ended_ns = 0
+
+        def run_model():
+            nonlocal run_started_ns, run_ended_ns
+            run_started_ns = time.perf_counter_ns()
+            self._last_upstream_call = time.monotonic()
+            try:
+                if pool.previews:
+                    return self._run_with_previews(
+                        model,
+                        {"prompt": prompt},
+                        lambda preview: loop.call_soon_threadsafe(
+                            publish_preview, preview
+                        ),
+                    )
+                return self._client.run(model, input={"prompt": prompt})
+            finally:
+                run_ended_ns = time.perf_counter_ns()
+                self._last_upstream_call = time.monotonic()
 
         try:
             logger.info(f"Job {job_id}: Starting image {index} generation")
 
             # Call Replicate API asynchronously
-            loop = asyncio.get_event_loop()
-            output = await loop.run_in_executor(
-                self._executor,
-                lambda: self._client.run(
-                    settings.IMAGE_GEN_MODEL, input={"prompt": prompt}
-                ),
-            )
+            start_time = time.perf_counter()
+            call = loop.run_in_executor(self._executor, run_model)
+        except Exception as e:
+            dispatch.release()
+            job.mark_failed(index, str(e))
+            logger.error(f"Job {job_id}: Image {index} failed - {e}")
+            if job.trace is not None:
+                self._trace_image(job, index, queued_ns)
+            return index
+
+        def on_call_done(call: asyncio.Future) -> None:
+            # The slot is held until the call returns, even if it was
+            # abandoned at the deadline, so the model's limit is never exceeded
+            dispatch.release()
+            if call.cancelled():
+                return
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            if call.exception() is None:
+                pool.record_latency(latency_ms)
+            else:
+                pool.record_failure(latency_ms)
+
+        call.add_done_callback(on_call_done)
+
+        try:
+            if job.deadline != math.inf:
+                remaining = job.deadline - time.monotonic()
+                output = await asyncio.wait_for(asyncio.shield(call), remaining)
+            else:
+                output = await call
 
             image_url = None
 
-            # Replicate returns FileOutputs instead of URLs
+            # Replicate runs return FileOutputs, polled predictions URLs
             if isinstance(output, list) and len(output) > 0:
                 logger.info(
-                    f"Extracting URL for image {index} from FileOutput for job {job_id}"
+                    f"Extracting URL for image {index} from FileOutput "
+                    f"for job {job_id}"
                 )
-                image_url = output[0].url
+                image_url = str(getattr(output[0], "url", output[0]))
             else:
                 logger.info(
-                    f"Trying to extract URL for image {index} from str(output) for job {job_id}"
+                    f"Trying to extract URL for image {index} from "
+                    f"str(output) for job {job_id}"
                 )
                 image_url = str(output)
 
             if image_url and image_url != "None":
-                result.status = GenerationStatus.SUCCEEDED
-                result.url = image_url
+                job.mark_succeeded(index, image_url)
                 logger.info(f"Job {job_id}: Image {index} generated successfully")
+                dedup_service.submit(job, index, image_url, self._broadcast_duplicate)
             else:
-                result.status = GenerationStatus.FAILED
-                result.error = "No image URL returned from Replicate"
+                job.mark_failed(index, "No image URL returned from Replicate")
                 logger.error(f"Job {job_id}: Image {index} failed - no URL")
 
+        except asyncio.TimeoutError:
+            job.mark_deadline_missed(
+                index, f"{DEADLINE_EXCEEDED_ERROR}: cancelled while generating"
+            )
+            logger.info(f"Job {job_id}: Image {index} cancelled at the deadline")
+
         except Exception as e:
-            result.status = GenerationStatus.FAILED
-            result.error = str(e)
+            job.mark_failed(index, str(e))
             logger.error(f"Job {job_id}: Image {index} failed - {e}")
 
+        if job.trace is not None:
+            self._trace_image(job, index, queued_ns, run_started_ns, run_ended_ns)
+        return index
+
+    def _run_with_previews(
+        self, model: str, input: dict, on_preview: Callable[[dict], None]
+    ):
+        """
+        Run a prediction, reporting its progress while it runs.
+
+        Runs in an executor thread: the prediction is created, then polled
+        until it is done, and every new step progress or intermediate output
+        is reported to `on_preview`.
+
+        Args:
+            model: Model to run
+            input: Prediction input
+            on_preview: Called from the thread with every new preview
+
+        Returns:
+            The output of the prediction
+
+        Raises:
+            ModelError: If the prediction failed or was canceled
+        """
+        prediction = self._client.predictions.create(model=model, input=input)
+        last_preview = None
+        while prediction.status not in PREDICTION_DONE_STATUSES:
+            time.sleep(self._preview_poll_interval)
+            prediction.reload()
+            if prediction.status != "processing":
+                continue
+
+            preview = _prediction_preview(prediction)
+            if preview is not None and preview != last_preview:
+                last_preview = preview
+                on_preview(preview)
+
+        if prediction.status != "succeeded":
+            raise ModelError(prediction)
+        return prediction.output
+
+    def start_prefill(self) -> None:
+        """Start prefilling popular prompts on the running event loop."""
+        if not self._prefill_enabled or self._prefill_task is not None:
+            return
+        self._prefill_task = asyncio.get_running_loop().create_task(
+            self._prefill_loop()
+        )
+
+    async def stop_prefill(self) -> None:
+        """Stop prefilling, cancelling the prefill predictions still running."""
+        if self._prefill_task is None:
+            return
+
+        for event in self._prefill_yield.values():
+            event.set()
+        tasks = [self._prefill_task, *self._prefills.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._prefill_task = None
+
+    def get_prefill_stats(self) -> dict:
+        """Get the prefill counters, budget and most popular prompts."""
+        saved_jobs = self._prefill_counts["saved_jobs"]
+        return {
+            "enabled": self._prefill_enabled,
+            **self._prefill_counts,
+            "running": sum(self._prefill_running.values()),
+            "budget_left": self._prefill_budget_left(),
+            "ttfi_saved_ms": round(self._prefill_saved_ms),
+            "mean_ttfi_saved_ms": (
+                round(self._prefill_saved_ms / saved_jobs) if saved_jobs else None
+            ),
+            "tracked_prompts": len(self._popular_prompts),
+            "top_prompts": [
+                {
+                    "prompt": hitter.data[0],
+                    "model": hitter.key[1],
+                    "requests": round(hitter.count - hitter.error),
+                }
+                for hitter in self._popular_prompts.top(settings.PREFILL_TOP_PROMPTS)
+            ],
+        }
+
+    async def _prefill_loop(self) -> None:
+        """Periodically start prefilling a popular prompt, if a model is idle."""
+        decayed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.PREFILL_INTERVAL_SECONDS)
+            if time.monotonic() - decayed_at >= settings.PREFILL_DECAY_SECONDS:
+                self._popular_prompts.decay(0.5)
+                decayed_at = time.monotonic()
+
+            try:
+                self._start_prefill()
+            except Exception as e:
+                logger.error(f"Prefill check failed - {e}")
+
+    def _start_prefill(self) -> None:
+        """
+        Start prefilling the most popular prompt that needs it.
+
+        A prompt needs it when it was requested at least
+        `PREFILL_MIN_REQUESTS` times, its cached images expire within
+        `PREFILL_REFRESH_SECONDS`, and its model has room for a prefill. A
+        single prompt is started per check, so that the checks of capacity
+        stay valid until its first prediction takes a slot.
+        """
+        popular = self._popular_prompts.top(
+            settings.PREFILL_TOP_PROMPTS, settings.PREFILL_MIN_REQUESTS
+        )
+        for hitter in popular:
+            key = hitter.key
+            prompt, num_images = hitter.data
+            model = key[1]
+            if key in self._prefills:
+                continue
+            if (
+                prompt_cache.expires_in(prompt, model, num_images)
+                > settings.PREFILL_REFRESH_SECONDS
+            ):
+                continue
+            if not self._prefill_has_room(self._models.get(model)):
+                continue
+
+            task = asyncio.create_task(self._prefill_prompt(prompt, model, num_images))
+            self._prefills[key] = task
+            task.add_done_callback(lambda _, key=key: self._prefills.pop(key, None))
+            return
+
+    def _model_idle(self, pool: ModelPool) -> bool:
+        """
+        Check whether a model is idle enough to run prefill predictions.
+
+        Args:
+            pool: Pool of the model
+
+        Returns:
+            bool: Whether no call is waiting for the model, and one more call
+            would keep it within the share of its capacity prefills are
+            allowed in
+        """
+        dispatch = pool.dispatch
+        return (
+            not dispatch.waiting
+            and dispatch.in_use + 1
+            <= pool.max_concurrency * settings.PREFILL_MAX_UTILIZATION
+        )
+
+    def _prefill_has_room(self, pool: ModelPool) -> bool:
+        """Check whether a prefill prediction of a model can start now."""
+        return (
+            not self._draining
+            and self._model_idle(pool)
+            and sum(self._prefill_running.values()) < settings.PREFILL_MAX_CONCURRENCY
+            and self._prefill_budget_left() > 0
+        )
+
+    def _prefill_budget_left(self) -> int:
+        """Get the number of prefill predictions that can start this hour."""
+        hour_ago = time.monotonic() - 3600
+        while self._prefill_starts and self._prefill_starts[0] < hour_ago:
+            self._prefill_starts.popleft()
+        return settings.PREFILL_MAX_PREDICTIONS_PER_HOUR - len(self._prefill_starts)
+
+    async def _prefill_prompt(self, prompt: str, model: str, num_images: int) -> None:
+        """
+        Generate the images of a popular prompt into the prompt cache.
+
+        Images are generated one at a time while the model has room for a
+        prefill, and cached together, marked as prefilled. Prefilling stops as
+        soon as real calls need the model's slots: the running prediction is
+        cancelled within one poll interval.
+
+        Args:
+            prompt: Prompt to prefill
+            model: Model of the prompt
+            num_images: Number of images to generate
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._models.get(model)
+        stop = self._prefill_yield.setdefault(model, threading.Event())
+        urls = []
+
+        for _ in range(num_images):
+            if not self._prefill_has_room(pool):
+                break
+            if not self._prefill_running.get(model):
+                # Yielded prefills of the model have all returned
+                stop.clear()
+
+            await pool.dispatch.acquire()
+            self._prefill_running[model] = self._prefill_running.get(model, 0) + 1
+            self._prefill_starts.append(time.monotonic())
+            self._prefill_counts["predictions"] += 1
+            try:
+                output = await loop.run_in_executor(
+                    self._executor,
+                    self._run_prefill_prediction,
+                    model,
+                    {"prompt": prompt},
+                    stop,
+                )
+            except Exception as e:
+                self._prefill_counts["failed"] += 1
+                logger.warning(f"Prefill of '{prompt}' with {model} failed - {e}")
+                break
+            finally:
+                self._prefill_running[model] -= 1
+                pool.dispatch.release()
+
+            if output is None:
+                self._prefill_counts["cancelled"] += 1
+                logger.info(f"Prefill of '{prompt}' with {model} yielded to jobs")
+                break
+            if isinstance(output, list):
+                output = output[0] if output else None
+            if output is not None:
+                urls.append(str(getattr(output, "url", output)))
+
+        if urls:
+            await self._add_to_cache(prompt, model, urls, prefilled=True)
+            self._prefill_counts["images"] += len(urls)
+            logger.info(f"Prefilled {len(urls)} images of '{prompt}' with {model}")
+
+    def _run_prefill_prediction(self, model: str, input: dict, stop: threading.Event):
+        """
+        Run a prefill prediction, cancelling it when asked to stop.
+
+        Runs in an executor thread, polling the prediction until it is done.
+
+        Args:
+            model: Model to run
+            input: Prediction input
+            stop: Set when the prediction must give its slot back
+
+        Returns:
+            The output of the prediction, or None if it was cancelled
+
+        Raises:
+            ModelError: If the prediction failed or was canceled upstream
+        """
+        self._last_upstream_call = time.monotonic()
+        prediction = self._client.predictions.create(model=model, input=input)
+        while prediction.status not in PREDICTION_DONE_STATUSES:
+            if stop.is_set():
+                prediction.cancel()
+                return None
+            time.sleep(self._preview_poll_interval)
+            prediction.reload()
+
+        self._last_upstream_call = time.monotonic()
+        if prediction.status != "succeeded":
+            raise ModelError(prediction)
+        return prediction.output
+
+    def _record_prefill_saving(self, job: JobState) -> None:
+        """
+        Record the TTFI a job served from prefilled images saved.
+
+        The TTFI of the job had it been generated is estimated as the p50
+        latency of its model.
+
+        Args:
+            job: Completed job served from prefilled images
+        """
+        expected_ms = self._models.get(job.model).p50_ms()
+        if expected_ms is None or job.ttfi_ms is None:
+            return
+        self._prefill_counts["saved_jobs"] += 1
+        self._prefill_saved_ms += max(expected_ms - job.ttfi_ms, 0.0)
+
+    async def ping_upstream(self, connections: int) -> int:
+        """
+        Open pooled Replicate connections, or keep them open, with cheap calls.
+
+        The calls run concurrently in executor threads, so that each one takes
+        its own connection from the pool.
+
+        Args:
+            connections: Number of concurrent calls, at most the number of
+                executor threads
+
+        Returns:
+            int: Number of successful calls
+        """
+        loop = asyncio.get_running_loop()
+        self._last_upstream_call = time.monotonic()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(self._executor, self._client.accounts.current)
+                for _ in range(min(connections, self._models.total_concurrency))
+            ),
+            return_exceptions=True,
+        )
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(
+                f"{len(errors)} of {len(results)} upstream pings failed - {errors[0]}"
+            )
+        return len(results) - len(errors)
+
+    async def warm_up_model(self, model: str, prompt: str) -> float:
+        """
+        Run a prediction of a model, so that it is booted for the first jobs.
+
+        The prediction takes a slot of the model's dispatch queue, at the
+        lowest priority, so that it counts against the model's concurrency
+        limit and gives way to waiting jobs. Warm-up latencies are not
+        recorded, since a cold boot would skew the routing of tier requests.
+
+        Args:
+            model: Model to run
+            prompt: Prompt of the prediction
+
+        Returns:
+            float: Latency of the prediction in milliseconds
+
+        Raises:
+            Exception: If the prediction failed
+        """
+        loop = asyncio.get_running_loop()
+        dispatch = self._models.get(model).dispatch
+        await dispatch.acquire()
+        try:
+            start_time = time.perf_counter()
+            self._last_upstream_call = time.monotonic()
+            await loop.run_in_executor(
+                self._executor,
+                lambda: self._client.run(model, input={"prompt": prompt}),
+            )
+            self._last_upstream_call = time.monotonic()
+            return (time.perf_counter() - start_time) * 1000
         finally:
-            result.finished_at = datetime.now(timezone.utc)
+            dispatch.release()
+
+    def upstream_idle_seconds(self) -> float:
+        """Get the time since the last Replicate call in seconds."""
+        return time.monotonic() - self._last_upstream_call
+
+    def _trace_image(
+        self,
+        job: JobState,
+        index: int,
+        queued_ns: int,
+        run_started_ns: int = 0,
+        run_ended_ns: int = 0,
+    ) -> None:
+        """
+        Record the spans of an image on its job's trace.
 
-        return result
+        Args:
+            job: Job the image belongs to, with a trace
+            index: Image index
+            queued_ns: When the image started waiting for a slot
+            run_started_ns: When an executor thread started the upstream call,
+                or 0 if it never started
+            run_ended_ns: When the upstream call returned, or 0 if it was
+                abandoned while still running
+        """
+        now_ns = time.perf_counter_ns()
+        attributes = {
+            "index": index,
+            "model": job.model,
+            "status": STATUS_VALUES[job.statuses[index]],
+        }
+
+        # Waiting for a dispatch slot, then for an executor thread
+        job.trace.add(
+            "image.queue_wait", queued_ns, run_started_ns or now_ns, attributes
+        )
+        if run_started_ns:
+            job.trace.add(
+                "image.run", run_started_ns, run_ended_ns or now_ns, attributes
+            )
+        if run_ended_ns:
+            job.trace.add("image.result", run_ended_ns, now_ns, attributes)
 
-    async def _broadcast_progress(self, job_id: str, result: GenerationResult) -> None:
+    async def _broadcast_progress(self, job: JobState, index: int) -> None:
         """Broadcast progress update to all subscribers."""
-        event_data = ProgressEventData(
-            index=result.index,
-            status=result.status,
-            url=result.url,
-            error=result.error,
-        )
-        await self._broadcast_event(job_id, "progress", event_data.model_dump())
+        await self._broadcast_event(job.job_id, "progress", job.progress_data(index))
+
+    def _broadcast_preview(self, job: JobState, index: int, preview: dict) -> None:
+        """
+        Send a preview of a running image to the job's subscribers.
+
+        Previews are not forwarded to batch streams, and a preview still
+        queued for a slow subscriber is replaced by the new one.
+        """
+        queues = self._job_streams.get(job.job_id)
+        if queues:
+            # Previews are not batched, and must not overtake batched events
+            self._flush_frames(job.job_id)
+            data = PreviewEventData(index=index, **preview).model_dump()
+            frame = encode_event("preview", data)
+            for queue in queues:
+                queue.put_preview(index, frame)
 
     async def _broadcast_completion(self, job_id: str) -> None:
         """Broadcast job completion to all subscribers."""
-        job = self._jobs[job_id]
-        event_data = DoneEventData(
-            total=job.num_images,
-            ttfi_ms=job.ttfi_ms,
-            total_ms=job.total_ms,
-        )
-        logger.info(
-            f"Broadcasting completion for job {job_id}: {event_data.model_dump()}"
-        )
-        await self._broadcast_event(job_id, "done", event_data.model_dump())
+        event_data = self._job_done_event_data(self._jobs[job_id])
+        logger.info(f"Broadcasting completion for job {job_id}: {event_data}")
+        await self._broadcast_event(job_id, "done", event_data)
+
+    async def _broadcast_duplicate(self, job: JobState, index: int) -> None:
+        """Broadcast that an image of a job was flagged as a near duplicate."""
+        # The job may have been forgotten while its image was hashed
+        if self._jobs.get(job.job_id) is not job:
+            return
+        data = DuplicateEventData(index=index, duplicate_of=job.duplicates[index])
+        await self._broadcast_event(job.job_id, "duplicate", data.model_dump())
 
     async def _broadcast_event(self, job_id: str, event_type: str, data: dict) -> None:
         """Broadcast event to all job subscribers."""
@@ -326,24 +1322,287 @@ class GenerationService:
             logger.warning(f"No streams found for job {job_id}")
             return
 
-        import json
+        trace = self._jobs[job_id].trace
+        start_ns = time.perf_counter_ns() if trace is not None else 0
+
+        # Encode once, every subscriber receives the same frame
+        queues = self._job_streams[job_id]
+        if queues:
+            frame = encode_event(event_type, data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Broadcasting {event_type} event to {len(queues)} "
+                    f"subscribers for job {job_id}: {frame!r}"
+                )
+
+            if self._batch_frames and event_type == "progress":
+                self._queue_frame(job_id, frame)
+            else:
+                # Terminal events end the stream, so they are put on their own
+                # after the batched events
+                self._flush_frames(job_id)
+                for queue in queues:
+                    try:
+                        queue.put_nowait(frame)
+                    except Exception as e:
+                        logger.error(f"Error broadcasting to stream: {e}")
+
+        # Forward the event to the aggregated stream of the job's batch
+        batch_id = self._job_batches.get(job_id)
+        if batch_id is not None:
+            await self._broadcast_batch_event(
+                batch_id, BATCH_EVENT_TYPES[event_type], {**data, "job_id": job_id}
+            )
 
-        event_string = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
-        logger.debug(f"Broadcasting event to job {job_id}: {event_string.strip()}")
+        if trace is not None:
+            trace.add(
+                "broadcast",
+                start_ns,
+                time.perf_counter_ns(),
+                {"event": event_type, "subscribers": len(queues)},
+            )
 
-        # Send to all subscribers
-        subscriber_count = len(self._job_streams[job_id])
-        logger.info(
-            f"Broadcasting {event_type} event to\n"
-            f"{subscriber_count} subscribers for job {job_id}"
-        )
+    def _queue_frame(self, job_id: str, frame: bytes) -> None:
+        """
+        Add a frame to the pending frames of a job stream.
 
-        for queue in self._job_streams[job_id]:
+        The first pending frame schedules a flush at the end of the batching
+        window, so all the frames broadcast until then (e.g. by images
+        finishing in the same event loop iteration) reach every subscriber
+        as one chunk, with one queue wakeup and one write.
+
+        Args:
+            job_id: Job ID
+            frame: Encoded event
+        """
+        pending = self._pending_frames.get(job_id)
+        if pending is None:
+            pending = self._pending_frames[job_id] = []
+            loop = asyncio.get_running_loop()
+            if self._batch_window > 0:
+                loop.call_later(self._batch_window, self._flush_frames, job_id)
+            else:
+                loop.call_soon(self._flush_frames, job_id)
+        pending.append(frame)
+
+    def _flush_frames(self, job_id: str) -> None:
+        """Put the pending frames of a job stream in its subscribers' queues."""
+        frames = self._pending_frames.pop(job_id, None)
+        if not frames:
+            return
+
+        chunk = frames[0] if len(frames) == 1 else b"".join(frames)
+        for queue in self._job_streams.get(job_id, ()):
             try:
-                await queue.put(event_string)
+                queue.put_nowait(chunk)
             except Exception as e:
                 logger.error(f"Error broadcasting to stream: {e}")
 
+    async def _broadcast_batch_event(
+        self, batch_id: str, event_type: str, data: dict
+    ) -> None:
+        """Broadcast event to all batch subscribers."""
+        queues = self._batch_streams.get(batch_id)
+        if not queues:
+            return
+
+        frame = encode_event(event_type, data)
+        for queue in queues:
+            try:
+                queue.put_nowait((event_type, data, frame))
+            except Exception as e:
+                logger.error(f"Error broadcasting to batch stream: {e}")
+
+    def _job_done_event_data(self, job: JobState) -> dict:
+        """Build the completion event payload for a job."""
+        return DoneEventData(
+            total=job.num_images,
+            ttfi_ms=job.ttfi_ms,
+            total_ms=job.total_ms,
+            deadline_misses=job.deadline_misses,
+        ).model_dump()
+
+    def _batch_done_event_data(self, batch: GenerationBatch) -> dict:
+        """Build the completion event payload for a batch from its jobs' results."""
+        succeeded = failed = deadline_misses = 0
+        for job_id in batch.job_ids:
+            job = self._jobs[job_id]
+            succeeded += job.count(SUCCEEDED)
+            failed += job.count(FAILED)
+            deadline_misses += job.deadline_misses
+
+        return BatchDoneEventData(
+            batch_id=batch.batch_id,
+            total_jobs=len(batch.job_ids),
+            total_images=batch.total_images,
+            succeeded=succeeded,
+            failed=failed,
+            deadline_misses=deadline_misses,
+            total_ms=batch.total_ms,
+        ).model_dump()
+
+    async def _iter_batch_events(
+        self, batch_id: str
+    ) -> AsyncGenerator[tuple[str, dict, Optional[bytes]], None]:
+        """
+        Iterate over the events of a batch, starting with a replay of its state.
+
+        Args:
+            batch_id: Batch ID to follow
+
+        Yields:
+            tuple[str, dict, Optional[bytes]]: Event type, event data and the
+                pre-encoded SSE frame when the event was broadcast live
+        """
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            # Forgotten since the request was accepted
+            return
+
+        stream_queue = asyncio.Queue()
+        self._batch_streams[batch_id].append(stream_queue)
+        # Read in the same step as the queue is registered, so that every
+        # later event is queued. An image is recorded on its job before its
+        # event is broadcast, so queued events the replay covers are skipped
+        # rather than sent twice.
+        replay, replayed = self._batch_replay(batch)
+
+        try:
+            # Replay the images and jobs that finished before the subscription;
+            # running images are sent once they finish
+            for event_type, data in replay:
+                yield event_type, data, None
+                if event_type in ("done", "error"):
+                    return
+
+            # Stream updates
+            while True:
+                try:
+                    event = await asyncio.wait_for(stream_queue.get(), timeout=30.0)
+                except asyncio.TimeoutError:
+                    yield "keepalive", {}, KEEPALIVE_FRAME
+                    continue
+
+                event_type, data, _ = event
+                if (event_type, data.get("job_id"), data.get("index")) in replayed:
+                    continue
+                yield event
+
+                if event_type in ("done", "error"):
+                    logger.info(
+                        f"Closing stream for batch {batch_id} after completion event"
+                    )
+                    break
+
+        finally:
+            try:
+                self._batch_streams[batch_id].remove(stream_queue)
+            except (KeyError, ValueError):
+                pass
+
+    def _batch_replay(
+        self, batch: GenerationBatch
+    ) -> tuple[list[tuple[str, dict]], set[tuple[str, str, Optional[int]]]]:
+        """
+        Build the events replaying the state of a batch to a new subscriber.
+
+        Args:
+            batch: Batch to replay
+
+        Returns:
+            tuple[list[tuple[str, dict]], set[tuple[str, str, Optional[int]]]]:
+            Event type and data of every finished image and job, then of the
+            batch if it finished; and the event type, job ID and image index
+            (None for job events) of every per-job event they cover
+        """
+        events = []
+        covered = set()
+        for job_id in batch.job_ids:
+            job = self._jobs[job_id]
+            for index in range(job.num_images):
+                if job.statuses[index] in FINISHED_IMAGE_STATUSES:
+                    event_data = {**job.progress_data(index), "job_id": job_id}
+                    events.append(("progress", event_data))
+                    covered.add(("progress", job_id, index))
+                    # The flag is in the progress event already
+                    if event_data.get("duplicate_of") is not None:
+                        covered.add(("duplicate", job_id, index))
+
+            if job.status == COMPLETED:
+                event_data = {**self._job_done_event_data(job), "job_id": job_id}
+                events.append(("job_done", event_data))
+                covered.add(("job_done", job_id, None))
+            elif job.status == FAILED:
+                events.append(("job_error", _error_event_data(job.error, job_id)))
+                covered.add(("job_error", job_id, None))
+
+        if batch.status == GenerationStatus.COMPLETED:
+            events.append(("done", self._batch_done_event_data(batch)))
+        elif batch.status == GenerationStatus.FAILED:
+            events.append(("error", _error_event_data("Batch failed", batch.batch_id)))
+        return events, covered
+
+    async def subscribe_to_batch_stream(
+        self, batch_id: str
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Subscribe to the aggregated progress stream of a batch.
+
+        Args:
+            batch_id: Batch ID to stream
+
+        Yields:
+            bytes: Server-sent event frames
+        """
+        async for event_type, data, frame in self._iter_batch_events(batch_id):
+            yield frame if frame is not None else encode_event(event_type, data)
+
+    async def stream_batch_results(self, batch_id: str) -> AsyncGenerator[bytes, None]:
+        """
+        Stream the image results of a batch as newline-delimited JSON.
+
+        Args:
+            batch_id: Batch ID to stream
+
+        Yields:
+            bytes: One JSON document per finished image
+        """
+        async for event_type, data, _ in self._iter_batch_events(batch_id):
+            if event_type == "progress" and data["status"] in FINISHED_STATUS_VALUES:
+                yield dumps(data) + b"\n"
+
+
+def _error_event_data(error: str, job_id: str) -> dict:
+    """Build the payload of an `error` or `job_error` event of a job or batch."""
+    return ErrorEventData(error=error, job_id=job_id).model_dump()
+
+
+def _prediction_preview(prediction) -> Optional[dict]:
+    """
+    Get the step progress and latest intermediate output of a prediction.
+
+    Args:
+        prediction: Running Replicate prediction
+
+    Returns:
+        Optional[dict]: `preview` event data without the image index, or None
+        if the prediction reports neither
+    """
+    # Parsed from the progress bar in the logs of diffusion models
+    progress = prediction.progress
+    output = prediction.output
+    if isinstance(output, list):
+        output = output[-1] if output else None
+    if progress is None and not output:
+        return None
+
+    return {
+        "step": progress.current if progress else None,
+        "total_steps": progress.total if progress else None,
+        "progress": round(progress.percentage, 3) if progress else None,
+        "url": str(getattr(output, "url", output)) if output else None,
+    }
+
 
 # Global service instance
 generation_service = GenerationService()
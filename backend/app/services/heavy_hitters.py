@@ -0,0 +1,107 @@
+"""
+Bounded tracking of the most frequent keys of a stream (Space-Saving).
+
+A Space-Saving sketch keeps a fixed number of counters. A key that has a
+counter is counted exactly; a new key takes over the counter of the least
+counted key, inheriting its count as an overestimation error. Any key seen
+more often than the total count divided by the capacity is guaranteed to
+hold a counter, so the frequent prompt templates are found with bounded
+memory however long the tail of one-off prompts is.
+"""
+
+from typing import Any, Generic, Hashable, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class HeavyHitter(NamedTuple):
+    """A frequent key, its estimated count and the data stored with it."""
+
+    key: Any
+    count: float
+    error: float
+    data: Any
+
+
+class SpaceSaving(Generic[K]):
+    """Space-Saving sketch of the most frequent keys."""
+
+    capacity: int
+    total: float
+    _counters: dict[K, list]
+
+    def __init__(self, capacity: int):
+        """
+        Initialize an empty sketch.
+
+        Args:
+            capacity: Number of counters, the keys tracked at a time
+
+        Raises:
+            ValueError: If the capacity is not positive
+        """
+        if capacity <= 0:
+            raise ValueError(f"Sketch capacity must be positive: {capacity}")
+        self.capacity = capacity
+        self.total = 0.0
+        # Count, overestimation error and latest data of every tracked key
+        self._counters = {}
+
+    def __len__(self) -> int:
+        """Get the number of tracked keys."""
+        return len(self._counters)
+
+    def add(self, key: K, data: Any = None) -> None:
+        """
+        Count an occurrence of a key.
+
+        Args:
+            key: Counted key
+            data: Data kept with the key, replacing the previous one
+        """
+        self.total += 1
+        counter = self._counters.get(key)
+        if counter is not None:
+            counter[0] += 1
+            counter[2] = data
+            return
+
+        if len(self._counters) < self.capacity:
+            self._counters[key] = [1.0, 0.0, data]
+            return
+
+        # Linear in the capacity, but only for keys that are not tracked
+        evicted = min(self._counters, key=lambda k: self._counters[k][0])
+        count = self._counters.pop(evicted)[0]
+        self._counters[key] = [count + 1, count, data]
+
+    def top(self, limit: int, min_count: float = 0.0) -> list[HeavyHitter]:
+        """
+        Get the most frequent keys.
+
+        Args:
+            limit: Maximum number of keys
+            min_count: Minimum guaranteed count (count minus error) of a key
+
+        Returns:
+            list[HeavyHitter]: Keys by decreasing estimated count
+        """
+        hitters = [
+            HeavyHitter(key, count, error, data)
+            for key, (count, error, data) in self._counters.items()
+            if count - error >= min_count
+        ]
+        hitters.sort(key=lambda hitter: hitter.count, reverse=True)
+        return hitters[:limit]
+
+    def decay(self, factor: float) -> None:
+        """
+        Scale every count down, so that past popularity fades.
+
+        Args:
+            factor: Multiplier of the counts, between 0 and 1
+        """
+        self.total *= factor
+        for counter in self._counters.values():
+            counter[0] *= factor
+            counter[1] *= factor
@@ -0,0 +1,211 @@
+"""
+Perceptual hashing of images and a near-duplicate index of the hashes.
+
+The difference hash (dHash) of an image is computed on a 9x8 grayscale
+thumbnail: every bit tells whether a pixel is brighter than its right
+neighbour, so resizing, re-encoding or light edits flip few bits, and
+near-identical images have hashes a small Hamming distance apart.
+
+Hashes are indexed with a multi-index hash table: a 64-bit hash is split
+into 4 chunks of 16 bits and the rows are sorted by each chunk. Two hashes at
+most r bits apart have a chunk at most r // 4 bits apart (pigeonhole), so the
+candidates of a lookup are the rows whose chunk is one of the few values
+within that distance of the query's, and only those are compared in full.
+Hashes added since the last sort are compared directly, and sorted in once
+they are a sizeable fraction of the index.
+"""
+
+import io
+from typing import Optional
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Thumbnail height of the hash, the width is one more pixel
+HASH_SIZE = 8
+
+# Chunks of the hashes the rows are sorted by
+CHUNKS = 4
+CHUNK_BITS = HASH_SIZE * HASH_SIZE // CHUNKS
+CHUNK_VALUES = 1 << CHUNK_BITS
+
+# Rows added since the last sort that trigger a new sort: at least this
+# number, and at least this fraction of the sorted rows
+MIN_SORT_ROWS = 65536
+SORT_FRACTION = 1 / 16
+
+
+def dhash(thumbnail: np.ndarray) -> int:
+    """
+    Compute the difference hash of a thumbnail.
+
+    Args:
+        thumbnail: Grayscale pixels, `HASH_SIZE` rows of `HASH_SIZE + 1`
+
+    Returns:
+        int: 64-bit hash, one bit per pixel brighter than its right neighbour
+    """
+    bits = thumbnail[:, :-1] > thumbnail[:, 1:]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_dhash(data: bytes) -> int:
+    """
+    Decode an image and compute its difference hash.
+
+    Args:
+        data: Encoded image (WebP, PNG, JPEG, ...)
+
+    Returns:
+        int: 64-bit hash of the image
+
+    Raises:
+        RuntimeError: If Pillow is not installed
+        OSError: If the image cannot be decoded
+    """
+    if Image is None:
+        raise RuntimeError("Perceptual hashing requires the Pillow package")
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG images are decoded at a fraction of their size
+        image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        thumbnail = image.convert("L").resize(
+            (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX
+        )
+    return dhash(np.asarray(thumbnail))
+
+
+class HashIndex:
+    """Multi-index hash table of 64-bit hashes, queried by Hamming distance."""
+
+    max_distance: int
+    _hashes: np.ndarray
+    _size: int
+    _sorted: int
+    _orders: list[np.ndarray]
+    _offsets: list[np.ndarray]
+    _masks: np.ndarray
+
+    def __init__(self, max_distance: int):
+        """
+        Initialize an empty index.
+
+        Args:
+            max_distance: Largest Hamming distance between near duplicates
+        """
+        self.max_distance = max_distance
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._size = 0
+        # Rows sorted by each chunk, and where each chunk value starts
+        self._sorted = 0
+        self._orders = [np.empty(0, dtype=np.int32)] * CHUNKS
+        self._offsets = [np.zeros(CHUNK_VALUES + 1, dtype=np.int64)] * CHUNKS
+        # Differences of the chunk values probed by a lookup
+        chunk_distance = max_distance // CHUNKS
+        self._masks = np.array(
+            [m for m in range(CHUNK_VALUES) if m.bit_count() <= chunk_distance],
+            dtype=np.int64,
+        )
+
+    def __len__(self) -> int:
+        """Get the number of indexed hashes."""
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Get the memory used by the hashes and the sorted rows."""
+        return self._hashes.nbytes + sum(order.nbytes for order in self._orders)
+
+    def add(self, values: np.ndarray) -> None:
+        """
+        Add hashes at the end of the index, in the order of their rows.
+
+        Args:
+            values: Hashes to add, as unsigned 64-bit integers
+        """
+        size = self._size + len(values)
+        if size > len(self._hashes):
+            hashes = np.empty(max(size, 2 * len(self._hashes), 1024), dtype=np.uint64)
+            hashes[: self._size] = self._hashes[: self._size]
+            self._hashes = hashes
+        self._hashes[self._size : size] = values
+        self._size = size
+
+        if size - self._sorted >= max(MIN_SORT_ROWS, self._sorted * SORT_FRACTION):
+            self._sort()
+
+    def drop_before(self, row: int) -> None:
+        """
+        Remove the hashes of the rows before a row, shifting the others down.
+
+        Args:
+            row: First row kept
+        """
+        self._hashes = self._hashes[row : self._size].copy()
+        self._size -= row
+        self._sort()
+
+    def _sort(self) -> None:
+        """Sort every row by each chunk, with a counting sort of the chunks."""
+        hashes = self._hashes[: self._size]
+        for chunk in range(CHUNKS):
+            keys = (hashes >> np.uint64(chunk * CHUNK_BITS)).astype(np.uint16)
+            # A stable sort of 16-bit keys is a radix sort
+            self._orders[chunk] = np.argsort(keys, kind="stable").astype(np.int32)
+            offsets = np.zeros(CHUNK_VALUES + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys, minlength=CHUNK_VALUES), out=offsets[1:])
+            self._offsets[chunk] = offsets
+        self._sorted = self._size
+
+    def nearest(self, value: int, first_row: int = 0) -> Optional[tuple[int, int]]:
+        """
+        Find the closest indexed hash within the maximum distance.
+
+        Args:
+            value: Hash to look up
+            first_row: Rows before this one are ignored
+
+        Returns:
+            Optional[tuple[int, int]]: Row of the closest hash (the earliest
+            one on ties) and its distance, or None
+        """
+        query = np.uint64(value)
+        candidates = [
+            order[start:end]
+            for chunk, order, offsets in zip(range(CHUNKS), self._orders, self._offsets)
+            for start, end in zip(
+                *self._probe_ranges(offsets, value >> (chunk * CHUNK_BITS))
+            )
+            if end > start
+        ]
+        rows = np.concatenate(candidates) if candidates else np.empty(0, np.int32)
+        rows = rows[rows >= first_row]
+        distances = np.bitwise_count(self._hashes[rows] ^ query)
+
+        # Rows added since the last sort are compared directly
+        tail_start = max(self._sorted, first_row)
+        tail = np.bitwise_count(self._hashes[tail_start : self._size] ^ query)
+
+        best: Optional[tuple[int, int]] = None
+        if len(distances):
+            i = np.lexsort((rows, distances))[0]
+            best = (int(rows[i]), int(distances[i]))
+        if len(tail):
+            i = int(tail.argmin())
+            if best is None or tail[i] < best[1]:
+                best = (tail_start + i, int(tail[i]))
+
+        if best is None or best[1] > self.max_distance:
+            return None
+        return best
+
+    def _probe_ranges(
+        self, offsets: np.ndarray, chunk_value: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get where the rows of the chunk values near a value start and end."""
+        probes = (chunk_value & (CHUNK_VALUES - 1)) ^ self._masks
+        return offsets[probes], offsets[probes + 1]
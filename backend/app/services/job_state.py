@@ -0,0 +1,223 @@
+"""
+Compact in-memory state for image generation jobs.
+
+The generation service mutates job state for every finished image, so it is
+kept in `__slots__` classes backed by parallel arrays (one entry per image
+index) instead of one Pydantic model per result. Pydantic models are only
+built at the API boundary via `to_model`/`result_model`.
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.tracing import JobTrace
+from app.models.generation import GenerationJob, GenerationResult, GenerationStatus
+from app.services.prompt_cache import CacheHit
+
+# Status codes stored per image; PENDING must be 0 so zeroed arrays are pending
+STATUSES: tuple[GenerationStatus, ...] = tuple(GenerationStatus)
+STATUS_CODES: dict[GenerationStatus, int] = {s: i for i, s in enumerate(STATUSES)}
+STATUS_VALUES: tuple[str, ...] = tuple(s.value for s in STATUSES)
+
+PENDING = STATUS_CODES[GenerationStatus.PENDING]
+RUNNING = STATUS_CODES[GenerationStatus.RUNNING]
+SUCCEEDED = STATUS_CODES[GenerationStatus.SUCCEEDED]
+FAILED = STATUS_CODES[GenerationStatus.FAILED]
+COMPLETED = STATUS_CODES[GenerationStatus.COMPLETED]
+
+
+def _to_datetime(timestamp: float) -> Optional[datetime]:
+    """Convert a stored epoch timestamp (0.0 meaning unset) to a datetime."""
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class JobState:
+    """Mutable state of a generation job and its per-image results."""
+
+    __slots__ = (
+        "job_id",
+        "prompt",
+        "model",
+        "num_images",
+        "priority",
+        "deadline_ms",
+        "deadline",
+        "deadline_misses",
+        "status",
+        "created_at",
+        "started_at",
+        "completed_at",
+        "ttfi_ms",
+        "total_ms",
+        "statuses",
+        "image_started_at",
+        "image_finished_at",
+        "urls",
+        "errors",
+        "error",
+        "duplicates",
+        "trace",
+        "cache_hit",
+    )
+
+    job_id: str
+    prompt: str
+    model: str
+    num_images: int
+    priority: int
+    deadline_ms: Optional[int]
+    deadline: float
+    deadline_misses: int
+    status: int
+    created_at: float
+    started_at: float
+    completed_at: float
+    ttfi_ms: Optional[int]
+    total_ms: Optional[int]
+    statuses: bytearray
+    image_started_at: array
+    image_finished_at: array
+    urls: list[Optional[str]]
+    errors: dict[int, str]
+    error: Optional[str]
+    duplicates: Optional[dict[int, str]]
+    trace: Optional[JobTrace]
+    cache_hit: Optional[CacheHit]
+
+    def __init__(
+        self,
+        job_id: str,
+        prompt: str,
+        model: str,
+        num_images: int,
+        priority: int = 5,
+        deadline_ms: Optional[int] = None,
+    ):
+        """
+        Initialize a job with every image in the pending state.
+
+        Args:
+            job_id: Unique job identifier
+            prompt: Generation prompt
+            model: Model the images are generated with
+            num_images: Number of images in the job
+            priority: Priority of the job's upstream calls, higher first
+            deadline_ms: Time budget from now in milliseconds, if any
+        """
+        self.job_id = job_id
+        self.prompt = prompt
+        self.model = model
+        self.num_images = num_images
+        self.priority = priority
+        self.deadline_ms = deadline_ms
+        # Monotonic time the job should finish by (infinite without a budget)
+        self.deadline = (
+            time.monotonic() + deadline_ms / 1000 if deadline_ms else math.inf
+        )
+        self.deadline_misses = 0
+        self.status = PENDING
+        self.created_at = time.time()
+        self.started_at = 0.0
+        self.completed_at = 0.0
+        self.ttfi_ms = None
+        self.total_ms = None
+
+        # Parallel per-image arrays, indexed by image index
+        self.statuses = bytearray(num_images)
+        self.image_started_at = array("d", bytes(8 * num_images))
+        self.image_finished_at = array("d", bytes(8 * num_images))
+        self.urls = [None] * num_images
+        # Errors are rare, so they are stored sparsely
+        self.errors = {}
+        # Error the whole job failed with, if any
+        self.error = None
+        # URLs of the originals of near-duplicate images, created on the first
+        self.duplicates = None
+        # Lifecycle spans, if the job is sampled for tracing
+        self.trace = None
+        # Cached prompt whose images the job is served from, if any
+        self.cache_hit = None
+
+    def mark_running(self, index: int) -> None:
+        """Record that an image started generating."""
+        self.statuses[index] = RUNNING
+        self.image_started_at[index] = time.time()
+
+    def mark_succeeded(self, index: int, url: str) -> None:
+        """Record a successfully generated image."""
+        self.statuses[index] = SUCCEEDED
+        self.urls[index] = url
+        self.image_finished_at[index] = time.time()
+
+    def mark_failed(self, index: int, error: str) -> None:
+        """Record a failed image."""
+        self.statuses[index] = FAILED
+        self.errors[index] = error
+        self.image_finished_at[index] = time.time()
+
+    def mark_duplicate(self, index: int, original_url: str) -> None:
+        """Record that an image is a near duplicate of an earlier image."""
+        if self.duplicates is None:
+            self.duplicates = {}
+        self.duplicates[index] = original_url
+
+    def mark_deadline_missed(self, index: int, error: str) -> None:
+        """Record an image failed for missing the job's deadline."""
+        self.mark_failed(index, error)
+        self.deadline_misses += 1
+
+    def count(self, status: int) -> int:
+        """Count images currently in the given status code."""
+        return self.statuses.count(status)
+
+    def progress_data(self, index: int) -> dict:
+        """Build the `progress` event payload for an image."""
+        data = {
+            "index": index,
+            "status": STATUS_VALUES[self.statuses[index]],
+            "url": self.urls[index],
+            "error": self.errors.get(index),
+        }
+        if self.duplicates and index in self.duplicates:
+            data["duplicate_of"] = self.duplicates[index]
+        if self.cache_hit is not None:
+            data["cache"] = self.cache_hit.kind
+            data["cached_prompt"] = self.cache_hit.prompt
+            data["similarity"] = self.cache_hit.similarity
+        return data
+
+    def result_model(self, index: int) -> GenerationResult:
+        """Build the API model for a single image result."""
+        return GenerationResult(
+            index=index,
+            status=STATUSES[self.statuses[index]],
+            url=self.urls[index],
+            error=self.errors.get(index),
+            duplicate_of=self.duplicates.get(index) if self.duplicates else None,
+            started_at=_to_datetime(self.image_started_at[index]),
+            finished_at=_to_datetime(self.image_finished_at[index]),
+        )
+
+    def to_model(self) -> GenerationJob:
+        """Build the API model for the whole job."""
+        return GenerationJob(
+            job_id=self.job_id,
+            prompt=self.prompt,
+            model=self.model,
+            priority=self.priority,
+            deadline_ms=self.deadline_ms,
+            num_images=self.num_images,
+            status=STATUSES[self.status],
+            results=[self.result_model(i) for i in range(self.num_images)],
+            created_at=_to_datetime(self.created_at),
+            started_at=_to_datetime(self.started_at),
+            completed_at=_to_datetime(self.completed_at),
+            ttfi_ms=self.ttfi_ms,
+            total_ms=self.total_ms,
+            deadline_misses=self.deadline_misses,
+        )
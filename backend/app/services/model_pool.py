@@ -0,0 +1,236 @@
+"""
+Per-model concurrency pools and latency-aware model routing.
+
+Every allowed image generation model gets its own pool: a dispatch queue
+bounding its in-flight Replicate calls and a window of recent call latencies.
+A slow model can then only exhaust its own capacity, and tier requests
+("fast" or "quality") are routed to the model of the tier with the lowest
+observed p50.
+
+When a model is at capacity, waiting calls are dispatched by priority, then
+earliest deadline, then arrival order, so interactive requests do not queue
+behind background work.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import statistics
+from collections import deque
+from typing import Optional
+
+from app.core.config import settings
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request selects a model or tier that is not allowed."""
+
+
+class DispatchQueue:
+    """Slots for concurrent calls, granted by priority, deadline and arrival."""
+
+    capacity: int
+    in_use: int
+    _waiters: list[tuple[int, float, int, asyncio.Future]]
+    _sequence: itertools.count
+
+    def __init__(self, capacity: int):
+        """
+        Initialize the queue.
+
+        Args:
+            capacity: Maximum number of slots in use at the same time
+        """
+        self.capacity = capacity
+        self.in_use = 0
+        # Heap of (-priority, deadline, arrival, future); waiters that gave up
+        # stay in the heap with a cancelled future until they are popped
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """Get the number of calls waiting for a slot."""
+        return sum(not future.done() for *_, future in self._waiters)
+
+    async def acquire(
+        self,
+        priority: int = 0,
+        deadline: float = math.inf,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: Priority of the call, higher first
+            deadline: Monotonic time the call should finish by, used to order
+                calls of the same priority
+            timeout: Maximum time to wait for a slot, in seconds
+
+        Returns:
+            bool: Whether a slot was acquired; it must then be released
+        """
+        # Drop waiters that gave up, so they cannot block the fast path
+        waiters = self._waiters
+        while waiters and waiters[0][3].done():
+            heapq.heappop(waiters)
+
+        # Waiters only exist while every slot is in use
+        if self.in_use < self.capacity and not waiters:
+            self.in_use += 1
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(waiters, (-priority, deadline, next(self._sequence), future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been handed over right before the timeout
+            return future.done() and not future.cancelled()
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Release a slot, handing it over to the first waiting call, if any."""
+        while self._waiters:
+            *_, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class ModelPool:
+    """Concurrency limit and latency tracking of a single model."""
+
+    __slots__ = ("model", "max_concurrency", "previews", "dispatch", "latencies")
+
+    model: str
+    max_concurrency: int
+    previews: bool
+    dispatch: DispatchQueue
+    latencies: deque[float]
+
+    def __init__(self, model: str, max_concurrency: int, previews: bool = False):
+        """
+        Initialize the pool of a model.
+
+        Args:
+            model: Replicate model identifier
+            max_concurrency: Maximum number of concurrent calls to the model
+            previews: Whether running predictions are polled for previews
+        """
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.previews = previews
+        self.dispatch = DispatchQueue(max_concurrency)
+        # Recent call latencies in milliseconds, failed calls at a penalty
+        self.latencies = deque(maxlen=settings.IMAGE_GEN_LATENCY_WINDOW)
+
+    def record_latency(self, latency_ms: float) -> None:
+        """Record the latency of a successful call."""
+        self.latencies.append(latency_ms)
+
+    def record_failure(self, latency_ms: float) -> None:
+        """Record a failed call, as at least the failure penalty latency."""
+        self.latencies.append(max(latency_ms, settings.IMAGE_GEN_FAILURE_PENALTY_MS))
+
+    def p50_ms(self) -> Optional[float]:
+        """Get the median of the recent latencies, if any were observed."""
+        return statistics.median(self.latencies) if self.latencies else None
+
+    def stats(self) -> dict:
+        """Get the current state of the pool."""
+        p50_ms = self.p50_ms()
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "previews": self.previews,
+            "in_flight": self.dispatch.in_use,
+            "queued": self.dispatch.waiting,
+            "p50_ms": round(p50_ms) if p50_ms is not None else None,
+            "samples": len(self.latencies),
+        }
+
+
+class ModelRouter:
+    """Resolves the model of a request and owns the pool of every model."""
+
+    _pools: dict[str, ModelPool]
+    _tiers: dict[str, list[str]]
+
+    def __init__(self):
+        """Create a pool for every allowed model."""
+        preview_models = settings.image_gen_preview_models_list
+        self._pools = {
+            model: ModelPool(model, max_concurrency, model in preview_models)
+            for model, max_concurrency in settings.image_gen_model_concurrency.items()
+        }
+        self._tiers = {
+            tier: [model for model in models if model in self._pools]
+            for tier, models in settings.image_gen_tiers.items()
+        }
+
+    @property
+    def total_concurrency(self) -> int:
+        """Get the maximum number of concurrent calls across all models."""
+        return sum(pool.max_concurrency for pool in self._pools.values())
+
+    def get(self, model: str) -> ModelPool:
+        """Get the pool of an allowed model."""
+        return self._pools[model]
+
+    def tier_of(self, model: str) -> Optional[str]:
+        """Get the tier a model serves, if any."""
+        return next((t for t, models in self._tiers.items() if model in models), None)
+
+    def resolve(self, model: Optional[str] = None, tier: Optional[str] = None) -> str:
+        """
+        Pick the model a request is generated with.
+
+        Args:
+            model: Model selected by the request
+            tier: Tier selected by the request
+
+        Returns:
+            str: The selected model; for a tier, the model of the tier with
+            the lowest observed p50 latency, where failed calls count at a
+            penalty latency. Models that were not observed yet are preferred
+            so every model of the tier gets measured.
+            Without either, the default model.
+
+        Raises:
+            UnknownModelError: If the model or tier is not allowed
+        """
+        if model is not None:
+            if model not in self._pools:
+                raise UnknownModelError(f"Model {model} is not allowed")
+            return model
+
+        if tier is None:
+            return settings.IMAGE_GEN_MODEL
+
+        candidates = self._tiers.get(tier)
+        if not candidates:
+            raise UnknownModelError(f"Tier {tier} has no allowed models")
+        if not settings.IMAGE_GEN_LATENCY_ROUTING:
+            return candidates[0]
+
+        def p50_key(candidate: str) -> float:
+            p50_ms = self._pools[candidate].p50_ms()
+            return p50_ms if p50_ms is not None else -1.0
+
+        return min(candidates, key=p50_key)
+
+    def stats(self) -> list[dict]:
+        """Get the current state of every model pool."""
+        return [
+            {**pool.stats(), "tier": self.tier_of(model)}
+            for model, pool in self._pools.items()
+        ]
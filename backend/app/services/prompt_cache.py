@@ -0,0 +1,388 @@
+"""
+Semantic cache of generated images, looked up by prompt similarity.
+
+Prompts are embedded locally, without a model: the words, word pairs and
+character trigrams of the normalized prompt are hashed into a fixed number
+of dimensions with a random sign (the hashing trick), and the vector is
+L2-normalized so that the dot product of two embeddings is their cosine
+similarity. Character trigrams make near-identical words ("mountain" and
+"mountains") similar, and filler words are dropped.
+
+The embeddings of cached prompts are the rows of a single contiguous
+float32 matrix, so a lookup scores every cached prompt with one matrix
+product (by blocks of rows), for a whole batch of prompts at once. The best
+row of the same model is a hit when its similarity reaches the threshold.
+Rows are reused in least recently used order once the cache is full.
+
+Lookups and additions are not thread-safe and must be made from a single
+thread (the generation service uses a dedicated one, as lookups take
+milliseconds). `expires_in` can be called from another thread meanwhile: a
+row is filled before its prompt maps to it.
+"""
+
+import time
+import zlib
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.search_index import tokenize
+
+# Words that do not change what a prompt depicts
+STOP_WORDS = frozenset(
+    {"a", "an", "and", "at", "by", "for", "in", "is", "of", "on", "the", "to", "with"}
+)
+
+# Weights of the hashed features
+WORD_WEIGHT = 1.0
+PAIR_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.35
+
+# Cached prompts scored at a time, to bound the size of the score matrix
+BLOCK_ROWS = 16384
+# Prompts looked up at a time
+BLOCK_QUERIES = 256
+
+
+class CacheHit(NamedTuple):
+    """A cached prompt similar enough to a looked up prompt."""
+
+    kind: str
+    prompt: str
+    similarity: float
+    urls: tuple[str, ...]
+    prefilled: bool = False
+
+
+class PromptVectorizer:
+    """Embeds prompts as signed hashed n-gram vectors."""
+
+    dim: int
+
+    def __init__(self, dim: int):
+        """
+        Initialize the vectorizer.
+
+        Args:
+            dim: Number of dimensions, a power of two
+
+        Raises:
+            ValueError: If the number of dimensions is not a power of two
+        """
+        if dim <= 0 or dim & (dim - 1):
+            raise ValueError(f"Embedding dimensions must be a power of two: {dim}")
+        self.dim = dim
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Lowercase a prompt and keep its meaningful words only."""
+        return " ".join(w for w in tokenize(prompt) if w not in STOP_WORDS)
+
+    def embed(self, normalized: list[str]) -> np.ndarray:
+        """
+        Embed normalized prompts.
+
+        Args:
+            normalized: Prompts normalized with `normalize`
+
+        Returns:
+            np.ndarray: One L2-normalized float32 row per prompt
+        """
+        rows: list[int] = []
+        columns: list[int] = []
+        values: list[float] = []
+        mask = self.dim - 1
+
+        for row, text in enumerate(normalized):
+            words = text.split()
+            features = [(word, WORD_WEIGHT) for word in words]
+            features.extend(
+                (f"{first} {second}", PAIR_WEIGHT)
+                for first, second in zip(words, words[1:])
+            )
+            for word in words:
+                padded = f"<{word}>"
+                features.extend(
+                    (padded[i : i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2)
+                )
+
+            for feature, weight in features:
+                digest = zlib.crc32(feature.encode())
+                rows.append(row)
+                columns.append(digest & mask)
+                # The top bit of the hash picks the sign, so that collisions
+                # cancel out on average instead of adding up
+                values.append(-weight if digest >> 31 else weight)
+
+        vectors = np.zeros((len(normalized), self.dim), dtype=np.float32)
+        np.add.at(vectors, (rows, columns), values)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        return vectors
+
+
+class PromptCache:
+    """Images of recent prompts, looked up by cosine similarity."""
+
+    max_prompts: int
+    threshold: float
+    ttl: float
+    vectorizer: PromptVectorizer
+    _matrix: np.ndarray
+    _model_codes: np.ndarray
+    _added_at: np.ndarray
+    _entries: list[tuple[str, str, int, tuple[str, ...], bool]]
+    _rows: dict[tuple[str, int], int]
+    _lru: "OrderedDict[int, None]"
+    _models: dict[str, int]
+
+    def __init__(
+        self,
+        max_prompts: int = settings.PROMPT_CACHE_MAX_PROMPTS,
+        dim: int = settings.PROMPT_CACHE_DIM,
+        threshold: float = settings.PROMPT_CACHE_THRESHOLD,
+        ttl_seconds: float = settings.PROMPT_CACHE_TTL_SECONDS,
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_prompts: Number of prompts kept, least recently used evicted
+            dim: Dimensions of the prompt embeddings, a power of two
+            threshold: Cosine similarity from which a cached prompt is a hit
+            ttl_seconds: Time after which the images of a prompt are not
+                served anymore
+        """
+        self.max_prompts = max_prompts
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.vectorizer = PromptVectorizer(dim)
+
+        # Rows are allocated as the cache fills up, up to max_prompts
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._model_codes = np.empty(0, dtype=np.int32)
+        self._added_at = np.empty(0, dtype=np.float64)
+        # Prompt, normalized prompt, model code, image URLs and whether the
+        # images were prefilled ahead of any request, of every row
+        self._entries = []
+        # Row of every normalized prompt and model code
+        self._rows = {}
+        # Rows from least to most recently used
+        self._lru = OrderedDict()
+        self._models = {}
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Get the number of cached prompts."""
+        return len(self._entries)
+
+    def _model_code(self, model: str) -> int:
+        """Get the integer code stored in the rows of a model."""
+        code = self._models.get(model)
+        if code is None:
+            code = self._models[model] = len(self._models)
+        return code
+
+    def add(
+        self, prompt: str, model: str, urls: list[str], prefilled: bool = False
+    ) -> None:
+        """
+        Cache the images generated for a prompt.
+
+        Args:
+            prompt: Generation prompt
+            model: Model the images were generated with
+            urls: URLs of the generated images
+            prefilled: Whether the images were generated ahead of a request
+        """
+        normalized = self.vectorizer.normalize(prompt)
+        code = self._model_code(model)
+        row = self._rows.get((normalized, code))
+        entry = (prompt, normalized, code, tuple(urls), prefilled)
+
+        if row is None:
+            if len(self._entries) < self.max_prompts:
+                row = len(self._entries)
+                self._reserve(row + 1)
+                self._entries.append(entry)
+            else:
+                row, _ = self._lru.popitem(last=False)
+                _, evicted, evicted_code, _, _ = self._entries[row]
+                del self._rows[(evicted, evicted_code)]
+                self._entries[row] = entry
+
+            self._matrix[row] = self.vectorizer.embed([normalized])[0]
+            self._model_codes[row] = code
+            self._added_at[row] = time.monotonic()
+            self._rows[(normalized, code)] = row
+        else:
+            self._entries[row] = entry
+            self._added_at[row] = time.monotonic()
+
+        self._lru[row] = None
+        self._lru.move_to_end(row)
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the row arrays, by doubling, to hold a number of rows."""
+        capacity = len(self._matrix)
+        if rows <= capacity:
+            return
+
+        capacity = min(max(rows, 2 * capacity, 1024), self.max_prompts)
+        matrix = np.empty((capacity, self.vectorizer.dim), dtype=np.float32)
+        matrix[: len(self._matrix)] = self._matrix
+        self._matrix = matrix
+        self._model_codes = np.resize(self._model_codes, capacity)
+        self._added_at = np.resize(self._added_at, capacity)
+
+    def expires_in(self, prompt: str, model: str, num_images: int) -> float:
+        """
+        Get the time left to serve a prompt's cached images, without a lookup.
+
+        Args:
+            prompt: Generation prompt
+            model: Model of the images
+            num_images: Number of images needed
+
+        Returns:
+            float: Seconds until the images of the same normalized prompt
+            expire, or 0 if there are not enough of them
+        """
+        normalized = self.vectorizer.normalize(prompt)
+        row = self._rows.get((normalized, self._models.get(model, -1)))
+        if row is None or len(self._entries[row][3]) < num_images:
+            return 0.0
+        return max(self.ttl - (time.monotonic() - self._added_at[row]), 0.0)
+
+    def lookup(self, prompt: str, model: str, num_images: int) -> Optional[CacheHit]:
+        """Look up a single prompt, see `lookup_batch`."""
+        return self.lookup_batch([(prompt, model, num_images)])[0]
+
+    def lookup_batch(
+        self, queries: list[tuple[str, str, int]]
+    ) -> list[Optional[CacheHit]]:
+        """
+        Find the most similar cached prompt of every query.
+
+        A cached prompt is a hit for a query if it was generated with the
+        same model, has at least the requested number of images that have not
+        expired, and its similarity reaches the threshold (or it normalizes
+        to the same prompt, for an exact hit).
+
+        Args:
+            queries: Prompt, model and number of images of every lookup
+
+        Returns:
+            list[Optional[CacheHit]]: The hit of every query, or None
+        """
+        hits: list[Optional[CacheHit]] = [None] * len(queries)
+        if not self._entries:
+            self.misses += len(queries)
+            return hits
+
+        normalized = [self.vectorizer.normalize(prompt) for prompt, _, _ in queries]
+        rows = np.full(len(queries), -1, dtype=np.intp)
+        scores = np.full(len(queries), -np.inf, dtype=np.float32)
+
+        # Exact hits do not need to be scored, nor prompts of a model with no
+        # cached row, which are misses
+        pending = []
+        codes = []
+        for i, (text, (_, model, _)) in enumerate(zip(normalized, queries)):
+            code = self._models.get(model)
+            if code is None:
+                continue
+            row = self._rows.get((text, code))
+            if row is not None:
+                rows[i], scores[i] = row, 1.0
+            else:
+                pending.append(i)
+                codes.append(code)
+
+        for start in range(0, len(pending), BLOCK_QUERIES):
+            block = pending[start : start + BLOCK_QUERIES]
+            vectors = self.vectorizer.embed([normalized[i] for i in block])
+            block_codes = np.array(codes[start : start + BLOCK_QUERIES], dtype=np.int32)
+            rows[block], scores[block] = self._best_rows(vectors, block_codes)
+
+        now = time.monotonic()
+        for i, (_, _, num_images) in enumerate(queries):
+            row = rows[i]
+            if row < 0 or scores[i] < self.threshold:
+                self.misses += 1
+                continue
+
+            prompt, text, _, urls, prefilled = self._entries[row]
+            if len(urls) < num_images or now - self._added_at[row] > self.ttl:
+                self.misses += 1
+                continue
+
+            exact = text == normalized[i]
+            if exact:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            self._lru.move_to_end(row)
+            hits[i] = CacheHit(
+                kind="exact" if exact else "near",
+                prompt=prompt,
+                similarity=round(float(min(scores[i], 1.0)), 3),
+                urls=urls[:num_images],
+                prefilled=prefilled,
+            )
+
+        return hits
+
+    def _best_rows(
+        self, vectors: np.ndarray, codes: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the most similar cached row of the same model for every vector.
+
+        Args:
+            vectors: Embeddings to look up
+            codes: Model code of every embedding, of a model with cached rows
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Best row of every embedding (-1
+            when no row has the same model) and its similarity
+        """
+        size = len(self._entries)
+        queries = np.arange(len(vectors))
+        best_rows = np.full(len(vectors), -1, dtype=np.intp)
+        best_scores = np.full(len(vectors), -np.inf, dtype=np.float32)
+        # With a single model, every row has the model of every query, since
+        # queries of other models were not looked up
+        mixed_models = len(self._models) > 1
+
+        for start in range(0, size, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, size)
+            scores = vectors @ self._matrix[start:end].T
+            if mixed_models:
+                scores[codes[:, None] != self._model_codes[None, start:end]] = -np.inf
+
+            rows = scores.argmax(axis=1)
+            top = scores[queries, rows]
+            better = top > best_scores
+            best_rows[better] = rows[better] + start
+            best_scores[better] = top[better]
+
+        return best_rows, best_scores
+
+    def stats(self) -> dict:
+        """Get the size and hit counts of the cache."""
+        return {
+            "prompts": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+        }
+
+
+# Global prompt cache instance
+prompt_cache = PromptCache()
@@ -0,0 +1,287 @@
+"""
+Service for personalized show recommendations.
+
+Every show is encoded once as a dense feature vector (multi-hot genres,
+normalized release year and rating) into a single matrix. A user's profile
+is a vector in the same space, built from the shows in their My List and the
+genres mentioned in their recent generation prompts, so scoring every show
+is a single matrix product and the top picks are selected with
+`np.argpartition` instead of sorting the whole catalog.
+
+Recommendations are cached per user and invalidated when the user's My List
+or generation history changes, or when the catalog is reloaded.
+"""
+
+import logging
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.http_cache import CachedPayload
+from app.services.catalog_service import TOP_PICKS_ROW_ID, catalog_service
+from app.services.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Words in generation prompts that hint at an interest in a genre, on top of
+# the genre name itself
+GENRE_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "action": ("battle", "chase", "explosion", "fight", "hero", "warrior"),
+    "comedy": ("cartoon", "comic", "funny", "joke", "silly"),
+    "documentary": ("history", "nature", "wildlife"),
+    "drama": ("emotional", "family", "tragedy"),
+    "horror": ("ghost", "haunted", "monster", "scary", "vampire", "zombie"),
+    "romance": ("couple", "kiss", "love", "romantic", "wedding"),
+    "sci-fi": ("alien", "cyberpunk", "futuristic", "galaxy", "robot", "space"),
+    "thriller": ("detective", "heist", "mystery", "spy"),
+}
+
+# Weights of the profile components. Genre affinities from My List and from
+# prompts are scaled to [0, 1] before weighting, like the year and rating.
+MY_LIST_WEIGHT = 1.0
+GENERATION_WEIGHT = 0.5
+RECENCY_WEIGHT = 0.2
+RATING_WEIGHT = 0.5
+
+# Stride of the sample of scores used to bound the k-th highest score
+SAMPLE_STRIDE = 16
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Get the indices of the k highest scores, best first.
+
+    Large inputs are first narrowed down to the scores at least as high as
+    the k-th highest score of a strided sample, which is a lower bound of the
+    k-th highest score overall. The exact top k is then selected with
+    `np.argpartition` over those candidates only, and only they are sorted.
+
+    Args:
+        scores: Scores of every show
+        k: Number of indices to select
+
+    Returns:
+        np.ndarray: Indices of the k highest scores, best first. Indices with
+        a score of -inf are left out.
+    """
+    candidates = None
+    if k > 0 and len(scores) >= 4 * SAMPLE_STRIDE * k:
+        sample = scores[::SAMPLE_STRIDE]
+        bound = np.partition(sample, len(sample) - k)[len(sample) - k]
+        candidates = np.flatnonzero(scores >= bound)
+        scores = scores[candidates]
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    top = top[np.isfinite(scores[top])]
+    return candidates[top] if candidates is not None else top
+
+
+class RecommendationService:
+    """Service for a user's My List and their "Top Picks for You" row."""
+
+    _my_lists: dict[str, dict[str, None]]
+    _prompts: dict[str, deque[str]]
+    _cache: "OrderedDict[str, CachedPayload]"
+    _features: np.ndarray
+    _genre_columns: dict[str, int]
+    _catalog_version: int
+
+    def __init__(self):
+        """Initialize the recommendation service."""
+        # Show IDs in a user's My List, in the order they were added
+        self._my_lists = {}
+        # Most recent generation prompts of every user
+        self._prompts = {}
+        self._cache = OrderedDict()
+        self._catalog_version = -1
+        self._ensure_features()
+
+    def _ensure_features(self) -> None:
+        """Rebuild the feature matrix if the catalog changed since it was built."""
+        if self._catalog_version == catalog_service.version:
+            return
+
+        features, genres = catalog_service.get_features()
+        genre_columns = {genre: i for i, genre in enumerate(genres)}
+
+        self._features = features
+        self._genre_columns = genre_columns
+        self._catalog_version = catalog_service.version
+        self._cache.clear()
+
+        logger.info(
+            f"Built recommendation features for {len(features)} shows "
+            f"and {len(genres)} genres"
+        )
+
+    def get_my_list(self, user_id: str) -> list[int]:
+        """Get the catalog positions of the shows in a user's My List."""
+        positions = (
+            catalog_service.get_show_position(show_id)
+            for show_id in self._my_lists.get(user_id, ())
+        )
+        return [position for position in positions if position is not None]
+
+    def add_to_my_list(self, user_id: str, show_id: str) -> None:
+        """Add a show to a user's My List."""
+        self._my_lists.setdefault(user_id, {})[show_id] = None
+        self._cache.pop(user_id, None)
+
+    def remove_from_my_list(self, user_id: str, show_id: str) -> None:
+        """Remove a show from a user's My List."""
+        self._my_lists.get(user_id, {}).pop(show_id, None)
+        self._cache.pop(user_id, None)
+
+    def record_generation(self, user_id: str, prompt: str) -> None:
+        """Record a generation prompt of a user, as a signal of their interests."""
+        prompts = self._prompts.get(user_id)
+        if prompts is None:
+            prompts = self._prompts[user_id] = deque(
+                maxlen=settings.RECOMMENDATIONS_MAX_PROMPTS
+            )
+        prompts.append(prompt)
+        self._cache.pop(user_id, None)
+
+    def _prompt_genres(self, prompt: str) -> list[int]:
+        """Get the genre columns a generation prompt hints at."""
+        tokens = set(tokenize(prompt))
+        columns = []
+        for genre, column in self._genre_columns.items():
+            keywords = GENRE_KEYWORDS.get(genre, ())
+            if set(tokenize(genre)) <= tokens or not tokens.isdisjoint(keywords):
+                columns.append(column)
+        return columns
+
+    def profile(self, user_id: str) -> np.ndarray:
+        """
+        Build a user's profile vector, in the same space as show features.
+
+        Users without a My List or generation history get a profile that
+        only weighs rating and recency, which ranks shows by popularity.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            np.ndarray: Profile vector
+        """
+        self._ensure_features()
+        num_genres = len(self._genre_columns)
+        vector = np.zeros(num_genres + 2, dtype=np.float32)
+
+        positions = self.get_my_list(user_id)
+        if positions:
+            affinity = self._features[positions, :num_genres].mean(axis=0)
+            vector[:num_genres] += MY_LIST_WEIGHT * affinity
+
+        prompts = self._prompts.get(user_id)
+        if prompts:
+            counts = np.zeros(num_genres, dtype=np.float32)
+            for prompt in prompts:
+                counts[self._prompt_genres(prompt)] += 1
+            vector[:num_genres] += GENERATION_WEIGHT * counts / len(prompts)
+
+        vector[-2] = RECENCY_WEIGHT
+        vector[-1] = RATING_WEIGHT
+        return vector
+
+    def recommend_batch(
+        self, user_ids: list[str], k: int, chunk_size: int = 64
+    ) -> list[np.ndarray]:
+        """
+        Compute the top picks of many users at once.
+
+        Profiles are stacked into a matrix and scored against every show with
+        one matrix product per chunk of users, so memory stays bounded at
+        `chunk_size` x number of shows scores.
+
+        Args:
+            user_ids: Users to compute recommendations for
+            k: Number of shows to recommend to every user
+            chunk_size: Number of users scored together
+
+        Returns:
+            list[np.ndarray]: Catalog positions of the top picks of every
+            user, best first. Shows in the user's My List are excluded.
+        """
+        self._ensure_features()
+        features_t = np.ascontiguousarray(self._features.T)
+
+        results = []
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start : start + chunk_size]
+            profiles = np.stack([self.profile(user_id) for user_id in chunk])
+            scores = profiles @ features_t
+
+            for row, user_id in enumerate(chunk):
+                scores[row, self.get_my_list(user_id)] = -np.inf
+                results.append(top_k(scores[row], k))
+
+        return results
+
+    def recommend(self, user_id: str, k: int) -> np.ndarray:
+        """
+        Compute the top picks of a user.
+
+        Args:
+            user_id: User identifier
+            k: Number of shows to recommend
+
+        Returns:
+            np.ndarray: Catalog positions of the top picks, best first.
+            Shows in the user's My List are excluded.
+        """
+        self._ensure_features()
+        scores = self._features @ self.profile(user_id)
+        scores[self.get_my_list(user_id)] = -np.inf
+        return top_k(scores, k)
+
+    def get_top_picks(self, user_id: str) -> CachedPayload:
+        """
+        Get the "Top Picks for You" row of a user.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            CachedPayload: Pre-serialized `ShowRowPage`
+        """
+        self._ensure_features()
+        payload = self._cache.get(user_id)
+        if payload is not None:
+            self._cache.move_to_end(user_id)
+            return payload
+
+        positions = self.recommend(user_id, settings.RECOMMENDATIONS_SIZE)
+        return self._store(user_id, positions)
+
+    def precompute(self, user_ids: list[str]) -> None:
+        """
+        Compute and cache the top picks of many users in batch mode.
+
+        Args:
+            user_ids: Users to compute recommendations for
+        """
+        results = self.recommend_batch(user_ids, settings.RECOMMENDATIONS_SIZE)
+        for user_id, positions in zip(user_ids, results):
+            self._store(user_id, positions)
+
+        logger.info(f"Precomputed top picks for {len(user_ids)} users")
+
+    def _store(self, user_id: str, positions: np.ndarray) -> CachedPayload:
+        """Serialize a user's top picks and add them to the LRU cache."""
+        body = catalog_service.render_row_page(TOP_PICKS_ROW_ID, positions.tolist())
+        payload = self._cache[user_id] = CachedPayload(body)
+        if len(self._cache) > settings.RECOMMENDATIONS_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return payload
+
+
+# Global recommendation service instance
+recommendation_service = RecommendationService()
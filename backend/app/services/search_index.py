@@ -0,0 +1,851 @@
+"""
+In-memory inverted index for searching the show catalog.
+
+The index is made of two segments:
+
+- A main segment, built in bulk, where documents are numbered in rank order
+  (rating first). Posting lists are stored roaring-style: terms found in few
+  documents keep a sorted `uint32` id array (all of them packed in a single
+  CSR buffer), while frequent terms, genres and years are bitsets. Since ids
+  follow rank order, the top results of a query are simply its lowest ids.
+- A small delta segment that receives shows added after the build. It is
+  merged into a new main segment, built in a background thread, once it
+  grows past `SEARCH_DELTA_MAX_DOCS`.
+
+The main segment is made of flat arrays only (strings are packed in string
+tables), so it can be saved to a catalog snapshot and used straight from the
+memory-mapped file.
+
+Queries match every token; the last token also matches as a prefix (for
+typeahead) and tokens with no match fall back to infix matching through a
+trigram index over the vocabulary. Shows matching every token in the title
+rank above shows that only match across title, description and genres.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.snapshot import StringTable
+from app.models.catalog import Show
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Posting lists covering more than 1/DENSE_RATIO of the documents are bitsets,
+# which is where a bitset becomes smaller than a uint32 id array
+DENSE_RATIO = 32
+
+# Upper bound used to find every term starting with a prefix
+_PREFIX_END = "\U0010ffff"
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _trigrams(term: str) -> set[str]:
+    """Get the trigrams of a term."""
+    return {term[i : i + 3] for i in range(len(term) - 2)}
+
+
+def _show_terms(show: Show) -> tuple[set[str], set[str]]:
+    """Get the title terms and all searchable terms of a show."""
+    title = set(tokenize(show.title))
+    text = set(tokenize(show.description))
+    for genre in show.genre:
+        text.update(tokenize(genre))
+    return title, title | text
+
+
+class _Match(NamedTuple):
+    """Documents of a segment: the union of sorted ids and a bitset."""
+
+    ids: Optional[np.ndarray]
+    bits: Optional[np.ndarray]
+
+
+def _test_bits(bits: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Check which ids are set in a bitset."""
+    words = bits[ids >> 6]
+    return ((words >> (ids & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def _ids_to_bits(ids: np.ndarray, num_words: int) -> np.ndarray:
+    """Build a bitset from sorted ids."""
+    mask = np.zeros(num_words * 64, dtype=bool)
+    mask[ids] = True
+    return np.packbits(mask, bitorder="little").view("<u8")
+
+
+def _iter_bit_ids(bits: np.ndarray) -> Iterator[np.ndarray]:
+    """Iterate over the ids set in a bitset, in ascending chunks."""
+    nonzero = np.flatnonzero(bits)
+    for start in range(0, len(nonzero), 64):
+        words = nonzero[start : start + 64]
+        unpacked = np.unpackbits(bits[words].view(np.uint8), bitorder="little").reshape(
+            -1, 64
+        )
+        rows, cols = np.nonzero(unpacked)
+        yield words[rows] * 64 + cols
+
+
+def _contains(match: _Match, ids: np.ndarray) -> np.ndarray:
+    """Check which ids are part of a match."""
+    found = np.zeros(len(ids), dtype=bool)
+    if match.ids is not None and len(match.ids):
+        positions = np.searchsorted(match.ids, ids)
+        positions[positions == len(match.ids)] = 0
+        found |= match.ids[positions] == ids
+    if match.bits is not None:
+        found |= _test_bits(match.bits, ids)
+    return found
+
+
+def _count(match: _Match) -> int:
+    """Count the documents of a query result."""
+    if match.bits is not None:
+        return int(np.bitwise_count(match.bits).sum())
+    return len(match.ids)
+
+
+def _first_ids(match: _Match, k: int, exclude: Optional[_Match] = None) -> list[int]:
+    """Get the k lowest (best ranked) ids of a query result."""
+    if k <= 0:
+        return []
+
+    chunks = (
+        _iter_bit_ids(match.bits)
+        if match.bits is not None
+        else (match.ids[i : i + 1024] for i in range(0, len(match.ids), 1024))
+    )
+
+    found: list[int] = []
+    for chunk in chunks:
+        if exclude is not None:
+            chunk = chunk[~_contains(exclude, chunk)]
+        found.extend(chunk[: k - len(found)].tolist())
+        if len(found) >= k:
+            break
+    return found
+
+
+class _PostingStore:
+    """Posting lists of one field of the main segment."""
+
+    terms: Sequence[str]
+    _offsets: np.ndarray
+    _ids: np.ndarray
+    _dense_term_ids: np.ndarray
+    _dense_bits: np.ndarray
+
+    def __init__(self, postings: dict[str, list[int]], num_docs: int):
+        """
+        Pack posting lists into sparse id arrays and dense bitsets.
+
+        Args:
+            postings: Sorted document ids per term
+            num_docs: Number of documents in the segment
+        """
+        self.terms = sorted(postings)
+        num_words = (num_docs + 63) // 64
+        dense_threshold = max(num_docs // DENSE_RATIO, 64)
+
+        dense_term_ids = []
+        dense_parts = []
+        lengths = np.zeros(len(self.terms), dtype=np.int64)
+        sparse_parts = []
+        for term_id, term in enumerate(self.terms):
+            ids = np.asarray(postings[term], dtype=np.uint32)
+            if len(ids) > dense_threshold:
+                dense_term_ids.append(term_id)
+                dense_parts.append(_ids_to_bits(ids, num_words))
+            else:
+                lengths[term_id] = len(ids)
+                sparse_parts.append(ids)
+
+        # Sparse postings of consecutive terms are adjacent in one buffer
+        self._offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._offsets[1:])
+        self._ids = (
+            np.concatenate(sparse_parts)
+            if sparse_parts
+            else np.zeros(0, dtype=np.uint32)
+        )
+        # Bitsets of the dense terms, one row per term in term id order
+        self._dense_term_ids = np.array(dense_term_ids, dtype=np.int64)
+        self._dense_bits = (
+            np.stack(dense_parts)
+            if dense_parts
+            else np.zeros((0, num_words), dtype=np.uint64)
+        )
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Get the arrays the store is made of, to save it."""
+        term_offsets, term_data = StringTable.pack(self.terms)
+        return {
+            "term_offsets": term_offsets,
+            "term_data": term_data,
+            "offsets": self._offsets,
+            "ids": self._ids,
+            "dense_term_ids": self._dense_term_ids,
+            "dense_bits": self._dense_bits,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "_PostingStore":
+        """Rebuild a store from its saved arrays, without copying them."""
+        store = cls.__new__(cls)
+        store.terms = StringTable(arrays["term_offsets"], arrays["term_data"])
+        store._offsets = arrays["offsets"]
+        store._ids = arrays["ids"]
+        store._dense_term_ids = arrays["dense_term_ids"]
+        store._dense_bits = arrays["dense_bits"]
+        return store
+
+    def term_range(self, token: str, is_prefix: bool) -> tuple[int, int]:
+        """
+        Find the term ids matching a token.
+
+        Args:
+            token: Query token
+            is_prefix: Whether terms starting with the token also match
+
+        Returns:
+            Range of matching term ids, capped at `SEARCH_MAX_EXPANSIONS` terms
+        """
+        lo = bisect.bisect_left(self.terms, token)
+        if not is_prefix:
+            found = lo < len(self.terms) and self.terms[lo] == token
+            return lo, lo + 1 if found else lo
+        hi = bisect.bisect_left(self.terms, token + _PREFIX_END, lo)
+        return lo, min(hi, lo + settings.SEARCH_MAX_EXPANSIONS)
+
+    def span(self, first: str, last: str) -> tuple[int, int]:
+        """Find the range of term ids between two terms (inclusive)."""
+        lo = bisect.bisect_left(self.terms, first)
+        return lo, bisect.bisect_right(self.terms, last, lo)
+
+    def match_range(self, lo: int, hi: int) -> Optional[_Match]:
+        """Get the union of the postings of a range of term ids."""
+        if lo >= hi:
+            return None
+
+        ids = self._ids[self._offsets[lo] : self._offsets[hi]]
+        if hi - lo > 1:
+            ids = np.unique(ids)
+
+        dense_lo, dense_hi = np.searchsorted(self._dense_term_ids, [lo, hi]).tolist()
+        bits = None
+        for term_bits in self._dense_bits[dense_lo:dense_hi]:
+            bits = term_bits if bits is None else bits | term_bits
+
+        return _Match(ids if len(ids) else None, bits)
+
+    def match_terms(self, terms: list[str]) -> Optional[_Match]:
+        """Get the union of the postings of a list of terms."""
+        matches = []
+        for term in terms:
+            lo, hi = self.term_range(term, is_prefix=False)
+            match = self.match_range(lo, hi)
+            if match is not None:
+                matches.append(match)
+        return _union(matches)
+
+
+def _union(matches: list[_Match]) -> Optional[_Match]:
+    """Get the union of several matches."""
+    if len(matches) <= 1:
+        return matches[0] if matches else None
+
+    id_parts = [m.ids for m in matches if m.ids is not None]
+    bit_parts = [m.bits for m in matches if m.bits is not None]
+    ids = np.unique(np.concatenate(id_parts)) if id_parts else None
+    bits = np.bitwise_or.reduce(bit_parts) if bit_parts else None
+    return _Match(ids, bits)
+
+
+class _TrigramTable:
+    """Vocabulary term ids of every trigram, in sorted CSR form."""
+
+    trigrams: Sequence[str]
+    offsets: np.ndarray
+    term_ids: np.ndarray
+
+    def __init__(
+        self, trigrams: Sequence[str], offsets: np.ndarray, term_ids: np.ndarray
+    ):
+        """
+        Wrap the table.
+
+        Args:
+            trigrams: Sorted trigrams
+            offsets: Start of the term ids of every trigram, then their end
+            term_ids: Sorted term ids of every trigram, concatenated
+        """
+        self.trigrams = trigrams
+        self.offsets = offsets
+        self.term_ids = term_ids
+
+    @classmethod
+    def build(cls, terms: Sequence[str]) -> "_TrigramTable":
+        """Build the table of a vocabulary."""
+        trigram_terms: dict[str, list[int]] = {}
+        for term_id, term in enumerate(terms):
+            for trigram in _trigrams(term):
+                trigram_terms.setdefault(trigram, []).append(term_id)
+
+        trigrams = sorted(trigram_terms)
+        offsets = np.zeros(len(trigrams) + 1, dtype=np.int64)
+        np.cumsum([len(trigram_terms[t]) for t in trigrams], out=offsets[1:])
+        term_ids = np.fromiter(
+            (term_id for t in trigrams for term_id in trigram_terms[t]),
+            dtype=np.int64,
+            count=int(offsets[-1]),
+        )
+        return cls(trigrams, offsets, term_ids)
+
+    def get(self, trigram: str) -> Optional[np.ndarray]:
+        """Get the term ids of a trigram, or None if no term contains it."""
+        i = bisect.bisect_left(self.trigrams, trigram)
+        if i == len(self.trigrams) or self.trigrams[i] != trigram:
+            return None
+        return self.term_ids[self.offsets[i] : self.offsets[i + 1]]
+
+
+class _Segment:
+    """Immutable, rank-ordered part of the index."""
+
+    def __init__(self, docs: list[tuple[int, Show]]):
+        """
+        Build the segment.
+
+        Args:
+            docs: Catalog positions and shows to index
+        """
+        # Local ids follow rank order: best rated first, then catalog order
+        docs = sorted(docs, key=lambda doc: (-doc[1].rating, doc[0]))
+        num_docs = len(docs)
+        self.num_words = (num_docs + 63) // 64
+        self.positions = np.fromiter((p for p, _ in docs), np.int64, num_docs)
+        self.ratings = np.fromiter((s.rating for _, s in docs), np.float64, num_docs)
+
+        title_postings: dict[str, list[int]] = {}
+        text_postings: dict[str, list[int]] = {}
+        genres: dict[str, list[int]] = {}
+        years: dict[int, list[int]] = {}
+        for local_id, (_, show) in enumerate(docs):
+            title, text = _show_terms(show)
+            for term in title:
+                title_postings.setdefault(term, []).append(local_id)
+            for term in text:
+                text_postings.setdefault(term, []).append(local_id)
+            for genre in show.genre:
+                genres.setdefault(genre.lower(), []).append(local_id)
+            years.setdefault(show.year, []).append(local_id)
+
+        self.title = _PostingStore(title_postings, num_docs)
+        self.text = _PostingStore(text_postings, num_docs)
+
+        # Filters are always bitsets so they intersect with a single AND
+        self.genre_bits = {
+            genre: _ids_to_bits(np.asarray(ids, np.uint32), self.num_words)
+            for genre, ids in genres.items()
+        }
+        self.year_bits = {
+            year: _ids_to_bits(np.asarray(ids, np.uint32), self.num_words)
+            for year, ids in years.items()
+        }
+        self.all_bits = _ids_to_bits(np.arange(num_docs), self.num_words)
+
+        # Trigrams of the vocabulary (text terms include title terms)
+        self.trigram_terms = _TrigramTable.build(self.text.terms)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Get the arrays the segment is made of, to save it."""
+        genres = sorted(self.genre_bits)
+        years = sorted(self.year_bits)
+        genre_offsets, genre_data = StringTable.pack(genres)
+        trigram_offsets, trigram_data = StringTable.pack(self.trigram_terms.trigrams)
+        arrays = {
+            "positions": self.positions,
+            "ratings": self.ratings,
+            "all_bits": self.all_bits,
+            "genre_offsets": genre_offsets,
+            "genre_data": genre_data,
+            "genre_bits": (
+                np.stack([self.genre_bits[genre] for genre in genres])
+                if genres
+                else np.zeros((0, self.num_words), dtype=np.uint64)
+            ),
+            "years": np.array(years, dtype=np.int64),
+            "year_bits": (
+                np.stack([self.year_bits[year] for year in years])
+                if years
+                else np.zeros((0, self.num_words), dtype=np.uint64)
+            ),
+            "trigram_offsets": trigram_offsets,
+            "trigram_data": trigram_data,
+            "trigram_term_offsets": self.trigram_terms.offsets,
+            "trigram_term_ids": self.trigram_terms.term_ids,
+        }
+        for field, store in (("title", self.title), ("text", self.text)):
+            for name, array in store.to_arrays().items():
+                arrays[f"{field}.{name}"] = array
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "_Segment":
+        """Rebuild a segment from its saved arrays, without copying them."""
+        segment = cls.__new__(cls)
+        segment.positions = arrays["positions"]
+        segment.ratings = arrays["ratings"]
+        segment.all_bits = arrays["all_bits"]
+        segment.num_words = len(segment.all_bits)
+
+        genres = StringTable(arrays["genre_offsets"], arrays["genre_data"])
+        segment.genre_bits = dict(zip(genres, arrays["genre_bits"]))
+        segment.year_bits = dict(zip(arrays["years"].tolist(), arrays["year_bits"]))
+        segment.trigram_terms = _TrigramTable(
+            StringTable(arrays["trigram_offsets"], arrays["trigram_data"]),
+            arrays["trigram_term_offsets"],
+            arrays["trigram_term_ids"],
+        )
+
+        for field in ("title", "text"):
+            prefix = f"{field}."
+            store = _PostingStore.from_arrays(
+                {
+                    name[len(prefix) :]: array
+                    for name, array in arrays.items()
+                    if name.startswith(prefix)
+                }
+            )
+            setattr(segment, field, store)
+        return segment
+
+    def _infix_terms(self, token: str) -> list[str]:
+        """Find vocabulary terms containing the token, via the trigram index."""
+        candidates = None
+        for trigram in _trigrams(token):
+            term_ids = self.trigram_terms.get(trigram)
+            if term_ids is None:
+                return []
+            candidates = (
+                term_ids
+                if candidates is None
+                else np.intersect1d(candidates, term_ids, assume_unique=True)
+            )
+
+        terms = []
+        for term_id in candidates.tolist():
+            term = self.text.terms[term_id]
+            if token in term:
+                terms.append(term)
+                if len(terms) >= settings.SEARCH_MAX_EXPANSIONS:
+                    break
+        return terms
+
+    def _resolve(self, tokens: list[str]) -> Optional[list]:
+        """
+        Resolve every token to the vocabulary terms it matches.
+
+        Returns:
+            Per token, either the (first, last) terms of a contiguous range of
+            the vocabulary or a list of infix matches. None if a token has no
+            match at all.
+        """
+        specs: list = []
+        for i, token in enumerate(tokens):
+            lo, hi = self.text.term_range(token, is_prefix=i == len(tokens) - 1)
+            if lo < hi:
+                specs.append((self.text.terms[lo], self.text.terms[hi - 1]))
+                continue
+
+            terms = self._infix_terms(token) if len(token) >= 3 else []
+            if not terms:
+                return None
+            specs.append(terms)
+        return specs
+
+    @staticmethod
+    def _matches(store: _PostingStore, specs: list) -> Optional[list[_Match]]:
+        """Get the match of every resolved token in a field."""
+        matches = []
+        for spec in specs:
+            if isinstance(spec, tuple):
+                match = store.match_range(*store.span(*spec))
+            else:
+                match = store.match_terms(spec)
+            if match is None:
+                return None
+            matches.append(match)
+        return matches
+
+    def _intersect(self, matches: list[_Match], filters: list[np.ndarray]) -> _Match:
+        """Intersect token matches and filter bitsets."""
+        sparse = [m for m in matches if m.bits is None]
+        if sparse:
+            # Start from the smallest id list and probe everything else
+            base = min(sparse, key=lambda m: len(m.ids))
+            ids = base.ids
+            for match in matches:
+                if match is not base:
+                    ids = ids[_contains(match, ids)]
+            for bits in filters:
+                ids = ids[_test_bits(bits, ids)]
+            return _Match(ids, None)
+
+        bits = self.all_bits
+        for match in matches:
+            match_bits = match.bits
+            if match.ids is not None:
+                match_bits = match_bits | _ids_to_bits(match.ids, self.num_words)
+            bits = bits & match_bits
+        for filter_bits in filters:
+            bits = bits & filter_bits
+        return _Match(None, bits)
+
+    def _filters(
+        self, genre: Optional[str], year_from: Optional[int], year_to: Optional[int]
+    ) -> Optional[list[np.ndarray]]:
+        """Get the filter bitsets, or None if a filter matches nothing."""
+        filters = []
+        if genre is not None:
+            genre_bits = self.genre_bits.get(genre.lower())
+            if genre_bits is None:
+                return None
+            filters.append(genre_bits)
+
+        if year_from is not None or year_to is not None:
+            year_parts = [
+                bits
+                for year, bits in self.year_bits.items()
+                if (year_from is None or year >= year_from)
+                and (year_to is None or year <= year_to)
+            ]
+            if not year_parts:
+                return None
+            filters.append(np.bitwise_or.reduce(year_parts))
+
+        return filters
+
+    def search(
+        self,
+        tokens: list[str],
+        genre: Optional[str],
+        year_from: Optional[int],
+        year_to: Optional[int],
+        k: int,
+    ) -> tuple[int, list[tuple[int, float, int]]]:
+        """
+        Search the segment.
+
+        Returns:
+            The number of matches, and up to k best matches as
+            (tier, -rating, position) tuples in rank order
+        """
+        filters = self._filters(genre, year_from, year_to)
+        if filters is None:
+            return 0, []
+
+        if not tokens:
+            result = self._intersect([], filters)
+            return _count(result), self._ranked(0, _first_ids(result, k))
+
+        # Terms are resolved once against the full vocabulary, so title
+        # matches are always a subset of text matches
+        specs = self._resolve(tokens)
+        text_matches = self._matches(self.text, specs) if specs else None
+        if text_matches is None:
+            return 0, []
+        text_result = self._intersect(text_matches, filters)
+
+        # Shows matching every token in the title rank first
+        title_matches = self._matches(self.title, specs)
+        if title_matches is None:
+            title_ids: list[int] = []
+            other_ids = _first_ids(text_result, k)
+        else:
+            title_result = self._intersect(title_matches, filters)
+            title_ids = _first_ids(title_result, k)
+            other_ids = _first_ids(text_result, k - len(title_ids), title_result)
+
+        ranked = self._ranked(0, title_ids) + self._ranked(1, other_ids)
+        return _count(text_result), ranked
+
+    def _ranked(self, tier: int, local_ids: list[int]) -> list[tuple[int, float, int]]:
+        """Convert local ids to sortable (tier, -rating, position) tuples."""
+        return [
+            (tier, -float(self.ratings[i]), int(self.positions[i])) for i in local_ids
+        ]
+
+
+class _DeltaSegment:
+    """Small, mutable part of the index receiving newly added shows."""
+
+    def __init__(self):
+        """Initialize an empty delta segment."""
+        self.docs: list[tuple[int, float]] = []
+        # (-rating, position, local id) of every document, in rank order
+        self.ranked: list[tuple[float, int, int]] = []
+        self.title: dict[str, set[int]] = {}
+        self.text: dict[str, set[int]] = {}
+        self.vocab: list[str] = []
+        self.genres: dict[str, set[int]] = {}
+        self.years: dict[int, set[int]] = {}
+
+    def add(self, position: int, show: Show) -> None:
+        """Index a show."""
+        local_id = len(self.docs)
+        self.docs.append((position, show.rating))
+        bisect.insort(self.ranked, (-show.rating, position, local_id))
+
+        title, text = _show_terms(show)
+        for term in title:
+            self.title.setdefault(term, set()).add(local_id)
+        for term in text:
+            if term not in self.text:
+                self.text[term] = set()
+                bisect.insort(self.vocab, term)
+            self.text[term].add(local_id)
+        for genre in show.genre:
+            self.genres.setdefault(genre.lower(), set()).add(local_id)
+        self.years.setdefault(show.year, set()).add(local_id)
+
+    def _terms(self, token: str, is_prefix: bool) -> list[str]:
+        """Find the vocabulary terms matching a token."""
+        if not is_prefix:
+            if token in self.text:
+                return [token]
+        else:
+            lo = bisect.bisect_left(self.vocab, token)
+            hi = bisect.bisect_left(self.vocab, token + _PREFIX_END, lo)
+            if lo < hi:
+                return self.vocab[lo : min(hi, lo + settings.SEARCH_MAX_EXPANSIONS)]
+        if len(token) < 3:
+            return []
+        return [t for t in self.vocab if token in t][: settings.SEARCH_MAX_EXPANSIONS]
+
+    def _match(
+        self, field: dict[str, set[int]], token_terms: list[list[str]]
+    ) -> set[int]:
+        """Get the documents matching every resolved token in a field."""
+        result: Optional[set[int]] = None
+        for terms in token_terms:
+            token_ids: set[int] = set()
+            for term in terms:
+                token_ids |= field.get(term, set())
+            result = token_ids if result is None else result & token_ids
+            if not result:
+                return set()
+        return result if result is not None else set(range(len(self.docs)))
+
+    def _top(
+        self, tier: int, ids: set[int], k: int, exclude: set[int]
+    ) -> list[tuple[int, float, int]]:
+        """Get the k best ranked documents of a set."""
+        if k <= 0:
+            return []
+
+        if len(ids) <= 8 * k:
+            ranked = sorted(
+                (-self.docs[i][1], self.docs[i][0]) for i in ids if i not in exclude
+            )
+            return [(tier, neg_rating, position) for neg_rating, position in ranked[:k]]
+
+        # Large sets: walk the rank order and stop after k matches
+        top = []
+        for neg_rating, position, local_id in self.ranked:
+            if local_id in ids and local_id not in exclude:
+                top.append((tier, neg_rating, position))
+                if len(top) >= k:
+                    break
+        return top
+
+    def search(
+        self,
+        tokens: list[str],
+        genre: Optional[str],
+        year_from: Optional[int],
+        year_to: Optional[int],
+        k: int,
+    ) -> tuple[int, list[tuple[int, float, int]]]:
+        """
+        Search the segment.
+
+        Returns:
+            The number of matches, and up to k best matches as
+            (tier, -rating, position) tuples in rank order
+        """
+        if not self.docs:
+            return 0, []
+
+        # Terms are resolved once, so title matches are a subset of text ones
+        token_terms = [
+            self._terms(token, is_prefix=i == len(tokens) - 1)
+            for i, token in enumerate(tokens)
+        ]
+        text_ids = self._match(self.text, token_terms)
+        title_ids = self._match(self.title, token_terms) if tokens else text_ids
+
+        allowed = None
+        if genre is not None:
+            allowed = self.genres.get(genre.lower(), set())
+        if year_from is not None or year_to is not None:
+            year_ids = set().union(
+                *(
+                    ids
+                    for year, ids in self.years.items()
+                    if (year_from is None or year >= year_from)
+                    and (year_to is None or year <= year_to)
+                )
+            )
+            allowed = year_ids if allowed is None else allowed & year_ids
+        if allowed is not None:
+            text_ids = text_ids & allowed
+            title_ids = title_ids & allowed
+
+        top = self._top(0, title_ids, k, set())
+        top += self._top(1, text_ids, k - len(top), title_ids)
+        return len(text_ids), top
+
+
+class SearchIndex:
+    """Ranked full-text search over shows with genre and year filters."""
+
+    _docs: Sequence[Show]
+    _segments: tuple[_Segment, _DeltaSegment]
+    _lock: threading.Lock
+    _merge_thread: Optional[threading.Thread]
+
+    def __init__(
+        self,
+        shows: Sequence[Show],
+        arrays: Optional[dict[str, np.ndarray]] = None,
+    ):
+        """
+        Build the index.
+
+        Args:
+            shows: Shows to index, identified by their position in the list
+            arrays: Saved arrays of a main segment over the shows (see
+                `to_arrays`), used instead of building it. Shows cannot be
+                added to such an index unless `shows` is a list.
+        """
+        if arrays is None:
+            self._docs = list(shows)
+            main = _Segment(list(enumerate(self._docs)))
+        else:
+            self._docs = shows
+            main = _Segment.from_arrays(arrays)
+        # Main and delta segments are swapped together as a single tuple
+        self._segments = (main, _DeltaSegment())
+        self._lock = threading.Lock()
+        self._merge_thread = None
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Get the arrays of a main segment over every indexed show, to save it.
+
+        Returns:
+            dict[str, np.ndarray]: Arrays by name, for `SearchIndex(shows, arrays)`
+        """
+        main, delta = self._segments
+        if delta.docs:
+            main = _Segment(list(enumerate(self._docs)))
+        return main.to_arrays()
+
+    def add(self, show: Show) -> int:
+        """
+        Add a show to the index.
+
+        Once the delta segment is full, it is folded into a new main segment
+        built in a background thread, so adding never blocks on a rebuild.
+
+        Args:
+            show: Show to index
+
+        Returns:
+            int: Position of the show, following the positions of the build
+        """
+        with self._lock:
+            position = len(self._docs)
+            self._docs.append(show)
+            self._segments[1].add(position, show)
+
+            if len(self._segments[1].docs) > settings.SEARCH_DELTA_MAX_DOCS and (
+                self._merge_thread is None or not self._merge_thread.is_alive()
+            ):
+                self._merge_thread = threading.Thread(
+                    target=self._merge, args=(position + 1,), daemon=True
+                )
+                self._merge_thread.start()
+
+        return position
+
+    def _merge(self, num_docs: int) -> None:
+        """
+        Build a main segment over the first documents and swap it in.
+
+        Args:
+            num_docs: Number of documents to include in the main segment
+        """
+        main = _Segment(list(enumerate(self._docs[:num_docs])))
+        with self._lock:
+            # Shows added during the build stay in the new delta segment
+            delta = _DeltaSegment()
+            for position in range(num_docs, len(self._docs)):
+                delta.add(position, self._docs[position])
+            self._segments = (main, delta)
+
+    def wait_for_merge(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait for a background merge, if one is running.
+
+        Args:
+            timeout: Maximum time to wait, in seconds
+        """
+        merge_thread = self._merge_thread
+        if merge_thread is not None:
+            merge_thread.join(timeout)
+
+    def search(
+        self,
+        query: str,
+        genre: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[int, list[int]]:
+        """
+        Search shows.
+
+        Args:
+            query: Free text query; the last word also matches as a prefix
+            genre: Only include shows of this genre
+            year_from: Only include shows released this year or later
+            year_to: Only include shows released this year or earlier
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            The total number of matches and the positions of the shows in the
+            requested page, best ranked first
+        """
+        tokens = tokenize(query)
+        k = offset + limit
+        main, delta = self._segments
+
+        main_total, main_ranked = main.search(tokens, genre, year_from, year_to, k)
+        delta_total, delta_ranked = delta.search(tokens, genre, year_from, year_to, k)
+
+        ranked = heapq.merge(main_ranked, delta_ranked)
+        page = [position for _, _, position in ranked][offset:k]
+        return main_total + delta_total, page
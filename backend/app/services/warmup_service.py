@@ -0,0 +1,222 @@
+"""
+Service warming up the Replicate upstream on startup and keeping it warm.
+
+On startup, concurrent cheap calls open the pooled Replicate connections
+(DNS, TCP and TLS handshakes), and a prediction of every allowed model can be
+run so that no model is cold for the first jobs. What fails is retried with
+exponential backoff. The service reports ready once this is done, or once the
+warm-up timeout has passed (with the error of the warm-up), so that a load
+balancer only routes traffic to warm instances. While no prediction is made,
+the same cheap calls keep the pooled connections from being closed.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.generation_service import generation_service
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupService:
+    """Warms up upstream connections and models, and keeps connections open."""
+
+    connections: int
+    predictions: bool
+    prompt: str
+    timeout: float
+    retry_delay: float
+    retry_max_delay: float
+    keepalive_interval: float
+    ready: bool
+    # Error of the last failed warm-up attempt (None once an attempt succeeded)
+    error: Optional[str]
+    attempts: int
+    _task: Optional[asyncio.Task]
+
+    def __init__(
+        self,
+        connections: int = settings.UPSTREAM_WARMUP_CONNECTIONS,
+        predictions: bool = settings.UPSTREAM_WARMUP_PREDICTIONS,
+        prompt: str = settings.UPSTREAM_WARMUP_PROMPT,
+        timeout: float = settings.UPSTREAM_WARMUP_TIMEOUT_SECONDS,
+        retry_delay: float = settings.UPSTREAM_WARMUP_RETRY_SECONDS,
+        retry_max_delay: float = settings.UPSTREAM_WARMUP_RETRY_MAX_SECONDS,
+        keepalive_interval: float = settings.UPSTREAM_KEEPALIVE_INTERVAL_SECONDS,
+    ):
+        """
+        Initialize the warm-up service.
+
+        Args:
+            connections: Number of connections opened and kept alive
+            predictions: Whether to run a prediction of every allowed model
+            prompt: Prompt of the warm-up predictions
+            timeout: Time after which the service is ready in any case, in
+                seconds
+            retry_delay: Delay before the first retry of a failed warm-up, in
+                seconds, doubled after every failed attempt
+            retry_max_delay: Longest delay between attempts, in seconds
+            keepalive_interval: Interval of the keep-alive calls while no
+                prediction is made, in seconds (0 disables them)
+        """
+        self.connections = connections
+        self.predictions = predictions
+        self.prompt = prompt
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.keepalive_interval = keepalive_interval
+        # Ready until a warm-up is started, e.g. when warm-up is disabled
+        self.ready = True
+        self.error = None
+        self.attempts = 0
+        self._task = None
+
+        self._started_at: Optional[float] = None
+        self._warmup_ms: Optional[float] = None
+        self._connections_opened = 0
+        self._model_latencies: dict[str, Optional[float]] = {}
+        self.keepalives = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the warm-up or keep-alive task is running."""
+        return self._task is not None
+
+    def start(self) -> None:
+        """Start warming up on the running event loop, not ready until done."""
+        if self.running:
+            return
+
+        self.ready = False
+        self._started_at = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the warm-up or the keep-alive calls."""
+        if not self.running:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        """Warm up within the timeout, then keep the connections alive."""
+        try:
+            await asyncio.wait_for(self._warm_up(), self.timeout)
+        except asyncio.TimeoutError:
+            self.error = self.error or f"Not done after {self.timeout}s"
+        except Exception as e:
+            self.error = str(e)
+
+        self._warmup_ms = (time.monotonic() - self._started_at) * 1000
+        self.ready = True
+        if self.error is None:
+            logger.info(
+                f"Upstream warm-up done in {self._warmup_ms:.0f}ms: "
+                f"{self._connections_opened} connections, "
+                f"{len(self._model_latencies)} models"
+            )
+        else:
+            logger.error(
+                f"Upstream warm-up given up after {self.attempts} attempts, "
+                f"reporting ready - {self.error}"
+            )
+
+        if self.keepalive_interval > 0:
+            await self._keep_alive()
+
+    async def _warm_up(self) -> None:
+        """Warm up, retrying what failed with exponential backoff."""
+        models = settings.image_gen_models_list if self.predictions else []
+        delay = self.retry_delay
+        while True:
+            self.attempts += 1
+            failures = await self._warm_up_models(models)
+            # Opened last, since connections can expire while models boot
+            self._connections_opened = await generation_service.ping_upstream(
+                self.connections
+            )
+
+            errors = [
+                f"Warm-up prediction of {model} failed - {error}"
+                for model, error in failures.items()
+            ]
+            if self.connections > 0 and self._connections_opened == 0:
+                errors.append("No upstream connection could be opened")
+            if not errors:
+                self.error = None
+                return
+
+            self.error = "; ".join(errors)
+            logger.warning(
+                f"Upstream warm-up attempt {self.attempts} failed, retrying in "
+                f"{delay:.1f}s - {self.error}"
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max_delay)
+            models = list(failures)
+
+    async def _warm_up_models(self, models: list[str]) -> dict[str, str]:
+        """
+        Run a warm-up prediction of every model at once.
+
+        Args:
+            models: Models to warm up
+
+        Returns:
+            dict[str, str]: Error of every model whose prediction failed
+        """
+        results = await asyncio.gather(
+            *(generation_service.warm_up_model(model, self.prompt) for model in models),
+            return_exceptions=True,
+        )
+        failures = {}
+        for model, result in zip(models, results):
+            if isinstance(result, Exception):
+                self._model_latencies[model] = None
+                failures[model] = str(result)
+                logger.warning(f"Warm-up prediction of {model} failed - {result}")
+            else:
+                self._model_latencies[model] = round(result, 1)
+                logger.info(f"Warm-up prediction of {model} took {result:.0f}ms")
+        return failures
+
+    async def _keep_alive(self) -> None:
+        """Ping the upstream whenever no call was made for an interval."""
+        while True:
+            idle = generation_service.upstream_idle_seconds()
+            if idle < self.keepalive_interval:
+                await asyncio.sleep(self.keepalive_interval - idle)
+                continue
+
+            try:
+                await generation_service.ping_upstream(self.connections)
+                self.keepalives += 1
+            except Exception as e:
+                logger.warning(f"Upstream keep-alive failed - {e}")
+
+    def stats(self) -> dict:
+        """Get the state and timings of the warm-up."""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "attempts": self.attempts,
+            "warmup_ms": (
+                round(self._warmup_ms, 1) if self._warmup_ms is not None else None
+            ),
+            "connections": self._connections_opened,
+            "models": dict(self._model_latencies),
+            "keepalives": self.keepalives,
+        }
+
+
+# Global service instance
+warmup_service = WarmupService()
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the MyFlix backend.
+
+Run from the `backend` folder as modules, e.g.
+`python -m benchmarks.bench_event_encoding`. Importing this package fills in
+placeholder values for required settings so no secrets are needed.
+"""
+
+import os
+
+os.environ.setdefault("REPLICATE_API_TOKEN", "benchmark")
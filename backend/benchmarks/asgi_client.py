@@ -0,0 +1,169 @@
+"""
+Minimal in-process ASGI client for benchmarks.
+
+`httpx.ASGITransport` collects the whole response body before returning, so
+it cannot observe when SSE events are sent. `ASGIClient` calls the app
+directly and hands out body chunks as the app sends them, so the time an
+event reaches the client can be measured without a network stack.
+"""
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, Optional
+
+import orjson
+
+
+class ASGIClient:
+    """Sends requests to an ASGI app in the same event loop."""
+
+    def __init__(self, app, headers: Optional[dict[str, str]] = None):
+        """
+        Initialize the client.
+
+        Args:
+            app: ASGI application
+            headers: Headers sent with every request
+        """
+        self.app = app
+        self.headers = headers or {}
+
+    def _scope(self, method: str, url: str, headers: dict[str, str]) -> dict:
+        """Build the HTTP scope of a request."""
+        path, _, query = url.partition("?")
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in {"host": "bench", **self.headers, **headers}.items()
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+
+    @contextlib.asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        json: Optional[dict] = None,
+        headers: Optional[dict[str, str]] = None,
+    ):
+        """
+        Send a request and stream the response body.
+
+        Leaving the context disconnects the client, like closing a connection.
+
+        Args:
+            method: HTTP method
+            url: Path and query string
+            json: JSON body
+            headers: Extra headers
+
+        Yields:
+            tuple[int, AsyncIterator[bytes]]: Status code and body chunks
+        """
+        headers = dict(headers or {})
+        body = b""
+        if json is not None:
+            body = orjson.dumps(json)
+            headers["content-type"] = "application/json"
+
+        chunks: asyncio.Queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+        disconnected = asyncio.Event()
+        request_sent = False
+
+        async def receive() -> dict:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                started.set_result(message["status"])
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.put_nowait(message["body"])
+                if not message.get("more_body", False):
+                    chunks.put_nowait(None)
+
+        async def run_app() -> None:
+            try:
+                await self.app(self._scope(method, url, headers), receive, send)
+            finally:
+                if not started.done():
+                    started.set_result(500)
+                chunks.put_nowait(None)
+
+        async def iter_chunks() -> AsyncIterator[bytes]:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+
+        task = asyncio.create_task(run_app())
+        try:
+            yield await started, iter_chunks()
+        finally:
+            disconnected.set()
+            with contextlib.suppress(Exception):
+                await task
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[dict] = None,
+        headers: Optional[dict[str, str]] = None,
+    ) -> tuple[int, bytes]:
+        """
+        Send a request and read the whole response body.
+
+        Args:
+            method: HTTP method
+            url: Path and query string
+            json: JSON body
+            headers: Extra headers
+
+        Returns:
+            tuple[int, bytes]: Status code and body
+        """
+        async with self.stream(method, url, json, headers) as (status, chunks):
+            return status, b"".join([chunk async for chunk in chunks])
+
+
+async def iter_sse_events(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Parse server-sent events from body chunks.
+
+    Args:
+        chunks: Body chunks of an SSE response
+
+    Yields:
+        tuple[str, dict]: Event type and decoded data of every event
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *frames, buffer = buffer.split(b"\n\n")
+        for frame in frames:
+            event_type, data = "message", None
+            for line in frame.split(b"\n"):
+                if line.startswith(b"event:"):
+                    event_type = line[6:].strip().decode()
+                elif line.startswith(b"data:"):
+                    data = orjson.loads(line[5:])
+            if data is not None:
+                yield event_type, data
@@ -0,0 +1,145 @@
+"""
+Memory benchmark for job archives.
+
+Streams `GET /api/generate/{job_id}/archive` for jobs of 100 and 1000 images
+served by an in-process image server, writes the archive to a temporary file
+and samples the RSS of the process as the archive is received. With archives
+produced on the fly, the RSS stays flat however many images are archived,
+while the archive grows by the size of every image. The archive is then
+checked with `zipfile`.
+
+Usage:
+    python -m benchmarks.bench_archive [--images N ...] [--image-kb KB]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+
+import httpx
+
+from benchmarks.asgi_client import ASGIClient
+
+
+def rss_mb() -> float:
+    """Get the current resident set size of the process, in megabytes."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # Peak instead of current, outside Linux
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def image_server(image_kb: int):
+    """Build an ASGI app serving the same incompressible image on every path."""
+    image = os.urandom(image_kb * 1024)
+
+    async def app(scope: dict, receive, send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"image/webp"),
+                    (b"content-length", str(len(image)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": image})
+
+    return app
+
+
+def finished_job(job_id: str, num_images: int):
+    """Build a completed job whose images are served by the image server."""
+    from app.services.job_state import COMPLETED, JobState
+
+    job = JobState(job_id, "Archived artwork", "bench-model", num_images)
+    for i in range(num_images):
+        job.mark_running(i)
+        job.mark_succeeded(i, f"http://images.bench/{job_id}/out-{i}.webp")
+    job.status = COMPLETED
+    job.completed_at = time.time()
+    return job
+
+
+async def archive(client: ASGIClient, service, num_images: int) -> None:
+    """Download the archive of a job and print the RSS as it is received."""
+    job = finished_job(f"job_archive_{num_images}", num_images)
+    service._jobs[job.job_id] = job
+
+    samples = []
+    received = 0
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as file:
+        async with client.stream("GET", f"/api/generate/{job.job_id}/archive") as (
+            status,
+            chunks,
+        ):
+            assert status == 200, status
+            async for chunk in chunks:
+                file.write(chunk)
+                received += len(chunk)
+                samples.append(rss_mb())
+        elapsed = time.perf_counter() - start
+
+        file.seek(0)
+        with zipfile.ZipFile(file) as archived:
+            entries = archived.infolist()
+            assert len(entries) == num_images, len(entries)
+            assert all(e.compress_type == zipfile.ZIP_STORED for e in entries)
+            assert archived.testzip() is None
+
+    del service._jobs[job.job_id]
+
+    # RSS after every tenth of the archive
+    steps = [samples[min(len(samples) * i // 10, len(samples) - 1)] for i in range(11)]
+    print(
+        f"{num_images:>5} images: {received / 1e6:7.1f} MB archive in "
+        f"{elapsed:5.2f}s ({received / 1e6 / elapsed:6.1f} MB/s), "
+        f"RSS {min(samples):6.1f}-{max(samples):6.1f} MB"
+    )
+    print("       RSS by tenth: " + " ".join(f"{value:.0f}" for value in steps))
+
+
+async def bench(sizes: list[int], image_kb: int) -> None:
+    """Archive jobs of every size, smallest first."""
+    # Imported once the environment is set, since settings are read on import
+    from app.core.security import create_access_token
+    from app.services.archive_service import archive_service
+    from app.services.generation_service import generation_service
+    from main import app
+
+    archive_service._transport = httpx.ASGITransport(app=image_server(image_kb))
+    token = create_access_token(user_id="user_bench", email="bench@myflix.com")
+    client = ASGIClient(app, headers={"authorization": f"Bearer {token}"})
+
+    print(
+        f"Archiving {image_kb} KB images, {archive_service.fetch_concurrency} "
+        f"downloads at a time (baseline RSS {rss_mb():.1f} MB)"
+    )
+    for num_images in sizes:
+        await archive(client, generation_service, num_images)
+
+
+def main() -> None:
+    """Parse the options and run the archive benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--image-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    os.environ["LOG_LEVEL"] = "WARNING"
+    asyncio.run(bench(sorted(args.images), args.image_kb))
+
+
+if __name__ == "__main__":
+    main()
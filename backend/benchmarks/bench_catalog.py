@@ -0,0 +1,105 @@
+"""
+Benchmark for the show catalog API.
+
+Loads a generated catalog (100k shows by default) and measures requests per
+second through the ASGI app for the home payload, paginated row pages and
+ETag revalidations, along with the payload size for the first paint.
+
+Usage:
+    python -m benchmarks.bench_catalog [--shows N] [--requests N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app.services.catalog_service import catalog_service, generate_dummy_shows
+from main import app
+
+
+async def run_requests(
+    client: httpx.AsyncClient, paths: list[str], headers: dict
+) -> tuple[float, int]:
+    """
+    Issue GET requests for the given paths, a few at a time.
+
+    Returns:
+        Requests per second and the last response size in bytes
+    """
+    concurrency = 16
+    size = 0
+
+    async def worker(chunk: list[str]) -> None:
+        nonlocal size
+        for path in chunk:
+            response = await client.get(path, headers=headers)
+            size = len(response.content)
+
+    start = time.perf_counter()
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+    await asyncio.gather(*(worker(chunk) for chunk in chunks))
+    return len(paths) / (time.perf_counter() - start), size
+
+
+async def bench(num_requests: int) -> None:
+    """Run the catalog request benchmarks."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        identity = {"Accept-Encoding": "identity"}
+        brotli = {"Accept-Encoding": "br"}
+
+        home = await c.get("/api/catalog/", headers=identity)
+        compressed = await c.get("/api/catalog/", headers=brotli)
+        print(
+            f"home payload: {len(home.content):,} bytes, "
+            f"{compressed.headers['content-length']} bytes with "
+            f"{compressed.headers.get('content-encoding', 'identity')}"
+        )
+
+        rps, _ = await run_requests(c, ["/api/catalog/"] * num_requests, brotli)
+        print(f"GET /api/catalog/ (br):            {rps:>8,.0f} req/s")
+
+        etag = home.headers["etag"]
+        rps, _ = await run_requests(
+            c, ["/api/catalog/"] * num_requests, {**identity, "If-None-Match": etag}
+        )
+        print(f"GET /api/catalog/ (304):           {rps:>8,.0f} req/s")
+
+        # Walk the first pages of a row, then serve them again from the cache
+        paths = ["/api/catalog/rows/row-1"]
+        cursor = home.json()["rows"][1]["next_cursor"]
+        while cursor and len(paths) < 200:
+            paths.append(f"/api/catalog/rows/row-1?cursor={cursor}")
+            page = await c.get(paths[-1], headers=identity)
+            cursor = page.json()["next_cursor"]
+
+        repeated = (paths * (num_requests // len(paths) + 1))[:num_requests]
+        rps, _ = await run_requests(c, repeated, brotli)
+        print(f"GET /api/catalog/rows/{{id}} (br):   {rps:>8,.0f} req/s")
+
+
+def main() -> None:
+    """Load the catalog and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shows", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    shows = generate_dummy_shows(args.shows)
+    start = time.perf_counter()
+    catalog_service.load(shows)
+    print(
+        f"loaded {args.shows:,} shows in {time.perf_counter() - start:.2f}s "
+        "(serialization, rows and home payload)"
+    )
+
+    asyncio.run(bench(args.requests))
+
+
+if __name__ == "__main__":
+    main()
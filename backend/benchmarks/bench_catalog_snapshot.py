@@ -0,0 +1,202 @@
+"""
+Benchmark of the memory of workers serving the catalog from a snapshot.
+
+Starts worker processes the way a multi-worker server does (fresh
+interpreters) and, in each, loads the catalog, serves a few requests of every
+kind (home, row pages, shows by ID, search, top picks), then reads its memory
+from `/proc/self/smaps_rollup` while all workers are alive:
+
+- RSS: memory mapped in the worker, counting shared pages in full. Kernels
+  that cache files in large folios map a whole folio on every page fault, so
+  a few lookups map much of a snapshot already in the page cache
+- PSS: RSS with shared pages split between the processes mapping them,
+  which adds up to the real memory of all workers
+- Private: memory of the worker alone
+
+It compares the catalog served from a snapshot (`CATALOG_SNAPSHOT_PATH`) with
+the catalog loaded in every worker (`CATALOG_PATH`). The in-memory catalog
+takes several GB per worker at a million shows, so it is measured with a
+smaller catalog (`--baseline-shows`); it grows linearly with the shows.
+Load times are with the files in the page cache, as after a deploy.
+
+Usage:
+    python -m benchmarks.bench_catalog_snapshot [--shows N] [--baseline-shows N]
+        [--workers N]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+# The app is imported in the processes below only, after their settings are
+# in the environment: the catalog is loaded when its module is imported
+
+
+def write_catalog(num_shows: int, snapshot_path: str, json_path: str, results) -> None:
+    """Generate a catalog and write it as a snapshot, and as JSON if asked."""
+    from app.services.catalog_service import (
+        generate_dummy_shows,
+        write_catalog_snapshot,
+    )
+
+    shows = generate_dummy_shows(num_shows)
+    start = time.perf_counter()
+    size = write_catalog_snapshot(shows, snapshot_path)
+    seconds = time.perf_counter() - start
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump([show.model_dump() for show in shows], f)
+    results.put((seconds, size))
+
+
+def memory_kb() -> dict[str, int]:
+    """Read the memory of the current process, in kB."""
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(
+            line.split(":", 1) for line in f.read().splitlines()[1:] if ":" in line
+        )
+    kb = {name: int(value.split()[0]) for name, value in fields.items()}
+    return {
+        "rss": kb["Rss"],
+        "pss": kb["Pss"],
+        "private": kb["Private_Clean"] + kb["Private_Dirty"],
+    }
+
+
+def serve(barrier, results) -> None:
+    """Load the catalog, serve requests and report the memory of the worker."""
+    # Modules of the catalog, so that only loading the catalog is timed
+    import app.core.http_cache  # noqa: F401
+    import app.core.snapshot  # noqa: F401
+    import app.models.catalog  # noqa: F401
+    import app.services.search_index  # noqa: F401
+    from app.core.config import settings
+
+    before = memory_kb()
+    start = time.perf_counter()
+    from app.services.catalog_service import ROW_DEFINITIONS, catalog_service
+
+    load_seconds = time.perf_counter() - start
+
+    from app.services.recommendation_service import recommendation_service
+
+    rng = random.Random(os.getpid())
+    shows = catalog_service.shows
+    catalog_service.get_home()
+    for row in ROW_DEFINITIONS:
+        for page in range(3):
+            offset = page and (
+                settings.CATALOG_FIRST_PAGE_SIZE
+                + (page - 1) * settings.CATALOG_PAGE_SIZE
+            )
+            catalog_service.get_row_page(row.id, offset)
+    for _ in range(1000):
+        catalog_service.get_show(shows[rng.randrange(len(shows))].id)
+    for query in ("the", "dark night", "space adv", "love story"):
+        catalog_service.search(query, limit=20)
+    recommendation_service.add_to_my_list("bench", shows[0].id)
+    recommendation_service.recommend("bench", 10)
+
+    barrier.wait()
+    after = memory_kb()
+    results.put((load_seconds, after, {k: after[k] - before[k] for k in after}))
+    # Stay alive until every worker measured, so shared pages are split
+    barrier.wait()
+
+
+def run_workers(num_workers: int, env: dict[str, str]) -> list:
+    """Start workers with settings in the environment and collect their results."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(num_workers)
+    results = context.Queue()
+    os.environ.update(env)
+    try:
+        workers = [
+            context.Process(target=serve, args=(barrier, results))
+            for _ in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    finally:
+        for name in env:
+            del os.environ[name]
+    return collected
+
+
+def write(num_shows: int, directory: str, with_json: bool) -> tuple[str, str]:
+    """Write a catalog snapshot (and JSON) in a separate process."""
+    snapshot_path = os.path.join(directory, f"catalog-{num_shows}.snapshot")
+    json_path = (
+        os.path.join(directory, f"catalog-{num_shows}.json") if with_json else ""
+    )
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    writer = context.Process(
+        target=write_catalog, args=(num_shows, snapshot_path, json_path, results)
+    )
+    writer.start()
+    seconds, size = results.get()
+    writer.join()
+    print(
+        f"{num_shows:>9,} shows: snapshot written in {seconds:5.1f}s, "
+        f"{size / 1e6:6.0f} MB"
+    )
+    return snapshot_path, json_path
+
+
+def report(label: str, num_shows: int, results: list) -> None:
+    """Print the mean load time and memory of the workers of a run."""
+    count = len(results)
+    load_ms = sum(load for load, _, _ in results) / count * 1000
+    total = {k: sum(after[k] for _, after, _ in results) / count for k in results[0][1]}
+    grown = {k: sum(diff[k] for _, _, diff in results) / count for k in results[0][2]}
+    print(
+        f"  {label:<9} {num_shows:>9,}  {load_ms:9.0f}ms  "
+        + "  ".join(f"{total[k] / 1024:6.0f} ({grown[k] / 1024:+6.0f})" for k in total)
+    )
+
+
+def main() -> None:
+    """Parse the options and run the snapshot memory benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shows", type=int, default=1_000_000)
+    parser.add_argument("--baseline-shows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    quiet = {"LOG_LEVEL": "WARNING"}
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot, _ = write(args.shows, directory, False)
+        baseline_snapshot, baseline_json = write(args.baseline_shows, directory, True)
+
+        print(
+            f"\n{args.workers} workers, memory per worker in MB "
+            "(growth from loading the catalog and serving requests)"
+        )
+        print(
+            f"  {'catalog':<9} {'shows':>9}  {'load':>11}  {'RSS':>15}  "
+            f"{'PSS':>15}  {'private':>15}"
+        )
+        runs = [
+            ("snapshot", args.shows, {"CATALOG_SNAPSHOT_PATH": snapshot}),
+            (
+                "snapshot",
+                args.baseline_shows,
+                {"CATALOG_SNAPSHOT_PATH": baseline_snapshot},
+            ),
+            ("in-memory", args.baseline_shows, {"CATALOG_PATH": baseline_json}),
+        ]
+        for label, num_shows, env in runs:
+            results = run_workers(args.workers, {**quiet, **env})
+            report(label, num_shows, results)
+
+
+if __name__ == "__main__":
+    main()
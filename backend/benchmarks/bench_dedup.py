@@ -0,0 +1,183 @@
+"""
+Benchmark of the perceptual-hash deduplication of generated images.
+
+- Hashing throughput: decoding and hashing 1024x1024 WebP, PNG and JPEG
+  images, on one thread and on a pool of `DEDUP_WORKERS` threads
+- Robustness: distance between the hash of an image and the hashes of its
+  resized, re-encoded or edited copies, and between different images
+- Lookups with 10M indexed hashes: latency for near duplicates and for
+  hashes without one, recall against a brute-force scan, and index memory
+
+Hashing requires Pillow and is skipped without it.
+
+Usage:
+    python -m benchmarks.bench_dedup [--hashes N] [--images N]
+"""
+
+import argparse
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.image_hash import HashIndex, Image, image_dhash
+
+FORMATS = {"WEBP": {"quality": 90}, "PNG": {}, "JPEG": {"quality": 90}}
+
+
+def synthetic_image(rng: np.random.Generator, size: int):
+    """Build a smooth random picture with fine noise, like a generated image."""
+    coarse = rng.integers(0, 256, (12, 12, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC)
+    noise = rng.normal(0, 6, (size, size, 3))
+    pixels = np.clip(np.asarray(image, dtype=np.float32) + noise, 0, 255)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+
+def encode(image, fmt: str, **params) -> bytes:
+    """Encode an image."""
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def distance(first: int, second: int) -> int:
+    """Get the Hamming distance between two hashes."""
+    return (first ^ second).bit_count()
+
+
+def hashing(num_images: int) -> None:
+    """Print the hashing throughput and the distances of edited copies."""
+    if Image is None:
+        print("Pillow is not installed: hashing not measured\n")
+        return
+
+    rng = np.random.default_rng(0)
+    images = [synthetic_image(rng, 1024) for _ in range(num_images)]
+    print(f"Hashing {num_images} 1024x1024 images")
+    for fmt, params in FORMATS.items():
+        encoded = [encode(image, fmt, **params) for image in images]
+        size_kb = statistics.mean(len(data) for data in encoded) / 1024
+
+        start = time.perf_counter()
+        for data in encoded:
+            image_dhash(data)
+        single = num_images / (time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=settings.DEDUP_WORKERS) as executor:
+            start = time.perf_counter()
+            list(executor.map(image_dhash, encoded))
+            pooled = num_images / (time.perf_counter() - start)
+        print(
+            f"  {fmt:<5} ({size_kb:5.0f} KB): {single:6.1f} images/s on one "
+            f"thread, {pooled:6.1f} on {settings.DEDUP_WORKERS} threads"
+        )
+
+    edits = {
+        "resized to 512": lambda image: encode(image.resize((512, 512)), "PNG"),
+        "JPEG quality 60": lambda image: encode(image, "JPEG", quality=60),
+        "brightened 10%": lambda image: encode(
+            Image.eval(image, lambda value: min(255, int(value * 1.1))), "PNG"
+        ),
+        "cropped 3%": lambda image: encode(image.crop((15, 15, 1009, 1009)), "PNG"),
+        "mirrored": lambda image: encode(
+            image.transpose(Image.Transpose.FLIP_LEFT_RIGHT), "PNG"
+        ),
+    }
+    hashes = [image_dhash(encode(image, "PNG")) for image in images]
+    print(f"\nDistance to the original (duplicate up to {settings.DEDUP_MAX_DISTANCE})")
+    for name, edit in edits.items():
+        distances = [
+            distance(original, image_dhash(edit(image)))
+            for original, image in zip(hashes, images)
+        ]
+        mean = statistics.mean(distances)
+        print(f"  {name:<16} mean {mean:5.1f}, max {max(distances):2d}")
+    different = [
+        distance(first, second)
+        for first in hashes
+        for second in hashes
+        if first != second
+    ]
+    mean = statistics.mean(different)
+    print(f"  {'different image':<16} mean {mean:5.1f}, min {min(different):2d}\n")
+
+
+def lookups(num_hashes: int) -> None:
+    """Print the lookup latency and recall with a large index."""
+    rng = np.random.default_rng(1)
+    index = HashIndex(settings.DEDUP_MAX_DISTANCE)
+
+    start = time.perf_counter()
+    chunk = 1_000_000
+    for offset in range(0, num_hashes, chunk):
+        size = min(chunk, num_hashes - offset)
+        index.add(rng.integers(0, 2**64, size, dtype=np.uint64, endpoint=False))
+    built = time.perf_counter() - start
+    # Recently added hashes, not sorted in yet
+    tail = min(200_000, num_hashes // 20)
+    index.add(rng.integers(0, 2**64, tail, dtype=np.uint64, endpoint=False))
+    hashes = index._hashes[: len(index)]
+    print(
+        f"{len(index):,} hashes indexed in {built:.1f}s ({tail:,} not sorted in), "
+        f"{index.nbytes / 1e6:,.0f} MB, max distance {index.max_distance}"
+    )
+
+    def near_duplicate() -> int:
+        value = int(hashes[rng.integers(0, len(hashes))])
+        bits = rng.choice(
+            64, size=rng.integers(0, index.max_distance + 1), replace=False
+        )
+        for bit in bits:
+            value ^= 1 << int(bit)
+        return value
+
+    queries = {
+        "near duplicate": [near_duplicate() for _ in range(1000)],
+        "no duplicate": [int(v) for v in rng.integers(0, 2**64, 1000, dtype=np.uint64)],
+    }
+    for name, values in queries.items():
+        timings = []
+        found = 0
+        for value in values:
+            start = time.perf_counter()
+            found += index.nearest(value) is not None
+            timings.append((time.perf_counter() - start) * 1000)
+        cuts = statistics.quantiles(timings, n=100)
+        print(
+            f"  {name:<15} p50 {cuts[49]:6.3f}ms  p99 {cuts[98]:6.3f}ms  "
+            f"found {found / len(values):4.0%}"
+        )
+
+    # Recall: the index finds the same closest distance as a full scan
+    agree = 0
+    samples = queries["near duplicate"][:50] + queries["no duplicate"][:50]
+    start = time.perf_counter()
+    for value in samples:
+        scanned = int(np.bitwise_count(hashes ^ np.uint64(value)).min())
+        expected = scanned if scanned <= index.max_distance else None
+        match = index.nearest(value)
+        agree += (match[1] if match else None) == expected
+    scan_ms = (time.perf_counter() - start) / len(samples) * 1000
+    print(
+        f"  agrees with a brute-force scan on {agree}/{len(samples)} queries "
+        f"(a scan takes {scan_ms:.0f}ms)"
+    )
+
+
+def main() -> None:
+    """Parse the options and run the deduplication benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hashes", type=int, default=10_000_000)
+    parser.add_argument("--images", type=int, default=20)
+    args = parser.parse_args()
+
+    hashing(args.images)
+    lookups(args.hashes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Microbenchmark for SSE event encoding and broadcast.
+
+Measures how many `progress` events per second can be encoded, and how many
+can be broadcast to a job with 1, 100 and 10k subscribers.
+
+Usage:
+    python -m benchmarks.bench_event_encoding [--events N]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from app.core import events
+from app.models.generation import (
+    GenerationRequest,
+    GenerationResult,
+    GenerationStatus,
+    ProgressEventData,
+)
+from app.services.generation_service import GenerationService
+from app.services.job_state import JobState
+
+SUBSCRIBER_COUNTS = (1, 100, 10_000)
+
+
+def bench_encoding(num_events: int) -> None:
+    """Compare the previous Pydantic + json path with the encoding layer."""
+    result = GenerationResult(
+        index=3,
+        status=GenerationStatus.SUCCEEDED,
+        url="https://replicate.delivery/xezq/guid/out-0.webp",
+    )
+
+    start = time.perf_counter()
+    for _ in range(num_events):
+        data = ProgressEventData(
+            index=result.index, status=result.status, url=result.url
+        ).model_dump()
+        f"event: progress\ndata: {json.dumps(data)}\n\n".encode()
+    baseline = num_events / (time.perf_counter() - start)
+
+    job = JobState("job_bench", "bench", "bench-model", 4)
+    job.mark_succeeded(result.index, result.url)
+
+    start = time.perf_counter()
+    for _ in range(num_events):
+        events.encode_event("progress", job.progress_data(result.index))
+    encoded = num_events / (time.perf_counter() - start)
+
+    print(f"JSON backend: {events.JSON_BACKEND}")
+    print(f"encode (pydantic + json.dumps): {baseline:>12,.0f} events/s")
+    print(f"encode (events layer):          {encoded:>12,.0f} events/s")
+
+
+async def bench_broadcast(num_events: int, num_subscribers: int) -> None:
+    """Broadcast progress events to a job with many subscribers."""
+    service = GenerationService()
+    # Measures the fan-out of every event (batching is measured over sockets
+    # by bench_sse_batching)
+    service._batch_frames = False
+    job = service._register_job(
+        GenerationRequest(prompt="bench", num_images=1), "bench-model"
+    )
+    queues = [asyncio.Queue() for _ in range(num_subscribers)]
+    service._job_streams[job.job_id].extend(queues)
+
+    job.mark_succeeded(0, "https://replicate.delivery/xezq/guid/out-0.webp")
+
+    elapsed = 0.0
+    sent = 0
+    # Drain between rounds so queue growth does not dominate at 10k subscribers
+    rounds = max(1, num_events // 100)
+    per_round = max(1, num_events // rounds)
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(per_round):
+            await service._broadcast_progress(job, 0)
+        elapsed += time.perf_counter() - start
+        sent += per_round
+        for queue in queues:
+            while not queue.empty():
+                queue.get_nowait()
+
+    service._executor.shutdown(wait=False)
+    print(
+        f"broadcast to {num_subscribers:>6} subscribers: "
+        f"{sent / elapsed:>10,.0f} events/s, "
+        f"{sent * num_subscribers / elapsed:>12,.0f} deliveries/s"
+    )
+
+
+def main() -> None:
+    """Run the event encoding benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    bench_encoding(args.events)
+    for num_subscribers in SUBSCRIBER_COUNTS:
+        # Keep total deliveries bounded for the large fan-outs
+        num_events = max(100, args.events // num_subscribers)
+        asyncio.run(bench_broadcast(num_events, num_subscribers))
+
+
+if __name__ == "__main__":
+    main()
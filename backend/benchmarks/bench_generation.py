@@ -0,0 +1,404 @@
+"""
+Load test of the generation path against a fake Replicate upstream.
+
+Drives `POST /api/generate/` and `GET /api/generate/{job_id}/stream` through
+an in-process ASGI client, with a fake upstream whose latency distribution,
+error rate and output shape are configurable, and reports:
+- TTFI p50/p95/p99, from the POST to the first succeeded image seen on the
+  job's stream
+- with `--steps`, predictions are polled and report diffusion steps: time
+  to first preview p50/p95/p99, the latency perceived before something is
+  shown, and the number of previews delivered
+- images/s and SSE events/s delivered to every subscriber
+- memory retained per finished job, and per open subscriber stream, net of
+  the client's own per-request objects (measured separately with
+  tracemalloc, which slows everything down)
+
+Results can also be written as JSON (`--json results.json`, or `-` for
+stdout) to track regressions between runs.
+
+Usage:
+    python -m benchmarks.bench_generation [--jobs N] [--images N]
+        [--subscribers N] [--rate JOBS_PER_S] [--latency-ms MS]
+        [--distribution lognormal|fixed|uniform|pareto] [--failure-rate F]
+        [--output file_list|string|mixed] [--concurrency N]
+        [--steps N] [--preview-poll-ms MS] [--json PATH]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+
+from benchmarks.asgi_client import ASGIClient, iter_sse_events
+from benchmarks.fake_upstream import (
+    LATENCY_DISTRIBUTIONS,
+    OUTPUT_SHAPES,
+    FakeReplicateClient,
+)
+
+
+def percentiles(samples: list[float]) -> dict[str, Optional[float]]:
+    """Get the p50/p95/p99 of samples, rounded."""
+    if len(samples) < 2:
+        value = round(samples[0], 1) if samples else None
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        "p50": round(cuts[49], 1),
+        "p95": round(cuts[94], 1),
+        "p99": round(cuts[98], 1),
+    }
+
+
+class LoadTest:
+    """Runs generation jobs through the API and collects client-side metrics."""
+
+    def __init__(self, client: ASGIClient, images: int, subscribers: int):
+        """
+        Initialize the load test.
+
+        Args:
+            client: Client of the app
+            images: Number of images per job
+            subscribers: Number of streams opened per job
+        """
+        self.client = client
+        self.images = images
+        self.subscribers = subscribers
+        self.ttfis_ms: list[float] = []
+        self.ttfps_ms: list[float] = []
+        self.previews = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.events = 0
+        self.rejected = 0
+
+    async def create_job(self, prompt: str) -> Optional[str]:
+        """Create a job through the API, returning its ID unless rejected."""
+        status, body = await self.client.request(
+            "POST",
+            "/api/generate/",
+            json={"prompt": prompt, "num_images": self.images},
+        )
+        if status != 202:
+            self.rejected += 1
+            return None
+        return orjson.loads(body)["job_id"]
+
+    async def follow(self, job_id: str, created_at: float, first: bool) -> None:
+        """Read the stream of a job until it completes."""
+        async with self.client.stream("GET", f"/api/generate/{job_id}/stream") as (
+            _,
+            chunks,
+        ):
+            ttfi_ms = ttfp_ms = None
+            async for event_type, data in iter_sse_events(chunks):
+                self.events += 1
+                if first and event_type == "preview":
+                    self.previews += 1
+                    if ttfp_ms is None:
+                        ttfp_ms = (time.perf_counter() - created_at) * 1000
+                        self.ttfps_ms.append(ttfp_ms)
+                if first and event_type == "progress":
+                    if data.get("status") == "succeeded":
+                        self.succeeded += 1
+                        if ttfi_ms is None:
+                            ttfi_ms = (time.perf_counter() - created_at) * 1000
+                            self.ttfis_ms.append(ttfi_ms)
+                    elif data.get("status") == "failed":
+                        self.failed += 1
+                if event_type in ("done", "error"):
+                    break
+
+    async def run_job(self, index: int) -> None:
+        """Create a job and follow it with every subscriber."""
+        created_at = time.perf_counter()
+        job_id = await self.create_job(f"Benchmark artwork {index}")
+        if job_id is not None:
+            await asyncio.gather(
+                *(
+                    self.follow(job_id, created_at, first=i == 0)
+                    for i in range(self.subscribers)
+                )
+            )
+
+    async def run(self, jobs: int, rate: float) -> float:
+        """
+        Run jobs arriving at a steady rate, or all at once.
+
+        Args:
+            jobs: Number of jobs
+            rate: Jobs created per second, 0 for all at once
+
+        Returns:
+            float: Wall time until every job completed, in seconds
+        """
+        start = time.perf_counter()
+        tasks = []
+        for i in range(jobs):
+            tasks.append(asyncio.create_task(self.run_job(i)))
+            if rate > 0:
+                await asyncio.sleep(
+                    max(start + (i + 1) / rate - time.perf_counter(), 0)
+                )
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+async def memory_per_job(client: ASGIClient, service, jobs: int, images: int) -> float:
+    """Measure the memory retained by finished jobs, in bytes per job."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    job_ids = []
+    for i in range(jobs):
+        _, body = await client.request(
+            "POST",
+            "/api/generate/",
+            json={"prompt": f"Memory artwork {i}", "num_images": images},
+        )
+        job_ids.append(orjson.loads(body)["job_id"])
+    while any(service.get_job(job_id).completed_at is None for job_id in job_ids):
+        await asyncio.sleep(0.01)
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / jobs
+
+
+async def idle_app(scope: dict, receive, send) -> None:
+    """ASGI app that holds every request open until the client disconnects."""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def memory_per_open_request(requests: int) -> float:
+    """Measure the memory of requests held open by the client, in bytes each."""
+    client = ASGIClient(idle_app)
+    ready = asyncio.Event()
+    opened = 0
+
+    async def hold() -> None:
+        nonlocal opened
+        async with client.stream("GET", "/"):
+            opened += 1
+            await ready.wait()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    tasks = [asyncio.create_task(hold()) for _ in range(requests)]
+    while opened < requests:
+        await asyncio.sleep(0.01)
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    ready.set()
+    await asyncio.gather(*tasks)
+    return (after - before) / requests
+
+
+async def memory_per_subscriber(
+    client: ASGIClient, service, upstream: FakeReplicateClient, subscribers: int
+) -> float:
+    """
+    Measure the memory of open streams on a running job, in bytes each.
+
+    The memory the client itself holds per open request is subtracted.
+    """
+    upstream.pause()
+    _, body = await client.request(
+        "POST", "/api/generate/", json={"prompt": "Subscriber artwork", "num_images": 1}
+    )
+    job_id = orjson.loads(body)["job_id"]
+
+    async def follow() -> None:
+        async with client.stream("GET", f"/api/generate/{job_id}/stream") as (
+            _,
+            chunks,
+        ):
+            async for event_type, _ in iter_sse_events(chunks):
+                if event_type in ("done", "error"):
+                    break
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    tasks = [asyncio.create_task(follow()) for _ in range(subscribers)]
+    while len(service._job_streams[job_id]) < subscribers:
+        await asyncio.sleep(0.01)
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    upstream.resume()
+    await asyncio.gather(*tasks)
+
+    client_bytes = await memory_per_open_request(subscribers)
+    return (after - before) / subscribers - client_bytes
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    """Run the load test and the memory measurements."""
+    # Imported once the environment is set, since settings are read on import
+    from app.core.rate_limit import limit_generation
+    from app.core.security import create_access_token
+    from app.services.generation_service import generation_service
+    from main import app
+
+    # Failed predictions are expected, and logged as errors
+    logging.disable(logging.ERROR)
+
+    upstream = FakeReplicateClient(
+        latency_ms=args.latency_ms,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        distribution=args.distribution,
+        output=args.output,
+        seed=args.seed,
+        steps=args.steps,
+    )
+    generation_service._client = upstream
+
+    # Predictions of every model are polled for previews when they have steps
+    for pool in generation_service._models._pools.values():
+        pool.previews = args.steps > 0
+    generation_service._preview_poll_interval = args.preview_poll_ms / 1000
+    generation_service._preview_min_interval = args.preview_poll_ms / 1000
+
+    # A single benchmark user would be rate limited after a few jobs
+    app.dependency_overrides[limit_generation] = lambda: None
+    token = create_access_token(user_id="user_bench", email="bench@myflix.com")
+    client = ASGIClient(app, headers={"authorization": f"Bearer {token}"})
+
+    load_test = LoadTest(client, args.images, args.subscribers)
+    duration = await load_test.run(args.jobs, args.rate)
+
+    upstream.latency_ms = 0.0
+    upstream.failure_rate = 0.0
+    for pool in generation_service._models._pools.values():
+        pool.previews = False
+    job_bytes = await memory_per_job(
+        client, generation_service, args.memory_jobs, args.images
+    )
+    subscriber_bytes = await memory_per_subscriber(
+        client, generation_service, upstream, args.memory_subscribers
+    )
+
+    return {
+        "ttfi_ms": percentiles(load_test.ttfis_ms),
+        "ttfp_ms": percentiles(load_test.ttfps_ms),
+        "previews_delivered": load_test.previews,
+        "duration_s": round(duration, 3),
+        "jobs": args.jobs,
+        "rejected_jobs": load_test.rejected,
+        "images_succeeded": load_test.succeeded,
+        "images_failed": load_test.failed,
+        "images_per_s": round(load_test.succeeded / duration, 1),
+        "events_delivered": load_test.events,
+        "events_per_s": round(load_test.events / duration, 1),
+        "memory_per_job_bytes": round(job_bytes),
+        "memory_per_subscriber_bytes": round(subscriber_bytes),
+    }
+
+
+def main() -> None:
+    """Parse the options and run the generation benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--subscribers", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=8.0, help="Jobs/s, 0: at once")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument(
+        "--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal"
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--output", choices=OUTPUT_SHAPES, default="mixed")
+    parser.add_argument(
+        "--concurrency", type=int, help="Concurrent upstream calls of the model"
+    )
+    parser.add_argument(
+        "--steps", type=int, default=0, help="Diffusion steps, 0: no previews"
+    )
+    parser.add_argument("--preview-poll-ms", type=float, default=50.0)
+    parser.add_argument("--memory-jobs", type=int, default=1000)
+    parser.add_argument("--memory-subscribers", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results as JSON to a file, or -")
+    args = parser.parse_args()
+
+    os.environ["LOG_LEVEL"] = "WARNING"
+    if args.concurrency:
+        os.environ["IMAGE_GEN_MODEL_CONCURRENCY"] = str(args.concurrency)
+
+    results = asyncio.run(run_benchmark(args))
+
+    ttfi = results["ttfi_ms"]
+    ttfp = results["ttfp_ms"]
+    print(
+        f"{args.jobs} jobs x {args.images} images, {args.subscribers} subscribers "
+        f"per job, {args.distribution} {args.latency_ms:.0f}ms upstream, "
+        f"{args.failure_rate:.0%} errors, {args.output} outputs",
+        file=sys.stderr,
+    )
+    print(
+        f"TTFI p50 {ttfi['p50']}ms  p95 {ttfi['p95']}ms  p99 {ttfi['p99']}ms",
+        file=sys.stderr,
+    )
+    if args.steps:
+        print(
+            f"First preview p50 {ttfp['p50']}ms  p95 {ttfp['p95']}ms  "
+            f"p99 {ttfp['p99']}ms ({results['previews_delivered']} previews)",
+            file=sys.stderr,
+        )
+    print(
+        f"{results['images_per_s']} images/s, {results['events_per_s']} events/s "
+        f"({results['images_failed']} failed, {results['rejected_jobs']} rejected)\n"
+        f"{results['memory_per_job_bytes']:,} bytes per finished job, "
+        f"{results['memory_per_subscriber_bytes']:,} bytes per open stream",
+        file=sys.stderr,
+    )
+
+    if args.json:
+        document = {
+            "benchmark": "generation",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": {
+                key: value for key, value in vars(args).items() if key != "json"
+            },
+            "results": results,
+        }
+        text = json.dumps(document, indent=2)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as file:
+                file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
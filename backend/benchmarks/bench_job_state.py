@@ -0,0 +1,109 @@
+"""
+Memory and allocation benchmark for internal job state.
+
+Compares a job kept as Pydantic `GenerationJob`/`GenerationResult` models
+(the previous internal representation) with the compact `JobState`, for jobs
+with 1 to 1000 images where every image runs and succeeds.
+
+Usage:
+    python -m benchmarks.bench_job_state
+"""
+
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+
+from app.models.generation import GenerationJob, GenerationResult, GenerationStatus
+from app.services.job_state import JobState
+
+NUM_IMAGES = (1, 10, 100, 1000)
+URL = "https://replicate.delivery/xezq/{guid}/out-0.webp"
+
+
+def pydantic_job(num_images: int, urls: list[str]) -> GenerationJob:
+    """Build and fill a job the way the service used to."""
+    job = GenerationJob(
+        job_id="job_bench",
+        prompt="A beautiful sunset over mountains",
+        num_images=num_images,
+        results=[
+            GenerationResult(index=i, status=GenerationStatus.PENDING)
+            for i in range(num_images)
+        ],
+    )
+    for i in range(num_images):
+        result = GenerationResult(
+            index=i,
+            status=GenerationStatus.RUNNING,
+            started_at=datetime.now(timezone.utc),
+        )
+        result.status = GenerationStatus.SUCCEEDED
+        result.url = urls[i]
+        result.finished_at = datetime.now(timezone.utc)
+        job.results[i] = result
+    return job
+
+
+def compact_job(num_images: int, urls: list[str]) -> JobState:
+    """Build and fill a job with the compact state."""
+    job = JobState(
+        "job_bench", "A beautiful sunset over mountains", "bench-model", num_images
+    )
+    for i in range(num_images):
+        job.mark_running(i)
+        job.mark_succeeded(i, urls[i])
+    return job
+
+
+def measure(
+    build: Callable[[int, list[str]], object], num_images: int
+) -> tuple[int, int, float]:
+    """
+    Measure retained bytes, live allocations and build time for one job.
+
+    Returns:
+        Retained bytes, number of live allocated blocks and microseconds
+    """
+    # URLs are created up front since both representations reference them
+    urls = [URL.format(guid=i) for i in range(num_images)]
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    job = build(num_images, urls)
+    after, _ = tracemalloc.get_traced_memory()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(
+        stat.count_diff
+        for stat in snapshot_after.compare_to(snapshot_before, "filename")
+    )
+
+    start = time.perf_counter()
+    for _ in range(max(1, 1000 // num_images)):
+        build(num_images, urls)
+    elapsed_us = (time.perf_counter() - start) * 1e6 / max(1, 1000 // num_images)
+
+    del job
+    return after - before, blocks, elapsed_us
+
+
+def main() -> None:
+    """Run the job state benchmark."""
+    print(
+        f"{'images':>7} | {'pydantic bytes':>14} {'blocks':>7} {'build us':>9} | "
+        f"{'compact bytes':>13} {'blocks':>7} {'build us':>9}"
+    )
+    for num_images in NUM_IMAGES:
+        p_bytes, p_blocks, p_us = measure(pydantic_job, num_images)
+        c_bytes, c_blocks, c_us = measure(compact_job, num_images)
+        print(
+            f"{num_images:>7} | {p_bytes:>14,} {p_blocks:>7,} {p_us:>9,.0f} | "
+            f"{c_bytes:>13,} {c_blocks:>7,} {c_us:>9,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
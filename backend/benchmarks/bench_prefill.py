@@ -0,0 +1,151 @@
+"""
+Simulation of bursty traffic over popular prompt templates, with prefill.
+
+Runs the generation service against a fake upstream with the prompt cache
+enabled and a short cache TTL (standing in for the hour after which
+Replicate deletes outputs). Bursts of single-image jobs arrive with idle
+gaps in between, their prompts drawn from a Zipf distribution over prompt
+templates. The same traffic is run:
+- with the prompt cache only: a popular prompt is generated again on its
+  first request after its images expired
+- with prefill: popular prompts are regenerated during the idle gaps before
+  their images expire, and prefill predictions are cancelled when a burst
+  needs the model
+
+Reported per run: the share of jobs served from the cache, the TTFI of all
+jobs and of generated ones (to show prefill yields to real jobs), upstream
+predictions, and the prefill counters with the TTFI saved by prefilled hits.
+
+Usage:
+    python -m benchmarks.bench_prefill [--bursts N] [--burst-jobs N] [--ttl S]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.models.generation import GenerationRequest
+from app.services.generation_service import GenerationService
+from app.services.job_state import COMPLETED
+from app.services.prompt_cache import prompt_cache
+from benchmarks.fake_upstream import FakeReplicateClient
+
+# Words the prompt templates are made of, distinct enough not to near-hit
+WORDS = (
+    "amber anchor badger beacon canyon cobalt comet dagger ember falcon fjord "
+    "glacier harvest hermit iris jackal jasmine kettle lagoon lynx marble meteor "
+    "nectar oasis onyx orchard pelican quartz quill raven saffron tundra umber "
+    "velvet walrus willow yarrow zephyr"
+).split()
+
+
+def templates(count: int, rng: random.Random) -> list[str]:
+    """Generate prompt templates of four random words."""
+    return [" ".join(rng.sample(WORDS, 4)) for _ in range(count)]
+
+
+async def run_scenario(args: argparse.Namespace, prefill: bool) -> dict:
+    """Send the bursts of jobs and collect the TTFI and prefill counters."""
+    rng = random.Random(args.seed)
+    prompts = templates(args.templates, rng)
+    weights = [1 / rank**args.zipf for rank in range(1, len(prompts) + 1)]
+
+    prompt_cache.__init__(ttl_seconds=args.ttl)
+    service = GenerationService()
+    service._cache_enabled = True
+    service._prefill_enabled = prefill
+    service._client = upstream = FakeReplicateClient(
+        latency_ms=args.latency_ms, jitter=0.2, seed=args.seed
+    )
+    service._preview_poll_interval = 0.05
+    service.start_prefill()
+
+    job_ids = []
+    for _ in range(args.bursts):
+        for prompt in rng.choices(prompts, weights, k=args.burst_jobs):
+            job_ids.append(
+                await service.create_job(GenerationRequest(prompt=prompt, num_images=1))
+            )
+        await asyncio.sleep(args.gap)
+
+    jobs = [service._jobs[job_id] for job_id in job_ids]
+    while any(job.status != COMPLETED for job in jobs):
+        await asyncio.sleep(0.05)
+    await service.stop_prefill()
+    service._executor.shutdown(wait=False, cancel_futures=True)
+
+    generated = [job.ttfi_ms for job in jobs if job.cache_hit is None]
+    return {
+        "jobs": len(jobs),
+        "cached": sum(job.cache_hit is not None for job in jobs),
+        "ttfi": [job.ttfi_ms for job in jobs if job.ttfi_ms is not None],
+        "generated_ttfi": [ttfi for ttfi in generated if ttfi is not None],
+        "upstream_calls": upstream.calls,
+        "prefill": service.get_prefill_stats(),
+    }
+
+
+def report(name: str, result: dict) -> None:
+    """Print the hit rate, TTFI and prefill counters of a run."""
+    ttfi = result["ttfi"]
+    generated = result["generated_ttfi"] or [0]
+    cuts = statistics.quantiles(generated, n=20) if len(generated) > 1 else generated
+    prefill = result["prefill"]
+    print(
+        f"{name:<18} served from cache {result['cached'] / result['jobs']:>4.0%}  "
+        f"TTFI mean {statistics.mean(ttfi):>5.0f}ms  generated TTFI p50 "
+        f"{statistics.median(generated):>5.0f}ms p95 {cuts[-1]:>5.0f}ms  "
+        f"upstream calls {result['upstream_calls']:>4}"
+    )
+    if prefill["enabled"]:
+        print(
+            f"{'':<18} prefill: {prefill['predictions']} predictions, "
+            f"{prefill['cancelled']} cancelled for jobs, {prefill['images']} "
+            f"images, {prefill['hits']} hits saving "
+            f"{prefill['ttfi_saved_ms'] / 1000:.1f}s of TTFI "
+            f"({prefill['mean_ttfi_saved_ms']}ms per hit)"
+        )
+
+
+async def bench(args: argparse.Namespace) -> None:
+    """Run the traffic without and with prefill."""
+    report("prompt cache only", await run_scenario(args, prefill=False))
+    report("with prefill", await run_scenario(args, prefill=True))
+
+
+def main() -> None:
+    """Parse the options and run the prefill simulation."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bursts", type=int, default=12)
+    parser.add_argument("--burst-jobs", type=int, default=16)
+    parser.add_argument("--gap", type=float, default=3.0, help="Seconds")
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--latency-ms", type=float, default=1000.0)
+    parser.add_argument("--ttl", type=float, default=8.0, help="Seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # Scaled down to the simulated time
+    settings.PREFILL_MIN_REQUESTS = 3
+    settings.PREFILL_REFRESH_SECONDS = args.ttl / 2
+    settings.PREFILL_INTERVAL_SECONDS = 0.1
+    settings.PREFILL_MAX_PREDICTIONS_PER_HOUR = 10_000
+    print(
+        f"{args.bursts} bursts of {args.burst_jobs} jobs every {args.gap}s over "
+        f"{args.templates} prompts (Zipf {args.zipf}), {args.latency_ms:.0f}ms "
+        f"predictions, {args.ttl}s cache TTL, {settings.PREFILL_TOP_PROMPTS} "
+        f"prompts prefilled ({settings.PREFILL_MAX_CONCURRENCY} at a time)"
+    )
+    start = time.perf_counter()
+    asyncio.run(bench(args))
+    print(f"Simulated in {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
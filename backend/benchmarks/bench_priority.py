@@ -0,0 +1,143 @@
+"""
+Simulation of interactive generation jobs competing with a backfill.
+
+Runs the generation service against a fake upstream (50ms predictions, the
+default model's concurrency limit) while interactive jobs arrive at a steady
+pace, and reports their time to first image (TTFI) and deadline misses:
+- without a backfill, as the baseline
+- during a backfill, with every job at the default priority and without
+  deadlines, which is dispatched first-come first-served like before
+  priorities and deadlines existed
+- during a low-priority backfill, where high-priority interactive calls with
+  a deadline jump the queue
+- the same, with a deadline too tight for some predictions, to show images
+  failed (and reported in `done`) for missing the deadline
+
+Usage:
+    python -m benchmarks.bench_priority [--backfill-jobs N] [--interactive-jobs N]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+from typing import Optional
+
+from app.models.generation import GenerationRequest
+from app.services.generation_service import GenerationService
+from app.services.job_state import COMPLETED
+from benchmarks.fake_upstream import FakeReplicateClient
+
+DEFAULT_PRIORITY = GenerationRequest.model_fields["priority"].default
+INTERACTIVE_PRIORITY = 9
+INTERACTIVE_IMAGES = 4
+INTERACTIVE_DEADLINE_MS = 3_000
+TIGHT_DEADLINE_MS = 60
+INTERACTIVE_INTERVAL_S = 0.2
+BACKFILL_IMAGES = 20
+
+
+async def run_scenario(
+    backfill_jobs: int,
+    backfill_priority: int,
+    interactive_priority: int,
+    interactive_deadline_ms: Optional[int],
+    interactive_jobs: int,
+) -> tuple[list[int], int, int]:
+    """
+    Run interactive jobs, optionally during a backfill.
+
+    Returns:
+        TTFI of every interactive job in milliseconds, interactive deadline
+        misses and backfill images finished while interactive jobs ran
+    """
+    service = GenerationService()
+    service._client = FakeReplicateClient(latency_ms=50.0)
+
+    backfill_ids = [
+        await service.create_job(
+            GenerationRequest(
+                prompt=f"Backfill artwork {i}",
+                num_images=BACKFILL_IMAGES,
+                priority=backfill_priority,
+            )
+        )
+        for i in range(backfill_jobs)
+    ]
+
+    interactive_ids = []
+    for i in range(interactive_jobs):
+        interactive_ids.append(
+            await service.create_job(
+                GenerationRequest(
+                    prompt=f"Interactive prompt {i}",
+                    num_images=INTERACTIVE_IMAGES,
+                    priority=interactive_priority,
+                    deadline_ms=interactive_deadline_ms,
+                )
+            )
+        )
+        await asyncio.sleep(INTERACTIVE_INTERVAL_S)
+
+    jobs = [service._jobs[job_id] for job_id in interactive_ids]
+    while any(job.status != COMPLETED for job in jobs):
+        await asyncio.sleep(0.01)
+
+    backfilled = sum(
+        service._jobs[job_id].num_images - service._jobs[job_id].count(0)
+        for job_id in backfill_ids
+    )
+    service._executor.shutdown(wait=False, cancel_futures=True)
+
+    ttfis = [job.ttfi_ms if job.ttfi_ms is not None else -1 for job in jobs]
+    misses = sum(job.deadline_misses for job in jobs)
+    return ttfis, misses, backfilled
+
+
+def report(name: str, ttfis: list[int], misses: int, backfilled: int) -> None:
+    """Print the TTFI percentiles and deadline misses of a scenario."""
+    served = [ttfi for ttfi in ttfis if ttfi >= 0]
+    cuts = statistics.quantiles(served, n=20) if len(served) > 1 else served * 19
+    print(
+        f"{name:<32} TTFI p50 {statistics.median(served):>6.0f}ms  "
+        f"p95 {cuts[18]:>6.0f}ms  no image {len(ttfis) - len(served):>3}  "
+        f"deadline misses {misses:>4}  backfilled {backfilled:>5}"
+    )
+
+
+def main() -> None:
+    """Run every scenario."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backfill-jobs", type=int, default=50)
+    parser.add_argument("--interactive-jobs", type=int, default=30)
+    args = parser.parse_args()
+
+    # Images still running when a scenario ends fail noisily on shutdown
+    logging.disable(logging.CRITICAL)
+
+    interactive = (INTERACTIVE_PRIORITY, INTERACTIVE_DEADLINE_MS)
+    scenarios = {
+        "no backfill": (0, 0, *interactive),
+        "backfill, FIFO": (
+            args.backfill_jobs,
+            DEFAULT_PRIORITY,
+            DEFAULT_PRIORITY,
+            None,
+        ),
+        "backfill, priority 0": (args.backfill_jobs, 0, *interactive),
+        f"backfill, {TIGHT_DEADLINE_MS}ms deadline": (
+            args.backfill_jobs,
+            0,
+            INTERACTIVE_PRIORITY,
+            TIGHT_DEADLINE_MS,
+        ),
+    }
+    for name, scenario in scenarios.items():
+        ttfis, misses, backfilled = asyncio.run(
+            run_scenario(*scenario, args.interactive_jobs)
+        )
+        report(name, ttfis, misses, backfilled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Benchmark of the semantic prompt cache.
+
+- Whether prompts are only served the images of their own model
+- Precision and recall of near-duplicate detection on a labelled set of
+  prompt pairs, at the configured threshold and a few others
+- Lookup latency of single prompts and of batches, and the embedding cost,
+  with 1M cached prompts (about 1 GB of embeddings at 256 dimensions)
+
+Usage:
+    python -m benchmarks.bench_prompt_cache [--prompts N] [--dim D]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.prompt_cache import PromptCache
+
+MODEL = "bench-model"
+
+# Prompt pairs labelled as duplicates (same picture expected) or not
+DUPLICATES = [
+    ("A sunset over mountains", "a beautiful sunset over the mountains"),
+    ("A cat sitting on a windowsill", "cat sitting on the windowsill"),
+    ("Portrait of an old man with a beard", "portrait of old man with beard"),
+    ("A red sports car on a highway", "red sports car driving on the highway"),
+    ("Cyberpunk city at night", "a cyberpunk city at night, neon"),
+    ("A dragon flying over a castle", "dragon flying over the castle"),
+    ("Astronaut riding a horse", "an astronaut riding a horse"),
+    ("A bowl of ramen", "a bowl of ramen noodles"),
+    ("Watercolor painting of a lighthouse", "watercolor painting of lighthouse"),
+    ("A forest in autumn", "forest in the autumn"),
+    ("Snowy mountain village", "a snowy mountain village"),
+    ("A robot playing chess", "robot playing a game of chess"),
+    ("Underwater coral reef with fish", "an underwater coral reef with fishes"),
+    ("A futuristic spaceship", "futuristic spaceships"),
+    ("Medieval knight in armor", "a medieval knight in shining armor"),
+    ("A cozy cabin in the woods", "cozy cabin in the woods at dusk"),
+    ("Vintage poster of Paris", "vintage posters of paris"),
+    ("A golden retriever puppy", "golden retriever puppy playing"),
+    ("Steampunk airship in the clouds", "a steampunk airship in clouds"),
+    ("A bustling market in Marrakech", "bustling market in marrakech"),
+    ("Pixel art of a wizard", "pixel art wizard"),
+    ("A lone tree on a hill", "lone tree on the hill"),
+    ("Japanese garden with cherry blossoms", "a japanese garden with cherry blossom"),
+    ("A haunted house on a stormy night", "haunted house on stormy night"),
+    ("Oil painting of a stormy sea", "an oil painting of the stormy sea"),
+]
+DIFFERENT = [
+    ("A sunset over mountains", "A sunrise over the ocean"),
+    ("A red car", "A blue car"),
+    ("A cat sitting on a windowsill", "A dog sitting on a windowsill"),
+    ("Portrait of an old man with a beard", "Portrait of a young woman"),
+    ("Cyberpunk city at night", "Medieval city at dawn"),
+    ("A dragon flying over a castle", "A castle on a lake"),
+    ("Astronaut riding a horse", "Horse running on a beach"),
+    ("A bowl of ramen", "A bowl of fruit"),
+    ("Watercolor painting of a lighthouse", "Watercolor painting of a forest"),
+    ("A forest in autumn", "A desert at noon"),
+    ("Snowy mountain village", "Tropical beach village"),
+    ("A robot playing chess", "Two children playing chess"),
+    ("Underwater coral reef with fish", "Fish market in Tokyo"),
+    ("A futuristic spaceship", "A futuristic city skyline"),
+    ("Medieval knight in armor", "Samurai warrior in armor"),
+    ("A cozy cabin in the woods", "A modern apartment in the city"),
+    ("Vintage poster of Paris", "Vintage poster of New York"),
+    ("A golden retriever puppy", "A black cat kitten"),
+    ("Steampunk airship in the clouds", "Airplane above the clouds"),
+    ("A bustling market in Marrakech", "An empty street in Marrakech"),
+    ("Pixel art of a wizard", "Pixel art of a castle"),
+    ("A lone tree on a hill", "A lone wolf on a hill"),
+    ("Japanese garden with cherry blossoms", "English garden with roses"),
+    ("A haunted house on a stormy night", "A happy house on a sunny day"),
+    ("Oil painting of a stormy sea", "Oil painting of a calm lake"),
+]
+
+# Vocabulary of the random prompts filling the cache
+WORDS = (
+    "ancient bright castle city cloud dark desert dragon forest garden giant "
+    "glowing golden harbor hidden island jungle knight lake lantern meadow "
+    "misty moon mountain neon ocean painting palace portrait quiet rainy river "
+    "robot ruins shadow silver sky snowy space star storm street sunset temple "
+    "tower train valley village vintage volcano waterfall winter wizard"
+).split()
+
+
+def precision(dim: int) -> None:
+    """Print the precision and recall of near-hits on the labelled pairs."""
+    print(f"Labelled set: {len(DUPLICATES)} duplicates, {len(DIFFERENT)} different")
+    thresholds = sorted({0.7, 0.75, 0.8, 0.85, 0.9, settings.PROMPT_CACHE_THRESHOLD})
+    for threshold in thresholds:
+        true_positives = false_positives = 0
+        for pairs, duplicate in ((DUPLICATES, True), (DIFFERENT, False)):
+            for cached, looked_up in pairs:
+                cache = PromptCache(max_prompts=10, dim=dim, threshold=threshold)
+                cache.add(cached, MODEL, ["https://example.com/0.webp"])
+                if cache.lookup(looked_up, MODEL, 1) is not None:
+                    if duplicate:
+                        true_positives += 1
+                    else:
+                        false_positives += 1
+
+        hits = true_positives + false_positives
+        marker = " (configured)" if threshold == settings.PROMPT_CACHE_THRESHOLD else ""
+        print(
+            f"  threshold {threshold:.2f}: precision "
+            f"{true_positives / hits if hits else 1.0:.0%}, recall "
+            f"{true_positives / len(DUPLICATES):.0%}{marker}"
+        )
+
+
+def check_models(dim: int) -> None:
+    """Check that a prompt is never served the images of another model."""
+    cache = PromptCache(max_prompts=10, dim=dim)
+    cache.add("a red car on a mountain road", "model-a", ["https://example.com/a"])
+    # No row of the model yet, with one and with several models cached
+    for models in (["model-a"], ["model-a", "model-c"]):
+        for model in models[1:]:
+            cache.add("a blue boat on a lake", model, ["https://example.com/c"])
+        for prompt in ("a red car on a mountain road", "red car on the mountain road"):
+            assert cache.lookup(prompt, "model-b", 1) is None, (prompt, models)
+            assert cache.lookup(prompt, "model-a", 1) is not None, (prompt, models)
+    print("Model isolation: no hit across models")
+
+
+def random_prompts(count: int, rng: random.Random) -> list[str]:
+    """Generate random prompts of 4 to 10 words."""
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 10))) for _ in range(count)]
+
+
+def latency(num_prompts: int, dim: int) -> None:
+    """Print the lookup latency with a full cache."""
+    rng = random.Random(0)
+    cache = PromptCache(max_prompts=num_prompts, dim=dim)
+
+    start = time.perf_counter()
+    chunk = 10000
+    for offset in range(0, num_prompts, chunk):
+        prompts = random_prompts(min(chunk, num_prompts - offset), rng)
+        # Fill the rows directly, adding a million prompts one by one is slow
+        first = len(cache)
+        cache._reserve(first + len(prompts))
+        vectors = cache.vectorizer.embed(
+            [cache.vectorizer.normalize(prompt) for prompt in prompts]
+        )
+        cache._matrix[first : first + len(prompts)] = vectors
+        cache._model_codes[first : first + len(prompts)] = cache._model_code(MODEL)
+        cache._added_at[first : first + len(prompts)] = time.monotonic()
+        for row, prompt in enumerate(prompts, first):
+            normalized = cache.vectorizer.normalize(prompt)
+            cache._entries.append((prompt, normalized, 0, ("https://e.com/0",), False))
+            cache._rows[(normalized, 0)] = row
+            cache._lru[row] = None
+    filled = time.perf_counter() - start
+    print(
+        f"\n{len(cache):,} cached prompts ({cache._matrix.nbytes / 1e6:,.0f} MB of "
+        f"{dim}-dimension embeddings), filled in {filled:.1f}s"
+    )
+
+    queries = random_prompts(256, rng)
+    start = time.perf_counter()
+    cache.vectorizer.embed([cache.vectorizer.normalize(q) for q in queries])
+    embed_us = (time.perf_counter() - start) / len(queries) * 1e6
+    print(f"  embedding: {embed_us:.0f}us per prompt")
+
+    timings = []
+    for query in queries[:20]:
+        start = time.perf_counter()
+        cache.lookup(query, MODEL, 1)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"  single lookup: p50 {np.median(timings):.1f}ms, " f"max {max(timings):.1f}ms"
+    )
+
+    for batch in (16, 64, 256):
+        start = time.perf_counter()
+        cache.lookup_batch([(query, MODEL, 1) for query in queries[:batch]])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"  batch of {batch:>3}: {elapsed:7.1f}ms "
+            f"({elapsed / batch:.2f}ms per prompt)"
+        )
+
+
+def main() -> None:
+    """Parse the options and run the prompt cache benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prompts", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=settings.PROMPT_CACHE_DIM)
+    args = parser.parse_args()
+
+    check_models(args.dim)
+    precision(args.dim)
+    latency(args.prompts, args.dim)
+
+
+if __name__ == "__main__":
+    main()
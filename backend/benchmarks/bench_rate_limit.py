@@ -0,0 +1,85 @@
+"""
+Benchmark for the in-process token-bucket rate limiter.
+
+Measures the cost of taking a token for a single hot key, for many distinct
+keys (one bucket each, as with many users or client IPs), and under key
+churn where idle buckets are evicted, along with the number of buckets kept
+in memory.
+
+Usage:
+    python -m benchmarks.bench_rate_limit [--keys N] [--requests N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from app.core.rate_limit import TokenBucketLimiter
+
+
+class FakeClock:
+    """Clock advanced manually, so buckets can go idle without sleeping."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Get the current time."""
+        return self.now
+
+
+async def time_acquires(limiter: TokenBucketLimiter, keys: list[str]) -> float:
+    """Take a token for every key and get the mean cost in microseconds."""
+    acquire = limiter.acquire
+    start = time.perf_counter()
+    for key in keys:
+        await acquire(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+async def bench(num_keys: int, num_requests: int) -> None:
+    """Run the limiter benchmarks."""
+    hot = TokenBucketLimiter("bench", rate=1e9, burst=1e9)
+    elapsed = await time_acquires(hot, ["user:hot"] * num_requests)
+    print(f"{'single hot key':<28} {elapsed:>6.2f}us per request")
+
+    many = TokenBucketLimiter("bench", rate=1.0, burst=10)
+    keys = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(num_keys)]
+    requests = keys * max(1, num_requests // num_keys)
+    elapsed = await time_acquires(many, requests)
+    print(
+        f"{f'{num_keys:,} distinct keys':<28} {elapsed:>6.2f}us per request  "
+        f"({len(many):,} buckets)"
+    )
+
+    # Every round uses new keys and the clock moves past the refill time, so
+    # buckets of previous rounds are idle and get evicted
+    clock = FakeClock()
+    churn = TokenBucketLimiter("bench", rate=1.0, burst=10, clock=clock)
+    rounds = 10
+    samples = []
+    for round_index in range(rounds):
+        clock.now += 20.0
+        round_keys = [f"{round_index}:{key}" for key in keys]
+        samples.append(await time_acquires(churn, round_keys))
+    print(
+        f"{'churn with eviction':<28} {sum(samples) / rounds:>6.2f}us per request  "
+        f"({len(churn):,} buckets after {rounds * num_keys:,} keys)"
+    )
+
+
+def main() -> None:
+    """Parse arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    asyncio.run(bench(args.keys, args.requests))
+
+
+if __name__ == "__main__":
+    main()
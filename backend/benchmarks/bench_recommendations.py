@@ -0,0 +1,122 @@
+"""
+Benchmark for "Top Picks for You" recommendations.
+
+Loads a generated catalog (100k shows by default) and synthetic users with a
+random My List and generation history, then measures:
+- batch mode: scoring every show for every user (10k by default) with one
+  matrix product per chunk of users, against a per-user Python loop that
+  sorts the whole catalog
+- single-user latency, uncached (score, select, serialize) and cached
+
+Usage:
+    python -m benchmarks.bench_recommendations [--shows N] [--users N]
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.catalog_service import catalog_service, generate_dummy_shows
+from app.services.recommendation_service import recommendation_service
+
+PROMPTS = [
+    "a haunted house at night",
+    "a robot exploring space",
+    "a funny cartoon dog",
+    "a detective in the rain",
+    "a wedding on the beach",
+    "an epic battle between heroes",
+    "wildlife in the savanna",
+]
+
+
+def percentiles(samples_us: list[float]) -> str:
+    """Format p50/p95/p99 of latency samples in microseconds."""
+    cuts = statistics.quantiles(samples_us, n=100)
+    return f"p50 {cuts[49]:>8.1f}us  p95 {cuts[94]:>8.1f}us  p99 {cuts[98]:>8.1f}us"
+
+
+def main() -> None:
+    """Load the catalog and users and run the recommendation benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(7)
+    k = settings.RECOMMENDATIONS_SIZE
+
+    catalog_service.load(generate_dummy_shows(args.shows))
+    show_ids = [show.id for show in catalog_service.shows]
+
+    user_ids = [f"user-{i}" for i in range(args.users)]
+    for user_id in user_ids:
+        for show_id in rng.sample(show_ids, rng.randrange(21)):
+            recommendation_service.add_to_my_list(user_id, show_id)
+        for _ in range(rng.randrange(6)):
+            recommendation_service.record_generation(user_id, rng.choice(PROMPTS))
+
+    start = time.perf_counter()
+    recommendation_service.profile(user_ids[0])
+    print(
+        f"built {args.shows:,}-show feature matrix in {time.perf_counter() - start:.2f}s"
+    )
+
+    start = time.perf_counter()
+    results = recommendation_service.recommend_batch(user_ids, k)
+    elapsed = time.perf_counter() - start
+    print(
+        f"batch mode: {args.users:,} users x {args.shows:,} shows in {elapsed:.2f}s "
+        f"({args.users / elapsed:,.0f} users/s)"
+    )
+
+    # Baseline: score with a Python dot product per show and sort everything
+    features = recommendation_service._features.tolist()
+    sample = user_ids[:20]
+    start = time.perf_counter()
+    for user_id in sample:
+        profile = recommendation_service.profile(user_id).tolist()
+        excluded = set(recommendation_service.get_my_list(user_id))
+        scores = [
+            (sum(f * p for f, p in zip(row, profile)), i)
+            for i, row in enumerate(features)
+            if i not in excluded
+        ]
+        scores.sort(reverse=True)
+    per_user = (time.perf_counter() - start) / len(sample)
+    print(
+        f"python sort baseline: {per_user * 1e3:.1f}ms per user "
+        f"({args.users * per_user:.0f}s for all users)"
+    )
+
+    # Batch and single-user results agree, up to the order of equal scores
+    for user_id, batch in list(zip(user_ids, results))[:100]:
+        single = recommendation_service.recommend(user_id, k)
+        scores = recommendation_service._features @ recommendation_service.profile(
+            user_id
+        )
+        assert np.allclose(np.sort(scores[batch]), np.sort(scores[single]))
+
+    samples = []
+    for user_id in user_ids[:1_000]:
+        start = time.perf_counter()
+        recommendation_service.get_top_picks(user_id)
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"{'single user, uncached':<24} {percentiles(samples)}")
+
+    samples = []
+    for user_id in user_ids[:1_000]:
+        start = time.perf_counter()
+        recommendation_service.get_top_picks(user_id)
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"{'single user, cached':<24} {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
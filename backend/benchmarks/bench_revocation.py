@@ -0,0 +1,133 @@
+"""
+Microbenchmark of the revoked token check on the authenticated hot path.
+
+Measures `RevokedTokens.is_revoked` for tokens that were not revoked (the
+common case) and for revoked ones, with an empty denylist and with many
+revoked tokens, without and with the Bloom filter front. Every check uses a
+fresh `jti` string, so its hash is computed as it is on a real request.
+For scale, it also times verifying an access token (HMAC and JSON decoding),
+a refresh and a bcrypt login.
+
+Usage:
+    python -m benchmarks.bench_revocation [--checks N] [--revoked N ...]
+"""
+
+import argparse
+import asyncio
+import logging
+import secrets
+import sys
+import time
+
+from app.core.revocation import RevokedTokens
+from app.core.security import create_access_token, verify_access_token
+from app.models.auth import LoginRequest
+from app.services.auth_service import auth_service
+
+
+def fresh_ids(count: int) -> list[str]:
+    """Generate token IDs, like the `jti` claims of tokens."""
+    return [secrets.token_hex(16) for _ in range(count)]
+
+
+async def time_checks(denylist: RevokedTokens, ids: list[str]) -> float:
+    """Check every ID once and get the mean cost in nanoseconds."""
+    is_revoked = denylist.is_revoked
+    # Copies whose hash is not cached yet, for the loop and for the checks
+    baseline = [id_.encode().decode() for id_ in ids]
+    checked = [id_.encode().decode() for id_ in ids]
+
+    start = time.perf_counter()
+    for jti in baseline:
+        pass
+    overhead = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for jti in checked:
+        await is_revoked(jti)
+    return (time.perf_counter() - start - overhead) / len(ids) * 1e9
+
+
+def denylist_bytes(denylist: RevokedTokens) -> int:
+    """Get the memory of the denylist dict, its keys and the Bloom filter."""
+    size = sys.getsizeof(denylist._expiries)
+    size += sum(sys.getsizeof(jti) for jti in denylist._expiries)
+    return size + (len(denylist._bloom) if denylist._bloom is not None else 0)
+
+
+async def checks(num_checks: int, revoked_counts: list[int]) -> None:
+    """Print the cost of the check for each denylist size."""
+    print(f"Revocation check, mean of {num_checks:,} checks")
+    expires_at = time.time() + 3600
+    for revoked in revoked_counts:
+        revoked_ids = fresh_ids(revoked)
+        for bloom_bits in (0, 16 * revoked):
+            denylist = RevokedTokens(bloom_bits=bloom_bits)
+            for jti in revoked_ids:
+                await denylist.revoke(jti, expires_at)
+
+            valid_ns = await time_checks(denylist, fresh_ids(num_checks))
+            line = (
+                f"  {revoked:>9,} revoked, "
+                f"{'Bloom filter' if bloom_bits else 'dict only':<12}: "
+                f"valid token {valid_ns:5.0f}ns"
+            )
+            if revoked:
+                sample = revoked_ids[:num_checks]
+                revoked_ns = await time_checks(denylist, sample)
+                line += (
+                    f", revoked token {revoked_ns:5.0f}ns, "
+                    f"{denylist_bytes(denylist) / 1e6:6.1f} MB"
+                )
+            print(line)
+            if revoked == 0:
+                break
+
+
+async def auth_paths(num_checks: int) -> None:
+    """Print the cost of verifying tokens, refreshing and logging in."""
+    token = create_access_token(user_id="user_01", email="demo@myflix.com")
+    count = min(num_checks, 20_000)
+    start = time.perf_counter()
+    for _ in range(count):
+        await verify_access_token(token)
+    verify_us = (time.perf_counter() - start) / count * 1e6
+
+    login = await auth_service.login(
+        LoginRequest(email="demo@myflix.com", password="demo123")
+    )
+    refresh_token = login.refresh_token
+    start = time.perf_counter()
+    for _ in range(100):
+        refresh_token = (await auth_service.refresh(refresh_token)).refresh_token
+    refresh_us = (time.perf_counter() - start) / 100 * 1e6
+
+    start = time.perf_counter()
+    for _ in range(5):
+        await auth_service.login(
+            LoginRequest(email="demo@myflix.com", password="demo123")
+        )
+    login_us = (time.perf_counter() - start) / 5 * 1e6
+
+    print(
+        f"\nFor scale: verifying an access token {verify_us:,.1f}us, "
+        f"refresh {refresh_us:,.0f}us, bcrypt login {login_us:,.0f}us"
+    )
+
+
+def main() -> None:
+    """Parse the options and run the revocation benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument(
+        "--revoked", type=int, nargs="+", default=[0, 1_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    asyncio.run(checks(args.checks, args.revoked))
+    asyncio.run(auth_paths(args.checks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark for catalog search.
+
+Builds the search index over a generated catalog (1M shows by default) and
+replays typeahead sessions: every prefix of a set of titles is searched as
+if typed character by character, with and without genre/year filters and
+with infix queries. Reports p50/p95/p99 latency, incremental add cost and
+latency while and after added shows are merged in the background.
+
+Usage:
+    python -m benchmarks.bench_search [--shows N] [--sessions N]
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from app.services.catalog_service import generate_dummy_shows
+from app.services.search_index import SearchIndex
+
+
+def percentiles(samples_us: list[float]) -> str:
+    """Format p50/p95/p99 of latency samples in microseconds."""
+    cuts = statistics.quantiles(samples_us, n=100)
+    return f"p50 {cuts[49]:>7.1f}us  p95 {cuts[94]:>7.1f}us  p99 {cuts[98]:>7.1f}us"
+
+
+def time_queries(index: SearchIndex, queries: list[tuple[str, dict]]) -> list[float]:
+    """Run queries and collect their latencies in microseconds."""
+    samples = []
+    for query, filters in queries:
+        start = time.perf_counter()
+        index.search(query, limit=10, **filters)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main() -> None:
+    """Build the index and run the search benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(7)
+
+    start = time.perf_counter()
+    shows = generate_dummy_shows(args.shows)
+    print(f"generated {args.shows:,} shows in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index = SearchIndex(shows)
+    print(f"built index in {time.perf_counter() - start:.1f}s")
+
+    # Typeahead sessions: every prefix of a title, as it is being typed
+    typed = []
+    for show in rng.sample(shows, args.sessions):
+        typed.extend(show.title[:i] for i in range(1, len(show.title) + 1))
+
+    genres = ["Action", "Comedy", "Drama", "Horror", "Sci-Fi"]
+    scenarios = {
+        "typeahead": [(q, {}) for q in typed],
+        "typeahead + genre": [(q, {"genre": rng.choice(genres)}) for q in typed],
+        "typeahead + genre + years": [
+            (q, {"genre": rng.choice(genres), "year_from": 2022, "year_to": 2023})
+            for q in typed
+        ],
+        "infix": [(f"itle {rng.randrange(1, 10_000)}", {}) for _ in range(2_000)],
+        "single word (dense)": [("amazing", {})] * 2_000,
+    }
+
+    # Warm up caches and lazily initialized numpy paths
+    time_queries(index, scenarios["typeahead"][:200])
+
+    for name, queries in scenarios.items():
+        samples = time_queries(index, queries)
+        print(f"{name:<26} {len(queries):>7,} queries  {percentiles(samples)}")
+
+    added = generate_dummy_shows(2_000, seed=11)
+    samples = []
+    for show in added:
+        start = time.perf_counter()
+        index.add(show)
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"{'incremental add':<26} {len(added):>7,} shows    {percentiles(samples)}")
+
+    # The delta segment overflowed, so a merge is now running in the background
+    for name in ("typeahead during merge", "typeahead after merge"):
+        if name == "typeahead after merge":
+            start = time.perf_counter()
+            index.wait_for_merge()
+            print(f"waited {time.perf_counter() - start:.1f}s for the merge")
+        samples = time_queries(index, scenarios["typeahead"])
+        print(f"{name:<26} {len(typed):>7,} queries  {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark of the batching of job stream events over real sockets.
+
+Runs the app under uvicorn in a separate process, with a fake upstream whose
+predictions all take the same time, so the images of a job finish in bursts
+of the model's concurrency limit. A 1000-image job is followed by many
+subscribers over TCP, and the server reports, per `progress` event delivered
+to a subscriber:
+
+- send syscalls: `send`/`sendmsg` calls on the server's sockets, counted by
+  wrapping them (every call is one syscall)
+- CPU time of the server process
+
+Each run uses a fresh server, without batching, batching the events of one
+event loop iteration, and batching the events of a few milliseconds.
+
+Usage:
+    python -m benchmarks.bench_sse_batching [--images N] [--subscribers N]
+        [--concurrency N] [--latency-ms MS] [--window-ms MS]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+
+import httpx
+
+# Send calls of the server process, counted by the wrappers installed in it
+SEND_CALLS = {"count": 0}
+
+
+def count_sends() -> None:
+    """Wrap the send methods of sockets to count their calls."""
+    for name in ("send", "sendmsg"):
+        send = getattr(socket.socket, name)
+
+        def counted(self, *args, _send=send, **kwargs):
+            SEND_CALLS["count"] += 1
+            return _send(self, *args, **kwargs)
+
+        setattr(socket.socket, name, counted)
+
+
+def serve(port: int, env: dict[str, str], latency_ms: float) -> None:
+    """Run the app with a fake upstream, and an endpoint reporting counters."""
+    os.environ.update(env)
+    count_sends()
+
+    # Imported once the environment is set, since settings are read on import
+    import uvicorn
+
+    from app.core.rate_limit import limit_generation
+    from app.services.generation_service import generation_service
+    from benchmarks.fake_upstream import FakeReplicateClient
+    from main import app
+
+    generation_service._client = FakeReplicateClient(
+        latency_ms=latency_ms, distribution="fixed"
+    )
+    app.dependency_overrides[limit_generation] = lambda: None
+
+    @app.get("/bench/counters")
+    async def counters() -> dict:
+        return {"sends": SEND_CALLS["count"], "cpu": time.process_time()}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    """Get a TCP port that is free on the loopback interface."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def follow(port: int, job_id: str, connected: asyncio.Event) -> tuple[int, int]:
+    """
+    Read a job stream until its `done` event.
+
+    Returns:
+        tuple[int, int]: Number of `progress` events and of reads with data
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /api/generate/{job_id}/stream HTTP/1.1\r\n"
+        f"Host: bench\r\n\r\n".encode()
+    )
+    await reader.readuntil(b"\r\n\r\n")
+    connected.set()
+
+    body = bytearray()
+    reads = 0
+    while b"event: done" not in body[-4096:]:
+        data = await reader.read(65536)
+        if not data:
+            break
+        body += data
+        reads += 1
+    writer.close()
+    return body.count(b"event: progress\n"), reads
+
+
+async def measure(port: int, args: argparse.Namespace) -> dict:
+    """Run a job followed by many subscribers, and get the server counters."""
+    from app.core.security import create_access_token
+
+    token = create_access_token(user_id="user_bench", email="bench@myflix.com")
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(200):
+            try:
+                await client.get("/bench/counters")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+
+        response = await client.post(
+            "/api/generate/",
+            json={"prompt": "bench", "num_images": args.images},
+            headers={"authorization": f"Bearer {token}"},
+        )
+        job_id = response.json()["job_id"]
+
+        events = [asyncio.Event() for _ in range(args.subscribers)]
+        streams = [asyncio.create_task(follow(port, job_id, event)) for event in events]
+        await asyncio.gather(*(event.wait() for event in events))
+        before = (await client.get("/bench/counters")).json()
+        start = time.perf_counter()
+        results = await asyncio.gather(*streams)
+        duration = time.perf_counter() - start
+        after = (await client.get("/bench/counters")).json()
+
+    delivered = sum(progress for progress, _ in results)
+    return {
+        "delivered": delivered,
+        "sends": after["sends"] - before["sends"],
+        "cpu": after["cpu"] - before["cpu"],
+        "reads": sum(reads for _, reads in results),
+        "duration": duration,
+    }
+
+
+def run(label: str, env: dict[str, str], args: argparse.Namespace) -> None:
+    """Measure a fresh server with the given settings, and print the results."""
+    port = free_port()
+    env = {
+        "LOG_LEVEL": "WARNING",
+        "UPSTREAM_WARMUP_ENABLED": "false",
+        # The subscribers share the CPU, and would be reported as stalls
+        "LOOP_MONITOR_ENABLED": "false",
+        "IMAGE_GEN_MODEL_CONCURRENCY": str(args.concurrency),
+        **env,
+    }
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port, env, args.latency_ms), daemon=True
+    )
+    server.start()
+    try:
+        result = asyncio.run(measure(port, args))
+    finally:
+        server.terminate()
+        server.join()
+
+    delivered = result["delivered"]
+    print(
+        f"  {label:<16} {delivered:>9,}  "
+        f"{result['sends'] / delivered:8.3f}  "
+        f"{result['cpu'] / delivered * 1e6:8.1f}  "
+        f"{result['reads'] / args.subscribers:8.0f}  "
+        f"{result['duration']:6.1f}s"
+    )
+
+
+def main() -> None:
+    """Parse the options and run the SSE batching benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=1000.0)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.images}-image job, {args.subscribers} subscribers, bursts of "
+        f"{args.concurrency} images every {args.latency_ms:.0f}ms"
+    )
+    print(
+        f"  {'batching':<16} {'events':>9}  {'sends/ev':>8}  {'CPU us/ev':>8}  "
+        f"{'reads/sub':>8}  {'time':>7}"
+    )
+    modes = {
+        "off": {"SSE_BATCHING_ENABLED": "false"},
+        "loop iteration": {"SSE_BATCH_WINDOW_MS": "0"},
+        f"{args.window_ms:g}ms window": {"SSE_BATCH_WINDOW_MS": str(args.window_ms)},
+    }
+    for label, env in modes.items():
+        run(label, env, args)
+
+
+if __name__ == "__main__":
+    main()
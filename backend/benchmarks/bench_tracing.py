@@ -0,0 +1,90 @@
+"""
+Benchmark for the lifecycle tracing of generation jobs.
+
+Runs generation jobs against a fake upstream that answers immediately, so the
+time per image is the service's own overhead, with tracing disabled, with
+every job traced, and with 10% of jobs traced. Runs alternate between the
+settings and the fastest of several rounds is kept, to reduce noise.
+
+Usage:
+    python -m benchmarks.bench_tracing [--jobs N] [--images N] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from app.core import tracing
+from app.models.generation import GenerationRequest
+from app.services.generation_service import GenerationService
+from app.services.job_state import COMPLETED
+from benchmarks.fake_upstream import FakeReplicateClient
+
+SAMPLE_RATES = {"tracing disabled": 0.0, "10% sampled": 0.1, "every job traced": 1.0}
+
+
+async def run_jobs(jobs: int, images: int) -> float:
+    """
+    Run generation jobs to completion.
+
+    Returns:
+        float: Wall time per image, in microseconds
+    """
+    service = GenerationService()
+    service._client = FakeReplicateClient(latency_ms=0.0)
+
+    start = time.perf_counter()
+    job_ids = [
+        await service.create_job(
+            GenerationRequest(prompt=f"prompt {i}", num_images=images)
+        )
+        for i in range(jobs)
+    ]
+    states = [service._jobs[job_id] for job_id in job_ids]
+    while any(job.status != COMPLETED for job in states):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    service._executor.shutdown(wait=True)
+    return elapsed / (jobs * images) * 1e6
+
+
+def main() -> None:
+    """Run the tracing benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    installed = "installed" if tracing.otel_trace is not None else "not installed"
+    print(f"OpenTelemetry API {installed}")
+
+    best = {name: float("inf") for name in SAMPLE_RATES}
+    for _ in range(args.rounds):
+        for name, sample_rate in SAMPLE_RATES.items():
+            tracing.tracer.sample_rate = sample_rate
+            per_image = asyncio.run(run_jobs(args.jobs, args.images))
+            best[name] = min(best[name], per_image)
+
+    baseline = best["tracing disabled"]
+    for name, per_image in best.items():
+        print(
+            f"{name:<18} {per_image:>8.1f}us per image  "
+            f"overhead {per_image - baseline:>+6.1f}us"
+        )
+
+    trace = tracing.JobTrace("job")
+    count = 100_000
+    start = time.perf_counter()
+    for _ in range(count):
+        now = time.perf_counter_ns()
+        trace.add("image.run", now, now, {"index": 0, "status": "succeeded"})
+    per_span = (time.perf_counter() - start) / count * 1e6
+    print(f"recording a span   {per_span:>8.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Simulation of the first jobs served after startup and after an idle period.
+
+Runs the generation service against a fake upstream where a call without an
+idle pooled connection pays a handshake, idle connections expire, and the
+first prediction of a model pays a cold boot. A burst of single-image jobs
+is sent and its time to first image (TTFI) reported:
+- on a cold start, without warm-up
+- once the warm-up service has opened the pooled connections
+- once it has also run a warm-up prediction of every model
+- after the upstream was idle for longer than the connection expiry,
+  without and with keep-alive calls
+
+Usage:
+    python -m benchmarks.bench_warmup [--jobs N] [--connect-ms MS] [--idle S]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from app.core.config import settings
+from app.models.generation import GenerationRequest
+from app.services.generation_service import generation_service
+from app.services.job_state import COMPLETED
+from app.services.warmup_service import WarmupService
+from benchmarks.fake_upstream import FakeReplicateClient
+
+
+async def burst(jobs: int) -> list[float]:
+    """Create single-image jobs at once and get their TTFI in milliseconds."""
+    ids = [
+        await generation_service.create_job(
+            GenerationRequest(prompt=f"Warm-up benchmark {i}", num_images=1)
+        )
+        for i in range(jobs)
+    ]
+    states = [generation_service._jobs[job_id] for job_id in ids]
+    while any(job.status != COMPLETED for job in states):
+        await asyncio.sleep(0.01)
+    return [job.ttfi_ms for job in states if job.ttfi_ms is not None]
+
+
+async def run_scenario(
+    args: argparse.Namespace,
+    warmup: bool,
+    predictions: bool,
+    keepalive: bool,
+    idle: bool,
+) -> tuple[list[float], float, FakeReplicateClient]:
+    """
+    Warm up as configured, optionally idle, then send a burst of jobs.
+
+    Returns:
+        TTFI of every job, time until ready in milliseconds, and the upstream
+    """
+    upstream = FakeReplicateClient(
+        latency_ms=args.latency_ms,
+        jitter=0.1,
+        connect_ms=args.connect_ms,
+        keepalive_expiry=args.expiry,
+        cold_start_ms=args.cold_start_ms,
+        rtt_ms=args.connect_ms / 3,
+    )
+    generation_service._client = upstream
+    generation_service._last_upstream_call = time.monotonic()
+    warmup_service = WarmupService(
+        connections=args.jobs,
+        predictions=predictions,
+        keepalive_interval=args.expiry / 2 if keepalive else 0,
+    )
+
+    start = time.perf_counter()
+    if warmup:
+        warmup_service.start()
+        while not warmup_service.ready:
+            await asyncio.sleep(0.005)
+    ready_ms = (time.perf_counter() - start) * 1000
+
+    if idle:
+        # Boot the model and open the connections, then leave them idle
+        await burst(args.jobs)
+        await asyncio.sleep(args.idle)
+
+    ttfis = await burst(args.jobs)
+    await warmup_service.stop()
+    return ttfis, ready_ms, upstream
+
+
+def report(name: str, ttfis: list[float], ready_ms: float, connects: int) -> None:
+    """Print the TTFI of a burst and the time until ready."""
+    print(
+        f"{name:<34} ready after {ready_ms:>6.0f}ms  TTFI p50 "
+        f"{statistics.median(ttfis):>6.0f}ms  max {max(ttfis):>6.0f}ms  "
+        f"handshakes {connects:>3}"
+    )
+
+
+async def bench(args: argparse.Namespace) -> None:
+    """Run every scenario on the same event loop."""
+    scenarios = {
+        "cold start": (False, False, False, False),
+        "warm connections": (True, False, False, False),
+        "warm connections and model": (True, True, False, False),
+        f"after {args.idle}s idle, no keep-alive": (True, False, False, True),
+        f"after {args.idle}s idle, keep-alive": (True, False, True, True),
+    }
+    for name, (warmup, predictions, keepalive, idle) in scenarios.items():
+        ttfis, ready_ms, upstream = await run_scenario(
+            args, warmup, predictions, keepalive, idle
+        )
+        report(name, ttfis, ready_ms, upstream.connects)
+
+
+def main() -> None:
+    """Run every scenario."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--connect-ms", type=float, default=150.0)
+    parser.add_argument("--cold-start-ms", type=float, default=2000.0)
+    parser.add_argument("--expiry", type=float, default=2.0, help="Seconds")
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    args.jobs = min(args.jobs, settings.IMAGE_GEN_MODEL_CONCURRENCY)
+    print(
+        f"{args.jobs} single-image jobs at once, {args.latency_ms:.0f}ms "
+        f"predictions, {args.connect_ms:.0f}ms handshakes, "
+        f"{args.cold_start_ms:.0f}ms cold boot, connections expire after "
+        f"{args.expiry}s"
+    )
+
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Fake Replicate upstream for benchmarks and simulations.
+
+`FakeReplicateClient` stands in for `replicate.Client` in the generation
+service: `run` blocks its executor thread for a latency sampled from a
+configurable distribution, like a real prediction, and returns the output
+shapes the service handles (a list with a file output, or a URL string), or
+raises for a share of the calls.
+
+`predictions.create` starts a `FakePrediction` instead, polled with `reload`
+like a real one: while it runs it reports diffusion steps in its logs (as a
+progress bar) and a low-resolution output for every step, then it succeeds
+or fails once its latency has elapsed.
+
+Connections and model boots can be simulated too: a call that finds no idle
+pooled connection (they expire after `keepalive_expiry` seconds) pays a
+`connect_ms` handshake, and the first prediction of a model pays a
+`cold_start_ms` boot. `accounts.current` is a cheap call that only takes a
+connection for a round trip, like the pings of the warm-up service.
+"""
+
+import random
+import threading
+import time
+from typing import Optional, Union
+
+from replicate.prediction import Prediction
+
+LATENCY_DISTRIBUTIONS = ("lognormal", "fixed", "uniform", "pareto")
+OUTPUT_SHAPES = ("file_list", "string", "mixed")
+
+
+class FakeFileOutput:
+    """Stand-in for a Replicate `FileOutput`."""
+
+    def __init__(self, url: str):
+        """Initialize the output with its URL."""
+        self.url = url
+
+
+class FakePrediction:
+    """Stand-in for a Replicate `Prediction`, progressing with time."""
+
+    def __init__(self, prediction_id: str, latency_ms: float, steps: int, failed: bool):
+        """
+        Start the prediction.
+
+        Args:
+            prediction_id: Prediction identifier, used in output URLs
+            latency_ms: Time until the prediction is done
+            steps: Number of diffusion steps reported while it runs
+            failed: Whether the prediction fails once done
+        """
+        self.id = prediction_id
+        self.status = "starting"
+        self.output: Optional[list[str]] = None
+        self.logs = ""
+        self.error: Optional[str] = None
+        self._latency_ms = latency_ms
+        self._steps = steps
+        self._failed = failed
+        self._started_at = time.monotonic()
+
+    @property
+    def progress(self) -> Optional[Prediction.Progress]:
+        """Progress parsed from the logs, like a real prediction."""
+        return Prediction.Progress.parse(self.logs) if self.logs else None
+
+    def cancel(self) -> None:
+        """Cancel the prediction."""
+        if self.status not in ("succeeded", "failed"):
+            self.status = "canceled"
+
+    def reload(self) -> None:
+        """Update the prediction to the current time."""
+        if self.status == "canceled":
+            return
+        elapsed_ms = (time.monotonic() - self._started_at) * 1000
+        if elapsed_ms >= self._latency_ms:
+            if self._failed:
+                self.status = "failed"
+                self.error = "Prediction failed"
+                self.output = None
+            else:
+                self.status = "succeeded"
+                self.output = [f"https://replicate.delivery/fake/{self.id}.webp"]
+            return
+
+        self.status = "processing"
+        step = int(self._steps * elapsed_ms / self._latency_ms)
+        if step:
+            percent = 100 * step // self._steps
+            bar = "#" * (percent // 10)
+            self.logs = f"{percent:3d}%|{bar:<10}| {step}/{self._steps}\n"
+            self.output = [f"https://replicate.delivery/fake/{self.id}-step{step}.webp"]
+
+
+class FakePredictions:
+    """Stand-in for the `predictions` namespace of a Replicate client."""
+
+    def __init__(self, client: "FakeReplicateClient"):
+        """Initialize the namespace of a fake client."""
+        self._client = client
+
+    def create(self, model: str, input: dict, **params) -> FakePrediction:
+        """
+        Start a fake prediction.
+
+        Args:
+            model: Model identifier
+            input: Prediction input
+
+        Returns:
+            FakePrediction: The started prediction
+        """
+        call, latency_ms, failed, _ = self._client._start_call(model)
+        return FakePrediction(str(call), latency_ms, self._client.steps, failed)
+
+
+class FakeAccounts:
+    """Stand-in for the `accounts` namespace of a Replicate client."""
+
+    def __init__(self, client: "FakeReplicateClient"):
+        """Initialize the namespace of a fake client."""
+        self._client = client
+
+    def current(self) -> dict:
+        """Get the account, taking a connection for a round trip."""
+        self._client._connect()
+        if self._client.rtt_ms > 0:
+            time.sleep(self._client.rtt_ms / 1000)
+        self._client._release()
+        return {"type": "organization", "username": "fake"}
+
+
+class FakeReplicateClient:
+    """Replicate client whose predictions sleep instead of calling the API."""
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        model_latency_ms: Optional[dict[str, float]] = None,
+        seed: int = 0,
+        distribution: str = "lognormal",
+        output: str = "file_list",
+        steps: int = 0,
+        connect_ms: float = 0.0,
+        keepalive_expiry: float = 5.0,
+        cold_start_ms: float = 0.0,
+        rtt_ms: float = 0.0,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            latency_ms: Median latency of a prediction
+            jitter: Relative spread of the latency (log-normal sigma, or
+                relative half-width of the uniform distribution)
+            failure_rate: Share of predictions that raise an error
+            model_latency_ms: Median latency of specific models
+            seed: Seed for the random generator
+            distribution: Latency distribution: "lognormal", "fixed",
+                "uniform", or "pareto" (heavy tail, alpha 1.5)
+            output: Output shape: "file_list" (a list with a `FileOutput`),
+                "string" (a URL), or "mixed" (either, at random)
+            steps: Number of diffusion steps reported by polled predictions
+            connect_ms: Handshake time of a call without an idle connection
+            keepalive_expiry: Idle connections are closed after this long, in
+                seconds
+            cold_start_ms: Boot time added to the first prediction of a model
+            rtt_ms: Round trip of a call to `accounts.current`
+
+        Raises:
+            ValueError: If the distribution or output shape is unknown
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution}")
+        if output not in OUTPUT_SHAPES:
+            raise ValueError(f"Unknown output shape {output}")
+
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.model_latency_ms = model_latency_ms or {}
+        self.distribution = distribution
+        self.output = output
+        self.steps = steps
+        self.connect_ms = connect_ms
+        self.keepalive_expiry = keepalive_expiry
+        self.cold_start_ms = cold_start_ms
+        self.rtt_ms = rtt_ms
+        self.calls = 0
+        self.connects = 0
+        self.predictions = FakePredictions(self)
+        self.accounts = FakeAccounts(self)
+        # Release times of the idle pooled connections, and the booted models
+        self._idle_connections: list[float] = []
+        self._booted: set[str] = set()
+        self._rng = random.Random(seed)
+        # Calls run in executor threads
+        self._lock = threading.Lock()
+        # Cleared to hold calls before they start, e.g. to keep jobs running
+        self._running = threading.Event()
+        self._running.set()
+
+    def pause(self) -> None:
+        """Hold new and waiting predictions until `resume` is called."""
+        self._running.clear()
+
+    def resume(self) -> None:
+        """Let held predictions run."""
+        self._running.set()
+
+    def _sample_latency_ms(self, median_ms: float) -> float:
+        """Sample a prediction latency around a median."""
+        if self.distribution == "fixed":
+            return median_ms
+        if self.distribution == "uniform":
+            return median_ms * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.distribution == "pareto":
+            # The median of a Pareto distribution with alpha 1.5 is 2^(1/1.5)
+            return median_ms * self._rng.paretovariate(1.5) / 2 ** (1 / 1.5)
+        return median_ms * self._rng.lognormvariate(0, self.jitter)
+
+    def _connect(self) -> None:
+        """Take an idle pooled connection, or open one paying the handshake."""
+        with self._lock:
+            now = time.monotonic()
+            self._idle_connections = [
+                released
+                for released in self._idle_connections
+                if now - released < self.keepalive_expiry
+            ]
+            if self._idle_connections:
+                self._idle_connections.pop()
+                return
+            self.connects += 1
+        if self.connect_ms > 0:
+            time.sleep(self.connect_ms / 1000)
+
+    def _release(self) -> None:
+        """Return a connection to the pool."""
+        with self._lock:
+            self._idle_connections.append(time.monotonic())
+
+    def _start_call(self, model: str) -> tuple[int, float, bool, bool]:
+        """
+        Start a call once predictions are not held, and draw its outcome.
+
+        Returns:
+            tuple[int, float, bool, bool]: Call number, latency in
+            milliseconds, whether it fails, and whether it returns a string
+        """
+        self._running.wait()
+        with self._lock:
+            self.calls += 1
+            median_ms = self.model_latency_ms.get(model, self.latency_ms)
+            boot_ms = 0.0 if model in self._booted else self.cold_start_ms
+            self._booted.add(model)
+            return (
+                self.calls,
+                self._sample_latency_ms(median_ms) + boot_ms,
+                self._rng.random() < self.failure_rate,
+                self.output == "string"
+                or (self.output == "mixed" and self._rng.random() < 0.5),
+            )
+
+    def run(self, model: str, input: dict) -> Union[list[FakeFileOutput], str]:
+        """
+        Run a fake prediction.
+
+        Args:
+            model: Model identifier
+            input: Prediction input
+
+        Returns:
+            Union[list[FakeFileOutput], str]: A single output, in the
+            configured shape
+
+        Raises:
+            RuntimeError: For a `failure_rate` share of the calls
+        """
+        self._connect()
+        call, latency_ms, failed, as_string = self._start_call(model)
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000)
+        self._release()
+        if failed:
+            raise RuntimeError("Prediction failed")
+
+        url = f"https://replicate.delivery/fake/{call}.webp"
+        return url if as_string else [FakeFileOutput(url)]
@@ -0,0 +1,202 @@
+"""
+Load test comparing the development and production servers.
+
+Starts each server in turn on a free port: the development server as
+`run.py` does (`uvicorn main:app --reload`) and the production server
+(`server.py`). Each one is then driven with keep-alive HTTP/1.1 connections
+from several client processes, and the script reports req/s and latency
+percentiles per endpoint.
+
+Usage:
+    python -m benchmarks.load_server [--workers N] [--connections N]
+        [--duration SECONDS] [--clients N]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = ["/health", "/api/catalog/"]
+
+
+def free_port() -> int:
+    """Get a port nobody is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, workers: int) -> subprocess.Popen:
+    """
+    Start a server and wait until it answers health checks.
+
+    Args:
+        mode: "dev" or "prod"
+        port: Port to listen on
+        workers: Number of workers of the production server
+
+    Returns:
+        subprocess.Popen: Server process
+    """
+    if mode == "dev":
+        command = ["-m", "uvicorn", "main:app", "--reload", "--log-level", "warning"]
+        command += ["--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = ["server.py", "--workers", str(workers), "--log-level", "warning"]
+        command += ["--host", "127.0.0.1", "--port", str(port)]
+
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen(
+        [sys.executable, *command],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+
+    process.kill()
+    raise RuntimeError(f"The {mode} server did not start")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    """Stop a server like Ctrl+C would, killing it if it does not stop."""
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def drive_connection(
+    port: int, path: str, until: float, latencies: list[float]
+) -> int:
+    """
+    Send requests one after the other on a keep-alive connection.
+
+    Args:
+        port: Port of the server
+        path: Path to request
+        until: Monotonic time to stop at
+        latencies: Latencies of successful requests, in seconds, appended to
+
+    Returns:
+        int: Number of failed requests
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+    errors = 0
+
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        writer.write(request)
+        status_line = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        await reader.readexactly(length)
+
+        if status_line.split(b" ")[1:2] == [b"200"]:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+
+    writer.close()
+    return errors
+
+
+def run_client(port: int, path: str, connections: int, duration: float, results):
+    """Drive connections from a client process and report the latencies."""
+
+    async def run() -> tuple[list[float], int]:
+        latencies: list[float] = []
+        until = time.monotonic() + duration
+        errors = await asyncio.gather(
+            *(
+                drive_connection(port, path, until, latencies)
+                for _ in range(connections)
+            )
+        )
+        return latencies, sum(errors)
+
+    results.put(asyncio.run(run()))
+
+
+def load(port: int, path: str, clients: int, connections: int, duration: float) -> str:
+    """Load an endpoint from several client processes and format the results."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_client,
+            args=(port, path, connections // clients, duration, results),
+        )
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+
+    latencies: list[float] = []
+    errors = 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies += client_latencies
+        errors += client_errors
+    for process in processes:
+        process.join()
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return (
+        f"{len(latencies) / duration:>9,.0f} req/s  p50 {cuts[49] * 1e3:>7.2f}ms  "
+        f"p99 {cuts[98] * 1e3:>7.2f}ms  errors {errors}"
+    )
+
+
+def main() -> None:
+    """Run the load test against both servers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2)
+    args = parser.parse_args()
+
+    print(
+        f"{args.connections} connections from {args.clients} client processes, "
+        f"{args.duration:.0f}s per endpoint, {os.cpu_count()} CPUs"
+    )
+    for mode in ("dev", "prod"):
+        port = free_port()
+        process = start_server(mode, port, args.workers)
+        label = "dev (--reload)" if mode == "dev" else f"prod ({args.workers} workers)"
+        try:
+            for path in ENDPOINTS:
+                result = load(port, path, args.clients, args.connections, args.duration)
+                print(f"{label:<22} {path:<14} {result}")
+        finally:
+            stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,43 @@
 Main FastAPI application for MyFlix Backend API.
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.routers import auth, generation
+from app.core.loop_monitor import loop_monitor
+from app.routers import admin, auth, catalog, generation, monitoring
+from app.services.catalog_service import catalog_service
+from app.services.dedup_service import dedup_service
+from app.services.generation_service import generation_service
+from app.services.warmup_service import warmup_service
 
 # Set up logging
 setup_logging(settings.LOG_LEVEL)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks (monitors, warm-up, prefill, dedup, catalog reloads)."""
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if settings.UPSTREAM_WARMUP_ENABLED:
+        warmup_service.start()
+    generation_service.start_prefill()
+    dedup_service.start()
+    catalog_service.start()
+    yield
+    await catalog_service.stop()
+    await dedup_service.stop()
+    await generation_service.stop_prefill()
+    await warmup_service.stop()
+    await loop_monitor.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="MyFlix Backend API",
@@ -19,6 +46,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -33,6 +61,9 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router)
 app.include_router(generation.router)
+app.include_router(catalog.router)
+app.include_router(monitoring.router)
+app.include_router(admin.router)
 
 
 @app.get("/")
@@ -44,7 +75,16 @@ async def root():
     }
 
 
-@app.get("/health")
+@app.get("/health", responses={503: {"description": "Upstream warm-up not done"}})
 async def health_check():
-    """Health check endpoint."""
+    """
+    Health check endpoint, unavailable until the upstream is warmed up.
+
+    A worker whose warm-up failed until its timeout is still available (the
+    upstream may be down for every worker), but reports itself degraded.
+    """
+    if not warmup_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    if warmup_service.error is not None:
+        return {"status": "degraded", "warmup_error": warmup_service.error}
     return {"status": "healthy"}
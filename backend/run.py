@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """
-Development server runner for MyFlix Backend API.
+Server runner for MyFlix Backend API.
 
 Provides a simple way to run the development server with
-proper configuration and error handling.
+proper configuration and error handling. With `--prod`, runs the
+production server (see `server.py`) instead: several workers, no
+file watching and graceful shutdown.
+
+Usage:
+    python run.py [--prod] [--workers N] [--port PORT]
 """
 
+import argparse
 import os
 import subprocess
 import sys
@@ -13,7 +19,17 @@ from pathlib import Path
 
 
 def main():
-    """Run the FastAPI development server."""
+    """Run the FastAPI development or production server."""
+    parser = argparse.ArgumentParser(description="Run the MyFlix Backend API")
+    parser.add_argument("--prod", action="store_true", help="Run the production server")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes in production (default: number of CPUs)",
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
 
     # Get the directory where this script is located
     backend_dir = Path(__file__).parent
@@ -65,28 +81,41 @@ def main():
             print(f"❌ Error installing dependencies: {e}")
             sys.exit(1)
 
-    print("🚀 Starting MyFlix Backend API...")
-    print("📍 Backend server will be available at: http://localhost:8000")
-    print("📚 API Documentation: http://localhost:8000/docs")
+    if args.prod:
+        # Run the production server with the given number of workers
+        command = [
+            str(venv_path / "bin" / "python"),
+            "server.py",
+            "--host",
+            "0.0.0.0",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(args.workers),
+        ]
+    else:
+        # Run the development server using uvicorn, reloading on changes
+        command = [
+            str(venv_path / "bin" / "uvicorn"),
+            "main:app",
+            "--host",
+            "0.0.0.0",
+            "--port",
+            str(args.port),
+            "--reload",
+            "--log-level",
+            "info",
+        ]
+
+    mode = f"production, {args.workers} workers" if args.prod else "development"
+    print(f"🚀 Starting MyFlix Backend API ({mode})...")
+    print(f"📍 Backend server will be available at: http://localhost:{args.port}")
+    print(f"📚 API Documentation: http://localhost:{args.port}/docs")
     print("🛑 Press Ctrl+C to stop the server")
     print("-" * 50)
 
     try:
-        # Run the server using uvicorn
-        subprocess.run(
-            [
-                str(venv_path / "bin" / "uvicorn"),
-                "main:app",
-                "--host",
-                "0.0.0.0",
-                "--port",
-                "8000",
-                "--reload",
-                "--log-level",
-                "info",
-            ],
-            check=True,
-        )
+        subprocess.run(command, check=True)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except subprocess.CalledProcessError as e:
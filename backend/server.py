@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Production server for MyFlix Backend API.
+
+Runs the app on several worker processes without file watching:
+- every worker binds its own listening socket with `SO_REUSEPORT` where
+  supported, so the kernel balances connections between them; elsewhere the
+  workers share a socket bound once by the supervisor
+- uvloop and httptools are used when installed
+- idle keep-alive connections are held long enough to outlive the idle
+  timeout of common load balancers
+- on SIGINT/SIGTERM, every worker stops accepting connections and drains
+  generation jobs and their SSE streams before exiting; workers that exit
+  unexpectedly are restarted
+
+Generation jobs, their streams and in-process rate limits live in the worker
+that created them, so with several workers clients must reach the same
+worker for a job and its stream (e.g. with a sticky load balancer), and
+`RATE_LIMIT_REDIS_URL` should be set. Likewise, revoked tokens are kept per
+worker: without `REVOKED_TOKENS_REDIS_URL`, a logged-out access token or a
+used refresh token is still accepted by the other workers.
+
+Usage:
+    python server.py [--workers N] [--host HOST] [--port PORT]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Optional
+
+import uvicorn
+
+logger = logging.getLogger("myflix.server")
+
+# Held longer than the 60s idle timeout of common load balancers, so they
+# never reuse a connection the server is closing
+DEFAULT_KEEP_ALIVE = 65
+
+# Time given to generation jobs and open connections to finish on shutdown
+DEFAULT_GRACEFUL_TIMEOUT = 30
+
+# Interval between checks for workers that exited unexpectedly, in seconds
+SUPERVISE_INTERVAL = 0.5
+
+
+def create_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """
+    Bind a listening socket.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        reuse_port: Whether to set `SO_REUSEPORT`, letting every worker bind
+            its own socket to the same port
+
+    Returns:
+        socket.socket: Bound socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+class DrainingServer(uvicorn.Server):
+    """Uvicorn server that drains generation jobs before closing connections."""
+
+    async def shutdown(self, sockets: Optional[list[socket.socket]] = None) -> None:
+        """
+        Stop accepting connections, drain generation jobs, then shut down.
+
+        Jobs finishing while draining close their SSE streams with their
+        `done` event; streams still open afterwards get an `error` event.
+        Uvicorn then waits for the remaining connections to finish.
+
+        Args:
+            sockets: Listening sockets of the server
+        """
+        for server in self.servers:
+            server.close()
+        for sock in sockets or []:
+            sock.close()
+
+        if not self.force_exit:
+            # Imported here since the app is only loaded once the server starts
+            from app.services.generation_service import generation_service
+
+            await generation_service.drain(self.config.timeout_graceful_shutdown)
+
+        await super().shutdown(sockets)
+
+
+def run_worker(options: dict, sock: Optional[socket.socket]) -> None:
+    """
+    Run a worker process.
+
+    Args:
+        options: Parsed command line options
+        sock: Socket shared by every worker, or None to bind one with
+            `SO_REUSEPORT`
+    """
+    if sock is None:
+        sock = create_socket(options["host"], options["port"], reuse_port=True)
+
+    config = uvicorn.Config(
+        "main:app",
+        loop="auto",
+        http="auto",
+        log_level=options["log_level"],
+        access_log=options["access_log"],
+        timeout_keep_alive=options["keep_alive"],
+        timeout_graceful_shutdown=options["graceful_timeout"],
+    )
+    try:
+        DrainingServer(config).run(sockets=[sock])
+    except KeyboardInterrupt:
+        # Uvicorn re-raises the SIGINT it stopped on, once shut down
+        pass
+
+
+def supervise(options: dict) -> None:
+    """
+    Run the workers, restarting those that exit, until SIGINT or SIGTERM.
+
+    Args:
+        options: Parsed command line options
+    """
+    reuse_port = hasattr(socket, "SO_REUSEPORT")
+    shared_socket = (
+        None
+        if reuse_port
+        else create_socket(options["host"], options["port"], reuse_port=False)
+    )
+
+    # Workers are spawned so they do not inherit the supervisor's state
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def stop(signum: int, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    def start_worker() -> multiprocessing.Process:
+        process = context.Process(
+            target=run_worker, args=(options, shared_socket), daemon=False
+        )
+        process.start()
+        return process
+
+    workers = [start_worker() for _ in range(options["workers"])]
+    logger.info(
+        f"Started {len(workers)} workers on {options['host']}:{options['port']} "
+        f"({'SO_REUSEPORT' if reuse_port else 'shared socket'})"
+    )
+
+    while not stopping:
+        time.sleep(SUPERVISE_INTERVAL)
+        for i, process in enumerate(workers):
+            if not process.is_alive() and not stopping:
+                logger.warning(
+                    f"Worker {process.pid} exited with code {process.exitcode}, "
+                    "restarting"
+                )
+                workers[i] = start_worker()
+
+    logger.info("Stopping workers")
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+
+    deadline = time.monotonic() + options["graceful_timeout"] + 5
+    for process in workers:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            logger.warning(f"Worker {process.pid} did not stop in time, killing it")
+            process.kill()
+            process.join()
+
+
+def main() -> None:
+    """Parse the command line and run the production server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=int,
+        default=DEFAULT_KEEP_ALIVE,
+        help="Seconds to hold idle keep-alive connections open",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=DEFAULT_GRACEFUL_TIMEOUT,
+        help="Seconds to drain jobs and connections on shutdown",
+    )
+    parser.add_argument("--access-log", action="store_true")
+    parser.add_argument("--log-level", default="info")
+    options = vars(parser.parse_args())
+
+    logging.basicConfig(
+        level=options["log_level"].upper(),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    # Inherited by the workers, so the app knows whether it has several
+    os.environ["SERVER_WORKERS"] = str(options["workers"])
+
+    if options["workers"] <= 1:
+        # A single worker runs in this process, without a supervisor
+        sock = create_socket(
+            options["host"], options["port"], reuse_port=hasattr(socket, "SO_REUSEPORT")
+        )
+        run_worker(options, sock)
+    else:
+        supervise(options)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ export const useAuthStore = create<AuthState & AuthActions>()(
       // State
       user: null,
       token: null,
+      refreshToken: null,
       isAuthenticated: false,
       isLoading: false,
       // Start with false to initialize auth state (see AuthProvider.tsx).
@@ -27,6 +28,7 @@ export const useAuthStore = create<AuthState & AuthActions>()(
           set({
             user: response.user,
             token: response.token,
+            refreshToken: response.refresh_token,
             isAuthenticated: true,
             isLoading: false,
             error: null,
@@ -48,16 +50,50 @@ export const useAuthStore = create<AuthState & AuthActions>()(
         }
       },
 
+      // Clear the session, and revoke its tokens so they cannot be used anymore
       logout: () => {
+        const { token, refreshToken } = get();
+        if (token) {
+          apiClient
+            .post('/api/auth/logout', { refresh_token: refreshToken }, token)
+            .catch((error) => console.error('Failed to revoke session:', error));
+        }
+
         set({
           user: null,
           token: null,
+          refreshToken: null,
           isAuthenticated: false,
           isLoading: false,
           error: null,
         });
       },
 
+      // Exchange the refresh token for new tokens once the access token expired
+      refreshSession: async () => {
+        const { refreshToken } = get();
+        if (!refreshToken) {
+          return null;
+        }
+
+        try {
+          const response = await apiClient.post<LoginResponse>('/api/auth/refresh', {
+            refresh_token: refreshToken,
+          });
+
+          set({
+            user: response.user,
+            token: response.token,
+            refreshToken: response.refresh_token,
+            isAuthenticated: true,
+          });
+          return response.token;
+        } catch (error) {
+          console.error('Failed to refresh session:', error);
+          return null;
+        }
+      },
+
       // Initialize auth state from localStorage
       initialize: () => {
         const { token } = get();
@@ -72,6 +108,7 @@ export const useAuthStore = create<AuthState & AuthActions>()(
           set({
             user: null,
             token: null,
+            refreshToken: null,
             isAuthenticated: false,
             isAuthInitialized: true,
             error: null,
@@ -84,6 +121,7 @@ export const useAuthStore = create<AuthState & AuthActions>()(
       partialize: (state) => ({
         user: state.user,
         token: state.token,
+        refreshToken: state.refreshToken,
         isAuthenticated: state.isAuthenticated,
       }),
     }
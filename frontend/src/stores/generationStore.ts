@@ -28,16 +28,27 @@ export const useGenerationStore = create<GenerationStore>((set, get) => ({
     set({ isLoading: true, error: null });
 
     try {
-      const { token } = useAuthStore.getState();
-
-      const response = await apiClient.post<GenerationResponse>(
-        '/api/generate/',
-        {
-          prompt: request.prompt,
-          num_images: request.numImages,
-        },
-        token || ''
-      );
+      const body = {
+        prompt: request.prompt,
+        num_images: request.numImages,
+      };
+      const post = (token: string | null) =>
+        apiClient.post<GenerationResponse>('/api/generate/', body, token || '');
+
+      let response: GenerationResponse;
+      try {
+        response = await post(useAuthStore.getState().token);
+      } catch (error) {
+        // Access tokens are short-lived: renew it once and retry
+        if (!(error instanceof CustomApiError && error.statusCode === 401)) {
+          throw error;
+        }
+        const token = await useAuthStore.getState().refreshSession();
+        if (!token) {
+          throw error;
+        }
+        response = await post(token);
+      }
 
       // Initialize job with pending results
       const initialResults: GenerationResult[] = Array.from(
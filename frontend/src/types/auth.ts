@@ -10,12 +10,15 @@ export interface LoginCredentials {
 
 export interface LoginResponse {
   token: string;
+  refresh_token: string;
+  expires_in: number;
   user: User;
 }
 
 export interface AuthState {
   user: User | null;
   token: string | null;
+  refreshToken: string | null;
   isAuthenticated: boolean;
   isLoading: boolean;
   isAuthInitialized: boolean;
@@ -25,5 +28,6 @@ export interface AuthState {
 export interface AuthActions {
   login: (credentials: LoginCredentials) => Promise<void>;
   logout: () => void;
+  refreshSession: () => Promise<string | null>;
   initialize: () => void;
 }